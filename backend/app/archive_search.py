@@ -0,0 +1,69 @@
+"""
+Archived job search for the manager diary.
+
+Non-empty queries go to the ``search_archived_jobs`` RPC, which ranks matches
+on job number, client and site using trigram and full-text indexes (FTS5 in
+the local SQLite stand-in). Results come back ARCHIVE_SEARCH_LIMIT at a time;
+the caller asks for the next batch with ``offset`` ("load more"). If the RPC
+has not been migrated yet, the old ilike filter is used, still paged.
+"""
+import os
+import re
+from typing import List, Tuple
+
+from postgrest.exceptions import APIError
+
+from . import models
+from .db import db
+
+ARCHIVE_SEARCH_LIMIT = int(os.getenv("ARCHIVE_SEARCH_LIMIT", "25"))
+ARCHIVE_SEARCH_MAX_QUERY = 100
+
+# Characters with meaning in PostgREST filter syntax; never useful in a search term.
+_RESERVED = re.compile(r'[,()"\\*%]')
+
+
+def normalise_query(q: str) -> str:
+    return " ".join(_RESERVED.sub(" ", q or "").split())[:ARCHIVE_SEARCH_MAX_QUERY]
+
+
+async def _recent_archive(limit: int, offset: int) -> list:
+    res = await (
+        db.table("jobs").select("*").eq("status", "Archived")
+        .order("date", desc=True).order("id", desc=True)
+        .range(offset, offset + limit - 1)
+        .execute()
+    )
+    return res.data or []
+
+
+async def _ilike_archive(q: str, limit: int, offset: int) -> list:
+    res = await (
+        db.table("jobs").select("*").eq("status", "Archived")
+        .or_(f"job_number.ilike.*{q}*,client_name.ilike.*{q}*,site_name.ilike.*{q}*")
+        .order("date", desc=True).order("id", desc=True)
+        .range(offset, offset + limit - 1)
+        .execute()
+    )
+    return res.data or []
+
+
+async def search_archived_jobs(q: str = "", limit: int = ARCHIVE_SEARCH_LIMIT, offset: int = 0) -> Tuple[List[models.Job], bool]:
+    """One batch of archived jobs matching ``q`` (best match first), and whether more follow."""
+    q = normalise_query(q)
+    limit = max(int(limit), 1)
+    offset = max(int(offset), 0)
+    # Ask for one extra row to learn whether a "load more" link is needed.
+    if not q:
+        rows = await _recent_archive(limit + 1, offset)
+    else:
+        try:
+            rows = (await db.rpc("search_archived_jobs", {
+                "query": q, "result_limit": limit + 1, "result_offset": offset
+            }).execute()).data or []
+        except APIError as exc:
+            if exc.code != "PGRST202":
+                raise
+            print(f"Warning: search_archived_jobs is not available; falling back to ilike search: {exc}")
+            rows = await _ilike_archive(q, limit + 1, offset)
+    return [models.Job(**row) for row in rows[:limit]], len(rows) > limit
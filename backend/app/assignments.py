@@ -0,0 +1,169 @@
+"""
+Engineer assignments: which jobs an engineer is on, in what role, with whom.
+
+An engineer is on a job as its lead (jobs.engineer_contact_name, or for the
+staff diary jobs.engineer_email) or through a job_engineers row. The
+``engineer_assignments`` RPC returns those job rows together with the
+engineer's role and the whole team in one query; fetch_assignments() turns
+them into models.Job objects with the team fields filled in, and role_for_job()
+answers the portal's access and role checks with the same query narrowed to
+one job number.
+
+Without the RPC (migration not run yet) the same answer is assembled from
+jobs and job_engineers table queries.
+"""
+from datetime import date as dt_date, timedelta
+from typing import Iterable, List, Optional
+
+from postgrest.exceptions import APIError
+
+from . import models
+from .db import db
+
+# The job columns models.Job requires, for lookups that only need the role.
+ROLE_LOOKUP_COLUMNS = "id,job_number,date,time,priority,client_name,engineer_contact_name"
+
+
+def apply_engineer_team(jobs: List[models.Job], rows: Iterable[dict]) -> List[models.Job]:
+    """Fill engineer_team, contributing_engineer_names, supervisor_name and engineer_role from job_engineers rows."""
+    team_by_job = {}
+    role_by_job_engineer = {}
+    for row in rows:
+        job_number = row.get("job_number")
+        engineer_name = row.get("engineer_contact_name")
+        if not job_number or not engineer_name:
+            continue
+        team_by_job.setdefault(job_number, []).append(engineer_name)
+        role_by_job_engineer[(job_number, engineer_name)] = row.get("engineer_role") or "Contributing"
+
+    for job in jobs:
+        team = team_by_job.get(job.job_number) or []
+        if job.engineer_contact_name and job.engineer_contact_name not in team:
+            team.insert(0, job.engineer_contact_name)
+        team.sort(key=lambda engineer_name: (
+            0 if engineer_name == job.engineer_contact_name else
+            2 if role_by_job_engineer.get((job.job_number, engineer_name)) == "Supervisor" else
+            1
+        ))
+        job.engineer_team = team
+        job.contributing_engineer_names = [
+            engineer_name for engineer_name in team
+            if role_by_job_engineer.get((job.job_number, engineer_name)) == "Contributing"
+        ]
+        job.supervisor_name = next(
+            (
+                engineer_name for engineer_name in team
+                if role_by_job_engineer.get((job.job_number, engineer_name)) == "Supervisor"
+            ),
+            None
+        )
+        if job.engineer_contact_name:
+            job.engineer_role = role_by_job_engineer.get((job.job_number, job.engineer_contact_name), "Lead")
+    return jobs
+
+
+def _date_bounds(date: Optional[str], start_date: Optional[str], end_date: Optional[str]):
+    """A single day, or the inclusive start / exclusive end of a window."""
+    if date:
+        return date, (dt_date.fromisoformat(date) + timedelta(days=1)).isoformat()
+    return start_date, end_date
+
+
+async def _fetch_assignments_rpc(engineer_name, engineer_email, job_number, date_from, date_to, columns):
+    res = await db.rpc("engineer_assignments", {
+        "for_engineer": engineer_name,
+        "for_email": engineer_email,
+        "for_job_number": job_number,
+        "date_from": date_from,
+        "date_to": date_to,
+        "job_columns": None if columns == "*" else [column.strip() for column in columns.split(",")],
+    }).execute()
+    jobs = []
+    for row in res.data or []:
+        job = models.Job(**row["job"])
+        apply_engineer_team([job], [dict(member, job_number=job.job_number) for member in row.get("team") or []])
+        job.assignment_role = row.get("assignment_role")
+        jobs.append(job)
+    return jobs
+
+
+def _filter_window(query, job_number, date_from, date_to):
+    if job_number:
+        query = query.eq("job_number", job_number)
+    if date_from:
+        query = query.gte("date", date_from)
+    if date_to:
+        query = query.lt("date", date_to)
+    return query
+
+
+async def _fetch_assignments_tables(engineer_name, engineer_email, job_number, date_from, date_to, columns):
+    roles = {}
+    rows_by_number = {}
+    lead_query = db.table("jobs").select(columns)
+    if engineer_email:
+        lead_query = lead_query.or_(f"engineer_contact_name.eq.{engineer_name},engineer_email.eq.{engineer_email}")
+    else:
+        lead_query = lead_query.eq("engineer_contact_name", engineer_name)
+    for row in (await _filter_window(lead_query, job_number, date_from, date_to).execute()).data or []:
+        rows_by_number[row.get("job_number")] = row
+        roles[row.get("job_number")] = "Lead"
+
+    team_rows = []
+    try:
+        assignment_query = db.table("job_engineers").select("job_number,engineer_role").eq("engineer_contact_name", engineer_name)
+        if job_number:
+            assignment_query = assignment_query.eq("job_number", job_number)
+        for row in (await assignment_query.execute()).data or []:
+            if row.get("job_number"):
+                roles.setdefault(row["job_number"], row.get("engineer_role") or "Contributing")
+        assigned_numbers = [number for number in roles if number not in rows_by_number]
+        if assigned_numbers:
+            assigned_query = _filter_window(db.table("jobs").select(columns).in_("job_number", assigned_numbers), None, date_from, date_to)
+            for row in (await assigned_query.execute()).data or []:
+                rows_by_number[row.get("job_number")] = row
+        if rows_by_number:
+            team_rows = (await db.table("job_engineers").select("*").in_("job_number", list(rows_by_number)).execute()).data or []
+    except Exception as exc:
+        print(f"Warning: job_engineers lookup unavailable; using lead assignments only: {exc}")
+
+    jobs = [models.Job(**row) for row in rows_by_number.values() if row]
+    jobs.sort(key=lambda job: (job.date, job.time))
+    apply_engineer_team(jobs, team_rows)
+    for job in jobs:
+        job.assignment_role = roles.get(job.job_number)
+    return jobs
+
+
+async def fetch_assignments(
+    engineer_name: str,
+    engineer_email: Optional[str] = None,
+    job_number: Optional[str] = None,
+    date: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    columns: str = "*"
+) -> List[models.Job]:
+    """
+    Jobs the engineer is on, ordered by date and time, each with its team and
+    the engineer's assignment_role. ``date`` selects one day; otherwise
+    ``start_date`` is inclusive and ``end_date`` exclusive.
+    """
+    if not engineer_name:
+        return []
+    date_from, date_to = _date_bounds(date, start_date, end_date)
+    try:
+        return await _fetch_assignments_rpc(engineer_name, engineer_email, job_number, date_from, date_to, columns)
+    except APIError as exc:
+        if exc.code != "PGRST202":
+            raise
+        print("Warning: engineer_assignments RPC missing; reading jobs and job_engineers tables instead")
+        return await _fetch_assignments_tables(engineer_name, engineer_email, job_number, date_from, date_to, columns)
+
+
+async def role_for_job(engineer_name: Optional[str], job_number: Optional[str]) -> Optional[str]:
+    """The engineer's role on a job ("Lead", "Contributing", "Supervisor"), or None if not on it."""
+    if not engineer_name or not job_number:
+        return None
+    jobs = await fetch_assignments(engineer_name, job_number=job_number, columns=ROLE_LOOKUP_COLUMNS)
+    return jobs[0].assignment_role if jobs else None
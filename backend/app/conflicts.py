@@ -0,0 +1,230 @@
+"""
+Engineer booking conflicts.
+
+Every job an engineer is on (as lead or through job_engineers) occupies
+[date + time, date + time + duration), and approved leave occupies whole days.
+The ``engineer_bookings`` RPC returns all of those for a time window and a
+team in one query; they are loaded into a BookingIndex (per-engineer interval
+lists searched by bisect), which answers "who is busy between t1 and t2" and
+validates a whole draft week against the diary and against itself.
+
+Jobs without a stored duration take JOB_DEFAULT_DURATION_MINUTES. Without the
+RPC (migration not run yet) the same rows are read with plain table queries.
+"""
+import asyncio
+import os
+from bisect import bisect_left, bisect_right
+from datetime import date as dt_date, datetime, time as dt_time, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from postgrest.exceptions import APIError
+
+from . import models
+from .db import db
+
+JOB_DEFAULT_DURATION_MINUTES = max(int(os.getenv("JOB_DEFAULT_DURATION_MINUTES", "120")), 1)
+
+
+class Booking(NamedTuple):
+    engineer: str
+    starts_at: datetime
+    ends_at: datetime
+    kind: str  # "job", "leave" or "draft"
+    job_number: Optional[str] = None
+    client_name: Optional[str] = None
+    reason: Optional[str] = None
+
+
+def job_window(date, time, duration_minutes: Optional[int] = None) -> Tuple[datetime, datetime]:
+    """The [start, end) a job occupies; date and time may be strings or date/time values."""
+    day = date if isinstance(date, dt_date) else dt_date.fromisoformat(str(date))
+    at = time if isinstance(time, dt_time) else dt_time.fromisoformat(str(time))
+    starts_at = datetime.combine(day, at)
+    return starts_at, starts_at + timedelta(minutes=duration_minutes or JOB_DEFAULT_DURATION_MINUTES)
+
+
+def _naive(value) -> datetime:
+    value = value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+    return value.replace(tzinfo=None)
+
+
+class BookingIndex:
+    """Bookings per engineer, sorted by start, for overlap queries in O(log n + k)."""
+
+    def __init__(self, bookings: Iterable[Booking] = ()):
+        self._starts: Dict[str, List[datetime]] = {}
+        self._bookings: Dict[str, List[Booking]] = {}
+        # Longest booking per engineer bounds how far back an overlap can start.
+        self._longest: Dict[str, timedelta] = {}
+        for booking in bookings:
+            self.add(booking)
+
+    def add(self, booking: Booking):
+        starts = self._starts.setdefault(booking.engineer, [])
+        position = bisect_right(starts, booking.starts_at)
+        starts.insert(position, booking.starts_at)
+        self._bookings.setdefault(booking.engineer, []).insert(position, booking)
+        length = booking.ends_at - booking.starts_at
+        if length > self._longest.get(booking.engineer, timedelta(0)):
+            self._longest[booking.engineer] = length
+
+    def overlapping(self, engineer: str, starts_at: datetime, ends_at: datetime) -> List[Booking]:
+        starts = self._starts.get(engineer)
+        if not starts:
+            return []
+        first = bisect_left(starts, starts_at - self._longest[engineer])
+        last = bisect_left(starts, ends_at)
+        return [booking for booking in self._bookings[engineer][first:last] if booking.ends_at > starts_at]
+
+    def busy_between(self, engineer_names: Iterable[str], starts_at: datetime, ends_at: datetime) -> Dict[str, List[Booking]]:
+        busy = {}
+        for name in dict.fromkeys(engineer_names):
+            clashes = self.overlapping(name, starts_at, ends_at)
+            if clashes:
+                busy[name] = clashes
+        return busy
+
+    def __len__(self):
+        return sum(len(bookings) for bookings in self._bookings.values())
+
+
+async def _fetch_bookings_rpc(window_start, window_end, engineer_names, exclude_job_number) -> List[Booking]:
+    res = await db.rpc("engineer_bookings", {
+        "window_start": window_start.isoformat(),
+        "window_end": window_end.isoformat(),
+        "engineer_names": engineer_names,
+        "exclude_job_number": exclude_job_number,
+        "default_minutes": JOB_DEFAULT_DURATION_MINUTES,
+    }).execute()
+    return [
+        Booking(
+            engineer=row["engineer_name"],
+            starts_at=_naive(row["starts_at"]),
+            ends_at=_naive(row["ends_at"]),
+            kind=row["kind"],
+            job_number=row.get("job_number"),
+            client_name=row.get("client_name"),
+            reason=row.get("reason"),
+        )
+        for row in res.data or []
+    ]
+
+
+async def _fetch_bookings_tables(window_start, window_end, engineer_names, exclude_job_number) -> List[Booking]:
+    jobs_query = (
+        db.table("jobs")
+        .select("*")
+        .gte("date", (window_start.date() - timedelta(days=1)).isoformat())
+        .lte("date", window_end.date().isoformat())
+        .neq("status", "Archived")
+    )
+    leave_query = (
+        db.table("leave_requests")
+        .select("*")
+        .eq("status", "Approved")
+        .lte("start_date", (window_end - timedelta(microseconds=1)).date().isoformat())
+        .gte("end_date", window_start.date().isoformat())
+    )
+    if engineer_names is not None:
+        leave_query = leave_query.in_("engineer_name", engineer_names)
+    jobs_res, leave_res = await asyncio.gather(jobs_query.execute(), leave_query.execute())
+    jobs = [row for row in jobs_res.data or [] if row.get("job_number") != exclude_job_number]
+
+    teams = {row["job_number"]: {row["engineer_contact_name"]} - {None} for row in jobs}
+    if jobs:
+        try:
+            team_res = await db.table("job_engineers").select("job_number,engineer_contact_name").in_("job_number", list(teams)).execute()
+            for row in team_res.data or []:
+                teams[row["job_number"]].add(row["engineer_contact_name"])
+        except Exception as exc:
+            print(f"Warning: job_engineers unavailable; checking lead engineers only: {exc}")
+
+    wanted = set(engineer_names) if engineer_names is not None else None
+    bookings = []
+    for row in jobs:
+        starts_at, ends_at = job_window(row["date"], row["time"], row.get("duration_minutes"))
+        if starts_at >= window_end or ends_at <= window_start:
+            continue
+        for name in teams[row["job_number"]]:
+            if wanted is None or name in wanted:
+                bookings.append(Booking(name, starts_at, ends_at, "job", row["job_number"], row.get("client_name")))
+    for row in leave_res.data or []:
+        bookings.append(Booking(
+            row["engineer_name"],
+            datetime.combine(dt_date.fromisoformat(str(row["start_date"])), dt_time()),
+            datetime.combine(dt_date.fromisoformat(str(row["end_date"])) + timedelta(days=1), dt_time()),
+            "leave",
+            reason=row.get("reason"),
+        ))
+    return bookings
+
+
+async def fetch_bookings(
+    window_start: datetime,
+    window_end: datetime,
+    engineer_names: Optional[List[str]] = None,
+    exclude_job_number: Optional[str] = None
+) -> List[Booking]:
+    """Every booking overlapping [window_start, window_end) for the given engineers (or everyone)."""
+    if engineer_names is not None:
+        engineer_names = [name for name in dict.fromkeys(engineer_names) if name]
+    try:
+        bookings = await _fetch_bookings_rpc(window_start, window_end, engineer_names, exclude_job_number)
+    except APIError as exc:
+        if exc.code != "PGRST202":
+            raise
+        print("Warning: engineer_bookings RPC missing; reading jobs and leave tables instead")
+        bookings = await _fetch_bookings_tables(window_start, window_end, engineer_names, exclude_job_number)
+    return bookings
+
+
+async def busy_between(
+    engineer_names: List[str],
+    starts_at: datetime,
+    ends_at: datetime,
+    exclude_job_number: Optional[str] = None
+) -> Dict[str, List[Booking]]:
+    """Engineers of the team who are booked (or on leave) at any point in [starts_at, ends_at)."""
+    engineer_names = [name for name in dict.fromkeys(engineer_names) if name]
+    if not engineer_names:
+        return {}
+    index = BookingIndex(await fetch_bookings(starts_at, ends_at, engineer_names, exclude_job_number))
+    return index.busy_between(engineer_names, starts_at, ends_at)
+
+
+async def check_schedule(drafts: List[models.DraftBooking]) -> List[models.ScheduleConflict]:
+    """
+    Validate a draft schedule in one load: each draft is checked against the
+    diary and against the drafts before it. Drafts that move an existing job
+    are compared without that job's current booking.
+    """
+    windows = [job_window(draft.date, draft.time, draft.duration_minutes) for draft in drafts]
+    engineers = [name for draft in drafts for name in draft.engineers if name]
+    if not windows or not engineers:
+        return []
+
+    moved = {draft.job_number for draft in drafts if draft.job_number}
+    bookings = await fetch_bookings(min(start for start, _ in windows), max(end for _, end in windows), engineers)
+    index = BookingIndex(booking for booking in bookings if booking.kind == "leave" or booking.job_number not in moved)
+
+    conflicts = []
+    for draft, (starts_at, ends_at) in zip(drafts, windows):
+        team = [name for name in dict.fromkeys(draft.engineers) if name]
+        for name, clashes in index.busy_between(team, starts_at, ends_at).items():
+            conflicts.extend(
+                models.ScheduleConflict(
+                    ref=draft.ref,
+                    engineer=name,
+                    kind=booking.kind,
+                    job_number=booking.job_number,
+                    client_name=booking.client_name,
+                    reason=booking.reason,
+                    starts_at=booking.starts_at,
+                    ends_at=booking.ends_at,
+                )
+                for booking in clashes
+            )
+        for name in team:
+            index.add(Booking(name, starts_at, ends_at, "draft", draft.job_number or draft.ref))
+    return conflicts
+
@@ -0,0 +1,100 @@
+"""
+Home page statistics snapshot.
+
+The dashboard needs three counts, the most recent jobs (the 20-row "recent
+jobs" list and the 10-row "operation history" are served from one query),
+archived clients and sites, and the engineer list. SnapshotService runs those
+queries concurrently and keeps the result for DASHBOARD_SNAPSHOT_TTL seconds.
+Job allocation, edits, archiving and CRM writes call invalidate() with the
+table they touched so the next page load rebuilds it.
+"""
+import asyncio
+import os
+import time
+from typing import Optional
+
+from . import models
+from .db import db
+
+DASHBOARD_SNAPSHOT_TTL = float(os.getenv("DASHBOARD_SNAPSHOT_TTL", "15"))
+RECENT_JOBS_LIMIT = 20
+OPERATION_HISTORY_LIMIT = 10
+SNAPSHOT_TABLES = {"jobs", "engineers", "clients", "client_sites"}
+
+
+async def _count(table_name: str) -> int:
+    return (await db.table(table_name).select("*", count="exact", head=True).execute()).count or 0
+
+
+async def _rows(query) -> list:
+    return (await query.execute()).data or []
+
+
+async def build_snapshot() -> models.DashboardSnapshot:
+    (
+        total_jobs, active_engineers, total_clients,
+        recent_rows, archived_client_rows, archived_site_rows, engineer_rows
+    ) = await asyncio.gather(
+        _count("jobs"),
+        _count("engineers"),
+        _count("clients"),
+        _rows(db.table("jobs").select("*").order("date", desc=True).limit(RECENT_JOBS_LIMIT)),
+        _rows(db.table("clients").select("*").eq("archived", True)),
+        _rows(db.table("client_sites").select("*").eq("archived", True)),
+        _rows(db.table("engineers").select("*")),
+    )
+    recent_jobs = [models.Job(**j) for j in recent_rows]
+    return models.DashboardSnapshot(
+        total_jobs=total_jobs,
+        active_engineers=active_engineers,
+        total_clients=total_clients,
+        recent_jobs=recent_jobs,
+        all_jobs=recent_jobs[:OPERATION_HISTORY_LIMIT],
+        archived_clients=[models.Client(**c) for c in archived_client_rows],
+        archived_sites=[models.ClientSite(**s) for s in archived_site_rows],
+        engineers=[models.Engineer(**e) for e in engineer_rows],
+    )
+
+
+class SnapshotService:
+    def __init__(self, ttl: float = DASHBOARD_SNAPSHOT_TTL):
+        self.ttl = ttl
+        self._snapshot: Optional[models.DashboardSnapshot] = None
+        self._expires_at = 0.0
+        self._loading: Optional[asyncio.Future] = None
+        # Bumped by invalidate() so a build that raced a write is not stored.
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self) -> models.DashboardSnapshot:
+        if self._snapshot is not None and time.monotonic() < self._expires_at:
+            self.hits += 1
+            return self._snapshot
+        self.misses += 1
+        if self._loading is None or self._loading.get_loop() is not asyncio.get_running_loop():
+            self._loading = asyncio.ensure_future(self._build(self._generation))
+        loading = self._loading
+        try:
+            return await asyncio.shield(loading)
+        finally:
+            if self._loading is loading and loading.done():
+                self._loading = None
+
+    async def _build(self, generation: int) -> models.DashboardSnapshot:
+        snapshot = await build_snapshot()
+        if generation == self._generation:
+            self._snapshot = snapshot
+            self._expires_at = time.monotonic() + self.ttl
+        return snapshot
+
+    def invalidate(self, *tables: str):
+        """Drop the snapshot if any of ``tables`` (or, with none given, anything) changed."""
+        if tables and not SNAPSHOT_TABLES.intersection(tables):
+            return
+        self._generation += 1
+        self._snapshot = None
+        self._loading = None
+
+
+dashboard_snapshot = SnapshotService()
@@ -0,0 +1,108 @@
+"""
+Async data-access layer for PNJ Cleaning.
+
+Routers await PostgREST queries through one shared, pooled HTTP/2 client
+instead of tying up FastAPI's threadpool with the synchronous ``supabase``
+client:
+
+    res = await db.table("jobs").select("*").eq("job_number", job_number).execute()
+
+The query builder is postgrest-py's, so filters, ordering and error types are
+the same as before; each query is counted against the request being served (see
+``query_stats``). SUPABASE_URL and SUPABASE_KEY are required; a missing one
+is a configuration error rather than a silent switch to another database.
+Set PNJ_DB_BACKEND to "local" to serve queries from the SQLite stand-in in
+``local_db`` instead (LOCAL_DB_PATH selects a file, default in-memory).
+"""
+import os
+from typing import Optional
+
+import httpx
+from dotenv import load_dotenv
+from postgrest import AsyncPostgrestClient
+
+from .local_db import LocalBackend
+from .query_stats import QUERY_STATS, TracedQuery
+
+load_dotenv()
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_TIMEOUT = float(os.getenv("DB_TIMEOUT", "15"))
+DB_KEEPALIVE_EXPIRY = float(os.getenv("DB_KEEPALIVE_EXPIRY", "30"))
+
+
+def create_postgrest_client(url: str, key: str) -> AsyncPostgrestClient:
+    """Build an async PostgREST client backed by a pooled HTTP/2 connection pool."""
+    rest_url = f"{url.rstrip('/')}/rest/v1"
+    headers = {"apikey": key, "Authorization": f"Bearer {key}"}
+    http_client = httpx.AsyncClient(
+        base_url=rest_url,
+        headers=headers,
+        http2=True,
+        follow_redirects=True,
+        timeout=httpx.Timeout(DB_TIMEOUT, connect=5.0),
+        limits=httpx.Limits(
+            max_connections=DB_POOL_SIZE,
+            max_keepalive_connections=DB_POOL_SIZE,
+            keepalive_expiry=DB_KEEPALIVE_EXPIRY,
+        ),
+    )
+    return AsyncPostgrestClient(rest_url, headers=headers, http_client=http_client)
+
+
+class Database:
+    """Lazily-initialised handle that routes queries to the configured backend."""
+
+    def __init__(self):
+        self._backend = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = self._create_default_backend()
+        return self._backend
+
+    @staticmethod
+    def _create_default_backend():
+        url = os.getenv("SUPABASE_URL")
+        key = os.getenv("SUPABASE_KEY")
+        if os.getenv("PNJ_DB_BACKEND", "").lower() == "local":
+            path = os.getenv("LOCAL_DB_PATH", ":memory:")
+            print(f"DB: using local SQLite stand-in at {path}", flush=True)
+            return LocalBackend(path)
+        if not url or not key:
+            raise RuntimeError(
+                "SUPABASE_URL and SUPABASE_KEY must be set (or PNJ_DB_BACKEND=local for the SQLite stand-in)"
+            )
+        return create_postgrest_client(url, key)
+
+    @property
+    def is_local(self) -> bool:
+        return isinstance(self.backend, LocalBackend)
+
+    def use(self, backend):
+        """Swap the active backend (used by tests); returns the previous one."""
+        previous = self._backend
+        self._backend = backend
+        return previous
+
+    def use_local(self, path: str = ":memory:") -> LocalBackend:
+        backend = LocalBackend(path)
+        self.use(backend)
+        return backend
+
+    def table(self, table_name: str):
+        builder = self.backend.table(table_name)
+        return TracedQuery(builder, table_name) if QUERY_STATS else builder
+
+    def rpc(self, func: str, params: Optional[dict] = None):
+        builder = self.backend.rpc(func, params or {})
+        return TracedQuery(builder, f"rpc/{func}", (("rpc", (params or {},), {}),)) if QUERY_STATS else builder
+
+    async def aclose(self):
+        if self._backend is not None:
+            await self._backend.aclose()
+            self._backend = None
+
+
+db = Database()
@@ -0,0 +1,319 @@
+"""
+Delta sync from a SQLite database into the PostgREST database (or any target
+with the same query-builder API, such as the local stand-in).
+
+For every table the sync keeps, in a small SQLite state file:
+
+* a high-water mark: the largest integer ``id`` already pushed. Rows above it
+  are new and are pushed without further checks.
+* a content checksum per row at or below the mark. Those rows are re-read
+  locally, and only the ones whose checksum changed are pushed.
+
+Rows go out as batched upserts of DELTA_SYNC_BATCH_SIZE on the table's primary
+key. The mark and checksums of a batch are committed only after its upsert
+succeeds, so an interrupted run resumes where it stopped and re-running an
+unchanged database pushes nothing. Tables are ordered by their foreign keys
+and each dependency level is synced by up to DELTA_SYNC_WORKERS parallel
+workers. Rows deleted from the source are not deleted from the target.
+
+    python -m app.delta_sync pnj_database.db [--table job=jobs ...] [--state PATH]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Sequence
+
+from postgrest.exceptions import APIError
+
+from . import models
+
+DELTA_SYNC_BATCH_SIZE = max(int(os.getenv("DELTA_SYNC_BATCH_SIZE", "200")), 1)
+DELTA_SYNC_WORKERS = max(int(os.getenv("DELTA_SYNC_WORKERS", "4")), 1)
+
+_STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_marks (
+    sync_key TEXT PRIMARY KEY,
+    high_water_id INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS sync_checksums (
+    sync_key TEXT NOT NULL,
+    row_key TEXT NOT NULL,
+    checksum TEXT NOT NULL,
+    PRIMARY KEY (sync_key, row_key)
+);
+"""
+
+
+def row_checksum(row: dict) -> str:
+    body = json.dumps(row, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()[:32]
+
+
+class SyncState:
+    """High-water marks and row checksums, committed batch by batch."""
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(_STATE_SCHEMA)
+        # Table workers commit from different threads.
+        self.lock = threading.Lock()
+
+    def high_water(self, sync_key: str) -> int:
+        with self.lock:
+            row = self.conn.execute("SELECT high_water_id FROM sync_marks WHERE sync_key = ?", (sync_key,)).fetchone()
+        return row[0] if row else 0
+
+    def checksums(self, sync_key: str) -> Dict[str, str]:
+        with self.lock:
+            rows = self.conn.execute("SELECT row_key, checksum FROM sync_checksums WHERE sync_key = ?", (sync_key,)).fetchall()
+        return dict(rows)
+
+    def commit_batch(self, sync_key: str, checksums: Dict[str, str], high_water: Optional[int]):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO sync_checksums (sync_key, row_key, checksum) VALUES (?, ?, ?) "
+                "ON CONFLICT (sync_key, row_key) DO UPDATE SET checksum = excluded.checksum",
+                [(sync_key, key, checksum) for key, checksum in checksums.items()],
+            )
+            if high_water is not None:
+                self.conn.execute(
+                    "INSERT INTO sync_marks (sync_key, high_water_id) VALUES (?, ?) "
+                    "ON CONFLICT (sync_key) DO UPDATE SET high_water_id = MAX(high_water_id, excluded.high_water_id)",
+                    (sync_key, high_water),
+                )
+
+    def close(self):
+        self.conn.close()
+
+
+class SourceTable:
+    """One SQLite table: its key, column types and foreign-key parents."""
+
+    def __init__(self, path: str, name: str):
+        self.path = path
+        self.name = name
+        with sqlite3.connect(path) as conn:
+            info = conn.execute(f'PRAGMA table_info("{name}")').fetchall()
+            foreign_keys = conn.execute(f'PRAGMA foreign_key_list("{name}")').fetchall()
+        self.types = {row[1]: (row[2] or "").upper() for row in info}
+        self.key = [row[1] for row in sorted(info, key=lambda row: row[5]) if row[5]] or ["id"]
+        self.parents = {row[2] for row in foreign_keys if row[2] != name}
+        self.has_id = self.key == ["id"] and "INT" in self.types.get("id", "")
+
+    def _clean(self, row: sqlite3.Row) -> dict:
+        record = dict(row)
+        for column, declared in self.types.items():
+            if "BOOL" in declared and record.get(column) is not None:
+                record[column] = bool(record[column])
+        return record
+
+    def row_key(self, row: dict) -> str:
+        return json.dumps([row.get(column) for column in self.key], default=str)
+
+    def _read(self, batch_size: int, where: str, params: Sequence) -> Iterator[List[dict]]:
+        order = ", ".join(f'"{column}"' for column in self.key if column in self.types) or "rowid"
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            cursor = conn.execute(f'SELECT * FROM "{self.name}" {where} ORDER BY {order}', tuple(params))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield [self._clean(row) for row in rows]
+        finally:
+            conn.close()
+
+    async def batches(self, batch_size: int, where: str = "", params: Sequence = ()) -> AsyncIterator[List[dict]]:
+        """Rows in key order, ``batch_size`` at a time, read off the event loop."""
+        reader = self._read(batch_size, where, params)
+        while True:
+            batch = await asyncio.to_thread(next, reader, None)
+            if batch is None:
+                return
+            yield batch
+
+
+def source_tables(path: str) -> List[str]:
+    """Ordinary tables of the source (full-text indexes and their shadow tables are rebuilt, not synced)."""
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        ).fetchall()
+    virtual = [name for name, sql in rows if (sql or "").upper().startswith("CREATE VIRTUAL")]
+    return [name for name, _ in rows if not any(name == v or name.startswith(f"{v}_") for v in virtual)]
+
+
+def dependency_levels(tables: Dict[str, SourceTable]) -> List[List[str]]:
+    """Group source tables so every table comes after the tables it references."""
+    remaining, levels = dict(tables), []
+    while remaining:
+        level = sorted(name for name, table in remaining.items() if not (table.parents & set(remaining)))
+        if not level:  # reference cycle: push the rest together
+            level = sorted(remaining)
+        levels.append(level)
+        for name in level:
+            remaining.pop(name)
+    return levels
+
+
+class DeltaSync:
+    def __init__(
+        self,
+        source_path: str,
+        target,
+        state_path: Optional[str] = None,
+        table_map: Optional[Dict[str, str]] = None,
+        batch_size: int = DELTA_SYNC_BATCH_SIZE,
+        workers: int = DELTA_SYNC_WORKERS
+    ):
+        self.source_path = source_path
+        self.target = target
+        self.state = SyncState(state_path or f"{source_path}.sync-state")
+        self.table_map = table_map or {}
+        self.batch_size = max(int(batch_size), 1)
+        self.workers = asyncio.Semaphore(max(int(workers), 1))
+
+    async def _upsert(self, table: str, rows: List[dict], key: List[str]):
+        """Batched upsert that drops columns the target schema does not have."""
+        while True:
+            try:
+                await self.target.table(table).upsert(rows, on_conflict=",".join(key)).execute()
+                return
+            except APIError as exc:
+                message = str(exc)
+                marker = "Could not find the '"
+                if marker not in message:
+                    raise
+                missing_column = message.split(marker, 1)[1].split("' column", 1)[0]
+                if missing_column in key or not any(missing_column in row for row in rows):
+                    raise
+                print(f"Warning: {table}.{missing_column} missing from target schema; syncing without it")
+                rows = [{k: v for k, v in row.items() if k != missing_column} for row in rows]
+
+    async def _push(self, source: SourceTable, rows: List[dict], stats: models.TableSyncStats, high_water: Optional[int]):
+        await self._upsert(stats.target_table, rows, source.key)
+        checksums = {source.row_key(row): row_checksum(row) for row in rows}
+        await asyncio.to_thread(self.state.commit_batch, stats.sync_key, checksums, high_water)
+        stats.pushed += len(rows)
+        stats.batches += 1
+
+    async def sync_table(self, source_name: str) -> models.TableSyncStats:
+        table = self.table_map.get(source_name, source_name)
+        source = SourceTable(self.source_path, source_name)
+        # Two legacy tables can feed one target, so state is kept per pair.
+        sync_key = table if table == source_name else f"{source_name}>{table}"
+        stats = models.TableSyncStats(source_table=source_name, target_table=table, sync_key=sync_key)
+        async with self.workers:
+            known = await asyncio.to_thread(self.state.checksums, sync_key)
+            high_water = await asyncio.to_thread(self.state.high_water, sync_key) if source.has_id else None
+
+            # Rows already pushed once: only those whose content changed.
+            where, params = ("WHERE id <= ?", (high_water,)) if source.has_id else ("", ())
+            if not source.has_id or high_water:
+                pending = []
+                async for batch in source.batches(self.batch_size, where, params):
+                    stats.scanned += len(batch)
+                    for row in batch:
+                        stored = known.get(source.row_key(row))
+                        if stored != row_checksum(row):
+                            pending.append(row)
+                            if stored is None:
+                                stats.new += 1
+                            else:
+                                stats.changed += 1
+                    while len(pending) >= self.batch_size:
+                        await self._push(source, pending[:self.batch_size], stats, None)
+                        pending = pending[self.batch_size:]
+                if pending:
+                    await self._push(source, pending, stats, None)
+
+            # New rows above the mark, which moves forward with every batch.
+            if source.has_id:
+                async for batch in source.batches(self.batch_size, "WHERE id > ?", (high_water,)):
+                    stats.scanned += len(batch)
+                    stats.new += len(batch)
+                    await self._push(source, batch, stats, batch[-1]["id"])
+        print(
+            f"{source_name} -> {table}: {stats.scanned} scanned, {stats.new} new, "
+            f"{stats.changed} changed, {stats.pushed} pushed in {stats.batches} batches",
+            flush=True,
+        )
+        return stats
+
+    async def run(self, tables: Optional[List[str]] = None) -> List[models.TableSyncStats]:
+        names = tables or [name for name in source_tables(self.source_path) if not self.table_map or name in self.table_map]
+        sources = {name: SourceTable(self.source_path, name) for name in names}
+        results = []
+        try:
+            for level in dependency_levels(sources):
+                results.extend(await asyncio.gather(*(self.sync_table(name) for name in level)))
+        finally:
+            self.state.close()
+        return results
+
+
+# Legacy SQLite table names used by push_to_supabase.py.
+LEGACY_TABLE_MAP = {
+    "brand": "brands",
+    "user": "users",
+    "engineer": "engineers",
+    "client": "clients",
+    "client_site": "client_sites",
+    "site_contact": "site_contacts",
+    "job": "jobs",
+    "job_schedule": "jobs",
+    "leave_request": "leave_requests",
+    "extraction_report": "extraction_reports",
+    "extraction_micron_reading": "extraction_micron_readings",
+    "extraction_inspection_item": "extraction_inspection_items",
+    "extraction_filter_item": "extraction_filter_items",
+    "extraction_photo": "extraction_photos",
+    "system_setting": "system_settings",
+}
+
+
+def _parse_table_map(pairs: List[str]) -> Dict[str, str]:
+    table_map = {}
+    for pair in pairs:
+        source, _, target = pair.partition("=")
+        table_map[source] = target or source
+    return table_map
+
+
+def main(argv: Optional[List[str]] = None):
+    from .db import db
+
+    parser = argparse.ArgumentParser(description="Push new and changed SQLite rows to the configured database.")
+    parser.add_argument("source", help="SQLite database file")
+    parser.add_argument("--table", action="append", default=[], metavar="SOURCE[=TARGET]",
+                        help="table to sync (repeatable; default: every table)")
+    parser.add_argument("--legacy-names", action="store_true", help="map the old singular table names (job -> jobs, ...)")
+    parser.add_argument("--state", help="state file (default: SOURCE.sync-state)")
+    parser.add_argument("--batch-size", type=int, default=DELTA_SYNC_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=DELTA_SYNC_WORKERS)
+    args = parser.parse_args(argv)
+
+    table_map = _parse_table_map(args.table)
+    if args.legacy_names:
+        existing = set(source_tables(args.source))
+        table_map.update({source: target for source, target in LEGACY_TABLE_MAP.items() if source in existing})
+
+    async def sync():
+        try:
+            return await DeltaSync(
+                args.source, db, args.state, table_map, args.batch_size, args.workers
+            ).run(list(table_map) or None)
+        finally:
+            await db.aclose()
+
+    results = asyncio.run(sync())
+    print(f"Synced {len(results)} tables, {sum(stats.pushed for stats in results)} rows pushed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,29 +4,37 @@ from jose import jwt
 import os
 from urllib.parse import quote
 from . import models, security
-from .supabase_client import supabase
+from .db import db
+from .user_cache import user_cache
 
 # Centralized templates instance for use in routers
 templates = Jinja2Templates(directory=os.path.join(os.path.dirname(__file__), "templates"))
 templates.env.filters["quote_path"] = lambda value: quote(str(value or ""), safe="")
 
 # Helper to get user by email using Supabase
-def get_user_by_email(email: str):
+async def get_user_by_email(email: str):
     normalized_email = (email or "").strip()
     if not normalized_email:
         return None
-    res = supabase.table("users").select("*").ilike("email", normalized_email).limit(1).execute()
+    res = await db.table("users").select("*").ilike("email", normalized_email).limit(1).execute()
     if res.data:
         return models.User(**res.data[0])
     return None
 
-def get_user_by_username(username: str):
-    res = supabase.table("users").select("*").eq("username", username).execute()
+async def get_user_by_username(username: str):
+    res = await db.table("users").select("*").eq("username", username).execute()
     if res.data:
         return models.User(**res.data[0])
     return None
 
-def get_current_user(request: Request):
+async def get_current_user(request: Request):
+    # Memoised on the request so repeated resolution within one request is free.
+    if hasattr(request.state, "current_user"):
+        return request.state.current_user
+    request.state.current_user = await _resolve_current_user(request)
+    return request.state.current_user
+
+async def _resolve_current_user(request: Request):
     token = request.cookies.get("access_token")
     if not token:
         return None
@@ -35,11 +43,11 @@ def get_current_user(request: Request):
         email: str = payload.get("sub")
         if email is None:
             return None
-        return get_user_by_email(email)
+        return await user_cache.get_or_load(email, get_user_by_email)
     except Exception:
         return None
 
-def login_required(user: models.User = Depends(get_current_user)):
+async def login_required(user: models.User = Depends(get_current_user)):
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -49,7 +57,7 @@ def login_required(user: models.User = Depends(get_current_user)):
     return user
 
 def role_required(allowed_roles: list):
-    def dependency(user: models.User = Depends(login_required)):
+    async def dependency(user: models.User = Depends(login_required)):
         if user.role not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
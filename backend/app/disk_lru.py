@@ -0,0 +1,34 @@
+"""
+Size-capped cache directories, least recently used files evicted first.
+
+A file's mtime doubles as its LRU clock: touch() marks a cached file as used
+(and says whether it exists), evict() removes the oldest matching files until
+the directory is back under its byte budget.
+"""
+import os
+from typing import Callable
+
+
+def touch(path: str) -> bool:
+    try:
+        os.utime(path)
+        return True
+    except OSError:
+        return False
+
+
+def evict(directory: str, max_bytes: int, matches: Callable[[str], bool]):
+    try:
+        entries = [entry for entry in os.scandir(directory) if matches(entry.name)]
+    except OSError:
+        return
+    stats = [(entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in entries]
+    total = sum(size for _, size, _ in stats)
+    for _, size, path in sorted(stats):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
@@ -0,0 +1,134 @@
+"""
+In-process cache for engineer portal authorisation.
+
+Portal requests carry the engineer's access token and a job number; before
+doing anything they need the engineer behind the token and the engineer's
+role on that job (None when they are not on it). Both answers are cached here
+for ENGINEER_AUTH_TTL seconds, at most ENGINEER_AUTH_MAX_ENTRIES of each, and
+resolve() also memoises them on the request so one request never asks twice.
+
+_sync_job_engineers and job deletes call invalidate(job_number=...) so team
+changes apply on the next request; engineer edits, deletes and token changes
+call invalidate(engineer_name=...) or invalidate(token=...). Unknown tokens
+are not cached.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+from . import models
+from .assignments import role_for_job
+from .db import db
+
+ENGINEER_AUTH_TTL = float(os.getenv("ENGINEER_AUTH_TTL", "30"))
+ENGINEER_AUTH_MAX_ENTRIES = int(os.getenv("ENGINEER_AUTH_MAX_ENTRIES", "1024"))
+
+_MISSING = object()
+
+
+class EngineerAuthCache:
+    def __init__(self, ttl: float = ENGINEER_AUTH_TTL, max_entries: int = ENGINEER_AUTH_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max(max_entries, 1)
+        # token -> (expires_at, engineer)
+        self._engineers = OrderedDict()
+        # (engineer name, job number) -> (expires_at, role or None)
+        self._roles = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, entries: OrderedDict, key):
+        with self._lock:
+            entry = entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            entries.pop(key, None)
+            self.misses += 1
+            return _MISSING
+
+    def _put(self, entries: OrderedDict, key, value, generation: int):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return  # invalidated while loading
+            entries[key] = (time.monotonic() + self.ttl, value)
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    async def engineer(self, token: Optional[str]) -> Optional[models.Engineer]:
+        if not token:
+            return None
+        engineer = self._get(self._engineers, token)
+        if engineer is not _MISSING:
+            return engineer
+        generation = self._generation
+        res = await db.table("engineers").select("*").eq("access_token", token).execute()
+        if not res.data:
+            return None
+        engineer = models.Engineer(**res.data[0])
+        self._put(self._engineers, token, engineer, generation)
+        return engineer
+
+    async def role(self, engineer_name: Optional[str], job_number: Optional[str]) -> Optional[str]:
+        if not engineer_name or not job_number:
+            return None
+        key = (engineer_name, job_number)
+        role = self._get(self._roles, key)
+        if role is not _MISSING:
+            return role
+        generation = self._generation
+        role = await role_for_job(engineer_name, job_number)
+        self._put(self._roles, key, role, generation)
+        return role
+
+    async def resolve(self, token: Optional[str], job_number: Optional[str], request=None) -> Tuple[Optional[models.Engineer], Optional[str]]:
+        """(engineer, role on job_number) for a portal token, memoised on the request when given."""
+        memo = None
+        if request is not None:
+            memo = getattr(request.state, "engineer_auth", None)
+            if memo is None:
+                memo = request.state.engineer_auth = {}
+            if (token, job_number) in memo:
+                return memo[(token, job_number)]
+        engineer = await self.engineer(token)
+        context = (engineer, await self.role(engineer.contact_name, job_number) if engineer else None)
+        if memo is not None:
+            memo[(token, job_number)] = context
+        return context
+
+    def invalidate(self, job_number: Optional[str] = None, engineer_name: Optional[str] = None,
+                   token: Optional[str] = None, job_numbers: Iterable[str] = ()):
+        with self._lock:
+            self._generation += 1
+            dropped_jobs = set(job_numbers)
+            if job_number:
+                dropped_jobs.add(job_number)
+            if token:
+                self._engineers.pop(str(token), None)
+            if engineer_name:
+                for key in [k for k, (_, engineer) in self._engineers.items() if engineer.contact_name == engineer_name]:
+                    del self._engineers[key]
+            for key in [k for k in self._roles if k[1] in dropped_jobs or k[0] == engineer_name]:
+                del self._roles[key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._engineers.clear()
+            self._roles.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "engineers": len(self._engineers), "roles": len(self._roles)}
+
+
+engineer_auth = EngineerAuthCache()
@@ -0,0 +1,96 @@
+"""
+Job number allocation for PNJ Cleaning.
+
+Automatic job numbers (pnj0001, pnj0002, ...) come from the counter row in
+``job_number_counters`` via the ``reserve_job_numbers`` RPC, so allocating a
+number is one small round trip instead of downloading every job number.
+Numbers are reserved in blocks of JOB_NUMBER_BLOCK_SIZE and handed out from an
+in-process cache; the default block of 1 means a restart never skips numbers.
+
+Setting JOB_NUMBER_REUSE_GAPS=1 switches to the old behaviour of filling the
+lowest unused number. That mode asks the database for the first gap on every
+allocation and relies on the unique job_number constraint to settle races.
+"""
+import os
+import re
+from collections import deque
+from typing import List, Optional
+
+from .db import db
+
+JOB_NUMBER_PREFIX = "pnj"
+JOB_NUMBER_BLOCK_SIZE = max(int(os.getenv("JOB_NUMBER_BLOCK_SIZE", "1")), 1)
+JOB_NUMBER_REUSE_GAPS = os.getenv("JOB_NUMBER_REUSE_GAPS", "").lower() in {"1", "true", "yes"}
+
+_PNJ_NUMBER = re.compile(r"^pnj(\d+)$", re.IGNORECASE)
+
+
+def format_job_number(value: int) -> str:
+    return f"{JOB_NUMBER_PREFIX}{value:04d}"
+
+
+def parse_job_number(job_number: Optional[str]) -> Optional[int]:
+    """Return the numeric part of a pnjNNNN job number, or None for other formats."""
+    match = _PNJ_NUMBER.match((job_number or "").strip())
+    return int(match.group(1)) if match else None
+
+
+def _scalar(data):
+    # PostgREST returns scalar function results bare; tolerate a wrapped row too.
+    if isinstance(data, list):
+        data = data[0] if data else None
+    if isinstance(data, dict):
+        data = next(iter(data.values()), None)
+    return int(data)
+
+
+class JobNumberAllocator:
+    def __init__(self, block_size: int = JOB_NUMBER_BLOCK_SIZE, reuse_gaps: bool = JOB_NUMBER_REUSE_GAPS):
+        self.block_size = max(int(block_size), 1)
+        self.reuse_gaps = reuse_gaps
+        self._reserved = deque()
+
+    async def allocate(self) -> str:
+        """Hand out a job number that no other caller has been given."""
+        if self.reuse_gaps:
+            return format_job_number(_scalar((await db.rpc("first_free_job_number").execute()).data))
+        if not self._reserved:
+            # No lock needed: each reservation is an atomic UPDATE, so concurrent
+            # refills just get separate blocks.
+            res = await db.rpc("reserve_job_numbers", {"block_size": self.block_size}).execute()
+            first = _scalar(res.data)
+            self._reserved.extend(range(first, first + self.block_size))
+        return format_job_number(self._reserved.popleft())
+
+    async def reserve_block(self, count: int) -> List[str]:
+        """Reserve ``count`` consecutive numbers in one round trip (bulk scheduling)."""
+        if count <= 0:
+            return []
+        if self.reuse_gaps:
+            raise RuntimeError("Bulk job numbers come from the counter; unset JOB_NUMBER_REUSE_GAPS to use them")
+        first = _scalar((await db.rpc("reserve_job_numbers", {"block_size": count}).execute()).data)
+        return [format_job_number(value) for value in range(first, first + count)]
+
+    async def peek(self) -> str:
+        """The number the next allocation will most likely get (for pre-filling forms)."""
+        if self.reuse_gaps:
+            return format_job_number(_scalar((await db.rpc("first_free_job_number").execute()).data))
+        if self._reserved:
+            return format_job_number(self._reserved[0])
+        res = await db.table("job_number_counters").select("next_value").eq("name", JOB_NUMBER_PREFIX).execute()
+        return format_job_number(int(res.data[0]["next_value"]) if res.data else 1)
+
+    async def observe(self, job_number: Optional[str]):
+        """Move the counter past a pnj number that was entered by hand."""
+        value = parse_job_number(job_number)
+        if value is None or self.reuse_gaps:
+            return
+        self._reserved = deque(n for n in self._reserved if n != value)
+        await db.rpc("bump_job_number_counter", {"used_value": value}).execute()
+
+    def reset(self):
+        """Forget cached reservations (e.g. after switching database backends)."""
+        self._reserved.clear()
+
+
+job_number_allocator = JobNumberAllocator()
@@ -0,0 +1,803 @@
+"""
+SQLite stand-in for the Supabase PostgREST API.
+
+Implements the subset of the postgrest-py query builder used by the routers
+(select/insert/upsert/update/delete, the common filters, ordering, paging,
+counts and RPC calls) on top of an in-process SQLite database created from
+local_schema.sql. It lets the app and its tests run without a live project:
+
+    backend = LocalBackend()
+    res = await backend.table("jobs").select("*").eq("status", "Scheduled").execute()
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from datetime import date, datetime, time, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from postgrest import APIResponse
+from postgrest.base_request_builder import SingleAPIResponse
+from postgrest.exceptions import APIError
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "local_schema.sql")
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+# Resource embedding in a select list: alias:table!hint(columns)
+_EMBED = re.compile(r"^(?:([A-Za-z_]\w*):)?([A-Za-z_]\w*)(?:![A-Za-z_]\w*)?\((.*)\)$", re.DOTALL)
+_COMPARISON_OPERATORS = {
+    "eq": "=",
+    "neq": "!=",
+    "gt": ">",
+    "gte": ">=",
+    "lt": "<",
+    "lte": "<=",
+}
+
+
+def _quote(identifier: str) -> str:
+    if not _IDENTIFIER.match(identifier or ""):
+        raise APIError({"message": f"Invalid identifier: {identifier!r}", "code": "PGRST100"})
+    return f'"{identifier}"'
+
+
+def _normalise_time(value: str) -> str:
+    parts = str(value).split(":")
+    if len(parts) == 2:
+        return f"{parts[0].zfill(2)}:{parts[1]}:00"
+    return str(value)
+
+
+def _split_top_level(text: str) -> List[str]:
+    """Split a PostgREST logic filter on commas that are not inside parentheses."""
+    parts, depth, current = [], 0, []
+    for char in text:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == "," and depth == 0:
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    if current:
+        parts.append("".join(current))
+    return [part.strip() for part in parts if part.strip()]
+
+
+class LocalBackend:
+    """Process-local SQLite database exposing a PostgREST-shaped API."""
+
+    def __init__(self, path: str = ":memory:", schema_path: str = SCHEMA_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+        self.rpcs: Dict[str, Callable[..., Any]] = dict(LOCAL_RPCS)
+        self.query_count = 0
+        self.query_log: List[Tuple[str, str]] = []
+        self._columns: Dict[str, Dict[str, str]] = {}
+        with open(schema_path, "r", encoding="utf-8") as f:
+            self.conn.executescript(f.read())
+
+    def table(self, table_name: str) -> "LocalQueryBuilder":
+        return LocalQueryBuilder(self, table_name)
+
+    def from_(self, table_name: str) -> "LocalQueryBuilder":
+        return self.table(table_name)
+
+    def rpc(self, func: str, params: Optional[dict] = None) -> "LocalRPCBuilder":
+        return LocalRPCBuilder(self, func, params or {})
+
+    def register_rpc(self, name: str, func: Callable[..., Any]):
+        """Register a Python implementation of a Postgres function for ``rpc()`` calls."""
+        self.rpcs[name] = func
+
+    def reset_query_log(self):
+        self.query_count = 0
+        self.query_log = []
+
+    def record_query(self, table_name: str, method: str):
+        self.query_count += 1
+        self.query_log.append((table_name, method))
+
+    def columns(self, table_name: str) -> Dict[str, str]:
+        """Return ``{column: declared_type}`` for a table or view."""
+        if table_name not in self._columns:
+            with self.lock:
+                rows = self.conn.execute(f"PRAGMA table_info({_quote(table_name)})").fetchall()
+            if not rows:
+                raise APIError({
+                    "message": f'relation "public.{table_name}" does not exist',
+                    "code": "42P01",
+                })
+            self._columns[table_name] = {row["name"]: (row["type"] or "").upper() for row in rows}
+        return self._columns[table_name]
+
+    def relationship(self, parent: str, child: str) -> Optional[Tuple[str, str, str]]:
+        """Foreign key linking two tables, as ``(kind, parent_column, child_column)``.
+
+        ``kind`` is "many" when ``child`` references ``parent`` (embedded as a list)
+        and "one" when ``parent`` references ``child`` (embedded as an object).
+        """
+        with self.lock:
+            child_keys = self.conn.execute(f"PRAGMA foreign_key_list({_quote(child)})").fetchall()
+            parent_keys = self.conn.execute(f"PRAGMA foreign_key_list({_quote(parent)})").fetchall()
+        for fk in child_keys:
+            if fk["table"] == parent:
+                return "many", fk["to"] or self.primary_key(parent)[0], fk["from"]
+        for fk in parent_keys:
+            if fk["table"] == child:
+                return "one", fk["from"], fk["to"] or self.primary_key(child)[0]
+        return None
+
+    def primary_key(self, table_name: str) -> List[str]:
+        with self.lock:
+            rows = self.conn.execute(f"PRAGMA table_info({_quote(table_name)})").fetchall()
+        return [row["name"] for row in sorted(rows, key=lambda row: row["pk"]) if row["pk"]]
+
+    def to_db(self, table_name: str, column: str, value: Any) -> Any:
+        declared = self.columns(table_name).get(column, "")
+        if value is None:
+            return None
+        if declared == "BOOLEAN":
+            if isinstance(value, str):
+                return 1 if value.strip().lower() in {"true", "t", "1", "yes"} else 0
+            return 1 if value else 0
+        if declared == "JSON" and not isinstance(value, str):
+            return json.dumps(value)
+        if isinstance(value, bool):
+            return 1 if value else 0
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, (date, time)):
+            value = value.isoformat()
+        if isinstance(value, uuid.UUID):
+            return str(value)
+        if isinstance(value, (dict, list)):
+            return json.dumps(value)
+        if declared == "TIME":
+            return _normalise_time(value)
+        return value
+
+    def from_db(self, table_name: str, row: sqlite3.Row) -> dict:
+        declared_types = self.columns(table_name)
+        record = {}
+        for key in row.keys():
+            value = row[key]
+            declared = declared_types.get(key, "")
+            if value is not None and declared == "BOOLEAN":
+                value = bool(value)
+            elif value is not None and declared == "JSON":
+                try:
+                    value = json.loads(value)
+                except (TypeError, ValueError):
+                    pass
+            record[key] = value
+        return record
+
+    def execute_sql(self, sql: str, params: Tuple = ()) -> List[sqlite3.Row]:
+        with self.lock:
+            try:
+                return self.conn.execute(sql, params).fetchall()
+            except sqlite3.IntegrityError as exc:
+                message = str(exc)
+                if "UNIQUE" in message or "PRIMARY KEY" in message:
+                    raise APIError({
+                        "message": "duplicate key value violates unique constraint",
+                        "code": "23505",
+                        "details": message,
+                    }) from exc
+                raise APIError({"message": message, "code": "23502"}) from exc
+            except sqlite3.OperationalError as exc:
+                message = str(exc)
+                match = re.search(r"no such column: (\w+)", message)
+                if match:
+                    raise APIError({
+                        "message": f"Could not find the '{match.group(1)}' column in the schema cache",
+                        "code": "PGRST204",
+                    }) from exc
+                raise APIError({"message": message, "code": "XX000"}) from exc
+
+    def execute_many(self, statements: List[Tuple[str, Tuple]]) -> List[sqlite3.Row]:
+        """Run several statements in one transaction and return every returned row."""
+        rows: List[sqlite3.Row] = []
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                for sql, params in statements:
+                    rows.extend(self.execute_sql(sql, params))
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+        return rows
+
+    async def aclose(self):
+        with self.lock:
+            self.conn.close()
+
+
+class LocalQueryBuilder:
+    """Chainable query mirroring ``postgrest.AsyncRequestBuilder``."""
+
+    def __init__(self, backend: LocalBackend, table_name: str):
+        self.backend = backend
+        self.table_name = table_name
+        self.method = "select"
+        self.columns = "*"
+        self.payload: Any = None
+        self.filters: List[Tuple[str, list]] = []
+        self.orders: List[str] = []
+        self.limit_value: Optional[int] = None
+        self.offset_value: Optional[int] = None
+        self.count_method: Optional[str] = None
+        self.head = False
+        self.on_conflict = ""
+        self.ignore_duplicates = False
+        self.negate_next = False
+
+    # -- operations -------------------------------------------------------
+
+    def select(self, *columns: str, count: Optional[str] = None, head: bool = False):
+        self.method = "select"
+        self.columns = ",".join(columns) if columns else "*"
+        self.count_method = count
+        self.head = head
+        return self
+
+    def insert(self, json: Any, *, count: Optional[str] = None, upsert: bool = False, **_kwargs):
+        self.method = "upsert" if upsert else "insert"
+        self.payload = json
+        self.count_method = count
+        return self
+
+    def upsert(self, json: Any, *, count: Optional[str] = None, on_conflict: str = "",
+               ignore_duplicates: bool = False, **_kwargs):
+        self.method = "upsert"
+        self.payload = json
+        self.count_method = count
+        self.on_conflict = on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, json: dict, *, count: Optional[str] = None, **_kwargs):
+        self.method = "update"
+        self.payload = json
+        self.count_method = count
+        return self
+
+    def delete(self, *, count: Optional[str] = None, **_kwargs):
+        self.method = "delete"
+        self.count_method = count
+        return self
+
+    # -- filters ----------------------------------------------------------
+
+    def _add(self, clause: str, params: list):
+        if self.negate_next:
+            clause = f"NOT ({clause})"
+            self.negate_next = False
+        self.filters.append((clause, params))
+        return self
+
+    def _value(self, column: str, value: Any) -> Any:
+        return self.backend.to_db(self.table_name, column, value)
+
+    def _compile(self, column: str, operator: str, value: Any) -> Tuple[str, list]:
+        negate = False
+        if operator.startswith("not."):
+            negate, operator = True, operator[4:]
+        quoted = _quote(column)
+        if operator in _COMPARISON_OPERATORS:
+            clause, params = f"{quoted} {_COMPARISON_OPERATORS[operator]} ?", [self._value(column, value)]
+        elif operator in {"like", "ilike"}:
+            pattern = str(value).replace("*", "%")
+            clause = f"{quoted} LIKE ?" if operator == "ilike" else f"{quoted} GLOB ?"
+            if operator == "like":
+                pattern = pattern.replace("[", "[[]").replace("%", "*").replace("_", "?")
+            params = [pattern]
+        elif operator == "is":
+            literal = str(value).lower()
+            if literal == "null" or value is None:
+                clause, params = f"{quoted} IS NULL", []
+            else:
+                clause, params = f"{quoted} = ?", [1 if literal == "true" else 0]
+        elif operator == "in":
+            values = value
+            if isinstance(value, str):
+                values = [item.strip().strip('"') for item in value.strip("()").split(",") if item.strip()]
+            values = [self._value(column, item) for item in values]
+            if not values:
+                clause, params = "0", []
+            else:
+                clause, params = f"{quoted} IN ({', '.join('?' for _ in values)})", values
+        else:
+            raise APIError({"message": f"Unsupported operator '{operator}' in local backend", "code": "PGRST100"})
+        if negate:
+            clause = f"NOT ({clause})"
+        return clause, params
+
+    def _compile_logic(self, expression: str, joiner: str) -> Tuple[str, list]:
+        clauses, params = [], []
+        for part in _split_top_level(expression):
+            nested = re.match(r"^(not\.)?(and|or)\((.*)\)$", part)
+            if nested:
+                clause, nested_params = self._compile_logic(nested.group(3), " AND " if nested.group(2) == "and" else " OR ")
+                if nested.group(1):
+                    clause = f"NOT ({clause})"
+            else:
+                column, rest = part.split(".", 1)
+                operator, _, value = rest.partition(".")
+                if operator == "not":
+                    inner_operator, _, value = value.partition(".")
+                    operator = f"not.{inner_operator}"
+                if operator.split(".")[-1] != "in" and len(value) > 1 and value[0] == value[-1] == '"':
+                    value = value[1:-1]  # PostgREST-style quoting of reserved characters
+                clause, nested_params = self._compile(column, operator, value)
+            clauses.append(f"({clause})")
+            params.extend(nested_params)
+        return joiner.join(clauses) or "1", params
+
+    def not_(self):
+        self.negate_next = True
+        return self
+
+    def filter(self, column: str, operator: str, criteria: str):
+        return self._add(*self._compile(column, operator, criteria))
+
+    def eq(self, column: str, value: Any):
+        return self._add(*self._compile(column, "eq", value))
+
+    def neq(self, column: str, value: Any):
+        return self._add(*self._compile(column, "neq", value))
+
+    def gt(self, column: str, value: Any):
+        return self._add(*self._compile(column, "gt", value))
+
+    def gte(self, column: str, value: Any):
+        return self._add(*self._compile(column, "gte", value))
+
+    def lt(self, column: str, value: Any):
+        return self._add(*self._compile(column, "lt", value))
+
+    def lte(self, column: str, value: Any):
+        return self._add(*self._compile(column, "lte", value))
+
+    def like(self, column: str, pattern: str):
+        return self._add(*self._compile(column, "like", pattern))
+
+    def ilike(self, column: str, pattern: str):
+        return self._add(*self._compile(column, "ilike", pattern))
+
+    def is_(self, column: str, value: Any):
+        return self._add(*self._compile(column, "is", value))
+
+    def in_(self, column: str, values):
+        return self._add(*self._compile(column, "in", list(values)))
+
+    def match(self, query: Dict[str, Any]):
+        for column, value in query.items():
+            self.eq(column, value)
+        return self
+
+    def or_(self, filters: str, reference_table: Optional[str] = None):
+        return self._add(*self._compile_logic(filters, " OR "))
+
+    # -- modifiers --------------------------------------------------------
+
+    def order(self, column: str, *, desc: bool = False, nullsfirst: Optional[bool] = None, **_kwargs):
+        if nullsfirst is None:
+            nullsfirst = desc
+        direction = "DESC" if desc else "ASC"
+        nulls = "NULLS FIRST" if nullsfirst else "NULLS LAST"
+        self.orders.append(f"{_quote(column)} {direction} {nulls}")
+        return self
+
+    def limit(self, size: int, **_kwargs):
+        self.limit_value = int(size)
+        return self
+
+    def offset(self, size: int):
+        self.offset_value = int(size)
+        return self
+
+    def range(self, start: int, end: int, **_kwargs):
+        self.offset_value = int(start)
+        self.limit_value = int(end) - int(start) + 1
+        return self
+
+    # -- execution --------------------------------------------------------
+
+    def _where(self) -> Tuple[str, list]:
+        if not self.filters:
+            return "", []
+        params: list = []
+        for _, clause_params in self.filters:
+            params.extend(clause_params)
+        return " WHERE " + " AND ".join(f"({clause})" for clause, _ in self.filters), params
+
+    def _parse_select(self) -> Tuple[List[str], List[Tuple[str, str, str]]]:
+        """Split the select list into plain columns and ``alias:table(columns)`` embeds."""
+        columns, embeds = [], []
+        for item in _split_top_level(self.columns or "*"):
+            match = _EMBED.match(item)
+            if match:
+                embeds.append((match.group(1) or match.group(2), match.group(2), match.group(3).strip() or "*"))
+            else:
+                columns.append(item)
+        return columns, embeds
+
+    def _select_list(self, columns: List[str]) -> str:
+        if not columns or "*" in columns:
+            return "*"
+        known = self.backend.columns(self.table_name)
+        for column in columns:
+            if column not in known:
+                raise APIError({
+                    "message": f"column {self.table_name}.{column} does not exist",
+                    "code": "42703",
+                })
+        return ", ".join(_quote(column) for column in columns)
+
+    def _attach_embeds(self, rows: List[dict], embeds: List[Tuple[str, str, str]], hidden: set):
+        for alias, child, child_columns in embeds:
+            relation = self.backend.relationship(self.table_name, child)
+            if relation is None:
+                raise APIError({
+                    "message": f"Could not find a relationship between '{self.table_name}' and '{child}' in the schema cache",
+                    "code": "PGRST200",
+                })
+            kind, parent_column, child_column = relation
+            keys = sorted({row[parent_column] for row in rows if row.get(parent_column) is not None}, key=str)
+            if child_columns.strip() == "count":
+                # ``alias:child(count)`` embeds [{"count": n}] instead of the rows.
+                placeholders = ", ".join("?" for _ in keys) or "NULL"
+                counts = {
+                    count_row["k"]: count_row["n"]
+                    for count_row in self.backend.execute_sql(
+                        f"SELECT {_quote(child_column)} AS k, COUNT(*) AS n FROM {_quote(child)} "
+                        f"WHERE {_quote(child_column)} IN ({placeholders}) GROUP BY {_quote(child_column)}",
+                        tuple(keys),
+                    )
+                }
+                for row in rows:
+                    row[alias] = [{"count": counts.get(row.get(parent_column), 0)}]
+                continue
+            child_query = LocalQueryBuilder(self.backend, child).select(child_columns)
+            child_rows = child_query.in_(child_column, keys)._fetch(extra_columns=[child_column]) if keys else []
+            grouped: Dict[Any, List[dict]] = {}
+            for child_row in child_rows:
+                grouped.setdefault(child_row[child_column], []).append(child_row)
+            for child_row in child_rows:
+                if child_column in child_query._hidden:
+                    child_row.pop(child_column, None)
+            for row in rows:
+                matches = grouped.get(row.get(parent_column), [])
+                row[alias] = matches if kind == "many" else (matches[0] if matches else None)
+        for row in rows:
+            for column in hidden:
+                row.pop(column, None)
+
+    def _rows(self, rows: List[sqlite3.Row]) -> List[dict]:
+        return [self.backend.from_db(self.table_name, row) for row in rows]
+
+    def _run_select(self) -> APIResponse:
+        where, params = self._where()
+        count = None
+        if self.count_method:
+            count = self.backend.execute_sql(
+                f"SELECT COUNT(*) AS n FROM {_quote(self.table_name)}{where}", tuple(params)
+            )[0]["n"]
+        if self.head:
+            return APIResponse(data=[], count=count)
+        return APIResponse(data=self._fetch(), count=count)
+
+    def _fetch(self, extra_columns: Optional[List[str]] = None) -> List[dict]:
+        where, params = self._where()
+        columns, embeds = self._parse_select()
+        # Join keys needed for embedding are selected even if not asked for, then dropped.
+        required = list(extra_columns or [])
+        for _, child, _ in embeds:
+            relation = self.backend.relationship(self.table_name, child)
+            if relation:
+                required.append(relation[1])
+        self._hidden = set()
+        if columns and "*" not in columns:
+            for column in required:
+                if column not in columns:
+                    columns.append(column)
+                    self._hidden.add(column)
+        elif not columns:
+            columns = ["*"]
+        sql = f"SELECT {self._select_list(columns)} FROM {_quote(self.table_name)}{where}"
+        if self.orders:
+            sql += " ORDER BY " + ", ".join(self.orders)
+        if self.limit_value is not None or self.offset_value is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params = params + [self.limit_value if self.limit_value is not None else -1, self.offset_value or 0]
+        rows = self._rows(self.backend.execute_sql(sql, tuple(params)))
+        if embeds:
+            self._attach_embeds(rows, embeds, self._hidden - set(extra_columns or []))
+        return rows
+
+    def _payload_rows(self) -> List[dict]:
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        return [dict(row) for row in rows if row is not None]
+
+    def _insert_statement(self, row: dict, conflict_clause: str = "") -> Tuple[str, Tuple]:
+        columns = list(row.keys())
+        values = tuple(self._value(column, row[column]) for column in columns)
+        if columns:
+            column_sql = ", ".join(_quote(column) for column in columns)
+            placeholders = ", ".join("?" for _ in columns)
+            sql = f"INSERT INTO {_quote(self.table_name)} ({column_sql}) VALUES ({placeholders})"
+        else:
+            sql = f"INSERT INTO {_quote(self.table_name)} DEFAULT VALUES"
+        return f"{sql}{conflict_clause} RETURNING *", values
+
+    def _run_insert(self) -> APIResponse:
+        statements = [self._insert_statement(row) for row in self._payload_rows()]
+        rows = self._rows(self.backend.execute_many(statements))
+        return APIResponse(data=rows, count=len(rows) if self.count_method else None)
+
+    def _run_upsert(self) -> APIResponse:
+        conflict_columns = [c.strip() for c in (self.on_conflict or "").split(",") if c.strip()]
+        if not conflict_columns:
+            conflict_columns = self.backend.primary_key(self.table_name)
+        statements = []
+        for row in self._payload_rows():
+            target = ", ".join(_quote(column) for column in conflict_columns)
+            updates = [column for column in row if column not in conflict_columns]
+            if self.ignore_duplicates or not updates:
+                conflict_clause = f" ON CONFLICT ({target}) DO NOTHING"
+            else:
+                assignments = ", ".join(f"{_quote(column)} = excluded.{_quote(column)}" for column in updates)
+                conflict_clause = f" ON CONFLICT ({target}) DO UPDATE SET {assignments}"
+            statements.append(self._insert_statement(row, conflict_clause))
+        rows = self._rows(self.backend.execute_many(statements))
+        return APIResponse(data=rows, count=len(rows) if self.count_method else None)
+
+    def _run_update(self) -> APIResponse:
+        payload = dict(self.payload or {})
+        if not payload:
+            return APIResponse(data=[], count=0 if self.count_method else None)
+        assignments = ", ".join(f"{_quote(column)} = ?" for column in payload)
+        values = [self._value(column, value) for column, value in payload.items()]
+        where, params = self._where()
+        sql = f"UPDATE {_quote(self.table_name)} SET {assignments}{where} RETURNING *"
+        rows = self._rows(self.backend.execute_sql(sql, tuple(values + params)))
+        return APIResponse(data=rows, count=len(rows) if self.count_method else None)
+
+    def _run_delete(self) -> APIResponse:
+        where, params = self._where()
+        sql = f"DELETE FROM {_quote(self.table_name)}{where} RETURNING *"
+        rows = self._rows(self.backend.execute_sql(sql, tuple(params)))
+        return APIResponse(data=rows, count=len(rows) if self.count_method else None)
+
+    def _check_payload_columns(self):
+        known = self.backend.columns(self.table_name)
+        rows = self._payload_rows() if self.method in {"insert", "upsert"} else [self.payload or {}]
+        for row in rows:
+            for column in row:
+                if column not in known:
+                    raise APIError({
+                        "message": f"Could not find the '{column}' column of '{self.table_name}' in the schema cache",
+                        "code": "PGRST204",
+                    })
+
+    async def execute(self) -> APIResponse:
+        self.backend.record_query(self.table_name, self.method)
+        if self.method in {"insert", "upsert", "update"}:
+            self._check_payload_columns()
+        runner = {
+            "select": self._run_select,
+            "insert": self._run_insert,
+            "upsert": self._run_upsert,
+            "update": self._run_update,
+            "delete": self._run_delete,
+        }[self.method]
+        return runner()
+
+
+class LocalRPCBuilder:
+    """Calls a Python function registered with ``LocalBackend.register_rpc``."""
+
+    def __init__(self, backend: LocalBackend, func: str, params: dict):
+        self.backend = backend
+        self.func = func
+        self.params = params
+
+    async def execute(self) -> SingleAPIResponse:
+        self.backend.record_query(f"rpc/{self.func}", "rpc")
+        handler = self.backend.rpcs.get(self.func)
+        if handler is None:
+            raise APIError({
+                "message": f"Could not find the function public.{self.func} in the schema cache",
+                "code": "PGRST202",
+            })
+        return SingleAPIResponse(data=handler(self.backend, **self.params))
+
+
+# Stand-ins for the Postgres functions created by migrations/, keyed by name.
+LOCAL_RPCS: Dict[str, Callable[..., Any]] = {}
+
+_PNJ_NUMBER = re.compile(r"^pnj(\d+)$", re.IGNORECASE)
+
+
+def local_rpc(name: str):
+    def decorator(func: Callable[..., Any]):
+        LOCAL_RPCS[name] = func
+        return func
+    return decorator
+
+
+def _used_pnj_numbers(backend: LocalBackend) -> List[int]:
+    rows = backend.execute_sql("SELECT job_number FROM jobs WHERE job_number LIKE 'pnj%'")
+    numbers = []
+    for row in rows:
+        match = _PNJ_NUMBER.match((row["job_number"] or "").strip())
+        if match:
+            numbers.append(int(match.group(1)))
+    return numbers
+
+
+@local_rpc("reserve_job_numbers")
+def _reserve_job_numbers(backend: LocalBackend, block_size: int = 1) -> int:
+    block_size = max(int(block_size or 1), 1)
+    rows = backend.execute_sql(
+        "UPDATE job_number_counters SET next_value = next_value + ? WHERE name = 'pnj' "
+        "RETURNING next_value - ? AS first_value",
+        (block_size, block_size),
+    )
+    return rows[0]["first_value"]
+
+
+@local_rpc("bump_job_number_counter")
+def _bump_job_number_counter(backend: LocalBackend, used_value: int) -> int:
+    rows = backend.execute_sql(
+        "UPDATE job_number_counters SET next_value = MAX(next_value, ?) WHERE name = 'pnj' "
+        "RETURNING next_value",
+        (int(used_value) + 1,),
+    )
+    return rows[0]["next_value"]
+
+
+@local_rpc("first_free_job_number")
+def _first_free_job_number(backend: LocalBackend) -> int:
+    used = set(_used_pnj_numbers(backend))
+    candidate = 1
+    while candidate in used:
+        candidate += 1
+    return candidate
+
+
+_LIKE_ESCAPE = str.maketrans({"\\": "\\\\", "%": "\\%", "_": "\\_"})
+
+
+@local_rpc("search_archived_jobs")
+def _search_archived_jobs(backend: LocalBackend, query: str, result_limit: int = 25, result_offset: int = 0) -> List[dict]:
+    # FTS5's trigram tokenizer needs three characters; shorter words use LIKE.
+    words = (query or "").lower().split()
+    long_words = [word for word in words if len(word) >= 3]
+    where, params = ["jobs.status = 'Archived'"], []
+    source, rank = "jobs", "0"
+    if long_words:
+        source = "jobs_search JOIN jobs ON jobs.id = jobs_search.rowid"
+        rank = "bm25(jobs_search)"
+        where.append("jobs_search MATCH ?")
+        params.append(" AND ".join('"' + word.replace('"', '""') + '"' for word in long_words))
+    for word in words:
+        if len(word) < 3:
+            where.append(
+                "lower(coalesce(jobs.job_number, '') || ' ' || coalesce(jobs.client_name, '') || ' ' || "
+                "coalesce(jobs.site_name, '')) LIKE ? ESCAPE '\\'"
+            )
+            params.append(f"%{word.translate(_LIKE_ESCAPE)}%")
+    rows = backend.execute_sql(
+        f"SELECT jobs.* FROM {source} WHERE {' AND '.join(where)} "
+        f"ORDER BY {rank}, jobs.date DESC, jobs.id DESC LIMIT ? OFFSET ?",
+        tuple(params) + (max(int(result_limit), 1), max(int(result_offset), 0)),
+    )
+    return [backend.from_db("jobs", row) for row in rows]
+
+
+@local_rpc("engineer_bookings")
+def _engineer_bookings(
+    backend: LocalBackend,
+    window_start: str,
+    window_end: str,
+    engineer_names: Optional[List[str]] = None,
+    exclude_job_number: Optional[str] = None,
+    default_minutes: int = 120
+) -> List[dict]:
+    start, end = datetime.fromisoformat(window_start), datetime.fromisoformat(window_end)
+    wanted = set(engineer_names) if engineer_names is not None else None
+    team = backend.execute_sql(
+        "WITH window_jobs AS ("
+        "  SELECT job_number, client_name, engineer_contact_name, date, time, duration_minutes FROM jobs"
+        "  WHERE status != 'Archived' AND date BETWEEN ? AND ? AND job_number IS NOT ?"
+        ") "
+        "SELECT engineer_contact_name AS engineer_name, job_number, client_name, date, time, duration_minutes "
+        "FROM window_jobs WHERE engineer_contact_name IS NOT NULL "
+        "UNION "
+        "SELECT je.engineer_contact_name, wj.job_number, wj.client_name, wj.date, wj.time, wj.duration_minutes "
+        "FROM window_jobs wj JOIN job_engineers je ON je.job_number = wj.job_number",
+        ((start.date() - timedelta(days=1)).isoformat(), end.date().isoformat(), exclude_job_number),
+    )
+    leave = backend.execute_sql(
+        "SELECT engineer_name, reason, start_date, end_date FROM leave_requests "
+        "WHERE status = 'Approved' AND start_date <= ? AND end_date >= ?",
+        ((end - timedelta(microseconds=1)).date().isoformat(), start.date().isoformat()),
+    )
+    bookings = []
+    for row in team:
+        starts_at = datetime.fromisoformat(f"{row['date']}T{row['time']}")
+        ends_at = starts_at + timedelta(minutes=row["duration_minutes"] or default_minutes)
+        if starts_at < end and ends_at > start and (wanted is None or row["engineer_name"] in wanted):
+            bookings.append({
+                "engineer_name": row["engineer_name"], "kind": "job", "job_number": row["job_number"],
+                "client_name": row["client_name"], "reason": None,
+                "starts_at": starts_at.isoformat(), "ends_at": ends_at.isoformat(),
+            })
+    for row in leave:
+        if wanted is None or row["engineer_name"] in wanted:
+            bookings.append({
+                "engineer_name": row["engineer_name"], "kind": "leave", "job_number": None,
+                "client_name": None, "reason": row["reason"],
+                "starts_at": f"{row['start_date']}T00:00:00",
+                "ends_at": (date.fromisoformat(str(row["end_date"])) + timedelta(days=1)).isoformat() + "T00:00:00",
+            })
+    return sorted(bookings, key=lambda booking: (booking["engineer_name"], booking["starts_at"]))
+
+
+@local_rpc("engineer_assignments")
+def _engineer_assignments(
+    backend: LocalBackend,
+    for_engineer: str,
+    for_email: Optional[str] = None,
+    for_job_number: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    job_columns: Optional[List[str]] = None
+) -> List[dict]:
+    rows = backend.execute_sql(
+        "WITH assigned AS ("
+        "  SELECT job_number, 'Lead' AS role, 0 AS source FROM jobs"
+        "  WHERE engineer_contact_name = ? OR (? IS NOT NULL AND engineer_email = ?)"
+        "  UNION ALL"
+        "  SELECT job_number, COALESCE(engineer_role, 'Contributing'), 1 FROM job_engineers"
+        "  WHERE engineer_contact_name = ?"
+        "), mine AS ("
+        "  SELECT job_number, role, MIN(source) FROM assigned"
+        "  WHERE ? IS NULL OR job_number = ? GROUP BY job_number"
+        ") "
+        "SELECT j.*, mine.role AS assignment_role FROM mine JOIN jobs j ON j.job_number = mine.job_number "
+        "WHERE (? IS NULL OR j.date >= ?) AND (? IS NULL OR j.date < ?) ORDER BY j.date, j.time",
+        (for_engineer, for_email, for_email, for_engineer, for_job_number, for_job_number,
+         date_from, date_from, date_to, date_to),
+    )
+    job_numbers = [row["job_number"] for row in rows]
+    teams: Dict[str, List[dict]] = {}
+    if job_numbers:
+        placeholders = ",".join("?" for _ in job_numbers)
+        for member in backend.execute_sql(
+            f"SELECT job_number, engineer_contact_name, engineer_role FROM job_engineers "
+            f"WHERE job_number IN ({placeholders}) ORDER BY id",
+            tuple(job_numbers),
+        ):
+            teams.setdefault(member["job_number"], []).append({
+                "engineer_contact_name": member["engineer_contact_name"],
+                "engineer_role": member["engineer_role"],
+            })
+    assignments = []
+    for row in rows:
+        job = backend.from_db("jobs", row)
+        role = job.pop("assignment_role")
+        if job_columns is not None:
+            job = {key: value for key, value in job.items() if key in job_columns}
+        assignments.append({"job": job, "assignment_role": role, "team": teams.get(row["job_number"], [])})
+    return assignments
@@ -0,0 +1,312 @@
+-- SQLite stand-in for the Supabase schema, used by app/local_db.py.
+-- Mirrors schema_dump.sql plus everything in migrations/ so the routers can
+-- run (and be tested) without a live project. Postgres-only types are mapped
+-- onto declared SQLite types that local_db.py converts on the way in and out:
+-- BOOLEAN -> 0/1, TIME -> 'HH:MM:SS', JSON -> serialised text.
+
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL UNIQUE,
+    email TEXT UNIQUE,
+    password TEXT NOT NULL,
+    role TEXT DEFAULT 'Admin',
+    reset_token TEXT,
+    reset_expires TIMESTAMPTZ,
+    created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS clients (
+    client_name TEXT PRIMARY KEY,
+    company TEXT,
+    address TEXT,
+    portal_token TEXT UNIQUE,
+    portal_enabled BOOLEAN DEFAULT 1,
+    archived BOOLEAN DEFAULT 0,
+    created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS sub_contractors (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    client_name TEXT NOT NULL REFERENCES clients(client_name) ON DELETE CASCADE,
+    sub_contractor_name TEXT NOT NULL,
+    company TEXT,
+    address TEXT,
+    contact_name TEXT,
+    email TEXT,
+    phone TEXT,
+    archived BOOLEAN NOT NULL DEFAULT 0,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS engineers (
+    contact_name TEXT PRIMARY KEY,
+    email TEXT,
+    phone TEXT,
+    address TEXT,
+    access_token TEXT UNIQUE DEFAULT (
+        lower(hex(randomblob(4)) || '-' || hex(randomblob(2)) || '-' || hex(randomblob(2))
+        || '-' || hex(randomblob(2)) || '-' || hex(randomblob(6)))
+    ),
+    created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS site_contacts (
+    contact_name TEXT PRIMARY KEY,
+    email TEXT,
+    phone TEXT,
+    created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS brands (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    brand_name TEXT UNIQUE,
+    created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS client_sites (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    client_name TEXT REFERENCES clients(client_name),
+    site_name TEXT NOT NULL,
+    address TEXT,
+    postcode TEXT,
+    brand_name TEXT REFERENCES brands(brand_name),
+    store_id_code TEXT,
+    ac_number TEXT,
+    frequency_number INTEGER,
+    last_clean DATE,
+    archived BOOLEAN DEFAULT 0,
+    created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_client_sites_store_id_code
+    ON client_sites (store_id_code);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_number TEXT UNIQUE,
+    date DATE NOT NULL,
+    time TIME NOT NULL,
+    brand TEXT,
+    site_name TEXT,
+    priority TEXT,
+    status TEXT DEFAULT 'Scheduled',
+    job_type TEXT NOT NULL DEFAULT 'Extraction',
+    client_name TEXT REFERENCES clients(client_name),
+    company TEXT,
+    address TEXT,
+    proxy_sub_contractor_id INTEGER,
+    proxy_sub_contractor_name TEXT,
+    engineer_contact_name TEXT REFERENCES engineers(contact_name),
+    engineer_email TEXT,
+    engineer_phone TEXT,
+    site_contact_name TEXT REFERENCES site_contacts(contact_name),
+    site_contact_email TEXT,
+    site_contact_phone TEXT,
+    notes TEXT,
+    photos TEXT,
+    duration_minutes INTEGER,
+    invoice_raised BOOLEAN DEFAULT 0,
+    invoice_id INTEGER,
+    created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_date
+    ON jobs (date);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_engineer_contact_name_date
+    ON jobs (engineer_contact_name, date);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_date_time_id
+    ON jobs (date, time, id);
+
+-- Stand-in for the archive search indexes (see migrations/2026-10-18_add_archive_search.sql).
+CREATE VIRTUAL TABLE IF NOT EXISTS jobs_search USING fts5(
+    job_number, client_name, site_name,
+    content='jobs', content_rowid='id', tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS jobs_search_insert AFTER INSERT ON jobs BEGIN
+    INSERT INTO jobs_search (rowid, job_number, client_name, site_name)
+    VALUES (new.id, new.job_number, new.client_name, new.site_name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS jobs_search_delete AFTER DELETE ON jobs BEGIN
+    INSERT INTO jobs_search (jobs_search, rowid, job_number, client_name, site_name)
+    VALUES ('delete', old.id, old.job_number, old.client_name, old.site_name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS jobs_search_update AFTER UPDATE OF job_number, client_name, site_name ON jobs BEGIN
+    INSERT INTO jobs_search (jobs_search, rowid, job_number, client_name, site_name)
+    VALUES ('delete', old.id, old.job_number, old.client_name, old.site_name);
+    INSERT INTO jobs_search (rowid, job_number, client_name, site_name)
+    VALUES (new.id, new.job_number, new.client_name, new.site_name);
+END;
+
+CREATE TABLE IF NOT EXISTS job_engineers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_number TEXT NOT NULL REFERENCES jobs(job_number),
+    engineer_contact_name TEXT NOT NULL,
+    engineer_role TEXT NOT NULL DEFAULT 'Contributing',
+    created_at TIMESTAMPTZ NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now')),
+    UNIQUE (job_number, engineer_contact_name)
+);
+
+CREATE INDEX IF NOT EXISTS idx_job_engineers_engineer_contact_name
+    ON job_engineers (engineer_contact_name);
+
+CREATE TABLE IF NOT EXISTS job_contributions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_number TEXT NOT NULL REFERENCES jobs(job_number),
+    engineer_contact_name TEXT NOT NULL,
+    engineer_role TEXT NOT NULL DEFAULT 'Contributing',
+    note TEXT,
+    media_path TEXT,
+    media_type TEXT,
+    original_filename TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS leave_requests (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    engineer_name TEXT REFERENCES engineers(contact_name),
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    reason TEXT,
+    status TEXT DEFAULT 'Pending',
+    created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_leave_requests_engineer_name_dates
+    ON leave_requests (engineer_name, start_date, end_date);
+
+CREATE TABLE IF NOT EXISTS engineer_diary (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    engineer_name TEXT REFERENCES engineers(contact_name),
+    date DATE NOT NULL,
+    status TEXT,
+    notes TEXT,
+    created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS password_resets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    email TEXT UNIQUE,
+    token TEXT,
+    created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS extraction_reports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_number TEXT,
+    company TEXT,
+    date DATE,
+    time TIME,
+    brand TEXT,
+    address TEXT,
+    contact_name TEXT,
+    contact_number TEXT,
+    job_type TEXT NOT NULL DEFAULT 'Extraction',
+    status TEXT DEFAULT 'Draft',
+    risk_pre INTEGER,
+    risk_post INTEGER,
+    remedial_requirements TEXT,
+    risk_improvements TEXT,
+    cleaning_interval_current TEXT,
+    cleaning_interval_recommended TEXT,
+    sketch_details TEXT,
+    issue_description TEXT,
+    work_done TEXT,
+    recommendations TEXT,
+    sketch_photo_path TEXT,
+    photos_taken TEXT,
+    photos_path TEXT,
+    client_signature TEXT,
+    engineer_signature TEXT,
+    created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS extraction_micron_readings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    report_id INTEGER REFERENCES extraction_reports(id),
+    location TEXT,
+    description TEXT,
+    pre_clean INTEGER,
+    post_clean INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS extraction_photos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    report_id INTEGER REFERENCES extraction_reports(id),
+    photo_type TEXT,
+    photo_path TEXT,
+    caption TEXT,
+    inspection_item TEXT,
+    upload_status TEXT NOT NULL DEFAULT 'uploaded',
+    storage_path TEXT
+);
+
+CREATE TABLE IF NOT EXISTS extraction_inspection_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    report_id INTEGER REFERENCES extraction_reports(id),
+    item_name TEXT,
+    pre_clean TEXT,
+    success BOOLEAN DEFAULT 0,
+    pass_status BOOLEAN DEFAULT 0,
+    fail_status BOOLEAN DEFAULT 0,
+    advice TEXT,
+    initial TEXT
+);
+
+CREATE TABLE IF NOT EXISTS extraction_filter_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    report_id INTEGER REFERENCES extraction_reports(id),
+    filter_type TEXT,
+    height INTEGER,
+    width INTEGER,
+    depth INTEGER,
+    quantity INTEGER,
+    pass_status BOOLEAN DEFAULT 0,
+    fail_status BOOLEAN DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS system_settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+
+INSERT OR IGNORE INTO system_settings (key, value)
+VALUES ('report_notification_recipients', '[]');
+
+CREATE TABLE IF NOT EXISTS notification_dead_letters (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    recipient TEXT,
+    subject TEXT,
+    body TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS invoices (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id INTEGER REFERENCES jobs(id),
+    sage_invoice_id TEXT UNIQUE,
+    invoice_number TEXT,
+    amount REAL,
+    status TEXT DEFAULT 'draft',
+    created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now')),
+    sage_synced_at TIMESTAMPTZ,
+    error_message TEXT
+);
+
+CREATE TABLE IF NOT EXISTS job_number_counters (
+    name TEXT PRIMARY KEY,
+    next_value INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO job_number_counters (name, next_value)
+SELECT 'pnj', COALESCE(MAX(CAST(substr(job_number, 4) AS INTEGER)), 0) + 1
+FROM jobs
+WHERE job_number LIKE 'pnj_%' AND substr(job_number, 4) NOT GLOB '*[^0-9]*';
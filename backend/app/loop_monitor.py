@@ -0,0 +1,122 @@
+"""
+Event-loop lag monitor.
+
+A heartbeat task on the event loop stamps the time every LOOP_LAG_INTERVAL_MS.
+A watchdog thread checks the stamp; when the loop has not run the heartbeat
+for LOOP_LAG_THRESHOLD_MS past its interval, something is blocking the loop,
+and the watchdog logs the loop thread's current stack together with the route
+being served (found from the request or ASGI scope in the stack's frames).
+Each stall is logged once, while it is still in progress, so a loop that never
+recovers is still reported. Set LOOP_LAG_MONITOR=0 to turn it off.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Callable, Optional
+
+LOOP_LAG_MONITOR = os.getenv("LOOP_LAG_MONITOR", "1") == "1"
+LOOP_LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "250"))
+LOOP_LAG_INTERVAL_MS = float(os.getenv("LOOP_LAG_INTERVAL_MS", "50"))
+LOOP_LAG_STACK_LIMIT = int(os.getenv("LOOP_LAG_STACK_LIMIT", "20"))
+
+
+def route_of(frame) -> Optional[str]:
+    """'METHOD /path' of the innermost frame holding a request or an HTTP scope."""
+    while frame is not None:
+        local_vars = frame.f_locals
+        scope = local_vars.get("scope")
+        if not isinstance(scope, dict):
+            scope = getattr(local_vars.get("request"), "scope", None)
+        if isinstance(scope, dict) and scope.get("type") == "http":
+            return f"{scope.get('method')} {scope.get('path')}"
+        frame = frame.f_back
+    return None
+
+
+class LoopLagMonitor:
+    def __init__(self, threshold_ms: float = LOOP_LAG_THRESHOLD_MS, interval_ms: float = LOOP_LAG_INTERVAL_MS,
+                 stack_limit: int = LOOP_LAG_STACK_LIMIT, report: Optional[Callable[[dict], None]] = None):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.stack_limit = stack_limit
+        self.report = report or self._log
+        self.stalls = 0
+        self.max_lag_ms = 0.0
+        self.last_stall: Optional[dict] = None
+        self._beat = 0.0
+        self._loop_thread_id = None
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-lag-monitor", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stop.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await asyncio.to_thread(self._thread.join, 1)
+        self._thread = None
+
+    async def _heartbeat(self):
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            lag = time.monotonic() - beat - self.interval
+            if reported_beat is not None and beat != reported_beat:
+                # The loop is running again; record how long the reported stall lasted.
+                self.max_lag_ms = max(self.max_lag_ms, (beat - reported_beat - self.interval) * 1000)
+                reported_beat = None
+            if lag < self.threshold or beat == reported_beat:
+                continue
+            reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stall = {
+                "lag_ms": round(lag * 1000),
+                "route": route_of(frame),
+                "stack": traceback.format_stack(frame, limit=self.stack_limit) if frame is not None else [],
+            }
+            del frame
+            self.stalls += 1
+            self.max_lag_ms = max(self.max_lag_ms, lag * 1000)
+            self.last_stall = stall
+            try:
+                self.report(stall)
+            except Exception as exc:
+                print(f"Warning: loop lag report failed: {exc}")
+
+    @staticmethod
+    def _log(stall: dict):
+        print(
+            f"Warning: event loop blocked for {stall['lag_ms']} ms while serving {stall['route'] or 'no request'}\n"
+            + "".join(stall["stack"]),
+            flush=True,
+        )
+
+    def stats(self) -> dict:
+        return {"stalls": self.stalls, "max_lag_ms": round(self.max_lag_ms), "last_stall": self.last_stall}
+
+
+loop_monitor = LoopLagMonitor()
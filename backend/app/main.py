@@ -1,17 +1,37 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 import os
 from .routers import auth, scheduler, crm, portal, admin, dashboard, dynamic_reports
 from .module_loader import load_modules
+from .db import db
+from .loop_monitor import LOOP_LAG_MONITOR, loop_monitor
+from .query_stats import finish_request, track_queries
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Log the route and stack whenever a handler blocks the event loop.
+    if LOOP_LAG_MONITOR:
+        await loop_monitor.start()
+    for hook in getattr(app.state, "module_startup_hooks", []):
+        await hook()
+    yield
+    for hook in getattr(app.state, "module_shutdown_hooks", []):
+        await hook()
+    # Release pooled database connections on shutdown.
+    await db.aclose()
+    await loop_monitor.stop()
 
 # Initialize FastAPI App
-app = FastAPI(title="Web App Builder")
+app = FastAPI(title="Web App Builder", lifespan=lifespan)
 
 @app.middleware("http")
 async def log_requests(request, call_next):
     print(f"REQUEST: {request.method} {request.url.path}")
-    response = await call_next(request)
-    print(f"RESPONSE: {response.status_code}")
+    with track_queries() as queries:
+        response = await call_next(request)
+    finish_request(request, response, queries)
+    print(f"RESPONSE: {response.status_code} {queries.summary()}")
     return response
 
 from fastapi.responses import RedirectResponse
@@ -17,6 +17,7 @@ class Client(BaseModel):
     portal_enabled: bool = True
     archived: bool = False
     created_at: Optional[datetime] = None
+    site_count: Optional[int] = None # Runtime helper field
 
 class SubContractor(BaseModel):
     id: Optional[int] = None
@@ -95,12 +96,14 @@ class Job(BaseModel):
     site_contact_phone: Optional[str] = None
     notes: Optional[str] = None
     photos: Optional[str] = None
+    duration_minutes: Optional[int] = None
     created_at: Optional[datetime] = None
     wa_link: Optional[str] = None # Runtime helper field
     engineer_team: Optional[List[str]] = None # Runtime helper field
     contributing_engineer_names: Optional[List[str]] = None # Runtime helper field
     supervisor_name: Optional[str] = None # Runtime helper field
     engineer_role: Optional[str] = None # Runtime helper field
+    assignment_role: Optional[str] = None # Runtime helper field: the viewing engineer's role
 
     def model_post_init(self, __context) -> None:
         if (self.job_type in (None, "", "Extraction")) and self.notes and self.notes.startswith(CALL_OUT_MARKER):
@@ -190,6 +193,8 @@ class ExtractionPhoto(BaseModel):
     photo_path: str
     caption: Optional[str] = None
     inspection_item: Optional[str] = None
+    upload_status: Optional[str] = "uploaded"
+    storage_path: Optional[str] = None
 
 class JobContribution(BaseModel):
     id: Optional[int] = None
@@ -227,3 +232,102 @@ class ExtractionFilterItem(BaseModel):
 class SystemSetting(BaseModel):
     key: str
     value: str
+
+class ReportAggregate(BaseModel):
+    """A report with its child rows and job, as loaded by report_loader."""
+    report: ExtractionReport
+    job: Optional[Job] = None
+    micron_readings: List[ExtractionMicronReading] = []
+    inspection_items: List[ExtractionInspectionItem] = []
+    filter_items: List[ExtractionFilterItem] = []
+    photos: List[ExtractionPhoto] = []
+
+class DashboardSnapshot(BaseModel):
+    """Everything the home page shows, as assembled by dashboard_snapshot."""
+    total_jobs: int = 0
+    active_engineers: int = 0
+    total_clients: int = 0
+    recent_jobs: List[Job] = []
+    all_jobs: List[Job] = []
+    archived_clients: List[Client] = []
+    archived_sites: List[ClientSite] = []
+    engineers: List[Engineer] = []
+
+class DraftBooking(BaseModel):
+    """One job of a draft schedule, as sent to the bulk conflict check."""
+    ref: Optional[str] = None # Caller's own id for the draft row
+    job_number: Optional[str] = None # Set when the draft moves an existing job
+    date: dt_date
+    time: dt_time
+    duration_minutes: Optional[int] = Field(None, gt=0)
+    engineers: List[str] = []
+
+class ScheduleCheckRequest(BaseModel):
+    jobs: List[DraftBooking] = []
+
+class ScheduleConflict(BaseModel):
+    ref: Optional[str] = None
+    engineer: str
+    kind: str # "job", "leave" or "draft"
+    job_number: Optional[str] = None
+    client_name: Optional[str] = None
+    reason: Optional[str] = None
+    starts_at: datetime
+    ends_at: datetime
+
+class RecurringScheduleRequest(BaseModel):
+    start: Optional[dt_date] = None # Defaults to today
+    months: int = 3
+    client_name: Optional[str] = None
+    brand_name: Optional[str] = None
+    site_ids: List[int] = []
+    engineer_name: Optional[str] = None
+    time: dt_time = dt_time(9, 0)
+    priority: str = "Medium"
+    dry_run: bool = True
+
+class PlannedJob(BaseModel):
+    site_id: int
+    client_name: str
+    site_name: str
+    brand: Optional[str] = None
+    store_id_code: Optional[str] = None
+    due_date: dt_date
+    date: dt_date # due_date moved off weekends
+    time: dt_time
+    overdue: bool = False
+    engineer_name: Optional[str] = None
+    job_number: Optional[str] = None # Set once the job is created
+
+class RecurringSchedulePlan(BaseModel):
+    start: dt_date
+    end: dt_date
+    jobs: List[PlannedJob] = []
+    sites_considered: int = 0
+    sites_without_frequency: int = 0
+    conflicts: List[ScheduleConflict] = []
+    created: int = 0
+
+class SiteImportStats(BaseModel):
+    """Running totals of a spreadsheet import (see app/site_import.py)."""
+    dry_run: bool = False
+    rows: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    clients_created: int = 0
+    brands_created: int = 0
+    errors: List[str] = []
+
+class TableSyncStats(BaseModel):
+    """Outcome of syncing one table (see app/delta_sync.py)."""
+    source_table: str
+    target_table: str
+    sync_key: str
+    scanned: int = 0
+    new: int = 0
+    changed: int = 0
+    pushed: int = 0
+    batches: int = 0
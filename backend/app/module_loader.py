@@ -9,6 +9,8 @@ def load_modules(app: FastAPI):
     Each module should have a router.py with a 'router' object.
     """
     config_path = os.path.join(os.path.dirname(__file__), "..", "config.json")
+    app.state.module_startup_hooks = []
+    app.state.module_shutdown_hooks = []
     
     try:
         if not os.path.exists(config_path):
@@ -29,6 +31,10 @@ def load_modules(app: FastAPI):
                 
                 if hasattr(module, "router"):
                     app.include_router(module.router, tags=[module_name.capitalize()])
+                    # Optional async startup()/shutdown() hooks run from the app lifespan.
+                    for hook in ("startup", "shutdown"):
+                        if hasattr(module, hook):
+                            getattr(app.state, f"module_{hook}_hooks").append(getattr(module, hook))
                     print(f"MODULAR_ENGINE: Loaded module: {module_name}", flush=True)
                 else:
                     print(f"MODULAR_ENGINE: Module {module_name} has no router", flush=True)
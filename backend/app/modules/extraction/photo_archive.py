@@ -0,0 +1,131 @@
+"""
+Streaming ZIP archives of report photos.
+
+Photos are fetched concurrently (at most PHOTO_ZIP_CONCURRENCY at a time) over
+one shared keep-alive HTTP client, and each ZIP entry is written and flushed to
+the response as soon as its download finishes. Only the photos currently in
+flight are held in memory, so the archive size does not affect peak memory.
+Already-compressed media is stored as-is; anything else is deflated in the
+offload CPU pool so large scans do not stall the event loop.
+"""
+import asyncio
+import io
+import os
+import zipfile
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+
+import anyio
+import httpx
+
+from ...offload import run_cpu
+
+PHOTO_ZIP_CONCURRENCY = int(os.getenv("PHOTO_ZIP_CONCURRENCY", "6"))
+PHOTO_FETCH_TIMEOUT = float(os.getenv("PHOTO_FETCH_TIMEOUT", "30"))
+
+# Formats that are already compressed; deflating them again only costs CPU.
+COMPRESSED_EXTENSIONS = {"jpg", "jpeg", "png", "gif", "webp", "heic", "mp4", "mov", "m4v", "webm", "avi", "ogg", "zip"}
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_media_client() -> httpx.AsyncClient:
+    """Shared keep-alive client for fetching stored media."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(PHOTO_FETCH_TIMEOUT, connect=5.0),
+            limits=httpx.Limits(max_connections=PHOTO_ZIP_CONCURRENCY * 2, max_keepalive_connections=PHOTO_ZIP_CONCURRENCY),
+            follow_redirects=True,
+        )
+    return _client
+
+
+async def aclose():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+class _ZipStream(io.RawIOBase):
+    """Write-only, unseekable sink; zipfile then uses data descriptors."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _extension(url: str) -> str:
+    ext = url.split('.')[-1].split('?')[0]
+    return 'jpg' if len(ext) > 4 else ext
+
+
+def photo_entry_name(job_number: str, index: int, photo: dict) -> str:
+    photo_type = (photo.get('photo_type') or 'Photo').replace(' ', '_')
+    return f"{job_number}_photo_{index + 1}_{photo_type}.{_extension(photo['photo_path'])}"
+
+
+async def _fetch(client: httpx.AsyncClient, index: int, photo: dict):
+    url = photo['photo_path']
+    try:
+        response = await client.get(url)
+        if response.status_code == 200:
+            return index, photo, response.content
+        print(f"Error adding photo: {url} returned {response.status_code}")
+    except Exception as e:
+        print(f"Error adding photo: {e}")
+    return None
+
+
+async def _fetch_as_completed(client: httpx.AsyncClient, photos: List[dict], limit: int):
+    """Yield downloaded photos in completion order, keeping at most ``limit`` in flight."""
+    position = 0
+    pending = set()
+    try:
+        while position < len(photos) or pending:
+            while position < len(photos) and len(pending) < limit:
+                pending.add(asyncio.create_task(_fetch(client, position, photos[position])))
+                position += 1
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                if result:
+                    yield result
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def stream_photo_zip(
+    photos: List[dict],
+    job_number: str,
+    client: Optional[httpx.AsyncClient] = None,
+    limit: int = PHOTO_ZIP_CONCURRENCY
+) -> AsyncIterator[bytes]:
+    sink = _ZipStream()
+    with zipfile.ZipFile(sink, "w") as zip_file:
+        async for index, photo, content in _fetch_as_completed(client or get_media_client(), photos, max(limit, 1)):
+            name = photo_entry_name(job_number, index, photo)
+            info = zipfile.ZipInfo(name, date_time=datetime.now().timetuple()[:6])
+            if _extension(name).lower() in COMPRESSED_EXTENSIONS:
+                info.compress_type = zipfile.ZIP_STORED
+                zip_file.writestr(info, content)
+            else:
+                info.compress_type = zipfile.ZIP_DEFLATED
+                # Let the write finish even on disconnect; closing the archive mid-entry raises.
+                with anyio.CancelScope(shield=True):
+                    await run_cpu(zip_file.writestr, info, content)
+            yield sink.drain()
+    yield sink.drain()
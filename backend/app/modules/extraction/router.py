@@ -1,14 +1,8 @@
-import io
+import asyncio
 import json
 import os
-import smtplib
-import tempfile
-import threading
-import zipfile
-import requests
 import re
 import html
-from email.message import EmailMessage
 from datetime import datetime
 from typing import Optional
 from fastapi import APIRouter, Request, Depends, Form, HTTPException
@@ -16,76 +10,34 @@ from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse,
 from postgrest.exceptions import APIError
 
 from ... import models
-from ...supabase_client import supabase
+from ...engineer_auth import engineer_auth
+from ...db import db
 from ...dependencies import templates, login_required, role_required, get_current_user
 from ... import supabase_storage
-from ...utils import _normalize_uk_phone
+from ...pdf_cache import pdf_cache
+from ...query_stats import query_budget
+from ...report_loader import load_report_aggregate
+from ...notifications import Notification, build_email, notification_dispatcher, report_recipients, smtp_from
+from .upload_queue import photo_upload_queue
+from .photo_archive import stream_photo_zip
+from . import photo_archive
 
 router = APIRouter()
 
 MEDIA_ROW_LIMIT = 20
 
 
-def _get_engineer_by_token(token: Optional[str]):
-    if not token:
-        return None
-    res = supabase.table("engineers").select("*").eq("access_token", token).execute()
-    if res.data:
-        return models.Engineer(**res.data[0])
-    return None
-
-
-def _engineer_can_access_job(engineer: Optional[models.Engineer], job_number: Optional[str]) -> bool:
-    if not engineer or not job_number:
-        return True
-    res = supabase.table("jobs").select("engineer_contact_name").eq("job_number", job_number).execute()
-    if not res.data:
-        return False
-    if (res.data[0].get("engineer_contact_name") or "") == engineer.contact_name:
-        return True
-    try:
-        assignment_res = (
-            supabase.table("job_engineers")
-            .select("id")
-            .eq("job_number", job_number)
-            .eq("engineer_contact_name", engineer.contact_name)
-            .limit(1)
-            .execute()
-        )
-        return bool(assignment_res.data)
-    except Exception as exc:
-        print(f"Warning: job_engineers access lookup unavailable: {exc}")
-        return False
-
-
-def _get_engineer_role_for_job(engineer: Optional[models.Engineer], job_number: Optional[str]) -> Optional[str]:
-    if not engineer or not job_number:
-        return None
-    res = supabase.table("jobs").select("engineer_contact_name").eq("job_number", job_number).execute()
-    if res.data and (res.data[0].get("engineer_contact_name") or "") == engineer.contact_name:
-        return "Lead"
-    try:
-        assignment_res = (
-            supabase.table("job_engineers")
-            .select("engineer_role")
-            .eq("job_number", job_number)
-            .eq("engineer_contact_name", engineer.contact_name)
-            .limit(1)
-            .execute()
-        )
-        if assignment_res.data:
-            return assignment_res.data[0].get("engineer_role") or "Contributing"
-    except Exception as exc:
-        print(f"Warning: job_engineers role lookup unavailable: {exc}")
-    return None
+def _engineer_denied(engineer: Optional[models.Engineer], job_number: Optional[str], role: Optional[str]) -> bool:
+    """True when a portal engineer asks for a job they are not on."""
+    return bool(engineer and job_number and role is None)
 
 
-def _get_job_contributions(job_number: Optional[str]) -> list:
+async def _get_job_contributions(job_number: Optional[str]) -> list:
     if not job_number:
         return []
     try:
-        res = (
-            supabase.table("job_contributions")
+        res = await (
+            db.table("job_contributions")
             .select("*")
             .eq("job_number", job_number)
             .order("created_at", desc=True)
@@ -98,77 +50,22 @@ def _get_job_contributions(job_number: Optional[str]) -> list:
 
 
 def _send_report_email(to_email: str, subject: str, body: str):
-    smtp_host = os.getenv("SMTP_HOST")
-    smtp_from = os.getenv("SMTP_FROM") or os.getenv("SMTP_USERNAME")
-    if not smtp_host or not smtp_from or not to_email:
+    """Send one email straight away over the pooled SMTP session (used by the admin test button)."""
+    if not os.getenv("SMTP_HOST") or not smtp_from() or not to_email:
         print(f"Report email notification skipped for {to_email}: SMTP_HOST/SMTP_FROM not configured")
         return False
-
-    message = EmailMessage()
-    message["Subject"] = subject
-    message["From"] = smtp_from
-    message["To"] = to_email
-    message.set_content(body)
-
-    port = int(os.getenv("SMTP_PORT", "587"))
-    timeout = int(os.getenv("SMTP_TIMEOUT", "8"))
-    username = os.getenv("SMTP_USERNAME")
-    password = os.getenv("SMTP_PASSWORD")
-    use_ssl = os.getenv("SMTP_SSL", "").lower() in {"1", "true", "yes"}
-    use_starttls = os.getenv("SMTP_STARTTLS", "1").lower() not in {"0", "false", "no"}
-
-    print(
-        "Report email notification sending "
-        f"to={to_email} host={smtp_host} port={port} "
-        f"from={smtp_from} username_set={bool(username)} password_set={bool(password)} "
-        f"ssl={use_ssl} starttls={use_starttls}"
-    )
-
-    if use_ssl:
-        with smtplib.SMTP_SSL(smtp_host, port, timeout=timeout) as smtp:
-            if username and password:
-                smtp.login(username, password)
-            smtp.send_message(message)
-    else:
-        with smtplib.SMTP(smtp_host, port, timeout=timeout) as smtp:
-            if use_starttls:
-                smtp.starttls()
-            if username and password:
-                smtp.login(username, password)
-            smtp.send_message(message)
+    error = notification_dispatcher.smtp.send([build_email(to_email, subject, body)])[0]
+    if error is not None:
+        raise error
     print(f"Report email notification sent to={to_email}")
     return True
 
 
-def _send_report_whatsapp(phone: str, message: str):
-    webhook_url = os.getenv("WHATSAPP_NOTIFY_WEBHOOK_URL")
-    normalized_phone = _normalize_uk_phone(phone)
-    if not webhook_url or not normalized_phone:
-        print(f"Report WhatsApp notification skipped for {phone}: WHATSAPP_NOTIFY_WEBHOOK_URL/phone not configured")
-        return False
-    response = requests.post(webhook_url, json={"to": normalized_phone, "message": message}, timeout=10)
-    response.raise_for_status()
-    return True
-
-
-def _notify_report_submitted(report_data: dict, report_id: int, host: str):
-    settings_res = supabase.table("system_settings").select("value").eq("key", "report_notification_recipients").execute()
-    if not settings_res.data:
-        print("Report notification skipped: no report_notification_recipients setting found")
-        return
-    try:
-        preferences = json.loads(settings_res.data[0].get("value") or "[]")
-    except json.JSONDecodeError:
-        print("Report notification skipped: report_notification_recipients is not valid JSON")
-        return
-    user_ids = [int(item["user_id"]) for item in preferences if str(item.get("user_id", "")).isdigit()]
-    if not user_ids:
+async def _notify_report_submitted(report_data: dict, report_id: int, host: str):
+    recipients = await report_recipients.get()
+    if not recipients:
         print("Report notification skipped: no selected administrator recipients")
         return
-
-    admins_res = supabase.table("users").select("*").in_("id", user_ids).execute()
-    admins_by_id = {int(admin["id"]): admin for admin in admins_res.data or [] if admin.get("id") is not None}
-    print(f"Report notification loaded {len(preferences)} preferences and {len(admins_by_id)} matching users")
     protocol = "http" if host.split(":", 1)[0] in {"localhost", "127.0.0.1", "0.0.0.0"} else "https"
     report_url = f"{protocol}://{host}/admin/reports/{report_id}"
     job_number = report_data.get("job_number") or "Unknown job"
@@ -182,36 +79,27 @@ def _notify_report_submitted(report_data: dict, report_id: int, host: str):
         f"Review: {report_url}"
     )
 
-    for preference in preferences:
-        admin = admins_by_id.get(int(preference.get("user_id", 0)))
-        if not admin:
-            print(f"Report notification skipped preference with missing user_id={preference.get('user_id')}")
-            continue
-        try:
-            if preference.get("email"):
-                _send_report_email(admin.get("email"), subject, body)
-            if preference.get("whatsapp"):
-                _send_report_whatsapp(preference.get("whatsapp_number"), body)
-        except Exception as exc:
-            print(f"Report notification failed for admin {admin.get('id')}: {exc}")
+    for recipient in recipients:
+        notification_dispatcher.submit(Notification(recipient["channel"], recipient["recipient"], subject, body))
+
+
+_notification_tasks = set()
 
 
 def _notify_report_submitted_async(report_data: dict, report_id: int, host: str):
-    """Send report notifications in the background so report submission can finish."""
-    thread = threading.Thread(
-        target=_notify_report_submitted,
-        args=(dict(report_data), report_id, host),
-        daemon=True
-    )
-    thread.start()
+    """Queue report notifications in the background so report submission can finish."""
+    task = asyncio.create_task(_notify_report_submitted(dict(report_data), report_id, host))
+    # Keep a reference until the task finishes so it is not garbage collected mid-send.
+    _notification_tasks.add(task)
+    task.add_done_callback(_notification_tasks.discard)
 
 
-def _insert_with_schema_fallback(table_name: str, payload: dict):
+async def _insert_with_schema_fallback(table_name: str, payload: dict):
     """Insert a record while tolerating stale PostgREST schema caches."""
     working_payload = dict(payload)
     while True:
         try:
-            return supabase.table(table_name).insert(working_payload).execute()
+            return await db.table(table_name).insert(working_payload).execute()
         except APIError as exc:
             message = str(exc)
             match = re.search(r"Could not find the '([^']+)' column of '([^']+)'", message)
@@ -224,14 +112,14 @@ def _insert_with_schema_fallback(table_name: str, payload: dict):
             print(f"Warning: {table_name}.{missing_column} missing from schema cache; retrying insert without it")
 
 
-def _update_with_schema_fallback(table_name: str, payload: dict, match_column: str, match_value):
+async def _update_with_schema_fallback(table_name: str, payload: dict, match_column: str, match_value):
     """Update a record while dropping unknown columns if the live schema is behind."""
     working_payload = {k: v for k, v in payload.items() if v is not None}
     if not working_payload:
         return None
     while True:
         try:
-            return supabase.table(table_name).update(working_payload).eq(match_column, match_value).execute()
+            return await db.table(table_name).update(working_payload).eq(match_column, match_value).execute()
         except APIError as exc:
             message = str(exc)
             match = re.search(r"Could not find the '([^']+)' column of '([^']+)'", message)
@@ -244,6 +132,42 @@ def _update_with_schema_fallback(table_name: str, payload: dict, match_column: s
             print(f"Warning: {table_name}.{missing_column} missing from schema cache; retrying update without it")
 
 
+def _reading_update(form_data, rid: int) -> dict:
+    pre = form_data.get(f"read_pre_{rid}")
+    post = form_data.get(f"read_post_{rid}")
+    desc = form_data.get(f"read_desc_{rid}")
+    r_update = {}
+    if pre is not None: r_update['pre_clean'] = int(pre) if pre else 0
+    if post is not None: r_update['post_clean'] = int(post) if post else 0
+    if desc is not None: r_update['description'] = desc
+    return r_update
+
+
+def _inspection_update(form_data, iid: int) -> dict:
+    status = form_data.get(f"insp_status_{iid}")
+    advice = form_data.get(f"insp_advice_{iid}")
+    i_update = {}
+    if status:
+        i_update['pass_status'] = (status == "Pass")
+        i_update['fail_status'] = (status == "Fail")
+    if advice is not None: i_update['advice'] = advice
+    return i_update
+
+
+def _changed_rows(existing_rows: list, updates: dict) -> list:
+    """Existing rows merged with their submitted values, keeping only rows that actually change.
+
+    Whole rows are returned so they can go out in a single upsert per table
+    (PostgREST needs the same keys on every row of a bulk upsert).
+    """
+    changed = []
+    for row in existing_rows:
+        update = updates.get(row['id']) or {}
+        if any(row.get(column) != value for column, value in update.items()):
+            changed.append({**row, **update})
+    return changed
+
+
 async def _build_media_entries(report_id: int, form_data, report_jn: str):
     """Collect both legacy uploads and paired before/after media rows."""
     media_entries = []
@@ -281,49 +205,79 @@ async def _build_media_entries(report_id: int, form_data, report_jn: str):
                 "inspection_item": location_label
             })
 
+    # Files are spooled to disk here and uploaded by the background queue.
     photos = []
     for entry in media_entries:
         upload = entry["file"]
         filename = f"{report_jn}_{datetime.now().timestamp()}_{upload.filename}"
         storage_path = f"reports/{report_jn}/{filename}"
-        file_content = await upload.read()
-        photo_url = supabase_storage.upload_file(file_content, storage_path)
+        await photo_upload_queue.spool(upload, storage_path)
         photos.append({
             "report_id": report_id,
             "photo_type": entry["photo_type"],
-            "photo_path": photo_url,
-            "inspection_item": entry["inspection_item"]
+            "photo_path": supabase_storage.get_file_url(storage_path),
+            "inspection_item": entry["inspection_item"],
+            "storage_path": storage_path,
+            "upload_status": "pending"
         })
 
     return photos
 
+
+async def _insert_pending_photos(photos: list):
+    """Insert spooled photo rows and hand them to the upload queue."""
+    try:
+        res = await db.table("extraction_photos").insert(photos).execute()
+    except APIError as exc:
+        match = re.search(r"Could not find the '(upload_status|storage_path)' column of 'extraction_photos'", str(exc))
+        if not match:
+            raise
+        print("Warning: extraction_photos upload status columns missing from schema cache; uploading inline")
+        for photo in photos:
+            photo.pop("upload_status", None)
+            photo["photo_path"] = await photo_upload_queue.upload_now(photo.pop("storage_path"))
+        return await db.table("extraction_photos").insert(photos).execute()
+    for row in res.data or []:
+        photo_upload_queue.enqueue(row["id"], row["storage_path"])
+    return res
+
+
+async def startup():
+    await photo_upload_queue.resume_pending()
+
+
+async def shutdown():
+    await photo_upload_queue.stop()
+    await photo_archive.aclose()
+    await notification_dispatcher.stop()
+
 @router.post("/extraction-report/start")
 async def start_extraction_report(request: Request, user: models.User = Depends(get_current_user)):
     form_data = await request.form()
     job_number = form_data.get("job_number")
     portal_token = form_data.get("portal_token")
-    engineer = _get_engineer_by_token(portal_token)
+    engineer, engineer_role = await engineer_auth.resolve(portal_token, job_number, request)
     if not user and not engineer:
         raise HTTPException(status_code=401, detail="Not authenticated")
     if not job_number:
         raise HTTPException(status_code=400, detail="Job number is required")
-    if engineer and not _engineer_can_access_job(engineer, job_number):
+    if _engineer_denied(engineer, job_number, engineer_role):
         raise HTTPException(status_code=403, detail="This job is not assigned to this engineer")
     suffix = f"&portal_token={portal_token}" if portal_token else ""
     return RedirectResponse(url=f"/extraction-report?job_number={job_number}{suffix}", status_code=303)
 
 @router.get("/extraction-report", response_class=HTMLResponse)
-def extraction_report(
+async def extraction_report(
     request: Request,
     job_number: Optional[str] = None,
     job_type: Optional[str] = None,
     portal_token: Optional[str] = None,
     user: models.User = Depends(get_current_user)
 ):
-    engineer = _get_engineer_by_token(portal_token)
+    engineer, engineer_role = await engineer_auth.resolve(portal_token, job_number, request)
     if not user and not engineer:
         raise HTTPException(status_code=401, detail="Not authenticated")
-    if engineer and not _engineer_can_access_job(engineer, job_number):
+    if _engineer_denied(engineer, job_number, engineer_role):
         raise HTTPException(status_code=403, detail="This job is not assigned to this engineer")
     job_info = {
         "job_number": job_number or "",
@@ -338,7 +292,7 @@ def extraction_report(
     }
     
     if job_number:
-        res = supabase.table("jobs").select("*").eq("job_number", job_number).execute()
+        res = await db.table("jobs").select("*").eq("job_number", job_number).execute()
         if res.data:
             j_obj = models.Job(**res.data[0])
             job_info.update({
@@ -354,8 +308,7 @@ def extraction_report(
     
     report_template = "extraction_report.html" if job_info["job_type"] == "Extraction" else "callout_report.html"
     report_title = "Extraction Report" if job_info["job_type"] == "Extraction" else "Breakdown / Callout Report"
-    engineer_role = _get_engineer_role_for_job(engineer, job_number) if engineer else None
-    contributions = _get_job_contributions(job_number)
+    contributions = await _get_job_contributions(job_number)
     return templates.TemplateResponse(report_template, {
         "request": request, 
         "title": report_title, 
@@ -376,16 +329,16 @@ async def submit_job_contribution(request: Request, user: models.User = Depends(
     job_number = (form_data.get("job_number") or "").strip()
     portal_token = form_data.get("portal_token")
     note = (form_data.get("contribution_note") or "").strip()
-    engineer = _get_engineer_by_token(portal_token)
+    engineer, engineer_role = await engineer_auth.resolve(portal_token, job_number, request)
 
     if not engineer:
         raise HTTPException(status_code=401, detail="Engineer portal token is required")
     if not job_number:
         return HTMLResponse("<div class='alert alert-error text-sm'>Job number is required.</div>")
-    if not _engineer_can_access_job(engineer, job_number):
+    if _engineer_denied(engineer, job_number, engineer_role):
         raise HTTPException(status_code=403, detail="This job is not assigned to this engineer")
 
-    engineer_role = _get_engineer_role_for_job(engineer, job_number) or "Contributing"
+    engineer_role = engineer_role or "Contributing"
     uploads = [
         upload for upload in form_data.getlist("contribution_media")
         if hasattr(upload, "filename") and upload.filename
@@ -409,7 +362,7 @@ async def submit_job_contribution(request: Request, user: models.User = Depends(
         filename = f"contribution_{job_number}_{datetime.now().timestamp()}_{safe_filename}"
         storage_path = f"reports/{job_number}/contributions/{filename}"
         file_content = await upload.read()
-        media_url = supabase_storage.upload_file(file_content, storage_path)
+        media_url = await supabase_storage.upload_file_async(file_content, storage_path)
         rows.append({
             "job_number": job_number,
             "engineer_contact_name": engineer.contact_name,
@@ -421,7 +374,7 @@ async def submit_job_contribution(request: Request, user: models.User = Depends(
         })
 
     try:
-        supabase.table("job_contributions").insert(rows).execute()
+        await db.table("job_contributions").insert(rows).execute()
     except Exception as exc:
         return HTMLResponse(f"<div class='alert alert-error text-sm'>Could not save contribution: {html.escape(str(exc))}</div>")
 
@@ -439,12 +392,11 @@ async def submit_extraction_report(request: Request, user: models.User = Depends
         report_jn = form_data.get("job_number")
         job_type = form_data.get("job_type") or "Extraction"
         portal_token = form_data.get("portal_token")
-        engineer = _get_engineer_by_token(portal_token)
+        engineer, engineer_role = await engineer_auth.resolve(portal_token, report_jn, request)
         if not user and not engineer:
             raise HTTPException(status_code=401, detail="Not authenticated")
-        if engineer and not _engineer_can_access_job(engineer, report_jn):
+        if _engineer_denied(engineer, report_jn, engineer_role):
             raise HTTPException(status_code=403, detail="This job is not assigned to this engineer")
-        engineer_role = _get_engineer_role_for_job(engineer, report_jn) if engineer else None
         if engineer and engineer_role != "Lead":
             return HTMLResponse(
                 "<div class='alert alert-error font-bold'>Only the lead engineer can submit the final report. "
@@ -458,7 +410,7 @@ async def submit_extraction_report(request: Request, user: models.User = Depends
             filename = f"sketch_{report_jn}_{datetime.now().timestamp()}_{sketch_photo.filename}"
             storage_path = f"reports/{report_jn}/{filename}"
             file_content = await sketch_photo.read()
-            sketch_photo_url = supabase_storage.upload_file(file_content, storage_path)
+            sketch_photo_url = await supabase_storage.upload_file_async(file_content, storage_path)
 
         report_data = {
             "job_number": form_data.get("job_number"),
@@ -494,7 +446,7 @@ async def submit_extraction_report(request: Request, user: models.User = Depends
             else:
                 report_data["sketch_details"] = "[CALL OUT]"
         
-        res = _insert_with_schema_fallback("extraction_reports", report_data)
+        res = await _insert_with_schema_fallback("extraction_reports", report_data)
         report_id = res.data[0]['id']
         
         if job_type == "Extraction":
@@ -515,7 +467,7 @@ async def submit_extraction_report(request: Request, user: models.User = Depends
                         "post_clean": int(m_posts[i]) if m_posts[i] else None
                     })
             if readings:
-                supabase.table("extraction_micron_readings").insert(readings).execute()
+                await db.table("extraction_micron_readings").insert(readings).execute()
                 
             # Inspection Items
             i_names = form_data.getlist("item_name[]")
@@ -531,7 +483,7 @@ async def submit_extraction_report(request: Request, user: models.User = Depends
                     "advice": i_advices[i]
                 })
             if items:
-                supabase.table("extraction_inspection_items").insert(items).execute()
+                await db.table("extraction_inspection_items").insert(items).execute()
                 
             # Filter Items
             f_types = form_data.getlist("filter_type[]")
@@ -548,12 +500,12 @@ async def submit_extraction_report(request: Request, user: models.User = Depends
                         "fail_status": (f_passes[i] == "fail")
                     })
             if filters:
-                supabase.table("extraction_filter_items").insert(filters).execute()
+                await db.table("extraction_filter_items").insert(filters).execute()
 
         # Photos and videos
         photos = await _build_media_entries(report_id, form_data, report_jn)
         if photos:
-            supabase.table("extraction_photos").insert(photos).execute()
+            await _insert_pending_photos(photos)
 
         _notify_report_submitted_async(report_data, report_id, request.url.netloc)
 
@@ -568,8 +520,8 @@ async def submit_extraction_report(request: Request, user: models.User = Depends
         return HTMLResponse(content=f"<div class='alert alert-error'>Error: {str(e)}</div>", status_code=400)
 
 @router.get("/admin/reports", response_class=HTMLResponse)
-def admin_reports(request: Request, user: models.User = Depends(role_required(["Admin", "Manager", "Viewer"]))):
-    res = supabase.table("extraction_reports").select("*").order("created_at", desc=True).execute()
+async def admin_reports(request: Request, user: models.User = Depends(role_required(["Admin", "Manager", "Viewer"]))):
+    res = await db.table("extraction_reports").select("*").order("created_at", desc=True).execute()
     reports = []
     for r in (res.data or []):
         try:
@@ -594,9 +546,9 @@ def admin_reports(request: Request, user: models.User = Depends(role_required(["
 
 
 @router.get("/admin/reports/job/{job_number}")
-def redirect_to_latest_job_report(job_number: str, user: models.User = Depends(role_required(["Admin", "Manager", "Viewer"]))):
-    res = (
-        supabase.table("extraction_reports")
+async def redirect_to_latest_job_report(job_number: str, user: models.User = Depends(role_required(["Admin", "Manager", "Viewer"]))):
+    res = await (
+        db.table("extraction_reports")
         .select("id")
         .eq("job_number", job_number)
         .order("created_at", desc=True)
@@ -609,37 +561,28 @@ def redirect_to_latest_job_report(job_number: str, user: models.User = Depends(r
 
 
 @router.get("/admin/reports/{report_id}", response_class=HTMLResponse)
-def review_report(report_id: int, request: Request, user: models.User = Depends(login_required)):
-    res = supabase.table("extraction_reports").select("*").eq("id", report_id).execute()
-    if not res.data:
+async def review_report(report_id: int, request: Request, user: models.User = Depends(login_required)):
+    aggregate = await load_report_aggregate(report_id=report_id)
+    if not aggregate:
         raise HTTPException(status_code=404, detail="Report not found")
-    report = models.ExtractionReport(**res.data[0])
-    
-    micron_readings = [models.ExtractionMicronReading(**m) for m in supabase.table("extraction_micron_readings").select("*").eq("report_id", report_id).execute().data]
-    inspection_items = [models.ExtractionInspectionItem(**i) for i in supabase.table("extraction_inspection_items").select("*").eq("report_id", report_id).execute().data]
-    filter_items = [models.ExtractionFilterItem(**f) for f in supabase.table("extraction_filter_items").select("*").eq("report_id", report_id).execute().data]
-    photos = [models.ExtractionPhoto(**p) for p in supabase.table("extraction_photos").select("*").eq("report_id", report_id).execute().data]
-    contributions = _get_job_contributions(report.job_number)
-    
-    job = None
-    j_res = supabase.table("jobs").select("*").eq("job_number", report.job_number).execute()
-    if j_res.data:
-        job = models.Job(**j_res.data[0])
+    report = aggregate.report
+    contributions = await _get_job_contributions(report.job_number)
     
     return templates.TemplateResponse("admin_report_review.html", {
         "request": request,
         "title": f"Review Report: {report.job_number}",
         "user": user,
         "report": report,
-        "micron_readings": micron_readings,
-        "inspection_items": inspection_items,
-        "filter_items": filter_items,
-        "photos": photos,
+        "micron_readings": aggregate.micron_readings,
+        "inspection_items": aggregate.inspection_items,
+        "filter_items": aggregate.filter_items,
+        "photos": aggregate.photos,
         "contributions": contributions,
-        "job": job
+        "job": aggregate.job
     })
 
 @router.post("/admin/reports/{report_id}/update")
+@query_budget(7)
 async def update_report(report_id: int, request: Request, user: models.User = Depends(login_required)):
     form_data = await request.form()
     update_data = {
@@ -653,46 +596,35 @@ async def update_report(report_id: int, request: Request, user: models.User = De
 
     sketch_photo = form_data.get("sketch_photo")
     if hasattr(sketch_photo, "filename") and sketch_photo.filename:
-        report_res = supabase.table("extraction_reports").select("job_number").eq("id", report_id).execute()
+        report_res = await db.table("extraction_reports").select("job_number").eq("id", report_id).execute()
         report_jn = report_res.data[0]["job_number"] if report_res.data else str(report_id)
         filename = f"sketch_{report_jn}_{datetime.now().timestamp()}_{sketch_photo.filename}"
         storage_path = f"reports/{report_jn}/{filename}"
         file_content = await sketch_photo.read()
-        update_data["sketch_photo_path"] = supabase_storage.upload_file(file_content, storage_path)
+        update_data["sketch_photo_path"] = await supabase_storage.upload_file_async(file_content, storage_path)
+
+    _, readings_res, items_res = await asyncio.gather(
+        _update_with_schema_fallback("extraction_reports", update_data, "id", report_id),
+        db.table("extraction_micron_readings").select("*").eq("report_id", report_id).execute(),
+        db.table("extraction_inspection_items").select("*").eq("report_id", report_id).execute()
+    )
+    readings = readings_res.data or []
+    items = items_res.data or []
+
+    changed_readings = _changed_rows(readings, {r['id']: _reading_update(form_data, r['id']) for r in readings})
+    changed_items = _changed_rows(items, {i['id']: _inspection_update(form_data, i['id']) for i in items})
+    writes = []
+    if changed_readings:
+        writes.append(db.table("extraction_micron_readings").upsert(changed_readings, on_conflict="id").execute())
+    if changed_items:
+        writes.append(db.table("extraction_inspection_items").upsert(changed_items, on_conflict="id").execute())
+    await asyncio.gather(*writes)
 
-    _update_with_schema_fallback("extraction_reports", update_data, "id", report_id)
-    
-    readings = supabase.table("extraction_micron_readings").select("id").eq("report_id", report_id).execute().data
-    for r in readings:
-        rid = r['id']
-        pre = form_data.get(f"read_pre_{rid}")
-        post = form_data.get(f"read_post_{rid}")
-        desc = form_data.get(f"read_desc_{rid}")
-        r_update = {}
-        if pre is not None: r_update['pre_clean'] = int(pre) if pre else 0
-        if post is not None: r_update['post_clean'] = int(post) if post else 0
-        if desc is not None: r_update['description'] = desc
-        if r_update:
-            supabase.table("extraction_micron_readings").update(r_update).eq("id", rid).execute()
-            
-    items = supabase.table("extraction_inspection_items").select("id").eq("report_id", report_id).execute().data
-    for item in items:
-        iid = item['id']
-        status = form_data.get(f"insp_status_{iid}")
-        advice = form_data.get(f"insp_advice_{iid}")
-        i_update = {}
-        if status:
-            i_update['pass_status'] = (status == "Pass")
-            i_update['fail_status'] = (status == "Fail")
-        if advice is not None: i_update['advice'] = advice
-        if i_update:
-            supabase.table("extraction_inspection_items").update(i_update).eq("id", iid).execute()
-            
     return HTMLResponse(content='<div class="alert alert-success">Report saved successfully!</div>')
 
 @router.post("/admin/reports/{report_id}/photos/delete/{photo_id}")
-def delete_report_photo(report_id: int, photo_id: int, user: models.User = Depends(login_required)):
-    supabase.table("extraction_photos").delete().eq("id", photo_id).execute()
+async def delete_report_photo(report_id: int, photo_id: int, user: models.User = Depends(login_required)):
+    await db.table("extraction_photos").delete().eq("id", photo_id).execute()
     return HTMLResponse(content="")
 
 @router.post("/admin/reports/{report_id}/photos/upload")
@@ -703,13 +635,13 @@ async def upload_report_photo(report_id: int, request: Request, user: models.Use
     item = form_data.get("photo_item", "Site Overview")
     
     if file and file.filename:
-        report_res = supabase.table("extraction_reports").select("job_number").eq("id", report_id).execute()
+        report_res = await db.table("extraction_reports").select("job_number").eq("id", report_id).execute()
         job_number = report_res.data[0]['job_number'] if report_res.data else str(report_id)
         filename = f"{datetime.now().timestamp()}_{file.filename}"
         storage_path = f"reports/{job_number}/{filename}"
         file_content = await file.read()
-        photo_url = supabase_storage.upload_file(file_content, storage_path)
-        supabase.table("extraction_photos").insert({
+        photo_url = await supabase_storage.upload_file_async(file_content, storage_path)
+        await db.table("extraction_photos").insert({
             "report_id": report_id,
             "photo_type": type,
             "photo_path": photo_url,
@@ -720,56 +652,27 @@ async def upload_report_photo(report_id: int, request: Request, user: models.Use
 
 @router.get("/admin/reports/{report_id}/photos/download")
 async def download_report_photos(report_id: int, user: models.User = Depends(login_required)):
-    photos_res = supabase.table("extraction_photos").select("*").eq("report_id", report_id).execute()
+    photos_res = await db.table("extraction_photos").select("*").eq("report_id", report_id).execute()
     if not photos_res.data:
         return HTMLResponse(content="No photos found.", status_code=404)
         
-    report_res = supabase.table("extraction_reports").select("job_number").eq("id", report_id).execute()
+    report_res = await db.table("extraction_reports").select("job_number").eq("id", report_id).execute()
     jn = report_res.data[0]['job_number'] if report_res.data else str(report_id)
     
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "a", zipfile.ZIP_DEFLATED, False) as zip_file:
-        for i, photo in enumerate(photos_res.data):
-            url = photo['photo_path']
-            try:
-                response = requests.get(url)
-                if response.status_code == 200:
-                    ext = url.split('.')[-1].split('?')[0]
-                    if len(ext) > 4: ext = 'jpg'
-                    fname = f"{jn}_photo_{i+1}_{photo['photo_type'].replace(' ', '_')}.{ext}"
-                    zip_file.writestr(fname, response.content)
-            except Exception as e:
-                print(f"Error adding photo: {e}")
-                
-    zip_buffer.seek(0)
-    return StreamingResponse(zip_buffer, media_type="application/zip", headers={"Content-Disposition": f"attachment; filename=PNJ_{jn}_Photos.zip"})
+    return StreamingResponse(stream_photo_zip(photos_res.data, jn), media_type="application/zip", headers={"Content-Disposition": f"attachment; filename=PNJ_{jn}_Photos.zip"})
 
 @router.get("/admin/reports/{report_id}/download")
-def download_admin_report_pdf(report_id: int, user: models.User = Depends(login_required)):
-    res = supabase.table("extraction_reports").select("*").eq("id", report_id).execute()
-    if not res.data:
+async def download_admin_report_pdf(report_id: int, user: models.User = Depends(login_required)):
+    aggregate = await load_report_aggregate(report_id=report_id, include_job=False)
+    if not aggregate:
         raise HTTPException(status_code=404, detail="Report not found")
+    report = aggregate.report
         
-    try:
-        report = models.ExtractionReport(**res.data[0])
-    except Exception:
-        fallback = dict(res.data[0])
-        fallback["date"] = None
-        fallback["time"] = None
-        report = models.ExtractionReport(**fallback)
-        
-    micron_readings = [models.ExtractionMicronReading(**m) for m in supabase.table("extraction_micron_readings").select("*").eq("report_id", report_id).execute().data]
-    inspection_items = [models.ExtractionInspectionItem(**i) for i in supabase.table("extraction_inspection_items").select("*").eq("report_id", report_id).execute().data]
-    filter_items = [models.ExtractionFilterItem(**f) for f in supabase.table("extraction_filter_items").select("*").eq("report_id", report_id).execute().data]
-    photos = [models.ExtractionPhoto(**p) for p in supabase.table("extraction_photos").select("*").eq("report_id", report_id).execute().data]
-    
-    tmp_dir = tempfile.gettempdir()
     jn = report.job_number or str(report_id)
     safe_jn = jn.replace('/', '_').replace('\\', '_')
-    pdf_path = os.path.join(tmp_dir, f"PNJ_Report_{safe_jn}.pdf")
-    
-    from ...report_generator import generate_client_pdf
-    generate_client_pdf(report, micron_readings, inspection_items, filter_items, photos, pdf_path)
+    pdf_path = await pdf_cache.get_or_render(
+        report, aggregate.micron_readings, aggregate.inspection_items, aggregate.filter_items, aggregate.photos
+    )
     
     return FileResponse(pdf_path, filename=f"PNJ_Report_{safe_jn}.pdf", media_type="application/pdf")
 
@@ -779,10 +682,10 @@ def download_admin_report_pdf(report_id: int, user: models.User = Depends(login_
 
 
 async def raise_invoice(report_id: int, user: models.User = Depends(login_required)):
-    report_res = supabase.table("extraction_reports").select("*").eq("id", report_id).execute()
+    report_res = await db.table("extraction_reports").select("*").eq("id", report_id).execute()
     if not report_res.data: return HTMLResponse("<span class='text-error'>Report not found</span>")
     report = models.ExtractionReport(**report_res.data[0])
-    job_res = supabase.table("jobs").select("*").eq("job_number", report.job_number).execute()
+    job_res = await db.table("jobs").select("*").eq("job_number", report.job_number).execute()
     if not job_res.data: return HTMLResponse("<span class='text-error'>Job not found</span>")
     job = models.Job(**job_res.data[0])
     
@@ -795,6 +698,6 @@ async def raise_invoice(report_id: int, user: models.User = Depends(login_requir
         return HTMLResponse(f"<span class='text-error'>Starting Invoice Failed</span>")
 
 @router.post("/admin/reports/{report_id}/approve")
-def approve_report(report_id: int, user: models.User = Depends(login_required)):
-    supabase.table("extraction_reports").update({"status": "Approved"}).eq("id", report_id).execute()
+async def approve_report(report_id: int, user: models.User = Depends(login_required)):
+    await db.table("extraction_reports").update({"status": "Approved"}).eq("id", report_id).execute()
     return HTMLResponse(content="<span class='badge badge-success'>Approved</span>")
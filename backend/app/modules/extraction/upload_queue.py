@@ -0,0 +1,147 @@
+"""
+Background upload queue for extraction-report media.
+
+Report submission spools each uploaded file to local disk and inserts its
+extraction_photos row with upload_status 'pending'. A pool of asyncio workers
+then pushes the files to Supabase Storage in parallel, retrying with
+exponential backoff, and marks each row 'uploaded' (or 'failed' once the
+retries run out). Pending rows whose spool file survived a restart are queued
+again by resume_pending() when the module starts.
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+from typing import Callable, Optional
+
+from ...db import db
+from ... import supabase_storage
+from ...offload import run_io
+
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "pnj_upload_spool"))
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "4"))
+UPLOAD_MAX_ATTEMPTS = int(os.getenv("UPLOAD_MAX_ATTEMPTS", "5"))
+UPLOAD_RETRY_DELAY = float(os.getenv("UPLOAD_RETRY_DELAY", "2"))
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+
+class PhotoUploadQueue:
+    def __init__(
+        self,
+        spool_dir: str = UPLOAD_SPOOL_DIR,
+        workers: int = UPLOAD_WORKERS,
+        max_attempts: int = UPLOAD_MAX_ATTEMPTS,
+        retry_delay: float = UPLOAD_RETRY_DELAY,
+        uploader: Optional[Callable[[bytes, str], str]] = None
+    ):
+        self.spool_dir = spool_dir
+        self.workers = max(workers, 1)
+        self.max_attempts = max(max_attempts, 1)
+        self.retry_delay = retry_delay
+        self.uploader = uploader or supabase_storage.upload_file
+        self._queue = None
+        self._tasks = []
+        self._loop = None
+
+    def spool_path(self, storage_path: str) -> str:
+        parts = [part for part in storage_path.split("/") if part not in {"", ".", ".."}]
+        return os.path.join(self.spool_dir, *parts)
+
+    async def spool(self, upload, storage_path: str) -> str:
+        """Copy an UploadFile to the spool directory without holding it in memory."""
+        path = self.spool_path(storage_path)
+        await run_io(self._copy_to_disk, upload.file, path)
+        return path
+
+    @staticmethod
+    def _copy_to_disk(source, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        source.seek(0)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(source, f, SPOOL_CHUNK_SIZE)
+
+    def _read_and_upload(self, storage_path: str) -> str:
+        with open(self.spool_path(storage_path), "rb") as f:
+            return self.uploader(f.read(), storage_path)
+
+    async def upload_now(self, storage_path: str) -> str:
+        """Upload a spooled file inline (used when the status columns are missing)."""
+        url = await run_io(self._read_and_upload, storage_path)
+        self._discard_spool(storage_path)
+        return url
+
+    def _discard_spool(self, storage_path: str):
+        try:
+            os.remove(self.spool_path(storage_path))
+        except OSError:
+            pass
+
+    def enqueue(self, photo_id: int, storage_path: str):
+        self._ensure_workers()
+        self._queue.put_nowait((photo_id, storage_path))
+
+    def _ensure_workers(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._tasks:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _worker(self):
+        while True:
+            photo_id, storage_path = await self._queue.get()
+            try:
+                await self._upload(photo_id, storage_path)
+            except Exception as exc:
+                print(f"Error: photo upload worker failed for {storage_path}: {exc}")
+            finally:
+                self._queue.task_done()
+
+    async def _upload(self, photo_id: int, storage_path: str):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                url = await run_io(self._read_and_upload, storage_path)
+                break
+            except FileNotFoundError:
+                print(f"Warning: spool file for {storage_path} is missing; marking upload failed")
+                await self._set_status(photo_id, {"upload_status": "failed"})
+                return
+            except Exception as exc:
+                print(f"Warning: upload of {storage_path} failed (attempt {attempt}/{self.max_attempts}): {exc}")
+                if attempt == self.max_attempts:
+                    await self._set_status(photo_id, {"upload_status": "failed"})
+                    return
+                await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+        await self._set_status(photo_id, {"upload_status": "uploaded", "photo_path": url})
+        self._discard_spool(storage_path)
+
+    @staticmethod
+    async def _set_status(photo_id: int, update: dict):
+        await db.table("extraction_photos").update(update).eq("id", photo_id).execute()
+
+    async def join(self):
+        """Wait until every queued upload has finished (or failed)."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def resume_pending(self):
+        """Queue pending rows left over from a previous process."""
+        try:
+            res = await db.table("extraction_photos").select("id,storage_path").eq("upload_status", "pending").execute()
+        except Exception as exc:
+            print(f"Warning: could not resume pending photo uploads: {exc}")
+            return
+        for row in res.data or []:
+            if row.get("storage_path"):
+                self.enqueue(row["id"], row["storage_path"])
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+
+photo_upload_queue = PhotoUploadQueue()
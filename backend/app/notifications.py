@@ -0,0 +1,405 @@
+"""
+Background delivery of email and WhatsApp notifications.
+
+Callers submit() notifications to a bounded queue and return immediately; a
+few long-lived asyncio workers deliver them. Emails waiting in the queue are
+sent NOTIFY_EMAIL_BATCH at a time over one SMTP session taken from a small
+pool of logged-in connections (reused until idle for SMTP_IDLE_SECONDS), and
+WhatsApp webhook calls share one keep-alive HTTP client. Failed deliveries are
+retried with exponential backoff; after NOTIFY_MAX_ATTEMPTS, or when the queue
+is full, the notification is written to notification_dead_letters.
+
+Who receives report notifications (the report_notification_recipients setting
+joined to users) is cached for REPORT_RECIPIENTS_TTL seconds and dropped when
+the setting or a user changes.
+"""
+import asyncio
+import json
+import os
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+from typing import Callable, List, NamedTuple, Optional
+
+import httpx
+
+from .db import db
+from .offload import run_io
+from .utils import _normalize_uk_phone
+
+NOTIFY_QUEUE_SIZE = max(int(os.getenv("NOTIFY_QUEUE_SIZE", "500")), 1)
+NOTIFY_WORKERS = max(int(os.getenv("NOTIFY_WORKERS", "2")), 1)
+NOTIFY_MAX_ATTEMPTS = max(int(os.getenv("NOTIFY_MAX_ATTEMPTS", "5")), 1)
+NOTIFY_RETRY_DELAY = float(os.getenv("NOTIFY_RETRY_DELAY", "2"))
+NOTIFY_EMAIL_BATCH = max(int(os.getenv("NOTIFY_EMAIL_BATCH", "20")), 1)
+SMTP_POOL_SIZE = max(int(os.getenv("SMTP_POOL_SIZE", "2")), 1)
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", "60"))
+REPORT_RECIPIENTS_TTL = float(os.getenv("REPORT_RECIPIENTS_TTL", "60"))
+
+
+class Notification(NamedTuple):
+    channel: str  # "email" or "whatsapp"
+    recipient: str
+    subject: str
+    body: str
+    attempts: int = 0
+
+
+def smtp_from() -> Optional[str]:
+    return os.getenv("SMTP_FROM") or os.getenv("SMTP_USERNAME")
+
+
+def build_email(to_email: str, subject: str, body: str) -> EmailMessage:
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = smtp_from()
+    message["To"] = to_email
+    message.set_content(body)
+    return message
+
+
+def _connect_smtp() -> smtplib.SMTP:
+    smtp_host = os.getenv("SMTP_HOST")
+    if not smtp_host or not smtp_from():
+        raise RuntimeError("SMTP_HOST/SMTP_FROM not configured")
+    port = int(os.getenv("SMTP_PORT", "587"))
+    timeout = int(os.getenv("SMTP_TIMEOUT", "8"))
+    username = os.getenv("SMTP_USERNAME")
+    password = os.getenv("SMTP_PASSWORD")
+    use_ssl = os.getenv("SMTP_SSL", "").lower() in {"1", "true", "yes"}
+    use_starttls = os.getenv("SMTP_STARTTLS", "1").lower() not in {"0", "false", "no"}
+
+    print(
+        "SMTP connecting "
+        f"host={smtp_host} port={port} from={smtp_from()} username_set={bool(username)} "
+        f"password_set={bool(password)} ssl={use_ssl} starttls={use_starttls}"
+    )
+    if use_ssl:
+        smtp = smtplib.SMTP_SSL(smtp_host, port, timeout=timeout)
+    else:
+        smtp = smtplib.SMTP(smtp_host, port, timeout=timeout)
+        if use_starttls:
+            smtp.starttls()
+    if username and password:
+        smtp.login(username, password)
+    return smtp
+
+
+def _permanent_smtp_error(error: Exception) -> bool:
+    """True for 5xx refusals, which fail the same way on every retry."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)):
+        return error.smtp_code >= 500
+    return False
+
+
+class SMTPPool:
+    """Logged-in SMTP connections kept open between sends (blocking; use from threads)."""
+
+    def __init__(self, size: int = SMTP_POOL_SIZE, idle_seconds: float = SMTP_IDLE_SECONDS,
+                 connect: Callable[[], smtplib.SMTP] = _connect_smtp):
+        self.size = size
+        self.idle_seconds = idle_seconds
+        self.connect = connect
+        self._idle = []  # (connection, last used)
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def acquire(self) -> smtplib.SMTP:
+        while True:
+            with self._lock:
+                entry = self._idle.pop() if self._idle else None
+            if entry is None:
+                self.connections_opened += 1
+                return self.connect()
+            smtp, last_used = entry
+            if time.monotonic() - last_used < self.idle_seconds:
+                try:
+                    if smtp.noop()[0] == 250:
+                        return smtp
+                except Exception:
+                    pass
+            self.discard(smtp)
+
+    def release(self, smtp: smtplib.SMTP):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((smtp, time.monotonic()))
+                return
+        self.discard(smtp)
+
+    @staticmethod
+    def discard(smtp: smtplib.SMTP):
+        try:
+            smtp.quit()
+        except Exception:
+            try:
+                smtp.close()
+            except Exception:
+                pass
+
+    def send(self, messages: List[EmailMessage]) -> List[Optional[Exception]]:
+        """Send messages over one session; returns the error (or None) for each."""
+        results: List[Optional[Exception]] = [None] * len(messages)
+        try:
+            smtp = self.acquire()
+        except Exception as exc:
+            return [exc] * len(messages)
+        for index, message in enumerate(messages):
+            try:
+                smtp.send_message(message)
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as exc:
+                results[index] = exc
+            except OSError as exc:
+                # The session is gone (SMTPException is an OSError too); the
+                # rest of the batch is retried on a fresh connection.
+                self.discard(smtp)
+                results[index:] = [exc] * (len(messages) - index)
+                return results
+        self.release(smtp)
+        return results
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for smtp, _ in idle:
+            self.discard(smtp)
+
+
+class NotificationDispatcher:
+    def __init__(
+        self,
+        queue_size: int = NOTIFY_QUEUE_SIZE,
+        workers: int = NOTIFY_WORKERS,
+        max_attempts: int = NOTIFY_MAX_ATTEMPTS,
+        retry_delay: float = NOTIFY_RETRY_DELAY,
+        email_batch: int = NOTIFY_EMAIL_BATCH,
+        smtp_pool: Optional[SMTPPool] = None,
+        http_client: Optional[httpx.AsyncClient] = None
+    ):
+        self.queue_size = queue_size
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.email_batch = email_batch
+        self.smtp = smtp_pool or SMTPPool()
+        self._http_client = http_client
+        self._queue = None
+        self._tasks = []
+        self._loop = None
+        self._outstanding = 0
+        self._idle = None
+        self.sent = 0
+        self.dead_lettered = 0
+
+    def _ensure_workers(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._tasks:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._outstanding = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(10.0, connect=5.0),
+                limits=httpx.Limits(max_connections=self.workers * 2, max_keepalive_connections=self.workers),
+            )
+        return self._http_client
+
+    def submit(self, notification: Notification) -> bool:
+        """Queue a notification without waiting; False if it had to be dead-lettered."""
+        self._ensure_workers()
+        self._outstanding += 1
+        self._idle.clear()
+        return self._enqueue(notification)
+
+    def _enqueue(self, notification: Notification) -> bool:
+        try:
+            self._queue.put_nowait(notification)
+            return True
+        except asyncio.QueueFull:
+            print(f"Warning: notification queue full; dead-lettering {notification.channel} to {notification.recipient}")
+            self._loop.create_task(self._dead_letter(notification, "queue full"))
+            return False
+
+    def _finished(self):
+        self._outstanding -= 1
+        if self._outstanding <= 0:
+            self._outstanding = 0
+            self._idle.set()
+
+    async def _worker(self):
+        while True:
+            batch = [await self._queue.get()]
+            # Take any other queued emails so they share one SMTP session.
+            if batch[0].channel == "email":
+                deferred = []
+                while len(batch) < self.email_batch and not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    (batch if item.channel == "email" else deferred).append(item)
+                batch.extend(deferred)
+            try:
+                emails = [item for item in batch if item.channel == "email"]
+                if emails:
+                    await self._settle(emails, self._deliver_emails(emails))
+                for item in batch:
+                    if item.channel != "email":
+                        await self._settle([item], self._deliver_other(item))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _settle(self, items: List[Notification], delivery):
+        """Await a delivery step; if it fails outright its items are retried, so join() still returns."""
+        try:
+            await delivery
+        except Exception as exc:
+            print(f"Error: notification worker failed: {exc}")
+            for item in items:
+                self._retry(item, exc)
+
+    async def _deliver_emails(self, emails: List[Notification]):
+        errors: List[Optional[Exception]] = [None] * len(emails)
+        messages = {}
+        for index, item in enumerate(emails):
+            try:
+                messages[index] = build_email(item.recipient, item.subject, item.body)
+            except ValueError as exc:  # malformed address or header
+                errors[index] = exc
+        if messages:
+            try:
+                results = await run_io(self.smtp.send, list(messages.values()))
+            except Exception as exc:
+                results = [exc] * len(messages)
+            for index, error in zip(messages, results):
+                errors[index] = error
+        for index, (item, error) in enumerate(zip(emails, errors)):
+            if error is None:
+                print(f"Notification email sent to={item.recipient}")
+                self.sent += 1
+                self._finished()
+            else:
+                self._retry(item, error, permanent=index not in messages or _permanent_smtp_error(error))
+
+    async def _deliver_other(self, item: Notification):
+        try:
+            if item.channel != "whatsapp":
+                raise ValueError(f"unknown notification channel {item.channel}")
+            webhook_url = os.getenv("WHATSAPP_NOTIFY_WEBHOOK_URL")
+            if not webhook_url:
+                raise RuntimeError("WHATSAPP_NOTIFY_WEBHOOK_URL not configured")
+            response = await self._http().post(webhook_url, json={"to": item.recipient, "message": item.body})
+            response.raise_for_status()
+        except Exception as exc:
+            self._retry(item, exc)
+            return
+        self.sent += 1
+        self._finished()
+
+    def _retry(self, item: Notification, error: Exception, permanent: bool = False):
+        attempts = item.attempts + 1
+        print(f"Warning: {item.channel} notification to {item.recipient} failed (attempt {attempts}/{self.max_attempts}): {error}")
+        if permanent or attempts >= self.max_attempts:
+            self._loop.create_task(self._dead_letter(item._replace(attempts=attempts), str(error)))
+            return
+        delay = self.retry_delay * 2 ** (attempts - 1)
+        self._loop.call_later(delay, self._enqueue, item._replace(attempts=attempts))
+
+    async def _dead_letter(self, item: Notification, error: str):
+        self.dead_lettered += 1
+        try:
+            await db.table("notification_dead_letters").insert({
+                "channel": item.channel,
+                "recipient": item.recipient,
+                "subject": item.subject,
+                "body": item.body,
+                "attempts": item.attempts,
+                "error": error[:1000],
+            }).execute()
+        except Exception as exc:
+            print(f"Warning: could not record undelivered {item.channel} notification to {item.recipient}: {exc}")
+        finally:
+            self._finished()
+
+    async def join(self):
+        """Wait until everything submitted so far is delivered or dead-lettered."""
+        if self._idle is not None:
+            await self._idle.wait()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+        await run_io(self.smtp.close)
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+
+class ReportRecipients:
+    """The report_notification_recipients preferences joined to their users, cached briefly."""
+
+    def __init__(self, ttl: float = REPORT_RECIPIENTS_TTL):
+        self.ttl = ttl
+        self._value = None
+        self._expires = 0.0
+        self._generation = 0
+
+    async def _load(self) -> List[dict]:
+        settings_res = await db.table("system_settings").select("value").eq("key", "report_notification_recipients").execute()
+        if not settings_res.data:
+            print("Report notification skipped: no report_notification_recipients setting found")
+            return []
+        try:
+            preferences = json.loads(settings_res.data[0].get("value") or "[]")
+        except json.JSONDecodeError:
+            print("Report notification skipped: report_notification_recipients is not valid JSON")
+            return []
+        user_ids = [int(item["user_id"]) for item in preferences if str(item.get("user_id", "")).isdigit()]
+        if not user_ids:
+            return []
+        admins_res = await db.table("users").select("*").in_("id", user_ids).execute()
+        admins_by_id = {int(admin["id"]): admin for admin in admins_res.data or [] if admin.get("id") is not None}
+        print(f"Report notification loaded {len(preferences)} preferences and {len(admins_by_id)} matching users")
+
+        recipients = []
+        for preference in preferences:
+            admin = admins_by_id.get(int(preference.get("user_id", 0)))
+            if not admin:
+                print(f"Report notification skipped preference with missing user_id={preference.get('user_id')}")
+                continue
+            if preference.get("email") and admin.get("email"):
+                recipients.append({"channel": "email", "recipient": admin["email"]})
+            if preference.get("whatsapp"):
+                phone = _normalize_uk_phone(preference.get("whatsapp_number"))
+                if phone:
+                    recipients.append({"channel": "whatsapp", "recipient": phone})
+                else:
+                    print(f"Report WhatsApp notification skipped for admin {admin.get('id')}: no valid number")
+        return recipients
+
+    async def get(self) -> List[dict]:
+        if self._value is not None and time.monotonic() < self._expires:
+            return self._value
+        generation = self._generation
+        value = await self._load()
+        if generation == self._generation:
+            self._value, self._expires = value, time.monotonic() + self.ttl
+        return value
+
+    def invalidate(self):
+        self._generation += 1
+        self._value = None
+
+
+notification_dispatcher = NotificationDispatcher()
+report_recipients = ReportRecipients()
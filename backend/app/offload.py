@@ -0,0 +1,36 @@
+"""
+Bounded thread pools for blocking work started from async handlers.
+
+Storage uploads, SMTP sends, upload spooling and the WorkOS SSO calls block on
+synchronous clients or disk, password hashing is deliberately slow bcrypt, and
+report PDFs are rendered in pure Python; run on the event loop, any of them
+stalls every other request for its duration. run_io() and run_cpu() hand that
+work to two small dedicated pools (OFFLOAD_IO_WORKERS, OFFLOAD_CPU_WORKERS), so
+a burst of uploads, logins or renders queues behind its own pool rather than
+behind the loop or asyncio.to_thread's shared default pool.
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+OFFLOAD_IO_WORKERS = max(int(os.getenv("OFFLOAD_IO_WORKERS", "8")), 1)
+OFFLOAD_CPU_WORKERS = max(int(os.getenv("OFFLOAD_CPU_WORKERS", "2")), 1)
+
+io_executor = ThreadPoolExecutor(max_workers=OFFLOAD_IO_WORKERS, thread_name_prefix="offload-io")
+cpu_executor = ThreadPoolExecutor(max_workers=OFFLOAD_CPU_WORKERS, thread_name_prefix="offload-cpu")
+
+
+async def _run(executor: ThreadPoolExecutor, func, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+async def run_io(func, *args, **kwargs):
+    """Run a blocking network or disk call in the I/O pool."""
+    return await _run(io_executor, func, *args, **kwargs)
+
+
+async def run_cpu(func, *args, **kwargs):
+    """Run CPU-bound work (password hashing, PDF rendering) in the CPU pool."""
+    return await _run(cpu_executor, func, *args, **kwargs)
+
@@ -0,0 +1,223 @@
+"""
+Images for report PDFs, prepared once and reused.
+
+fpdf re-decodes and re-compresses every image for every document it builds
+(the VHR logo alone costs over half a second), and report photos are usually
+full-size camera JPEGs behind storage URLs. This module keeps:
+
+- the parsed fpdf image objects of logos, signatures and photo thumbnails in a
+  process-level LRU (PDF_IMAGE_CACHE_MB), seeded into each new document so an
+  image is decoded once per process and embedded once per PDF;
+- base64 signatures decoded once into PDF_ASSET_DIR, keyed by their content;
+- photo thumbnails in PDF_ASSET_DIR: prefetch() downloads the photos of a
+  report in parallel (PDF_PHOTO_WORKERS, one keep-alive HTTP client) and
+  resizes them to the size they are printed at (PDF_PHOTO_DPI), before layout
+  starts. Thumbnails are evicted least-recently-used past PDF_ASSET_MAX_MB.
+"""
+import base64
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+import httpx
+from fpdf.image_parsing import get_img_info
+from PIL import Image, ImageOps
+
+from . import disk_lru
+
+PDF_ASSET_DIR = os.getenv("PDF_ASSET_DIR", os.path.join(tempfile.gettempdir(), "pnj_pdf_assets"))
+PDF_ASSET_MAX_MB = float(os.getenv("PDF_ASSET_MAX_MB", "300"))
+PDF_IMAGE_CACHE_MB = float(os.getenv("PDF_IMAGE_CACHE_MB", "64"))
+PDF_PHOTO_DPI = max(int(os.getenv("PDF_PHOTO_DPI", "200")), 72)
+PDF_PHOTO_QUALITY = int(os.getenv("PDF_PHOTO_QUALITY", "80"))
+PDF_PHOTO_WORKERS = max(int(os.getenv("PDF_PHOTO_WORKERS", "6")), 1)
+PDF_PHOTO_TIMEOUT = float(os.getenv("PDF_PHOTO_TIMEOUT", "15"))
+# Bump when thumbnails are produced differently so stale files are not reused.
+THUMBNAIL_VERSION = "1"
+
+
+def _mm_to_px(mm: float, dpi: int) -> int:
+    return max(int(round(mm / 25.4 * dpi)), 1)
+
+
+class PDFAssets:
+    def __init__(self, asset_dir: str = PDF_ASSET_DIR, max_bytes: int = int(PDF_ASSET_MAX_MB * 1024 * 1024),
+                 image_cache_bytes: int = int(PDF_IMAGE_CACHE_MB * 1024 * 1024), dpi: int = PDF_PHOTO_DPI,
+                 quality: int = PDF_PHOTO_QUALITY, workers: int = PDF_PHOTO_WORKERS, fetch=None):
+        self.asset_dir = asset_dir
+        self.max_bytes = max_bytes
+        self.image_cache_bytes = image_cache_bytes
+        self.dpi = dpi
+        self.quality = quality
+        self.workers = workers
+        self.fetch = fetch or self._download
+        # (path, size, filter) -> parsed fpdf image info, least recently used first
+        self._parsed: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._parsed_bytes = 0
+        self._lock = threading.Lock()
+        self._client = None
+        self.hits = 0
+        self.misses = 0
+
+    def _http(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(
+                    timeout=PDF_PHOTO_TIMEOUT,
+                    follow_redirects=True,
+                    limits=httpx.Limits(max_connections=self.workers, max_keepalive_connections=self.workers),
+                )
+            return self._client
+
+    def _download(self, url: str) -> Optional[bytes]:
+        response = self._http().get(url)
+        if response.status_code != 200:
+            print(f"Warning: report photo {url} returned {response.status_code}")
+            return None
+        return response.content
+
+    def _read_source(self, source: str) -> Optional[bytes]:
+        if source.startswith(("http://", "https://")):
+            return self.fetch(source)
+        if os.path.exists(source):
+            with open(source, "rb") as f:
+                return f.read()
+        return None
+
+    # --- fpdf image objects ---------------------------------------------------
+
+    def _info(self, path: str, image_filter: str) -> dict:
+        # Not keyed on mtime: disk_lru.touch() moves it on every use of a cached file.
+        key = (path, os.stat(path).st_size, image_filter)
+        with self._lock:
+            info = self._parsed.get(key)
+            if info is not None:
+                self._parsed.move_to_end(key)
+                self.hits += 1
+                return info
+        info = get_img_info(path, None, image_filter)
+        size = len(info.get("data") or b"") + len(info.get("smask") or b"")
+        with self._lock:
+            self.misses += 1
+            if key not in self._parsed:
+                self._parsed[key] = info
+                self._parsed_bytes += size
+            while self._parsed_bytes > self.image_cache_bytes and len(self._parsed) > 1:
+                _, old = self._parsed.popitem(last=False)
+                self._parsed_bytes -= len(old.get("data") or b"") + len(old.get("smask") or b"")
+        return info
+
+    def place(self, pdf, path: Optional[str], x: float, y: float, w: float = 0, h: float = 0) -> bool:
+        """Draw a local image, reusing its parsed form; False if there is nothing to draw."""
+        if not path:
+            return False
+        cache = pdf.image_cache
+        if path not in cache.images:
+            try:
+                shared = self._info(path, cache.image_filter)
+            except FileNotFoundError:
+                return False
+            except Exception as exc:
+                print(f"Warning: could not prepare PDF image {path}: {exc}")
+                return False
+            # Register a copy of the shared object the way fpdf does on a first use.
+            info = type(shared)(shared)
+            info["i"] = len(cache.images) + 1
+            info["usages"] = 0
+            info["iccp_i"] = None
+            iccp = info.get("iccp")
+            if iccp is not None:
+                if iccp not in cache.icc_profiles:
+                    cache.icc_profiles[iccp] = len(cache.icc_profiles)
+                info["iccp_i"] = cache.icc_profiles[iccp]
+                info["iccp"] = None
+            cache.images[path] = info
+        pdf.image(path, x, y, w, h)
+        return True
+
+    # --- signatures ------------------------------------------------------------
+
+    def signature_path(self, signature_value) -> Optional[str]:
+        """Local file for a data:image/... signature, decoded once per distinct signature."""
+        if not signature_value or not str(signature_value).startswith("data:image/"):
+            return None
+        try:
+            header, encoded = str(signature_value).split(",", 1)
+            suffix = ".png" if "png" in header else ".jpg"
+            digest = hashlib.sha256(encoded.encode("ascii")).hexdigest()
+            path = os.path.join(self.asset_dir, f"sig-{digest}{suffix}")
+            if not disk_lru.touch(path):
+                self._write(path, base64.b64decode(encoded))
+            return path
+        except Exception:
+            return None
+
+    # --- photo thumbnails ------------------------------------------------------
+
+    def _thumbnail_path(self, source: str, width_mm: float, height_mm: float) -> str:
+        key = f"{THUMBNAIL_VERSION}|{source}|{width_mm}x{height_mm}|{self.dpi}|{self.quality}"
+        return os.path.join(self.asset_dir, f"thumb-{hashlib.sha256(key.encode('utf-8')).hexdigest()}.jpg")
+
+    def thumbnail(self, source: str, width_mm: float, height_mm: float) -> Optional[str]:
+        """Local JPEG of a photo at print resolution for a width_mm x height_mm slot."""
+        if not source:
+            return None
+        path = self._thumbnail_path(source, width_mm, height_mm)
+        if disk_lru.touch(path):
+            return path
+        try:
+            content = self._read_source(source)
+            if not content:
+                return None
+            with Image.open(io.BytesIO(content)) as image:
+                image = ImageOps.exif_transpose(image).convert("RGB")
+                # Photos are stretched to fill their slot, so size each axis to the slot.
+                size = (min(image.width, _mm_to_px(width_mm, self.dpi)), min(image.height, _mm_to_px(height_mm, self.dpi)))
+                if size != image.size:
+                    image = image.resize(size, Image.LANCZOS)
+                buffer = io.BytesIO()
+                image.save(buffer, "JPEG", quality=self.quality, optimize=True)
+            self._write(path, buffer.getvalue())
+            return path
+        except Exception as exc:
+            print(f"Warning: could not prepare report photo {source}: {exc}")
+            return None
+
+    def prefetch(self, sources: Iterable[str], width_mm: float, height_mm: float) -> Dict[str, Optional[str]]:
+        """Thumbnails for every distinct source, fetched in parallel; maps source -> local path."""
+        unique = list(dict.fromkeys(source for source in sources if source))
+        if not unique:
+            return {}
+        if len(unique) == 1 or self.workers == 1:
+            results = [self.thumbnail(source, width_mm, height_mm) for source in unique]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(unique))) as pool:
+                results = list(pool.map(lambda source: self.thumbnail(source, width_mm, height_mm), unique))
+        self._evict()
+        return dict(zip(unique, results))
+
+    # --- files -----------------------------------------------------------------
+
+    def _write(self, path: str, content: bytes):
+        os.makedirs(self.asset_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.asset_dir)
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def _evict(self):
+        disk_lru.evict(self.asset_dir, self.max_bytes, lambda name: name.startswith("thumb-"))
+
+    def close(self):
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+
+pdf_assets = PDFAssets()
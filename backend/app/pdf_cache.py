@@ -0,0 +1,122 @@
+"""
+Content-addressed cache for rendered report PDFs.
+
+A PDF is stored under the SHA-256 of everything it is rendered from (the report
+row, its micron/inspection/filter rows and the photo list), so an unchanged
+report is never rasterised twice and any change to it, however it was made,
+renders afresh.
+
+Files live in PDF_CACHE_DIR and the least recently used ones are evicted once
+the directory grows past PDF_CACHE_MAX_MB. With PDF_CACHE_MIRROR enabled,
+rendered PDFs are also copied to the private PDF_CACHE_BUCKET so a fresh
+container can download them (with the service key) instead of re-rendering.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+
+from . import disk_lru, supabase_storage
+from .offload import run_cpu, run_io
+from .report_generator import generate_client_pdf
+
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "pnj_pdf_cache"))
+PDF_CACHE_MAX_MB = float(os.getenv("PDF_CACHE_MAX_MB", "200"))
+PDF_CACHE_MIRROR = os.getenv("PDF_CACHE_MIRROR", "").lower() in {"1", "true", "yes"}
+# Client reports must not sit at a guessable public URL; see migrations/2026-10-18_add_pdf_cache_bucket.sql.
+PDF_CACHE_BUCKET = os.getenv("PDF_CACHE_BUCKET", "pnj-pdf-cache")
+# Bump when report_generator output changes so old renders are not served.
+PDF_RENDER_VERSION = "2"
+
+
+def _dump(item):
+    return item.model_dump(mode="json") if hasattr(item, "model_dump") else item
+
+
+def _digest(payload) -> str:
+    body = json.dumps(payload, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+class PDFCache:
+    def __init__(self, cache_dir: str = PDF_CACHE_DIR, max_bytes: int = int(PDF_CACHE_MAX_MB * 1024 * 1024),
+                 mirror: bool = PDF_CACHE_MIRROR, renderer=generate_client_pdf):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.mirror = mirror
+        self.renderer = renderer
+        # Mirror uploads in flight; held so they are not garbage collected mid-run.
+        self._uploads = set()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, f"{digest}.pdf")
+
+    @staticmethod
+    def content_key(report, micron_readings, inspection_items, filter_items, photos) -> str:
+        return _digest({
+            "version": PDF_RENDER_VERSION,
+            "report": _dump(report),
+            "micron_readings": [_dump(m) for m in micron_readings],
+            "inspection_items": [_dump(i) for i in inspection_items],
+            "filter_items": [_dump(f) for f in filter_items],
+            "photos": [_dump(p) for p in photos],
+        })
+
+    async def get_or_render(self, report, micron_readings, inspection_items, filter_items, photos) -> str:
+        digest = self.content_key(report, micron_readings, inspection_items, filter_items, photos)
+        path = self._path(digest)
+        if disk_lru.touch(path) or await self._fetch_mirror(digest, path):
+            self.hits += 1
+        else:
+            self.misses += 1
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(suffix=".pdf", dir=self.cache_dir)
+            os.close(fd)
+            try:
+                await run_cpu(self.renderer, report, micron_readings, inspection_items, filter_items, photos, tmp_path)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            self._evict()
+            if self.mirror:
+                task = asyncio.create_task(run_io(self._upload_mirror, digest, path))
+                self._uploads.add(task)
+                task.add_done_callback(self._upload_done)
+        return path
+
+    def _evict(self):
+        disk_lru.evict(self.cache_dir, self.max_bytes, lambda name: name.endswith(".pdf"))
+
+    def _upload_done(self, task: asyncio.Task):
+        self._uploads.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Warning: PDF cache mirror upload failed: {task.exception()}")
+
+    def _upload_mirror(self, digest: str, path: str):
+        try:
+            with open(path, "rb") as f:
+                supabase_storage.upload_file(f.read(), f"{digest}.pdf", content_type="application/pdf", bucket=PDF_CACHE_BUCKET)
+        except Exception as exc:
+            print(f"Warning: PDF cache mirror upload failed for {digest}: {exc}")
+
+    async def _fetch_mirror(self, digest: str, path: str) -> bool:
+        if not self.mirror:
+            return False
+        try:
+            content = await run_io(supabase_storage.download_file, f"{digest}.pdf", PDF_CACHE_BUCKET)
+        except Exception as exc:
+            if "not found" not in str(exc).lower():
+                print(f"Warning: PDF cache mirror fetch failed for {digest}: {exc}")
+            return False
+        if not content.startswith(b"%PDF"):
+            return False
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+        return True
+
+pdf_cache = PDFCache()
@@ -0,0 +1,165 @@
+"""
+Delta sync of an engineer's job queue for the portal.
+
+The engineer's queue is their jobs from PORTAL_SYNC_PAST_DAYS ago to
+PORTAL_SYNC_FUTURE_DAYS ahead (with role and team), their leave overlapping
+that window and the contributions made on those jobs. Each item is reduced to
+a compact dict and a short content hash; the set of hashes is the queue's
+version, and the cursor handed to the client names that version.
+
+A client that sends its last cursor gets back only the items that were added
+or changed since, plus the keys of items that went away (unassigned, deleted,
+or out of the window). The versions behind recent cursors are kept in memory
+(PORTAL_SYNC_MAX_CURSORS, least recently used dropped first); an unknown or
+expired cursor gets a full snapshot with "full": true. The cursor doubles as
+the ETag, so an unchanged queue is a bodyless 304.
+
+The engineer dashboard keeps its last cursor in localStorage and polls every
+PORTAL_SYNC_POLL_SECONDS; only when today's jobs change does it re-fetch the
+queue partial (/portal/{token}/today), and only on job or leave changes does
+it refetch the calendar.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import date as dt_date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from . import models
+from .assignments import fetch_assignments
+from .db import db
+
+PORTAL_SYNC_VERSION = 1
+PORTAL_SYNC_PAST_DAYS = int(os.getenv("PORTAL_SYNC_PAST_DAYS", "7"))
+PORTAL_SYNC_FUTURE_DAYS = int(os.getenv("PORTAL_SYNC_FUTURE_DAYS", "30"))
+PORTAL_SYNC_MAX_CURSORS = int(os.getenv("PORTAL_SYNC_MAX_CURSORS", "2048"))
+# How often the engineer dashboard polls /api/engineer/{token}/sync.
+PORTAL_SYNC_POLL_SECONDS = max(float(os.getenv("PORTAL_SYNC_POLL_SECONDS", "60")), 5)
+
+# Job columns the portal shows; role and team are added from the assignment.
+SYNC_JOB_COLUMNS = "id,job_number,date,time,priority,status,job_type,client_name,site_name,address,engineer_contact_name,site_contact_name,site_contact_phone,notes"
+SYNC_CONTRIBUTION_COLUMNS = "id,job_number,engineer_contact_name,engineer_role,note,media_path,media_type,created_at"
+
+# Response section -> key prefix
+SECTIONS = {"jobs": "j", "leave": "l", "contributions": "c"}
+
+
+def _compact(row: dict) -> dict:
+    return {key: value for key, value in row.items() if value not in (None, "", [])}
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, separators=(",", ":"), sort_keys=True, default=str)
+
+
+def _item_hash(item: dict) -> str:
+    return hashlib.sha1(_dumps(item).encode("utf-8")).hexdigest()[:12]
+
+
+def _job_item(job: models.Job) -> dict:
+    return _compact({
+        "job_number": job.job_number,
+        "date": job.date.isoformat(),
+        "time": job.time.strftime("%H:%M"),
+        "priority": job.priority,
+        "status": job.status,
+        "job_type": job.job_type,
+        "client_name": job.client_name,
+        "site_name": job.site_name,
+        "address": job.address,
+        "site_contact_name": job.site_contact_name,
+        "site_contact_phone": job.site_contact_phone,
+        "notes": job.notes,
+        "role": job.assignment_role,
+        "team": job.engineer_team,
+    })
+
+
+class PortalSync:
+    def __init__(self, max_cursors: int = PORTAL_SYNC_MAX_CURSORS):
+        self.max_cursors = max(max_cursors, 1)
+        # cursor -> {item key: item hash}
+        self._versions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def window(self, today: Optional[dt_date] = None) -> Tuple[str, str]:
+        today = today or dt_date.today()
+        return (
+            (today - timedelta(days=PORTAL_SYNC_PAST_DAYS)).isoformat(),
+            (today + timedelta(days=PORTAL_SYNC_FUTURE_DAYS + 1)).isoformat(),
+        )
+
+    async def load(self, engineer_name: str, today: Optional[dt_date] = None) -> Dict[str, Dict[str, dict]]:
+        """The engineer's current queue as {section: {item key: compact item}}."""
+        start_date, end_date = self.window(today)
+        jobs = await fetch_assignments(engineer_name, start_date=start_date, end_date=end_date, columns=SYNC_JOB_COLUMNS)
+        leave_res = await (
+            db.table("leave_requests")
+            .select("id,start_date,end_date,reason,status")
+            .eq("engineer_name", engineer_name)
+            .gte("end_date", start_date)
+            .lt("start_date", end_date)
+            .execute()
+        )
+        contributions = []
+        if jobs:
+            try:
+                contribution_res = await (
+                    db.table("job_contributions")
+                    .select(SYNC_CONTRIBUTION_COLUMNS)
+                    .in_("job_number", [job.job_number for job in jobs])
+                    .execute()
+                )
+                contributions = contribution_res.data or []
+            except Exception as exc:
+                print(f"Warning: job_contributions lookup unavailable for portal sync: {exc}")
+        return {
+            "jobs": {f"j:{job.job_number}": _job_item(job) for job in jobs},
+            "leave": {f"l:{row['id']}": _compact(row) for row in leave_res.data or []},
+            "contributions": {f"c:{row['id']}": _compact(row) for row in contributions},
+        }
+
+    def _remember(self, cursor: str, hashes: Dict[str, str]):
+        with self._lock:
+            self._versions[cursor] = hashes
+            self._versions.move_to_end(cursor)
+            while len(self._versions) > self.max_cursors:
+                self._versions.popitem(last=False)
+
+    def _recall(self, cursor: Optional[str]) -> Optional[Dict[str, str]]:
+        if not cursor:
+            return None
+        with self._lock:
+            hashes = self._versions.get(cursor)
+            if hashes is not None:
+                self._versions.move_to_end(cursor)
+            return hashes
+
+    async def changes(self, engineer_name: str, cursor: Optional[str] = None, today: Optional[dt_date] = None) -> dict:
+        """Everything that changed in the engineer's queue since ``cursor`` (or all of it)."""
+        sections = await self.load(engineer_name, today)
+        hashes = {key: _item_hash(item) for items in sections.values() for key, item in items.items()}
+        digest = hashlib.sha1(_dumps([engineer_name, sorted(hashes.items())]).encode("utf-8")).hexdigest()[:20]
+        new_cursor = f"{PORTAL_SYNC_VERSION}.{digest}"
+        self._remember(new_cursor, hashes)
+
+        previous = self._recall(cursor) if cursor != new_cursor else hashes
+        payload = {"v": PORTAL_SYNC_VERSION, "cursor": new_cursor, "full": previous is None}
+        for section, items in sections.items():
+            changed = [item for key, item in items.items() if previous is None or previous.get(key) != hashes[key]]
+            if changed:
+                payload[section] = changed
+        if previous is not None:
+            removed: Dict[str, List[str]] = {}
+            for key in previous.keys() - hashes.keys():
+                prefix, _, item_id = key.partition(":")
+                section = next(name for name, short in SECTIONS.items() if short == prefix)
+                removed.setdefault(section, []).append(item_id)
+            if removed:
+                payload["removed"] = {section: sorted(ids) for section, ids in removed.items()}
+        return payload
+
+
+portal_sync = PortalSync()
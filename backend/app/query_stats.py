@@ -0,0 +1,178 @@
+"""
+Per-request database query accounting.
+
+db.table() and db.rpc() hand out their query builders wrapped in TracedQuery,
+which times each execute() and records it against the request being served:
+track_queries() (entered by the log_requests middleware) puts a RequestQueries
+in a context variable, and tasks started with asyncio.gather inherit it. For
+each request we keep the query count, a per-table breakdown, the total time
+spent waiting on the database, identical queries issued more than once, and
+query shapes (table, operation and filtered columns, ignoring the values) run
+QUERY_N_PLUS_ONE_MIN or more times, the mark of a per-row loop (N+1).
+
+The middleware returns these as X-DB-* and Server-Timing response headers and
+on its RESPONSE log line. Routes declare a budget with @query_budget(n); a
+request over it logs a warning, and the query_budget pytest fixture fails the
+test. Set QUERY_STATS=0 to stop wrapping builders.
+"""
+import hashlib
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+QUERY_STATS = os.getenv("QUERY_STATS", "1") == "1"
+QUERY_N_PLUS_ONE_MIN = int(os.getenv("QUERY_N_PLUS_ONE_MIN", "5"))
+
+# Builder calls that choose the operation rather than filter it.
+OPERATIONS = {"select", "insert", "upsert", "update", "delete", "rpc"}
+
+_current: ContextVar[Optional["RequestQueries"]] = ContextVar("request_queries", default=None)
+
+# Called with (route, RequestQueries, budget) after each tracked request; see tests/conftest.py.
+listeners: List = []
+
+
+def _short(value, limit: int = 60) -> str:
+    text = repr(value)
+    if len(text) <= limit:
+        return text
+    # Keep long payloads distinguishable without logging them in full.
+    return f"{text[:limit]}...#{hashlib.sha1(text.encode('utf-8')).hexdigest()[:8]}"
+
+
+class RequestQueries:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.tables: Counter = Counter()
+        self.signatures: Counter = Counter()
+        self.shapes: Counter = Counter()
+        self.closed = False
+
+    def record(self, table: str, shape: str, signature: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        self.tables[table] += 1
+        self.shapes[shape] += 1
+        self.signatures[signature] += 1
+
+    @property
+    def milliseconds(self) -> float:
+        return round(self.seconds * 1000, 1)
+
+    def repeated(self) -> Dict[str, int]:
+        """Identical queries run more than once."""
+        return {signature: n for signature, n in self.signatures.items() if n > 1}
+
+    def n_plus_one(self) -> Dict[str, int]:
+        """Query shapes run often enough to look like one query per row."""
+        return {shape: n for shape, n in self.shapes.items() if n >= QUERY_N_PLUS_ONE_MIN}
+
+    def summary(self) -> str:
+        tables = ",".join(f"{table}:{n}" for table, n in self.tables.most_common())
+        return f"queries={self.count} db_ms={self.milliseconds}" + (f" tables={tables}" if tables else "")
+
+    def headers(self, budget: Optional[int] = None) -> Dict[str, str]:
+        headers = {
+            "X-DB-Queries": str(self.count),
+            "X-DB-Time-Ms": str(self.milliseconds),
+            "Server-Timing": f'db;dur={self.milliseconds};desc="{self.count} queries"',
+        }
+        if budget is not None:
+            headers["X-DB-Query-Budget"] = str(budget)
+        n_plus_one = self.n_plus_one()
+        if n_plus_one:
+            headers["X-DB-N-Plus-One"] = ", ".join(n_plus_one)
+        return headers
+
+
+@contextmanager
+def track_queries():
+    """Record the queries run inside the block (and its child tasks)."""
+    queries = RequestQueries()
+    token = _current.set(queries)
+    try:
+        yield queries
+    finally:
+        # Tasks spawned during the request keep the context; stop counting their queries.
+        queries.closed = True
+        _current.reset(token)
+
+
+def query_budget(limit: int):
+    """Declare the most queries a route should need, e.g. @query_budget(5)."""
+    def decorate(endpoint):
+        endpoint.query_budget = limit
+        return endpoint
+    return decorate
+
+
+def route_budget(request) -> Tuple[str, Optional[int]]:
+    """('METHOD /route/{template}', declared budget) of a request that has been routed."""
+    route = request.scope.get("route")
+    path = getattr(route, "path", None) or request.url.path
+    return f"{request.method} {path}", getattr(getattr(route, "endpoint", None), "query_budget", None)
+
+
+def finish_request(request, response, queries: RequestQueries):
+    """Add the query headers to a response and log repeats, N+1 shapes and budget overruns."""
+    if not QUERY_STATS:
+        return
+    route, budget = route_budget(request)
+    response.headers.update(queries.headers(budget))
+    for shape, n in queries.n_plus_one().items():
+        print(f"Warning: possible N+1 in {route}: {shape} ran {n} times")
+    for signature, n in queries.repeated().items():
+        print(f"Warning: {route} repeated {signature} {n} times")
+    if budget is not None and queries.count > budget:
+        print(f"Warning: {route} ran {queries.count} queries, over its budget of {budget}")
+    for listener in list(listeners):
+        listener(route, queries, budget)
+
+
+class TracedQuery:
+    """Forwards to a query builder, noting each call so execute() can be recorded."""
+
+    __slots__ = ("_builder", "_table", "_steps")
+
+    def __init__(self, builder, table: str, steps: tuple = ()):
+        self._builder = builder
+        self._table = table
+        self._steps = steps
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return TracedQuery(attr, self._table, self._steps) if hasattr(attr, "execute") else attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if hasattr(result, "execute"):
+                return TracedQuery(result, self._table, self._steps + ((name, args, kwargs),))
+            return result
+        return call
+
+    def _describe(self) -> Tuple[str, str]:
+        shape, signature = [self._table], [self._table]
+        for name, args, kwargs in self._steps:
+            if name in OPERATIONS:
+                shape.append(name)
+            else:
+                shape.append(f"{name}({args[0]})" if args and isinstance(args[0], str) else name)
+            values = [_short(arg) for arg in args] + [f"{key}={_short(value)}" for key, value in kwargs.items()]
+            signature.append(f"{name}({', '.join(values)})")
+        return ".".join(shape), ".".join(signature)
+
+    async def execute(self):
+        queries = _current.get()
+        if queries is None or queries.closed:
+            return await self._builder.execute()
+        started = time.perf_counter()
+        try:
+            return await self._builder.execute()
+        finally:
+            shape, signature = self._describe()
+            queries.record(self._table, shape, signature, time.perf_counter() - started)
@@ -0,0 +1,210 @@
+"""
+Recurring clean schedule generator.
+
+Each site's ``frequency_number`` is its number of cleans per year (the
+"Current cleans PA" column of the frequency spreadsheet). Starting from the
+later of ``last_clean`` and the site's most recent job, the next due dates are
+stepped forward (by whole months when the frequency divides the year, by days
+otherwise) across the next N months; weekend dues move to the Monday and
+overdue sites are booked on the first day. With an engineer, jobs that land
+on the same day are given back-to-back slots of JOB_DEFAULT_DURATION_MINUTES
+from the requested time, spilling onto the next working day once the day is
+full, so the engineer's own new jobs never clash with each other.
+
+plan_recurring_jobs() builds the plan from the cached reference data and the
+recent jobs, read in pages of SCHEDULE_JOBS_PAGE rows (PostgREST caps a single
+response at its max-rows setting), so a dry run usually costs one round trip.
+create_recurring_jobs() reserves the whole block of job numbers at once and
+writes the jobs (and their lead engineer rows) with multi-row inserts of
+SCHEDULE_INSERT_BATCH rows.
+Because planning anchors on existing jobs, running it again for the same
+window plans nothing new.
+"""
+import calendar
+import os
+from datetime import date as dt_date, datetime, time as dt_time, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from . import models
+from .conflicts import JOB_DEFAULT_DURATION_MINUTES, check_schedule
+from .dashboard_snapshot import dashboard_snapshot
+from .db import db
+from .engineer_auth import engineer_auth
+from .job_numbers import job_number_allocator
+from .reference_data import reference_data
+
+SCHEDULE_INSERT_BATCH = max(int(os.getenv("SCHEDULE_INSERT_BATCH", "200")), 1)
+SCHEDULE_JOBS_PAGE = max(int(os.getenv("SCHEDULE_JOBS_PAGE", "1000")), 1)
+SCHEDULE_MAX_MONTHS = 12
+
+
+def add_months(day: dt_date, months: int) -> dt_date:
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def next_clean(day: dt_date, frequency: int) -> dt_date:
+    if 12 % frequency == 0:
+        return add_months(day, 12 // frequency)
+    return day + timedelta(days=round(365 / frequency))
+
+
+def due_dates(anchor: Optional[dt_date], frequency: int, start: dt_date, end: dt_date) -> List[Tuple[dt_date, bool]]:
+    """(due date, overdue) pairs in [start, end) for a site last cleaned on ``anchor``."""
+    due = next_clean(anchor, frequency) if anchor else start
+    dues = []
+    if due < start:
+        dues.append((start, True))
+        due = next_clean(start, frequency)
+    while due < end:
+        dues.append((due, False))
+        due = next_clean(due, frequency)
+    return dues
+
+
+def working_day(day: dt_date) -> dt_date:
+    return day + timedelta(days=(7 - day.weekday()) % 7) if day.weekday() >= 5 else day
+
+
+def _as_date(value) -> Optional[dt_date]:
+    if not value:
+        return None
+    return value if isinstance(value, dt_date) else dt_date.fromisoformat(str(value)[:10])
+
+
+def _stagger(jobs: List[models.PlannedJob], first: dt_time):
+    """Move one engineer's same-day jobs into consecutive slots (``jobs`` sorted by date)."""
+    step = timedelta(minutes=JOB_DEFAULT_DURATION_MINUTES)
+    taken: Dict[dt_date, int] = {}
+    for job in jobs:
+        day = job.date
+        while True:
+            starts_at = datetime.combine(day, first) + step * taken.get(day, 0)
+            if not taken.get(day) or starts_at + step <= datetime.combine(day + timedelta(days=1), dt_time()):
+                break
+            day = working_day(day + timedelta(days=1))
+        taken[day] = taken.get(day, 0) + 1
+        job.date, job.time = day, starts_at.time()
+    jobs.sort(key=lambda job: (job.date, job.time, job.client_name, job.site_name))
+
+
+async def _latest_jobs(start: dt_date, end: dt_date) -> Dict[Tuple[str, str], dt_date]:
+    """Most recent job date per (client, site) from a year before ``start`` up to ``end``."""
+    latest, after_id = {}, None
+    while True:
+        query = (
+            db.table("jobs")
+            .select("id,client_name,site_name,date")
+            .gte("date", (start - timedelta(days=366)).isoformat())
+            .lt("date", end.isoformat())
+        )
+        if after_id is not None:
+            query = query.gt("id", after_id)
+        rows = (await query.order("id").limit(SCHEDULE_JOBS_PAGE).execute()).data or []
+        for row in rows:
+            key, day = (row.get("client_name"), row.get("site_name")), _as_date(row.get("date"))
+            if day and (key not in latest or day > latest[key]):
+                latest[key] = day
+        if len(rows) < SCHEDULE_JOBS_PAGE:
+            return latest
+        after_id = rows[-1]["id"]
+
+
+async def plan_recurring_jobs(request: models.RecurringScheduleRequest) -> models.RecurringSchedulePlan:
+    start = request.start or dt_date.today()
+    end = add_months(start, request.months)
+    snapshot = await reference_data.snapshot()
+
+    sites = snapshot.active_sites(request.client_name)
+    if request.brand_name:
+        sites = [site for site in sites if site.get("brand_name") == request.brand_name]
+    if request.site_ids:
+        wanted = set(request.site_ids)
+        sites = [site for site in sites if site["id"] in wanted]
+    scheduled = [site for site in sites if (site.get("frequency_number") or 0) > 0]
+
+    latest = await _latest_jobs(start, end) if scheduled else {}
+    jobs = []
+    for site in scheduled:
+        last_job = latest.get((site["client_name"], site["site_name"]))
+        anchor = max(filter(None, [_as_date(site.get("last_clean")), last_job]), default=None)
+        for due, overdue in due_dates(anchor, site["frequency_number"], start, end):
+            jobs.append(models.PlannedJob(
+                site_id=site["id"],
+                client_name=site["client_name"],
+                site_name=site["site_name"],
+                brand=site.get("brand_name"),
+                store_id_code=site.get("store_id_code"),
+                due_date=due,
+                date=working_day(due),
+                time=request.time,
+                overdue=overdue,
+                engineer_name=request.engineer_name,
+            ))
+    jobs.sort(key=lambda job: (job.date, job.client_name, job.site_name))
+
+    conflicts = []
+    if request.engineer_name and jobs:
+        _stagger(jobs, request.time)
+        conflicts = await check_schedule([
+            models.DraftBooking(ref=f"{job.site_id}:{job.date}", date=job.date, time=job.time, engineers=[request.engineer_name])
+            for job in jobs
+        ])
+
+    return models.RecurringSchedulePlan(
+        start=start,
+        end=end,
+        jobs=jobs,
+        sites_considered=len(sites),
+        sites_without_frequency=len(sites) - len(scheduled),
+        conflicts=conflicts,
+    )
+
+
+def _chunks(rows: List[dict], size: int):
+    for position in range(0, len(rows), size):
+        yield rows[position:position + size]
+
+
+async def create_recurring_jobs(plan: models.RecurringSchedulePlan, priority: str = "Medium") -> models.RecurringSchedulePlan:
+    """Insert every planned job; fills in plan.jobs[*].job_number and plan.created."""
+    if not plan.jobs:
+        return plan
+    snapshot = await reference_data.snapshot()
+    numbers = await job_number_allocator.reserve_block(len(plan.jobs))
+
+    job_rows, team_rows = [], []
+    for job, job_number in zip(plan.jobs, numbers):
+        job.job_number = job_number
+        client = snapshot.clients_by_name.get(job.client_name) or {}
+        site = snapshot.sites_by_id.get(job.site_id) or {}
+        job_rows.append({
+            "job_number": job_number,
+            "date": job.date.isoformat(),
+            "time": job.time.strftime("%H:%M:%S"),
+            "priority": priority,
+            "job_type": "Extraction",
+            "client_name": job.client_name,
+            "engineer_contact_name": job.engineer_name,
+            "brand": job.brand,
+            "site_name": job.site_name,
+            "company": client.get("company") or job.client_name,
+            "address": site.get("address") or client.get("address"),
+            "status": "Scheduled",
+        })
+        if job.engineer_name:
+            team_rows.append({"job_number": job_number, "engineer_contact_name": job.engineer_name, "engineer_role": "Lead"})
+
+    for batch in _chunks(job_rows, SCHEDULE_INSERT_BATCH):
+        await db.table("jobs").insert(batch).execute()
+        plan.created += len(batch)
+    dashboard_snapshot.invalidate("jobs")
+
+    try:
+        for batch in _chunks(team_rows, SCHEDULE_INSERT_BATCH):
+            await db.table("job_engineers").insert(batch).execute()
+    except Exception as exc:
+        print(f"Warning: job_engineers sync unavailable; generated jobs remain assigned to lead only: {exc}")
+    engineer_auth.invalidate(job_numbers=numbers)
+    return plan
@@ -0,0 +1,157 @@
+"""
+In-process cache of CRM reference data.
+
+Clients, sites, brands, engineers, sub-contractors and site contacts are small
+tables that the job-allocation dropdowns read on every change. They are loaded
+once into an immutable, versioned ReferenceSnapshot with indexes by client
+name, brand and store ID code. The CRM write endpoints call invalidate() with
+the table they changed, so only that table is re-read on the next lookup; a
+REFERENCE_DATA_TTL refresh covers writes made outside this process.
+
+Snapshot rows are shared between requests and must not be mutated.
+"""
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional
+
+from .db import db
+
+REFERENCE_DATA_TTL = float(os.getenv("REFERENCE_DATA_TTL", "300"))
+# Rows per request; PostgREST silently truncates a response at its max-rows setting.
+REFERENCE_DATA_PAGE = max(int(os.getenv("REFERENCE_DATA_PAGE", "1000")), 1)
+REFERENCE_TABLES = ("clients", "client_sites", "brands", "engineers", "sub_contractors", "site_contacts")
+# Primary key each table is paged by.
+REFERENCE_KEYS = {"clients": "client_name", "engineers": "contact_name", "site_contacts": "contact_name"}
+# Tables that may be missing on older databases.
+OPTIONAL_TABLES = {"sub_contractors"}
+
+
+def _by(rows: List[dict], *columns: str) -> List[dict]:
+    # Matches PostgREST's default ordering: ascending, NULLs last.
+    return sorted(rows, key=lambda row: [(row.get(c) is None, row.get(c) or "") for c in columns])
+
+
+def _active(rows: List[dict]) -> List[dict]:
+    return [row for row in rows if row.get("archived") is False]
+
+
+def _group(rows: List[dict], column: str) -> Dict[str, List[dict]]:
+    groups: Dict[str, List[dict]] = {}
+    for row in rows:
+        if row.get(column) is not None:
+            groups.setdefault(row[column], []).append(row)
+    return groups
+
+
+class ReferenceSnapshot:
+    def __init__(self, version: int, rows: Dict[str, List[dict]]):
+        self.version = version
+        self.brands = rows["brands"]
+        self.clients = _by(rows["clients"], "client_name")
+        self.sites = _by(rows["client_sites"], "site_name")
+        self.engineers = _by(rows["engineers"], "contact_name")
+        self.site_contacts = _by(rows["site_contacts"], "contact_name")
+        self.sub_contractors = _by(rows["sub_contractors"], "client_name", "sub_contractor_name")
+
+        self.clients_by_name = {row["client_name"]: row for row in self.clients}
+        self.sites_by_id = {row["id"]: row for row in self.sites}
+        self.sites_by_client = _group(self.sites, "client_name")
+        self.sites_by_brand = _group(self.sites, "brand_name")
+        self.sites_by_store_id_code = _group(self.sites, "store_id_code")
+        self.sub_contractors_by_client = _group(self.sub_contractors, "client_name")
+
+    def active_sites(self, client_name: Optional[str] = None, order_by_store_id: bool = False) -> List[dict]:
+        sites = _active(self.sites_by_client.get(client_name, []) if client_name else self.sites)
+        return _by(sites, "store_id_code", "site_name") if order_by_store_id else sites
+
+    def brands_for_client(self, client_name: str) -> List[str]:
+        return sorted({
+            (site.get("brand_name") or "").strip()
+            for site in self.active_sites(client_name)
+            if (site.get("brand_name") or "").strip()
+        })
+
+    def clients_for_brand(self, brand_name: str) -> List[dict]:
+        names = {site["client_name"] for site in self.sites_by_brand.get(brand_name, [])}
+        return [client for client in self.clients if client["client_name"] in names]
+
+    def active_clients(self) -> List[dict]:
+        return _active(self.clients)
+
+    def active_sub_contractors(self, client_name: Optional[str] = None) -> List[dict]:
+        rows = self.sub_contractors_by_client.get(client_name, []) if client_name else self.sub_contractors
+        return _active(rows)
+
+
+class ReferenceDataCache:
+    def __init__(self, ttl: float = REFERENCE_DATA_TTL):
+        self.ttl = ttl
+        # table -> (loaded_at, rows)
+        self._tables: Dict[str, tuple] = {}
+        # Bumped by invalidate() so a load that raced a write is not kept.
+        self._generations: Dict[str, int] = {table: 0 for table in REFERENCE_TABLES}
+        self._snapshot: Optional[ReferenceSnapshot] = None
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _stale_tables(self) -> List[str]:
+        now = time.monotonic()
+        return [
+            table for table in REFERENCE_TABLES
+            if table not in self._tables or now - self._tables[table][0] > self.ttl
+        ]
+
+    async def _load(self, table: str) -> List[dict]:
+        key = REFERENCE_KEYS.get(table, "id")
+        rows, after = [], None
+        try:
+            while True:
+                query = db.table(table).select("*")
+                if after is not None:
+                    query = query.gt(key, after)
+                page = (await query.order(key).limit(REFERENCE_DATA_PAGE).execute()).data or []
+                rows.extend(page)
+                if len(page) < REFERENCE_DATA_PAGE:
+                    return rows
+                after = page[-1][key]
+        except Exception as exc:
+            if table not in OPTIONAL_TABLES:
+                raise
+            print(f"Warning: {table} reference data unavailable: {exc}")
+            return []
+
+    async def snapshot(self) -> ReferenceSnapshot:
+        stale = self._stale_tables()
+        if not stale and self._snapshot is not None:
+            self.hits += 1
+            return self._snapshot
+        self.misses += 1
+        generations = {table: self._generations[table] for table in stale}
+        loaded = await asyncio.gather(*(self._load(table) for table in stale))
+        now = time.monotonic()
+        rows = {table: entry[1] for table, entry in self._tables.items()}
+        for table, table_rows in zip(stale, loaded):
+            rows[table] = table_rows
+            if self._generations[table] == generations[table]:
+                self._tables[table] = (now, table_rows)
+        self.version += 1
+        snapshot = ReferenceSnapshot(self.version, rows)
+        if not self._stale_tables():
+            self._snapshot = snapshot
+        return snapshot
+
+    def invalidate(self, *tables: str):
+        """Forget the given tables (all of them when none are named)."""
+        for table in tables or REFERENCE_TABLES:
+            if table in self._generations:
+                self._generations[table] += 1
+                self._tables.pop(table, None)
+                self._snapshot = None
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "version": self.version}
+
+
+reference_data = ReferenceDataCache()
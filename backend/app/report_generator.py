@@ -1,8 +1,11 @@
 from fpdf import FPDF
 from datetime import datetime
-import base64
 import os
-import tempfile
+
+from .pdf_assets import pdf_assets
+
+PHOTO_W = 85
+PHOTO_H = 55
 
 class PNJReport(FPDF):
     def __init__(self, *args, **kwargs):
@@ -18,22 +21,18 @@ class PNJReport(FPDF):
 
     def header(self):
         if self.page_no() == 1:
-            if os.path.exists(self.logo_path):
-                self.image(self.logo_path, 10, 10, 60)
+            pdf_assets.place(self, self.logo_path, 10, 10, 60)
             self.set_xy(0, 12)
             self.set_font('helvetica', 'B', 28)
             self.set_text_color(2, 132, 199)
             self.cell(0, 15, 'CERTIFICATE', ln=True, align='R')
-            if os.path.exists(self.vhr_logo_path):
-                self.image(self.vhr_logo_path, 138, 28, 52)
+            pdf_assets.place(self, self.vhr_logo_path, 138, 28, 52)
             self.ln(34)
         else:
             self.set_fill_color(15, 23, 42)
             self.rect(0, 0, 210, 25, 'F')
-            if os.path.exists(self.logo_path):
-                self.image(self.logo_path, 10, 5, 25)
-            if os.path.exists(self.vhr_logo_path):
-                self.image(self.vhr_logo_path, 150, 4, 42)
+            pdf_assets.place(self, self.logo_path, 10, 5, 25)
+            pdf_assets.place(self, self.vhr_logo_path, 150, 4, 42)
             self.set_y(5)
             self.set_text_color(255, 255, 255)
             self.set_font('helvetica', 'B', 14)
@@ -44,10 +43,8 @@ class PNJReport(FPDF):
         self.set_y(-25)
         self.set_font('helvetica', 'I', 8)
         self.set_text_color(100, 116, 139)
-        if os.path.exists(self.fsb_logo):
-            self.image(self.fsb_logo, 10, self.get_y(), 15)
-        if os.path.exists(self.bics_logo):
-            self.image(self.bics_logo, 30, self.get_y(), 15)
+        pdf_assets.place(self, self.fsb_logo, 10, self.get_y(), 15)
+        pdf_assets.place(self, self.bics_logo, 30, self.get_y(), 15)
             
         self.set_x(0)
         self.cell(0, 10, f'Page {self.page_no()} | CONFIDENTIAL | PNJ Cleaners Limited', align='C')
@@ -55,20 +52,6 @@ class PNJReport(FPDF):
         self.cell(0, 10, 'Email: gary@pnjcleaning.co.uk | Office: +44 1283 791 953 | Mob: +44 758 512 7242', align='C')
 
 
-def _signature_image_path(signature_value):
-    if not signature_value or not str(signature_value).startswith("data:image/"):
-        return None
-    try:
-        header, encoded = str(signature_value).split(",", 1)
-        suffix = ".png" if "png" in header else ".jpg"
-        handle = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
-        handle.write(base64.b64decode(encoded))
-        handle.close()
-        return handle.name
-    except Exception:
-        return None
-
-
 def _draw_signatures(pdf, report):
     pdf.ln(8)
     pdf.set_font('helvetica', 'B', 11)
@@ -80,10 +63,8 @@ def _draw_signatures(pdf, report):
     pdf.rect(pdf.l_margin, pdf.get_y(), 95, 30)
     pdf.rect(pdf.l_margin + 95, pdf.get_y(), 95, 30)
 
-    client_sig_path = _signature_image_path(getattr(report, "client_signature", None))
-    if client_sig_path:
-        pdf.image(client_sig_path, pdf.l_margin + 4, pdf.get_y() + 3, 87, 22)
-    else:
+    client_sig_path = pdf_assets.signature_path(getattr(report, "client_signature", None))
+    if not pdf_assets.place(pdf, client_sig_path, pdf.l_margin + 4, pdf.get_y() + 3, 87, 22):
         pdf.set_xy(pdf.l_margin + 4, pdf.get_y() + 10)
         pdf.set_font('helvetica', '', 9)
         pdf.cell(87, 6, str(getattr(report, "client_signature", "") or "-"))
@@ -94,6 +75,8 @@ def _draw_signatures(pdf, report):
     pdf.set_y(y + 38)
 
 def generate_client_pdf(report, micron_readings, inspection_items, filter_items, photos, output_path):
+    # Download and shrink every photo up front so layout only touches local files.
+    thumbnails = pdf_assets.prefetch([photo.photo_path for photo in photos or []], PHOTO_W, PHOTO_H)
     pdf = PNJReport()
     pdf.set_auto_page_break(auto=True, margin=30)
     
@@ -185,8 +168,8 @@ def generate_client_pdf(report, micron_readings, inspection_items, filter_items,
             pdf.set_font('helvetica', 'B', 14)
             pdf.cell(0, 10, 'Photographic Evidence', ln=True)
             pdf.ln(5)
-            img_w = 85
-            img_h = 55
+            img_w = PHOTO_W
+            img_h = PHOTO_H
             start_x = pdf.l_margin + 5
             start_y = pdf.get_y()
             for i, photo in enumerate(photos):
@@ -198,9 +181,7 @@ def generate_client_pdf(report, micron_readings, inspection_items, filter_items,
                 row = page_idx // 2
                 x = start_x + (img_w + 10) * col
                 y = start_y + (img_h + 15) * row
-                if os.path.exists(photo.photo_path):
-                    pdf.image(photo.photo_path, x, y, img_w, img_h)
-                else:
+                if not pdf_assets.place(pdf, thumbnails.get(photo.photo_path), x, y, img_w, img_h):
                     pdf.rect(x, y, img_w, img_h)
                     pdf.set_xy(x, y + img_h/2)
                     pdf.cell(img_w, 10, '[Image Missing]', align='C')
@@ -371,8 +352,8 @@ def generate_client_pdf(report, micron_readings, inspection_items, filter_items,
         pdf.cell(0, 10, 'Photographic Evidence Archive', ln=True)
         pdf.ln(5)
         
-        img_w = 85
-        img_h = 55
+        img_w = PHOTO_W
+        img_h = PHOTO_H
         margin_x = 10
         margin_y = 15
         
@@ -391,9 +372,7 @@ def generate_client_pdf(report, micron_readings, inspection_items, filter_items,
             x = start_x + (img_w + margin_x) * col
             y = start_y + (img_h + margin_y) * row
             
-            if os.path.exists(photo.photo_path):
-                pdf.image(photo.photo_path, x, y, img_w, img_h)
-            else:
+            if not pdf_assets.place(pdf, thumbnails.get(photo.photo_path), x, y, img_w, img_h):
                 pdf.rect(x, y, img_w, img_h)
                 pdf.set_xy(x, y + img_h/2)
                 pdf.cell(img_w, 10, '[Image Missing]', align='C')
@@ -0,0 +1,103 @@
+"""
+Report aggregate loader.
+
+Loads an extraction report together with its micron readings, inspection
+items, filter items and photos in one embedded PostgREST select, and its job
+alongside it. Looking a report up by job number runs the report and job
+queries concurrently, so a page costs one round trip instead of six. If the
+live schema cache cannot embed the child tables, the child queries are run
+concurrently instead.
+"""
+import asyncio
+from typing import List, Optional
+
+from postgrest.exceptions import APIError
+
+from . import models
+from .db import db
+
+# aggregate field -> child table (each has report_id REFERENCES extraction_reports(id))
+REPORT_CHILD_TABLES = {
+    "micron_readings": "extraction_micron_readings",
+    "inspection_items": "extraction_inspection_items",
+    "filter_items": "extraction_filter_items",
+    "photos": "extraction_photos",
+}
+_CHILD_MODELS = {
+    "micron_readings": models.ExtractionMicronReading,
+    "inspection_items": models.ExtractionInspectionItem,
+    "filter_items": models.ExtractionFilterItem,
+    "photos": models.ExtractionPhoto,
+}
+EMBEDDED_REPORT_SELECT = "*, " + ", ".join(f"{field}:{table}(*)" for field, table in REPORT_CHILD_TABLES.items())
+
+
+def report_model(row: dict) -> models.ExtractionReport:
+    try:
+        return models.ExtractionReport(**row)
+    except Exception:
+        # Prevent template crashes on malformed legacy date/time values.
+        fallback = dict(row)
+        fallback["date"] = None
+        fallback["time"] = None
+        return models.ExtractionReport(**fallback)
+
+
+async def _fetch_reports(column: str, value) -> List[dict]:
+    try:
+        return (await db.table("extraction_reports").select(EMBEDDED_REPORT_SELECT).eq(column, value).execute()).data or []
+    except APIError as exc:
+        if exc.code != "PGRST200" and "relationship" not in str(exc):
+            raise
+        print(f"Warning: report child tables cannot be embedded; loading them separately: {exc}")
+    rows = (await db.table("extraction_reports").select("*").eq(column, value).execute()).data or []
+    if rows:
+        children = await asyncio.gather(*(
+            db.table(table).select("*").eq("report_id", rows[0]["id"]).execute()
+            for table in REPORT_CHILD_TABLES.values()
+        ))
+        for field, res in zip(REPORT_CHILD_TABLES, children):
+            rows[0][field] = res.data or []
+    return rows
+
+
+async def _fetch_job(job_number: Optional[str]) -> List[dict]:
+    if not job_number:
+        return []
+    return (await db.table("jobs").select("*").eq("job_number", job_number).execute()).data or []
+
+
+async def load_report_aggregate(
+    report_id: Optional[int] = None,
+    job_number: Optional[str] = None,
+    include_job: bool = True
+) -> Optional[models.ReportAggregate]:
+    """Load a report (by id or job number) with its child rows and, optionally, its job."""
+    if report_id is not None:
+        report_rows = await _fetch_reports("id", report_id)
+        job_rows = await _fetch_job(report_rows[0].get("job_number")) if include_job and report_rows else []
+    elif include_job:
+        report_rows, job_rows = await asyncio.gather(_fetch_reports("job_number", job_number), _fetch_job(job_number))
+    else:
+        report_rows, job_rows = await _fetch_reports("job_number", job_number), []
+    if not report_rows:
+        return None
+
+    row = dict(report_rows[0])
+    children = {}
+    for field, model in _CHILD_MODELS.items():
+        child_rows = sorted(row.pop(field, None) or [], key=lambda child: child.get("id") or 0)
+        children[field] = [model(**child) for child in child_rows]
+    return models.ReportAggregate(
+        report=report_model(row),
+        job=_job_model(job_rows[0]) if job_rows else None,
+        **children
+    )
+
+
+def _job_model(row: dict) -> models.Job:
+    try:
+        return models.Job(**row)
+    except Exception:
+        # Legacy job rows can miss required fields; callers only need the stored values.
+        return models.Job.model_construct(**row)
@@ -1,74 +1,77 @@
+import asyncio
 import json
 import os
 import html
-from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
 from typing import Optional
 from fastapi import APIRouter, Request, Depends, Form, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 
 from .. import models, security
-from ..supabase_client import supabase
+from ..db import db
 from ..dependencies import templates, login_required, role_required, get_user_by_email
+from ..pdf_cache import pdf_cache
+from ..dashboard_snapshot import dashboard_snapshot
+from ..reference_data import reference_data
+from ..user_cache import user_cache
+from ..notifications import report_recipients
+from ..offload import run_io
 
 router = APIRouter()
 
 @router.get("/admin/manage", response_class=HTMLResponse)
-def admin_manage(request: Request, user: models.User = Depends(role_required(["Admin", "Manager"]))):
+async def admin_manage(request: Request, user: models.User = Depends(role_required(["Admin", "Manager"]))):
     """Admin management panel for clients, sites, brands, engineers, and admins"""
-    def fetch_clients():
-        res = supabase.table("clients").select("*").execute()
+    async def fetch_clients():
+        res = await db.table("clients").select("*").execute()
         return [models.Client(**c) for c in (res.data or [])]
 
-    def fetch_sites():
-        res = supabase.table("client_sites").select("*").execute()
+    async def fetch_sites():
+        res = await db.table("client_sites").select("*").execute()
         return [models.ClientSite(**s) for s in (res.data or [])]
 
-    def fetch_brands():
-        res = supabase.table("brands").select("*").execute()
+    async def fetch_brands():
+        res = await db.table("brands").select("*").execute()
         return [models.Brand(**b) for b in (res.data or [])]
 
-    def fetch_engineers():
-        res = supabase.table("engineers").select("*").execute()
+    async def fetch_engineers():
+        res = await db.table("engineers").select("*").execute()
         return [models.Engineer(**e) for e in (res.data or [])]
 
-    def fetch_sub_contractors():
+    async def fetch_sub_contractors():
         try:
-            res = supabase.table("sub_contractors").select("*").order("client_name").order("sub_contractor_name").execute()
+            res = await db.table("sub_contractors").select("*").order("client_name").order("sub_contractor_name").execute()
             return [models.SubContractor(**s) for s in (res.data or [])]
         except Exception as exc:
             print(f"Warning: sub_contractors admin load failed: {exc}")
             return []
 
-    def fetch_admins():
-        res = supabase.table("users").select("*").execute()
+    async def fetch_admins():
+        res = await db.table("users").select("*").execute()
         return [models.User(**a) for a in (res.data or [])]
 
-    def fetch_settings():
+    async def fetch_settings():
         try:
-            res = supabase.table("system_settings").select("*").execute()
+            res = await db.table("system_settings").select("*").execute()
             return {s["key"]: s["value"] for s in (res.data or [])}
         except Exception as exc:
             print(f"Warning: system_settings admin load failed: {exc}")
             return {}
 
-    with ThreadPoolExecutor(max_workers=7) as executor:
-        futures = {
-            "clients": executor.submit(fetch_clients),
-            "sites": executor.submit(fetch_sites),
-            "brands": executor.submit(fetch_brands),
-            "engineers": executor.submit(fetch_engineers),
-            "sub_contractors": executor.submit(fetch_sub_contractors),
-            "admins": executor.submit(fetch_admins),
-            "settings": executor.submit(fetch_settings),
-        }
-        clients = futures["clients"].result()
-        sites = futures["sites"].result()
-        brands = futures["brands"].result()
-        engineers = futures["engineers"].result()
-        sub_contractors = futures["sub_contractors"].result()
-        admins = futures["admins"].result()
-        settings_dict = futures["settings"].result()
+    clients, sites, brands, engineers, sub_contractors, admins, settings_dict = await asyncio.gather(
+        fetch_clients(),
+        fetch_sites(),
+        fetch_brands(),
+        fetch_engineers(),
+        fetch_sub_contractors(),
+        fetch_admins(),
+        fetch_settings(),
+    )
     
+    site_counts = Counter(site.client_name for site in sites)
+    for client in clients:
+        client.site_count = site_counts.get(client.client_name, 0)
+
     try:
         report_notification_settings = json.loads(settings_dict.get("report_notification_recipients", "[]"))
     except json.JSONDecodeError:
@@ -99,11 +102,11 @@ def admin_manage(request: Request, user: models.User = Depends(role_required(["A
 async def update_settings(request: Request, user: models.User = Depends(role_required(["Admin"]))):
     form_data = await request.form()
     for key, value in form_data.items():
-        check_res = supabase.table("system_settings").select("*").eq("key", key).execute()
+        check_res = await db.table("system_settings").select("*").eq("key", key).execute()
         if check_res.data:
-            supabase.table("system_settings").update({"value": value}).eq("key", key).execute()
+            await db.table("system_settings").update({"value": value}).eq("key", key).execute()
         else:
-            supabase.table("system_settings").insert({"key": key, "value": value}).execute()
+            await db.table("system_settings").insert({"key": key, "value": value}).execute()
     return RedirectResponse(url="/admin/manage", status_code=303)
 
 
@@ -124,11 +127,12 @@ async def update_notification_settings(request: Request, user: models.User = Dep
         })
 
     payload = json.dumps(recipients)
-    check_res = supabase.table("system_settings").select("*").eq("key", "report_notification_recipients").execute()
+    check_res = await db.table("system_settings").select("*").eq("key", "report_notification_recipients").execute()
     if check_res.data:
-        supabase.table("system_settings").update({"value": payload}).eq("key", "report_notification_recipients").execute()
+        await db.table("system_settings").update({"value": payload}).eq("key", "report_notification_recipients").execute()
     else:
-        supabase.table("system_settings").insert({"key": "report_notification_recipients", "value": payload}).execute()
+        await db.table("system_settings").insert({"key": "report_notification_recipients", "value": payload}).execute()
+    report_recipients.invalidate()
 
     return RedirectResponse(url="/admin/manage?success=notifications_updated", status_code=303)
 
@@ -152,7 +156,8 @@ async def test_email_notification(
     try:
         from ..modules.extraction.router import _send_report_email
 
-        _send_report_email(
+        await run_io(
+            _send_report_email,
             to_email,
             "PNJ test report notification",
             (
@@ -194,12 +199,12 @@ async def add_user(
     if user.role != "Admin":
         raise HTTPException(status_code=403, detail="Access denied")
     normalized_email = (email or "").strip().lower()
-    existing = get_user_by_email(normalized_email)
+    existing = await get_user_by_email(normalized_email)
     if existing:
         return RedirectResponse(url="/admin/manage?error=email_exists", status_code=303)
     
-    hashed_password = security.get_password_hash(password)
-    supabase.table("users").insert({
+    hashed_password = await security.get_password_hash_async(password)
+    await db.table("users").insert({
         "username": username,
         "email": normalized_email,
         "password": hashed_password,
@@ -220,15 +225,33 @@ async def edit_user(
         raise HTTPException(status_code=403, detail="Access denied")
     update_data = {"username": username, "email": (email or "").strip().lower(), "role": role}
     if password:
-        update_data["password"] = security.get_password_hash(password)
-    supabase.table("users").update(update_data).eq("id", user_id).execute()
+        update_data["password"] = await security.get_password_hash_async(password)
+    res = await db.table("users").update(update_data).eq("id", user_id).execute()
+    user_cache.invalidate(user_id=user_id)
+    for row in res.data or []:
+        user_cache.invalidate(email=row.get("email"))
+    report_recipients.invalidate()
     return RedirectResponse(url="/admin/manage?success=user_updated", status_code=303)
 
 @router.delete("/admin/manage/users/{user_id}")
-def delete_user(user_id: int, user: models.User = Depends(login_required)):
+async def delete_user(user_id: int, user: models.User = Depends(login_required)):
     if user.role != "Admin":
         raise HTTPException(status_code=403, detail="Access denied")
     if user.id == user_id:
         return HTMLResponse(content="<div class='alert alert-warning'>Cannot delete yourself!</div>", status_code=400)
-    supabase.table("users").delete().eq("id", user_id).execute()
+    res = await db.table("users").delete().eq("id", user_id).execute()
+    user_cache.invalidate(user_id=user_id)
+    for row in res.data or []:
+        user_cache.invalidate(email=row.get("email"))
+    report_recipients.invalidate()
     return HTMLResponse(content="")
+
+@router.get("/api/admin/cache-stats")
+async def cache_stats(user: models.User = Depends(role_required(["Admin"]))):
+    """Hit/miss counters for the in-process caches."""
+    return JSONResponse({
+        "user_cache": user_cache.stats(),
+        "pdf_cache": {"hits": pdf_cache.hits, "misses": pdf_cache.misses},
+        "dashboard_snapshot": {"hits": dashboard_snapshot.hits, "misses": dashboard_snapshot.misses},
+        "reference_data": reference_data.stats(),
+    })
@@ -7,8 +7,10 @@ from fastapi import APIRouter, Request, Depends, Form, HTTPException, status
 from fastapi.responses import HTMLResponse, RedirectResponse
 
 from .. import models, security
-from ..supabase_client import supabase
+from ..db import db
+from ..offload import run_io
 from ..dependencies import templates, get_user_by_email, get_user_by_username, get_current_user
+from ..user_cache import user_cache
 
 router = APIRouter()
 
@@ -23,7 +25,7 @@ from workos import WorkOSClient
 wos = WorkOSClient(api_key=workos_api_key, client_id=workos_client_id)
 
 @router.get("/login", response_class=HTMLResponse)
-def login_page(request: Request, user: models.User = Depends(get_current_user)):
+async def login_page(request: Request, user: models.User = Depends(get_current_user)):
     if user:
         return RedirectResponse(url="/")
     last_login_email = request.cookies.get("last_login_email", "")
@@ -45,7 +47,7 @@ async def auth_workos(email: str = Form(...)):
         domain = email.split('@')[-1]
         print(f"DEBUG: SSO lookup for domain '{domain}'")
         
-        connections = wos.sso.list_connections(domain=domain)
+        connections = await run_io(wos.sso.list_connections, domain=domain)
         if not connections.data:
             print(f"DEBUG: No connection found for domain '{domain}'")
             response = RedirectResponse(url=f"/login?error=unknown_domain&domain={domain}", status_code=303)
@@ -95,7 +97,7 @@ async def auth_callback(request: Request, code: str):
     """Handle WorkOS callback and auto-provision users"""
     try:
         print(f"DEBUG: auth_callback received code: {code[:10]}...")
-        profile_and_token = wos.sso.get_profile_and_token(code)
+        profile_and_token = await run_io(wos.sso.get_profile_and_token, code)
         print(f"DEBUG: Profile exchange successful")
         
         profile = profile_and_token.profile
@@ -106,7 +108,7 @@ async def auth_callback(request: Request, code: str):
             print("ERROR: No email in WorkOS profile")
             return RedirectResponse(url="/login?error=no_email")
             
-        user = get_user_by_email(email)
+        user = await get_user_by_email(email)
         
         if not user:
             print(f"DEBUG: User {email} not found. Provisioning...")
@@ -118,22 +120,22 @@ async def auth_callback(request: Request, code: str):
                 username = email.split('@')[0]
                 
             random_pw = str(uuid.uuid4())
-            hashed_pw = security.get_password_hash(random_pw)
+            hashed_pw = await security.get_password_hash_async(random_pw)
             
             # Ensure username is unique
-            if get_user_by_username(username):
+            if await get_user_by_username(username):
                 print(f"DEBUG: Username {username} taken, using email {email} instead")
                 username = email
             
             print(f"DEBUG: Inserting user {email} as {username} into database")
-            supabase.table("users").insert({
+            await db.table("users").insert({
                 "username": username,
                 "email": email,
                 "password": hashed_pw,
                 "role": "Admin"
             }).execute()
             
-            user = get_user_by_email(email)
+            user = await get_user_by_email(email)
             
         if not user:
             print("ERROR: Provisioning failed")
@@ -164,17 +166,17 @@ async def login(
     identifier = (email or "").strip()
     normalized_email = identifier.lower()
     print(f"LOGIN_DEBUG: attempt identifier={identifier!r} normalized_email={normalized_email!r}")
-    user = get_user_by_email(normalized_email)
+    user = await get_user_by_email(normalized_email)
     print(f"LOGIN_DEBUG: email lookup found={bool(user)}")
     if not user:
-        user = get_user_by_username(identifier)
+        user = await get_user_by_username(identifier)
         print(f"LOGIN_DEBUG: username lookup found={bool(user)}")
     
     if not user:
         print(f"LOGIN_DEBUG: user not found for identifier={identifier!r}")
         return HTMLResponse(content="<div class='alert alert-error'>User not found</div>", status_code=200)
         
-    if not security.verify_password(password, user.password):
+    if not await security.verify_password_async(password, user.password):
         print(f"LOGIN_DEBUG: password mismatch for user_id={user.id} email={user.email!r}")
         return HTMLResponse(content="<div class='alert alert-error'>Invalid password</div>", status_code=200)
     
@@ -186,12 +188,12 @@ async def login(
     return response
 
 @router.get("/forgot-password", response_class=HTMLResponse)
-def forgot_password_page(request: Request):
+async def forgot_password_page(request: Request):
     return templates.TemplateResponse("forgot_password.html", {"request": request})
 
 @router.post("/forgot-password")
 async def handle_forgot_password(request: Request, email: str = Form(...)):
-    user = get_user_by_email((email or "").strip().lower())
+    user = await get_user_by_email((email or "").strip().lower())
     if not user:
         return templates.TemplateResponse("forgot_password.html", {
             "request": request, 
@@ -201,7 +203,7 @@ async def handle_forgot_password(request: Request, email: str = Form(...)):
     token = str(uuid.uuid4())
     expires = datetime.utcnow() + timedelta(hours=1)
     
-    supabase.table("users").update({
+    await db.table("users").update({
         "reset_token": token,
         "reset_expires": expires.isoformat()
     }).eq("id", user.id).execute()
@@ -215,8 +217,8 @@ async def handle_forgot_password(request: Request, email: str = Form(...)):
     })
 
 @router.get("/reset-password/{token}", response_class=HTMLResponse)
-def reset_password_page(request: Request, token: str):
-    res = supabase.table("users").select("*").eq("reset_token", token).execute()
+async def reset_password_page(request: Request, token: str):
+    res = await db.table("users").select("*").eq("reset_token", token).execute()
     if not res.data:
         return templates.TemplateResponse("placeholder.html", {
             "request": request, "title": "Invalid Token", "message": "The reset link is invalid or has expired."
@@ -233,7 +235,7 @@ def reset_password_page(request: Request, token: str):
 
 @router.post("/reset-password/{token}")
 async def handle_reset_password(request: Request, token: str, password: str = Form(...)):
-    res = supabase.table("users").select("*").eq("reset_token", token).execute()
+    res = await db.table("users").select("*").eq("reset_token", token).execute()
     if not res.data:
         raise HTTPException(status_code=400, detail="Invalid token")
     
@@ -242,17 +244,18 @@ async def handle_reset_password(request: Request, token: str, password: str = Fo
     if datetime.utcnow() > expires:
         raise HTTPException(status_code=400, detail="Expired token")
     
-    hashed_password = security.get_password_hash(password)
-    supabase.table("users").update({
+    hashed_password = await security.get_password_hash_async(password)
+    await db.table("users").update({
         "password": hashed_password,
         "reset_token": None,
         "reset_expires": None
     }).eq("id", user_data['id']).execute()
+    user_cache.invalidate(user_id=user_data['id'])
     
     return RedirectResponse(url="/login?message=password_updated", status_code=303)
 
 @router.get("/logout")
-def logout():
+async def logout():
     response = RedirectResponse(url="/login")
     response.delete_cookie("access_token")
     return response
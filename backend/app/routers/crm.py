@@ -1,22 +1,42 @@
+import asyncio
+import json
+import os
 import secrets
+import shutil
+import tempfile
 import html
-from typing import Optional
-from fastapi import APIRouter, Request, Depends, Form, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from collections import Counter
+from typing import List, Optional
+import anyio
+from fastapi import APIRouter, Request, Depends, File, Form, HTTPException, UploadFile
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, StreamingResponse
 from postgrest.exceptions import APIError
 
 from .. import models
-from ..supabase_client import supabase
-from ..dependencies import templates, login_required
+from ..db import db
+from ..dependencies import templates, login_required, role_required
+from ..dashboard_snapshot import dashboard_snapshot
+from ..engineer_auth import engineer_auth
+from ..offload import run_io
+from ..reference_data import reference_data
+from ..site_import import SITE_IMPORT_CHUNK_SIZE, SiteImporter, read_rows
 
 router = APIRouter()
 
 
-def _schema_safe_insert(table_name: str, payload):
+def _crm_changed(table_name: str):
+    """Drop cached views built from a CRM table after it is written."""
+    dashboard_snapshot.invalidate(table_name)
+    reference_data.invalidate(table_name)
+
+
+async def _schema_safe_insert(table_name: str, payload):
     working_payload = payload
     while True:
         try:
-            return supabase.table(table_name).insert(working_payload).execute()
+            res = await db.table(table_name).insert(working_payload).execute()
+            _crm_changed(table_name)
+            return res
         except APIError as exc:
             message = str(exc)
             marker = "Could not find the '"
@@ -34,11 +54,13 @@ def _schema_safe_insert(table_name: str, payload):
             print(f"Warning: {table_name}.{missing_column} missing from schema cache; retrying insert without it")
 
 
-def _schema_safe_update(table_name: str, payload: dict, match_column: str, match_value):
+async def _schema_safe_update(table_name: str, payload: dict, match_column: str, match_value):
     working_payload = dict(payload)
     while True:
         try:
-            return supabase.table(table_name).update(working_payload).eq(match_column, match_value).execute()
+            res = await db.table(table_name).update(working_payload).eq(match_column, match_value).execute()
+            _crm_changed(table_name)
+            return res
         except APIError as exc:
             message = str(exc)
             marker = "Could not find the '"
@@ -64,16 +86,13 @@ def _subcontractor_option_label(subcontractor: models.SubContractor) -> str:
     return f"{subcontractor.sub_contractor_name} ({company})"
 
 @router.get("/admin/sites-lookup", response_class=HTMLResponse)
-def get_sites_for_client(
+async def get_sites_for_client(
     client_name: Optional[str] = None, 
     brand_name: Optional[str] = None,
     user: models.User = Depends(login_required)
 ):
-    query = supabase.table("client_sites").select("*").eq("archived", False)
-    if client_name:
-        query = query.eq("client_name", client_name)
-    res = query.order("site_name").execute()
-    sites = [models.ClientSite(**s) for s in res.data]
+    snapshot = await reference_data.snapshot()
+    sites = [models.ClientSite(**s) for s in snapshot.active_sites(client_name)]
     options = "".join([
         f'<option value="{s.id}" data-brand="{html.escape(s.brand_name or "", quote=True)}">{html.escape(_site_option_label(s), quote=True)}</option>'
         for s in sites
@@ -82,16 +101,13 @@ def get_sites_for_client(
 
 
 @router.get("/admin/sites-lookup-by-id", response_class=HTMLResponse)
-def get_sites_for_client_by_id(
+async def get_sites_for_client_by_id(
     client_name: Optional[str] = None,
     brand_name: Optional[str] = None,
     user: models.User = Depends(login_required)
 ):
-    query = supabase.table("client_sites").select("*").eq("archived", False)
-    if client_name:
-        query = query.eq("client_name", client_name)
-    res = query.order("store_id_code").order("site_name").execute()
-    sites = [models.ClientSite(**s) for s in res.data]
+    snapshot = await reference_data.snapshot()
+    sites = [models.ClientSite(**s) for s in snapshot.active_sites(client_name, order_by_store_id=True)]
     options = "".join([
         f'<option value="{s.id}" data-brand="{html.escape(s.brand_name or "", quote=True)}">{html.escape(_site_id_option_label(s), quote=True)}</option>'
         for s in sites
@@ -100,25 +116,14 @@ def get_sites_for_client_by_id(
 
 
 @router.get("/admin/client-brand-lookup")
-def get_brand_for_client(
+async def get_brand_for_client(
     client_name: Optional[str] = None,
     user: models.User = Depends(login_required)
 ):
     if not client_name:
         return JSONResponse(content={"brand": "", "label": ""})
 
-    res = (
-        supabase.table("client_sites")
-        .select("brand_name")
-        .eq("client_name", client_name)
-        .eq("archived", False)
-        .execute()
-    )
-    brands = sorted({
-        (site.get("brand_name") or "").strip()
-        for site in (res.data or [])
-        if (site.get("brand_name") or "").strip()
-    })
+    brands = (await reference_data.snapshot()).brands_for_client(client_name)
 
     if len(brands) == 1:
         return JSONResponse(content={"brand": brands[0], "label": brands[0]})
@@ -128,86 +133,112 @@ def get_brand_for_client(
 
 
 @router.get("/admin/clients-lookup", response_class=HTMLResponse)
-def get_clients_lookup(
+async def get_clients_lookup(
     brand_name: Optional[str] = None,
     user: models.User = Depends(login_required)
 ):
+    snapshot = await reference_data.snapshot()
     if brand_name:
-        sites = supabase.table("client_sites").select("client_name").eq("brand_name", brand_name).execute().data
-        client_names = list(set([s['client_name'] for s in sites]))
-        if not client_names:
+        rows = snapshot.clients_for_brand(brand_name)
+        if not rows:
             return HTMLResponse(content='<option value="">All Companies (None found)</option>')
-        res = supabase.table("clients").select("*").in_("client_name", client_names).order("client_name").execute()
     else:
-        res = supabase.table("clients").select("*").order("client_name").execute()
-    clients = [models.Client(**c) for c in res.data]
+        rows = snapshot.clients
+    clients = [models.Client(**c) for c in rows]
     options = "".join([f'<option value="{html.escape(c.client_name, quote=True)}">{html.escape(c.client_name)}</option>' for c in clients])
     return HTMLResponse(content=f'<option value="">All Companies</option>{options}')
 
 
 @router.get("/admin/subcontractors-lookup", response_class=HTMLResponse)
-def get_subcontractors_lookup(
+async def get_subcontractors_lookup(
     client_name: Optional[str] = None,
     user: models.User = Depends(login_required)
 ):
-    try:
-        query = supabase.table("sub_contractors").select("*").eq("archived", False)
-        if client_name:
-            query = query.eq("client_name", client_name)
-        res = query.order("sub_contractor_name").execute()
-        sub_contractors = [models.SubContractor(**s) for s in res.data] if res.data else []
-    except Exception:
-        sub_contractors = []
+    rows = (await reference_data.snapshot()).active_sub_contractors(client_name)
+    sub_contractors = [models.SubContractor(**s) for s in sorted(rows, key=lambda s: s["sub_contractor_name"])]
     options = "".join([f'<option value="{s.id}">{html.escape(_subcontractor_option_label(s))}</option>' for s in sub_contractors])
     return HTMLResponse(content=f'<option value="">No sub-contractor / direct client billing</option>{options}')
 
+async def _clients_with_site_counts(query) -> List[models.Client]:
+    """Run a clients query with each client's site count embedded in the same request."""
+    try:
+        rows = (await query("*, site_count:client_sites(count)").order("client_name").execute()).data or []
+    except APIError as exc:
+        if exc.code != "PGRST200" and "relationship" not in str(exc):
+            raise
+        print(f"Warning: client_sites cannot be embedded in clients; counting sites separately: {exc}")
+        rows = (await query("*").order("client_name").execute()).data or []
+        names = [row["client_name"] for row in rows]
+        site_rows = (await db.table("client_sites").select("client_name").in_("client_name", names).execute()).data if names else []
+        counts = Counter(site["client_name"] for site in site_rows or [])
+        for row in rows:
+            row["site_count"] = [{"count": counts.get(row["client_name"], 0)}]
+    clients = []
+    for row in rows:
+        counts = row.pop("site_count", None) or [{}]
+        clients.append(models.Client(**row, site_count=counts[0].get("count", 0)))
+    return clients
+
+
 @router.get("/admin/manage/clients-table", response_class=HTMLResponse)
-def get_clients_table(
+async def get_clients_table(
     request: Request,
     client_name: Optional[str] = None,
     brand_name: Optional[str] = None,
     site_id: Optional[str] = None,
     user: models.User = Depends(login_required)
 ):
-    target_client_names = None
+    target_client_name = None
     if site_id and site_id.isdigit():
-        site_res = supabase.table("client_sites").select("client_name").eq("id", int(site_id)).execute()
-        if site_res.data:
-            target_client_names = [site_res.data[0]['client_name']]
-    query = supabase.table("clients").select("*")
-    if client_name:
-        query = query.eq("client_name", client_name)
-    if target_client_names is not None:
-        query = query.in_("client_name", target_client_names)
-        
-    res = query.order("client_name").execute()
-    clients = [models.Client(**c) for c in res.data]
-    all_sites = supabase.table("client_sites").select("*").execute().data
-    sites_objs = [models.ClientSite(**s) for s in all_sites]
+        site = (await reference_data.snapshot()).sites_by_id.get(int(site_id))
+        if site:
+            target_client_name = site["client_name"]
+
+    def query(columns: str):
+        q = db.table("clients").select(columns)
+        if client_name:
+            q = q.eq("client_name", client_name)
+        if target_client_name is not None:
+            q = q.eq("client_name", target_client_name)
+        return q
 
     return templates.TemplateResponse("partials/clients_table_rows.html", {
         "request": request,
-        "clients": clients,
-        "sites": sites_objs
+        "clients": await _clients_with_site_counts(query)
     })
 
+
+@router.get("/admin/manage/clients/{client_name}/sites", response_class=HTMLResponse)
+async def get_client_sites(client_name: str, user: models.User = Depends(login_required)):
+    """A client's stores, loaded when its row in the clients table is expanded."""
+    sites = [models.ClientSite(**s) for s in (await reference_data.snapshot()).sites_by_client.get(client_name, [])]
+    if not sites:
+        return HTMLResponse(content='<div class="text-[10px] text-slate-400 italic">No stores linked.</div>')
+    items = "".join(
+        f'<li class="{"text-slate-300 line-through" if s.archived else "text-slate-600"}">'
+        f'{html.escape(s.site_name)}'
+        f'<span class="text-slate-400 font-mono ml-1">{html.escape(s.store_id_code or "")}</span></li>'
+        for s in sites
+    )
+    return HTMLResponse(content=f'<ul class="text-[10px] space-y-0.5 max-h-48 overflow-y-auto">{items}</ul>')
+
 @router.get("/admin/manage/sites-table", response_class=HTMLResponse)
-def get_sites_table(
+async def get_sites_table(
     request: Request,
     client_name: Optional[str] = None, 
     brand_name: Optional[str] = None,
     show_archived: bool = False,
     user: models.User = Depends(login_required)
 ):
-    query = supabase.table("client_sites").select("*")
+    query = db.table("client_sites").select("*")
     if client_name:
         query = query.eq("client_name", client_name)
     if not show_archived:
         query = query.eq("archived", False)
         
-    res = query.order("site_name").execute()
+    res = await query.order("site_name").execute()
     sites = [models.ClientSite(**s) for s in res.data]
-    brands_res = supabase.table("brands").select("*").execute()
+    brands_res = await db.table("brands").select("*").execute()
     brands = [models.Brand(**b) for b in brands_res.data]
     
     return templates.TemplateResponse("partials/sites_table_rows.html", {
@@ -217,23 +248,27 @@ def get_sites_table(
     })
 
 @router.post("/admin/manage/clients/{client_name}/archive")
-def archive_client(client_name: str, user: models.User = Depends(login_required)):
-    supabase.table("clients").update({"archived": True}).eq("client_name", client_name).execute()
+async def archive_client(client_name: str, user: models.User = Depends(login_required)):
+    await db.table("clients").update({"archived": True}).eq("client_name", client_name).execute()
+    _crm_changed("clients")
     return HTMLResponse(content="", headers={"HX-Trigger": "refreshClients"})
 
 @router.post("/admin/manage/clients/{client_name}/restore")
-def restore_client(client_name: str, user: models.User = Depends(login_required)):
-    supabase.table("clients").update({"archived": False}).eq("client_name", client_name).execute()
+async def restore_client(client_name: str, user: models.User = Depends(login_required)):
+    await db.table("clients").update({"archived": False}).eq("client_name", client_name).execute()
+    _crm_changed("clients")
     return HTMLResponse(content="", headers={"HX-Trigger": "refreshClients"})
 
 @router.post("/admin/manage/sites/{site_id}/archive")
-def archive_site(site_id: int, user: models.User = Depends(login_required)):
-    supabase.table("client_sites").update({"archived": True}).eq("id", site_id).execute()
+async def archive_site(site_id: int, user: models.User = Depends(login_required)):
+    await db.table("client_sites").update({"archived": True}).eq("id", site_id).execute()
+    _crm_changed("client_sites")
     return HTMLResponse(content="", headers={"HX-Trigger": "refreshSites"})
 
 @router.post("/admin/manage/sites/{site_id}/restore")
-def restore_site(site_id: int, user: models.User = Depends(login_required)):
-    supabase.table("client_sites").update({"archived": False}).eq("id", site_id).execute()
+async def restore_site(site_id: int, user: models.User = Depends(login_required)):
+    await db.table("client_sites").update({"archived": False}).eq("id", site_id).execute()
+    _crm_changed("client_sites")
     return HTMLResponse(content="", headers={"HX-Trigger": "refreshSites"})
 
 @router.post("/admin/manage/sites/bulk-archive")
@@ -242,13 +277,14 @@ async def bulk_archive_sites(request: Request, user: models.User = Depends(login
     site_ids = form.getlist("site_ids")
     if site_ids:
         ids = [int(i) for i in site_ids]
-        supabase.table("client_sites").update({"archived": True}).in_("id", ids).execute()
+        await db.table("client_sites").update({"archived": True}).in_("id", ids).execute()
+        _crm_changed("client_sites")
     return HTMLResponse(content="", headers={"HX-Trigger": "refreshSites"})
 
 @router.post("/admin/manage/clients/add")
-def add_client(client_name: str = Form(...), company: str = Form(None), address: str = Form(None), user: models.User = Depends(login_required)):
+async def add_client(client_name: str = Form(...), company: str = Form(None), address: str = Form(None), user: models.User = Depends(login_required)):
     portal_token = secrets.token_urlsafe(32)
-    _schema_safe_insert("clients", {
+    await _schema_safe_insert("clients", {
         "client_name": client_name,
         "company": company,
         "address": address,
@@ -257,8 +293,8 @@ def add_client(client_name: str = Form(...), company: str = Form(None), address:
     return RedirectResponse(url="/admin/manage", status_code=303)
 
 @router.post("/admin/manage/clients/edit/{client_name}")
-def edit_client(client_name: str, company: str = Form(None), address: str = Form(None), user: models.User = Depends(login_required)):
-    _schema_safe_update("clients", {
+async def edit_client(client_name: str, company: str = Form(None), address: str = Form(None), user: models.User = Depends(login_required)):
+    await _schema_safe_update("clients", {
         "company": company,
         "address": address
     }, "client_name", client_name)
@@ -266,7 +302,7 @@ def edit_client(client_name: str, company: str = Form(None), address: str = Form
 
 
 @router.post("/admin/manage/subcontractors/add")
-def add_subcontractor(
+async def add_subcontractor(
     client_name: str = Form(...),
     sub_contractor_name: str = Form(...),
     company: str = Form(None),
@@ -276,7 +312,7 @@ def add_subcontractor(
     phone: str = Form(None),
     user: models.User = Depends(login_required)
 ):
-    _schema_safe_insert("sub_contractors", {
+    await _schema_safe_insert("sub_contractors", {
         "client_name": client_name,
         "sub_contractor_name": sub_contractor_name,
         "company": company,
@@ -289,7 +325,7 @@ def add_subcontractor(
 
 
 @router.post("/admin/manage/subcontractors/edit/{subcontractor_id}")
-def edit_subcontractor(
+async def edit_subcontractor(
     subcontractor_id: int,
     sub_contractor_name: str = Form(...),
     company: str = Form(None),
@@ -299,7 +335,7 @@ def edit_subcontractor(
     phone: str = Form(None),
     user: models.User = Depends(login_required)
 ):
-    _schema_safe_update("sub_contractors", {
+    await _schema_safe_update("sub_contractors", {
         "sub_contractor_name": sub_contractor_name,
         "company": company,
         "address": address,
@@ -311,18 +347,20 @@ def edit_subcontractor(
 
 
 @router.post("/admin/manage/subcontractors/{subcontractor_id}/archive")
-def archive_subcontractor(subcontractor_id: int, user: models.User = Depends(login_required)):
-    supabase.table("sub_contractors").update({"archived": True}).eq("id", subcontractor_id).execute()
+async def archive_subcontractor(subcontractor_id: int, user: models.User = Depends(login_required)):
+    await db.table("sub_contractors").update({"archived": True}).eq("id", subcontractor_id).execute()
+    _crm_changed("sub_contractors")
     return RedirectResponse(url="/admin/manage", status_code=303)
 
 
 @router.post("/admin/manage/subcontractors/{subcontractor_id}/restore")
-def restore_subcontractor(subcontractor_id: int, user: models.User = Depends(login_required)):
-    supabase.table("sub_contractors").update({"archived": False}).eq("id", subcontractor_id).execute()
+async def restore_subcontractor(subcontractor_id: int, user: models.User = Depends(login_required)):
+    await db.table("sub_contractors").update({"archived": False}).eq("id", subcontractor_id).execute()
+    _crm_changed("sub_contractors")
     return RedirectResponse(url="/admin/manage", status_code=303)
 
 @router.post("/admin/manage/sites/add")
-def add_site(
+async def add_site(
     client_name: str = Form(...),
     site_name: str = Form(...),
     address: str = Form(...),
@@ -334,7 +372,7 @@ def add_site(
     brand_name: str = Form(None),
     user: models.User = Depends(login_required)
 ):
-    _schema_safe_insert("client_sites", {
+    await _schema_safe_insert("client_sites", {
         "client_name": client_name,
         "site_name": site_name,
         "address": address,
@@ -348,7 +386,7 @@ def add_site(
     return RedirectResponse(url="/admin/manage", status_code=303)
 
 @router.post("/admin/manage/sites/edit/{site_id}")
-def edit_site(
+async def edit_site(
     site_id: int,
     site_name: str = Form(...),
     address: str = Form(...),
@@ -360,7 +398,7 @@ def edit_site(
     brand_name: str = Form(None),
     user: models.User = Depends(login_required)
 ):
-    _schema_safe_update("client_sites", {
+    await _schema_safe_update("client_sites", {
         "site_name": site_name,
         "address": address,
         "postcode": postcode if postcode else None,
@@ -373,40 +411,101 @@ def edit_site(
     return RedirectResponse(url="/admin/manage", status_code=303)
 
 @router.post("/admin/manage/brands/add")
-def add_brand(brand_name: str = Form(...), user: models.User = Depends(login_required)):
-    supabase.table("brands").insert({"brand_name": brand_name}).execute()
+async def add_brand(brand_name: str = Form(...), user: models.User = Depends(login_required)):
+    await db.table("brands").insert({"brand_name": brand_name}).execute()
+    _crm_changed("brands")
     return RedirectResponse(url="/admin/manage", status_code=303)
 
 @router.post("/admin/manage/brands/edit/{brand_id}")
-def edit_brand(brand_id: int, brand_name: str = Form(...), user: models.User = Depends(login_required)):
-    supabase.table("brands").update({"brand_name": brand_name}).eq("id", brand_id).execute()
+async def edit_brand(brand_id: int, brand_name: str = Form(...), user: models.User = Depends(login_required)):
+    await db.table("brands").update({"brand_name": brand_name}).eq("id", brand_id).execute()
+    _crm_changed("brands")
     return RedirectResponse(url="/admin/manage", status_code=303)
 
 @router.delete("/admin/manage/brands/{brand_id}")
-def delete_brand(brand_id: int, user: models.User = Depends(login_required)):
-    supabase.table("brands").delete().eq("id", brand_id).execute()
+async def delete_brand(brand_id: int, user: models.User = Depends(login_required)):
+    await db.table("brands").delete().eq("id", brand_id).execute()
+    _crm_changed("brands")
     return HTMLResponse(content="")
 
 @router.post("/admin/manage/engineers/add")
-def add_engineer(contact_name: str = Form(...), email: str = Form(None), phone: str = Form(None), address: str = Form(None), user: models.User = Depends(login_required)):
-    supabase.table("engineers").insert({
+async def add_engineer(contact_name: str = Form(...), email: str = Form(None), phone: str = Form(None), address: str = Form(None), user: models.User = Depends(login_required)):
+    await db.table("engineers").insert({
         "contact_name": contact_name,
         "email": email,
         "phone": phone,
         "address": address
     }).execute()
+    _crm_changed("engineers")
     return RedirectResponse(url="/admin/manage", status_code=303)
 
 @router.post("/admin/manage/engineers/edit/{contact_name}")
-def edit_engineer(contact_name: str, email: str = Form(None), phone: str = Form(None), address: str = Form(None), user: models.User = Depends(login_required)):
-    supabase.table("engineers").update({
+async def edit_engineer(contact_name: str, email: str = Form(None), phone: str = Form(None), address: str = Form(None), user: models.User = Depends(login_required)):
+    await db.table("engineers").update({
         "email": email,
         "phone": phone,
         "address": address
     }).eq("contact_name", contact_name).execute()
+    _crm_changed("engineers")
+    engineer_auth.invalidate(engineer_name=contact_name)
     return RedirectResponse(url="/admin/manage", status_code=303)
 
 @router.delete("/admin/manage/engineers/{contact_name}")
-def delete_engineer(contact_name: str, user: models.User = Depends(login_required)):
-    supabase.table("engineers").delete().eq("contact_name", contact_name).execute()
+async def delete_engineer(contact_name: str, user: models.User = Depends(login_required)):
+    await db.table("engineers").delete().eq("contact_name", contact_name).execute()
+    _crm_changed("engineers")
+    engineer_auth.invalidate(engineer_name=contact_name)
     return HTMLResponse(content="")
+
+
+def _spool_upload(upload: UploadFile) -> str:
+    suffix = os.path.splitext(upload.filename or "")[1].lower() or ".csv"
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    with os.fdopen(fd, "wb") as target:
+        upload.file.seek(0)
+        shutil.copyfileobj(upload.file, target, 1024 * 1024)
+    return path
+
+
+async def _site_import_progress(path: str, importer: SiteImporter):
+    """NDJSON: one line of running totals per chunk, then the final totals (or an error)."""
+    updates = asyncio.Queue()
+    importer.progress = lambda stats: updates.put_nowait(stats.model_dump_json())
+    try:
+        with open(path, "rb") as source:
+            task = asyncio.create_task(importer.run(read_rows(source, path)))
+            task.add_done_callback(lambda _: updates.put_nowait(None))
+            try:
+                while (line := await updates.get()) is not None:
+                    yield line + "\n"
+                try:
+                    stats = await task
+                    yield json.dumps({**stats.model_dump(mode="json"), "done": True}) + "\n"
+                except Exception as exc:
+                    print(f"Warning: site import failed: {exc}")
+                    yield json.dumps({"done": True, "error": str(exc)}) + "\n"
+            finally:
+                # The client may have gone away mid-import: stop the import before
+                # its spool file is closed and removed. Shielded because the
+                # response's cancel scope would otherwise cancel this wait too.
+                task.cancel()
+                with anyio.CancelScope(shield=True):
+                    await asyncio.gather(task, return_exceptions=True)
+    finally:
+        os.remove(path)
+
+
+@router.post("/api/admin/import/sites")
+async def import_sites(
+    file: UploadFile = File(...),
+    client_name: Optional[str] = Form(None),
+    chunk_size: int = Form(SITE_IMPORT_CHUNK_SIZE),
+    dry_run: bool = Form(False),
+    user: models.User = Depends(role_required(["Admin"]))
+):
+    """Stream-import a store / frequency spreadsheet, reporting progress as NDJSON."""
+    if not (file.filename or "").lower().endswith((".csv", ".xlsx", ".xlsm")):
+        raise HTTPException(status_code=400, detail="Upload a .csv or .xlsx file")
+    path = await run_io(_spool_upload, file)
+    importer = SiteImporter(default_client=client_name, chunk_size=chunk_size, dry_run=dry_run)
+    return StreamingResponse(_site_import_progress(path, importer), media_type="application/x-ndjson")
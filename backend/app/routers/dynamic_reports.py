@@ -5,7 +5,7 @@ from fastapi import APIRouter, Request, Depends, HTTPException
 from fastapi.responses import HTMLResponse
 
 from .. import models
-from ..supabase_client import supabase
+from ..db import db
 from ..dependencies import templates, login_required
 
 router = APIRouter()
@@ -19,7 +19,7 @@ def get_schema(module_name: str):
         return json.load(f)
 
 @router.get("/dynamic-report/{module_name}", response_class=HTMLResponse)
-def render_dynamic_report(module_name: str, request: Request, user: models.User = Depends(login_required)):
+async def render_dynamic_report(module_name: str, request: Request, user: models.User = Depends(login_required)):
     schema = get_schema(module_name)
     if not schema:
         raise HTTPException(status_code=404, detail=f"Schema for module {module_name} not found")
@@ -62,7 +62,7 @@ async def submit_dynamic_report(module_name: str, request: Request, user: models
         }
         # Note: This table needs to be created in Supabase
         # For now, we simulate the save and return success
-        # supabase.table("universal_submissions").insert(payload).execute()
+        # await db.table("universal_submissions").insert(payload).execute()
         
         return HTMLResponse(content=f"<div class='alert alert-success'>Successfully submitted {schema.get('title')}!</div>")
     except Exception as e:
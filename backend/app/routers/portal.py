@@ -1,11 +1,10 @@
-import os
-import tempfile
 from fastapi import APIRouter, Request, Depends, HTTPException
 from fastapi.responses import HTMLResponse, FileResponse
-from ..report_generator import generate_client_pdf
 
 from .. import models
-from ..supabase_client import supabase
+from ..db import db
+from ..pdf_cache import pdf_cache
+from ..report_loader import load_report_aggregate
 from ..dependencies import templates, login_required
 
 router = APIRouter()
@@ -15,10 +14,10 @@ def _client_report_template(report: models.ExtractionReport) -> str:
     return "report_view_callout_portal.html" if report.job_type == "Breakdown/Callout" else "report_view_portal.html"
 
 
-def _get_client_jobs_with_reports(client_name: str):
+async def _get_client_jobs_with_reports(client_name: str):
     """Return archived jobs for a client that have a matching report row."""
-    jobs_res = (
-        supabase.table("jobs")
+    jobs_res = await (
+        db.table("jobs")
         .select("*")
         .eq("client_name", client_name)
         .eq("status", "Archived")
@@ -30,8 +29,8 @@ def _get_client_jobs_with_reports(client_name: str):
         return []
 
     job_numbers = [job.job_number for job in jobs if job.job_number]
-    reports_res = (
-        supabase.table("extraction_reports")
+    reports_res = await (
+        db.table("extraction_reports")
         .select("job_number")
         .in_("job_number", job_numbers)
         .execute()
@@ -44,13 +43,13 @@ def _get_client_jobs_with_reports(client_name: str):
     return [job for job in jobs if job.job_number in available_report_numbers]
 
 @router.get("/client-portal/{token}", response_class=HTMLResponse)
-def client_portal(token: str, request: Request):
+async def client_portal(token: str, request: Request):
     """Public client portal - no login required"""
-    client_res = supabase.table("clients").select("*").eq("portal_token", token).execute()
+    client_res = await db.table("clients").select("*").eq("portal_token", token).execute()
     if not client_res.data:
         raise HTTPException(status_code=404, detail="Portal not found")
     client = models.Client(**client_res.data[0])
-    jobs = _get_client_jobs_with_reports(client.client_name)
+    jobs = await _get_client_jobs_with_reports(client.client_name)
     breakdown_count = sum(1 for job in jobs if job.job_type == 'Breakdown/Callout')
     return templates.TemplateResponse("client_portal.html", {
         "request": request,
@@ -61,9 +60,9 @@ def client_portal(token: str, request: Request):
     })
 
 @router.get("/admin/portal-preview", response_class=HTMLResponse)
-def admin_portal_preview(request: Request, user: models.User = Depends(login_required)):
+async def admin_portal_preview(request: Request, user: models.User = Depends(login_required)):
     """Admin page to preview client portals"""
-    clients_res = supabase.table("clients").select("*").order("client_name").execute()
+    clients_res = await db.table("clients").select("*").order("client_name").execute()
     clients = [models.Client(**c) for c in clients_res.data] if clients_res.data else []
     return templates.TemplateResponse("admin_portal_preview.html", {
         "request": request,
@@ -73,13 +72,13 @@ def admin_portal_preview(request: Request, user: models.User = Depends(login_req
     })
 
 @router.get("/admin/portal-preview/{client_name}", response_class=HTMLResponse)
-def admin_portal_preview_client(client_name: str, request: Request, user: models.User = Depends(login_required)):
+async def admin_portal_preview_client(client_name: str, request: Request, user: models.User = Depends(login_required)):
     """Admin preview of specific client portal"""
-    client_res = supabase.table("clients").select("*").eq("client_name", client_name).execute()
+    client_res = await db.table("clients").select("*").eq("client_name", client_name).execute()
     if not client_res.data:
         raise HTTPException(status_code=404, detail="Client not found")
     client = models.Client(**client_res.data[0])
-    jobs = _get_client_jobs_with_reports(client.client_name)
+    jobs = await _get_client_jobs_with_reports(client.client_name)
     breakdown_count = sum(1 for job in jobs if job.job_type == 'Breakdown/Callout')
     return templates.TemplateResponse("client_portal.html", {
         "request": request,
@@ -91,46 +90,51 @@ def admin_portal_preview_client(client_name: str, request: Request, user: models
     })
 
 
+async def _get_client_report(client_column: str, client_value: str, job_number: str, client_missing: str):
+    """
+    Resolve the client, check the job is theirs, then load the report aggregate.
+    Ownership is checked before the report is looked up, so another client's
+    job numbers get the same 403 whether or not they have a report.
+    """
+    client_res = await db.table("clients").select("*").eq(client_column, client_value).execute()
+    if not client_res.data:
+        raise HTTPException(status_code=404, detail=client_missing)
+    client = models.Client(**client_res.data[0])
+    job_res = await db.table("jobs").select("client_name").eq("job_number", job_number).execute()
+    if not job_res.data or job_res.data[0].get("client_name") != client.client_name:
+        raise HTTPException(status_code=403, detail="Access denied")
+    aggregate = await load_report_aggregate(job_number=job_number, include_job=False)
+    if not aggregate:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return client, aggregate
+
+
+async def _report_pdf_response(aggregate: models.ReportAggregate, job_number: str):
+    report = aggregate.report
+    safe_jn = job_number.replace('/', '_').replace('\\', '_')
+    pdf_path = await pdf_cache.get_or_render(
+        report, aggregate.micron_readings, aggregate.inspection_items, aggregate.filter_items, aggregate.photos
+    )
+    return FileResponse(pdf_path, filename=f"PNJ_Report_{safe_jn}.pdf", media_type="application/pdf")
+
+
 @router.get("/admin/portal-preview/{client_name}/report/{job_number:path}", response_class=HTMLResponse)
-def admin_portal_preview_report(
+async def admin_portal_preview_report(
     client_name: str,
     job_number: str,
     request: Request,
     user: models.User = Depends(login_required)
 ):
     """Admin-only preview of a client report without requiring a portal token."""
-    client_res = supabase.table("clients").select("*").eq("client_name", client_name).execute()
-    if not client_res.data:
-        raise HTTPException(status_code=404, detail="Client not found")
-    client = models.Client(**client_res.data[0])
-
-    report_res = supabase.table("extraction_reports").select("*").eq("job_number", job_number).execute()
-    if not report_res.data:
-        raise HTTPException(status_code=404, detail="Report not found")
-    try:
-        report = models.ExtractionReport(**report_res.data[0])
-    except Exception:
-        fallback = dict(report_res.data[0])
-        fallback["date"] = None
-        fallback["time"] = None
-        report = models.ExtractionReport(**fallback)
-
-    job_res = supabase.table("jobs").select("*").eq("job_number", job_number).execute()
-    if not job_res.data or job_res.data[0]['client_name'] != client.client_name:
-        raise HTTPException(status_code=403, detail="Access denied")
-
-    micron_readings = [models.ExtractionMicronReading(**m) for m in supabase.table("extraction_micron_readings").select("*").eq("report_id", report.id).execute().data]
-    inspection_items = [models.ExtractionInspectionItem(**i) for i in supabase.table("extraction_inspection_items").select("*").eq("report_id", report.id).execute().data]
-    filter_items = [models.ExtractionFilterItem(**f) for f in supabase.table("extraction_filter_items").select("*").eq("report_id", report.id).execute().data]
-    photos = [models.ExtractionPhoto(**p) for p in supabase.table("extraction_photos").select("*").eq("report_id", report.id).execute().data]
+    client, aggregate = await _get_client_report("client_name", client_name, job_number, "Client not found")
 
-    return templates.TemplateResponse(_client_report_template(report), {
+    return templates.TemplateResponse(_client_report_template(aggregate.report), {
         "request": request,
-        "report": report,
-        "micron_readings": micron_readings,
-        "inspection_items": inspection_items,
-        "filter_items": filter_items,
-        "photos": photos,
+        "report": aggregate.report,
+        "micron_readings": aggregate.micron_readings,
+        "inspection_items": aggregate.inspection_items,
+        "filter_items": aggregate.filter_items,
+        "photos": aggregate.photos,
         "client": client,
         "token": client.portal_token,
         "is_admin_preview": True,
@@ -139,116 +143,34 @@ def admin_portal_preview_report(
 
 
 @router.get("/admin/portal-preview/{client_name}/pdf/{job_number:path}")
-def admin_portal_preview_pdf(
+async def admin_portal_preview_pdf(
     client_name: str,
     job_number: str,
     user: models.User = Depends(login_required)
 ):
     """Admin-only PDF preview without requiring a portal token."""
-    client_res = supabase.table("clients").select("*").eq("client_name", client_name).execute()
-    if not client_res.data:
-        raise HTTPException(status_code=404, detail="Client not found")
-    client = models.Client(**client_res.data[0])
-
-    job_res = supabase.table("jobs").select("*").eq("job_number", job_number).execute()
-    if not job_res.data or job_res.data[0]['client_name'] != client.client_name:
-        raise HTTPException(status_code=403, detail="Access denied")
-
-    report_res = supabase.table("extraction_reports").select("*").eq("job_number", job_number).execute()
-    if not report_res.data:
-        raise HTTPException(status_code=404, detail="Report not found")
-    try:
-        report = models.ExtractionReport(**report_res.data[0])
-    except Exception:
-        fallback = dict(report_res.data[0])
-        fallback["date"] = None
-        fallback["time"] = None
-        report = models.ExtractionReport(**fallback)
-
-    micron_readings = [models.ExtractionMicronReading(**m) for m in supabase.table("extraction_micron_readings").select("*").eq("report_id", report.id).execute().data]
-    inspection_items = [models.ExtractionInspectionItem(**i) for i in supabase.table("extraction_inspection_items").select("*").eq("report_id", report.id).execute().data]
-    filter_items = [models.ExtractionFilterItem(**f) for f in supabase.table("extraction_filter_items").select("*").eq("report_id", report.id).execute().data]
-    photos = [models.ExtractionPhoto(**p) for p in supabase.table("extraction_photos").select("*").eq("report_id", report.id).execute().data]
-
-    tmp_dir = tempfile.gettempdir()
-    safe_jn = job_number.replace('/', '_').replace('\\', '_')
-    pdf_path = os.path.join(tmp_dir, f"PNJ_Report_{safe_jn}.pdf")
-    generate_client_pdf(report, micron_readings, inspection_items, filter_items, photos, pdf_path)
-
-    return FileResponse(pdf_path, filename=f"PNJ_Report_{safe_jn}.pdf", media_type="application/pdf")
+    client, aggregate = await _get_client_report("client_name", client_name, job_number, "Client not found")
+    return await _report_pdf_response(aggregate, job_number)
 
 @router.get("/client-portal/{token}/report/{job_number:path}", response_class=HTMLResponse)
-def portal_view_report(token: str, job_number: str, request: Request):
+async def portal_view_report(token: str, job_number: str, request: Request):
     """View report in client portal"""
-    client_res = supabase.table("clients").select("*").eq("portal_token", token).execute()
-    if not client_res.data:
-        raise HTTPException(status_code=404, detail="Portal not found")
-    client = models.Client(**client_res.data[0])
-    
-    report_res = supabase.table("extraction_reports").select("*").eq("job_number", job_number).execute()
-    if not report_res.data:
-        raise HTTPException(status_code=404, detail="Report not found")
-    try:
-        report = models.ExtractionReport(**report_res.data[0])
-    except Exception:
-        fallback = dict(report_res.data[0])
-        # Prevent template crashes on malformed legacy values.
-        fallback["date"] = None
-        fallback["time"] = None
-        report = models.ExtractionReport(**fallback)
-    
-    job_res = supabase.table("jobs").select("*").eq("job_number", job_number).execute()
-    if not job_res.data or job_res.data[0]['client_name'] != client.client_name:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    micron_readings = [models.ExtractionMicronReading(**m) for m in supabase.table("extraction_micron_readings").select("*").eq("report_id", report.id).execute().data]
-    inspection_items = [models.ExtractionInspectionItem(**i) for i in supabase.table("extraction_inspection_items").select("*").eq("report_id", report.id).execute().data]
-    filter_items = [models.ExtractionFilterItem(**f) for f in supabase.table("extraction_filter_items").select("*").eq("report_id", report.id).execute().data]
-    photos = [models.ExtractionPhoto(**p) for p in supabase.table("extraction_photos").select("*").eq("report_id", report.id).execute().data]
+    client, aggregate = await _get_client_report("portal_token", token, job_number, "Portal not found")
     
-    return templates.TemplateResponse(_client_report_template(report), {
+    return templates.TemplateResponse(_client_report_template(aggregate.report), {
         "request": request,
-        "report": report,
-        "micron_readings": micron_readings,
-        "inspection_items": inspection_items,
-        "filter_items": filter_items,
-        "photos": photos,
+        "report": aggregate.report,
+        "micron_readings": aggregate.micron_readings,
+        "inspection_items": aggregate.inspection_items,
+        "filter_items": aggregate.filter_items,
+        "photos": aggregate.photos,
         "client": client,
         "token": token,
         "is_admin_preview": False
     })
 
 @router.get("/client-portal/{token}/pdf/{job_number:path}")
-def portal_download_pdf(token: str, job_number: str):
+async def portal_download_pdf(token: str, job_number: str):
     """Download PDF report from client portal"""
-    client_res = supabase.table("clients").select("*").eq("portal_token", token).execute()
-    if not client_res.data:
-        raise HTTPException(status_code=404, detail="Portal not found")
-    client = models.Client(**client_res.data[0])
-    job_res = supabase.table("jobs").select("*").eq("job_number", job_number).execute()
-    if not job_res.data or job_res.data[0]['client_name'] != client.client_name:
-        raise HTTPException(status_code=403, detail="Access denied")
-        
-    report_res = supabase.table("extraction_reports").select("*").eq("job_number", job_number).execute()
-    if not report_res.data:
-        raise HTTPException(status_code=404, detail="Report not found")
-    try:
-        report = models.ExtractionReport(**report_res.data[0])
-    except Exception:
-        fallback = dict(report_res.data[0])
-        # Prevent template crashes on malformed legacy values.
-        fallback["date"] = None
-        fallback["time"] = None
-        report = models.ExtractionReport(**fallback)
-        
-    micron_readings = [models.ExtractionMicronReading(**m) for m in supabase.table("extraction_micron_readings").select("*").eq("report_id", report.id).execute().data]
-    inspection_items = [models.ExtractionInspectionItem(**i) for i in supabase.table("extraction_inspection_items").select("*").eq("report_id", report.id).execute().data]
-    filter_items = [models.ExtractionFilterItem(**f) for f in supabase.table("extraction_filter_items").select("*").eq("report_id", report.id).execute().data]
-    photos = [models.ExtractionPhoto(**p) for p in supabase.table("extraction_photos").select("*").eq("report_id", report.id).execute().data]
-    
-    tmp_dir = tempfile.gettempdir()
-    safe_jn = job_number.replace('/', '_').replace('\\', '_')
-    pdf_path = os.path.join(tmp_dir, f"PNJ_Report_{safe_jn}.pdf")
-    generate_client_pdf(report, micron_readings, inspection_items, filter_items, photos, pdf_path)
-    
-    return FileResponse(pdf_path, filename=f"PNJ_Report_{safe_jn}.pdf", media_type="application/pdf")
+    client, aggregate = await _get_client_report("portal_token", token, job_number, "Portal not found")
+    return await _report_pdf_response(aggregate, job_number)
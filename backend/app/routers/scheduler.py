@@ -1,101 +1,184 @@
-from datetime import datetime
-import re
+from datetime import datetime, date as dt_date, timedelta
+import asyncio
+import base64
 import json
 import html
+import os
 from typing import List, Optional
+from urllib.parse import urlencode
 from fastapi import APIRouter, Request, Depends, Form, HTTPException, status
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse
 from postgrest.exceptions import APIError
 
 from .. import models
-from ..supabase_client import supabase
+from ..db import db
+from ..job_numbers import job_number_allocator
+from ..dashboard_snapshot import dashboard_snapshot
+from ..engineer_auth import engineer_auth
+from ..portal_sync import PORTAL_SYNC_POLL_SECONDS, portal_sync
+from ..query_stats import query_budget
+from ..archive_search import search_archived_jobs
+from ..assignments import apply_engineer_team, fetch_assignments
+from ..conflicts import busy_between, check_schedule, job_window
+from ..recurring_schedule import SCHEDULE_MAX_MONTHS, create_recurring_jobs, plan_recurring_jobs
+from ..reference_data import reference_data
 from ..dependencies import templates, login_required, role_required
-from ..utils import generate_whatsapp_link, generate_whatsapp_app_link, get_report_link
+from ..utils import generate_whatsapp_link, generate_whatsapp_app_link, get_report_link, json_response_with_etag
 
 router = APIRouter()
 
 
 def _job_engineers_select():
-    return supabase.table("job_engineers").select("*")
+    return db.table("job_engineers").select("*")
 
 
-def _get_job_engineer_rows(job_numbers: List[str]):
+# Only the job columns the calendars render (plus the fields models.Job requires).
+CALENDAR_JOB_COLUMNS = "id,job_number,date,time,priority,status,job_type,client_name,site_name,address,engineer_contact_name"
+
+
+def _parse_calendar_window(start: Optional[str], end: Optional[str]):
+    """Reduce FullCalendar's ISO start/end parameters to YYYY-MM-DD bounds (end exclusive)."""
+    bounds = []
+    for value in (start, end):
+        try:
+            bounds.append(datetime.strptime(value.strip()[:10], "%Y-%m-%d").date().isoformat() if value else None)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid calendar date: {value}")
+    return bounds[0], bounds[1]
+
+
+async def _get_job_engineer_rows(job_numbers: List[str]):
     if not job_numbers:
         return []
     try:
-        return _job_engineers_select().in_("job_number", job_numbers).execute().data or []
+        return (await _job_engineers_select().in_("job_number", job_numbers).execute()).data or []
     except Exception as exc:
         print(f"Warning: job_engineers lookup unavailable; falling back to lead engineer only: {exc}")
         return []
 
 
-def _attach_engineer_team(jobs: List[models.Job]) -> List[models.Job]:
-    rows = _get_job_engineer_rows([job.job_number for job in jobs])
-    team_by_job = {}
-    role_by_job_engineer = {}
-    for row in rows:
-        job_number = row.get("job_number")
-        engineer_name = row.get("engineer_contact_name")
-        if not job_number or not engineer_name:
-            continue
-        team_by_job.setdefault(job_number, []).append(engineer_name)
-        role_by_job_engineer[(job_number, engineer_name)] = row.get("engineer_role") or "Contributing"
+async def _attach_engineer_team(jobs: List[models.Job]) -> List[models.Job]:
+    return apply_engineer_team(jobs, await _get_job_engineer_rows([job.job_number for job in jobs]))
 
-    for job in jobs:
-        team = team_by_job.get(job.job_number) or []
-        if job.engineer_contact_name and job.engineer_contact_name not in team:
-            team.insert(0, job.engineer_contact_name)
-        team.sort(key=lambda engineer_name: (
-            0 if engineer_name == job.engineer_contact_name else
-            2 if role_by_job_engineer.get((job.job_number, engineer_name)) == "Supervisor" else
-            1
-        ))
-        job.engineer_team = team
-        job.contributing_engineer_names = [
-            engineer_name for engineer_name in team
-            if role_by_job_engineer.get((job.job_number, engineer_name)) == "Contributing"
-        ]
-        job.supervisor_name = next(
-            (
-                engineer_name for engineer_name in team
-                if role_by_job_engineer.get((job.job_number, engineer_name)) == "Supervisor"
-            ),
-            None
-        )
-        if job.engineer_contact_name:
-            job.engineer_role = role_by_job_engineer.get((job.job_number, job.engineer_contact_name), "Lead")
-    return jobs
-
-
-def _get_jobs_for_engineer(engineer_name: str, date: Optional[str] = None) -> List[models.Job]:
-    jobs_by_number = {}
 
-    query = supabase.table("jobs").select("*").eq("engineer_contact_name", engineer_name)
+def _filter_job_window(query, date: Optional[str] = None, start_date: Optional[str] = None, end_date: Optional[str] = None):
     if date:
         query = query.eq("date", date)
-    lead_res = query.order("time" if date else "date").execute()
-    for row in lead_res.data or []:
-        jobs_by_number[row.get("job_number")] = row
+    if start_date:
+        query = query.gte("date", start_date)
+    if end_date:
+        query = query.lt("date", end_date)
+    return query
+
+
+JOB_PAGE_SIZE = int(os.getenv("JOB_PAGE_SIZE", "50"))
+# Default diary window: this many days either side of today.
+JOB_WINDOW_DAYS = int(os.getenv("JOB_WINDOW_DAYS", "30"))
+JOB_LIST_STATUSES = ["Scheduled", "In Progress", "Submitted", "Completed"]
+JOB_LIST_TYPES = ["Extraction", "Breakdown/Callout"]
+
 
+def _encode_job_cursor(job: models.Job) -> str:
+    key = [job.date.isoformat(), job.time.isoformat(), job.id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+
+def _decode_job_cursor(cursor: str):
+    try:
+        date_value, time_value, job_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return dt_date.fromisoformat(date_value).isoformat(), datetime.strptime(time_value, "%H:%M:%S").time().isoformat(), int(job_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid page cursor")
+
+
+def _job_list_window(start: Optional[str], end: Optional[str]):
+    """Resolve the inclusive start/end date filters (default: JOB_WINDOW_DAYS around today) to an end-exclusive window."""
+    start_date, end_date = _parse_calendar_window(start, end)
+    today = dt_date.today()
+    start_date = start_date or (today - timedelta(days=JOB_WINDOW_DAYS)).isoformat()
+    end_date = end_date or (today + timedelta(days=JOB_WINDOW_DAYS)).isoformat()
+    return start_date, (dt_date.fromisoformat(end_date) + timedelta(days=1)).isoformat()
+
+
+async def _assigned_job_numbers(engineer_name: str) -> List[str]:
     try:
-        assignment_res = supabase.table("job_engineers").select("job_number,engineer_role").eq("engineer_contact_name", engineer_name).execute()
-        assigned_numbers = [row["job_number"] for row in (assignment_res.data or []) if row.get("job_number")]
-        if assigned_numbers:
-            assigned_query = supabase.table("jobs").select("*").in_("job_number", assigned_numbers)
-            if date:
-                assigned_query = assigned_query.eq("date", date)
-            assigned_res = assigned_query.order("time" if date else "date").execute()
-            for row in assigned_res.data or []:
-                jobs_by_number[row.get("job_number")] = row
+        res = await db.table("job_engineers").select("job_number").eq("engineer_contact_name", engineer_name).execute()
+        return sorted({row["job_number"] for row in (res.data or []) if row.get("job_number")})
     except Exception as exc:
-        print(f"Warning: job_engineers lookup unavailable for engineer portal: {exc}")
+        print(f"Warning: job_engineers lookup unavailable; filtering by lead engineer only: {exc}")
+        return []
+
+
+def _job_type_filter(query, job_type: str):
+    # Call-outs saved while jobs.job_type was missing are only marked in the notes.
+    marker = f'"{models.CALL_OUT_MARKER}*"'
+    if job_type == "Breakdown/Callout":
+        return query.or_(f"job_type.eq.Breakdown/Callout,notes.like.{marker}")
+    return query.or_("job_type.is.null,job_type.eq.Extraction").or_(f"notes.is.null,notes.not.like.{marker}")
+
+
+async def _get_job_page(
+    start_date: str,
+    end_date: str,
+    status: str = "",
+    engineer_name: str = "",
+    job_type: str = "",
+    cursor: Optional[str] = None,
+    limit: int = JOB_PAGE_SIZE
+):
+    """One page of unfinished jobs ordered by (date, time, id), plus the cursor for the next page."""
+    assigned_numbers = await _assigned_job_numbers(engineer_name) if engineer_name else []
+
+    def build(with_job_type: bool):
+        query = db.table("jobs").select("*").gte("date", start_date).lt("date", end_date)
+        query = query.eq("status", status) if status else query.neq("status", "Archived")
+        if engineer_name:
+            engineer_filter = f'engineer_contact_name.eq."{engineer_name}"'
+            if assigned_numbers:
+                numbers = ",".join(f'"{number}"' for number in assigned_numbers)
+                engineer_filter += f",job_number.in.({numbers})"
+            query = query.or_(engineer_filter)
+        if job_type and with_job_type:
+            query = _job_type_filter(query, job_type)
+        if cursor:
+            after_date, after_time, after_id = _decode_job_cursor(cursor)
+            query = query.or_(
+                f"date.gt.{after_date},"
+                f"and(date.eq.{after_date},time.gt.{after_time}),"
+                f"and(date.eq.{after_date},time.eq.{after_time},id.gt.{after_id})"
+            )
+        return query.order("date").order("time").order("id").limit(limit + 1)
+
+    try:
+        rows = (await build(True).execute()).data or []
+    except APIError as exc:
+        if not job_type or "job_type" not in str(exc):
+            raise
+        print("Warning: jobs.job_type missing from schema cache; filtering job type after the query")
+        rows = (await build(False).execute()).data or []
+    has_more = len(rows) > limit
+    jobs = [models.Job(**row) for row in rows[:limit]]
+    next_cursor = _encode_job_cursor(jobs[-1]) if has_more and jobs else None
+    if job_type:
+        jobs = [job for job in jobs if (job.job_type or "Extraction") == job_type]
+    return await _attach_engineer_team(jobs), next_cursor
+
+
+async def _count_unfinished_jobs() -> int:
+    return (await db.table("jobs").select("*", count="exact", head=True).neq("status", "Archived").execute()).count or 0
 
-    jobs = [models.Job(**row) for row in jobs_by_number.values() if row]
-    jobs.sort(key=lambda job: (job.date, job.time))
-    return _attach_engineer_team(jobs)
 
+async def _get_jobs_for_engineer(
+    engineer_name: str,
+    date: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    columns: str = "*"
+) -> List[models.Job]:
+    return await fetch_assignments(engineer_name, date=date, start_date=start_date, end_date=end_date, columns=columns)
 
-def _sync_job_engineers(
+
+async def _sync_job_engineers(
     job_number: str,
     lead_engineer: str,
     contributing_engineers: List[str],
@@ -123,15 +206,18 @@ def _sync_job_engineers(
         return True
 
     try:
-        supabase.table("job_engineers").delete().eq("job_number", job_number).execute()
-        supabase.table("job_engineers").insert(assignments).execute()
+        await db.table("job_engineers").delete().eq("job_number", job_number).execute()
+        await db.table("job_engineers").insert(assignments).execute()
         return True
     except Exception as exc:
         print(f"Warning: job_engineers sync unavailable; job remains assigned to lead only: {exc}")
         return False
+    finally:
+        # The lead (jobs.engineer_contact_name) may have changed even if the team could not be saved.
+        engineer_auth.invalidate(job_number=job_number)
 
 
-def _get_engineers_by_name(names: List[str]):
+async def _get_engineers_by_name(names: List[str]):
     cleaned_names = []
     seen = set()
     for name in names:
@@ -141,7 +227,7 @@ def _get_engineers_by_name(names: List[str]):
             cleaned_names.append(cleaned_name)
     if not cleaned_names:
         return []
-    res = supabase.table("engineers").select("*").in_("contact_name", cleaned_names).execute()
+    res = await db.table("engineers").select("*").in_("contact_name", cleaned_names).execute()
     engineers = [models.Engineer(**row) for row in (res.data or [])]
     by_name = {engineer.contact_name: engineer for engineer in engineers}
     return [by_name[name] for name in cleaned_names if name in by_name]
@@ -172,38 +258,40 @@ def _normalise_assignment_names(
     return lead_engineer, contributors, supervisor_name, [name for name in assigned_names if name]
 
 
-def _get_slot_conflicts(date: str, time: str, engineer_names: List[str], exclude_job_number: Optional[str] = None):
+async def _get_slot_conflicts(
+    date: str,
+    time: str,
+    engineer_names: List[str],
+    exclude_job_number: Optional[str] = None,
+    duration_minutes: Optional[int] = None
+):
+    """Jobs and approved leave that overlap the slot for any of the engineers, grouped per job."""
     engineer_names = [name for name in dict.fromkeys([name for name in engineer_names if name])]
     if not date or not time or not engineer_names:
         return []
 
-    jobs_res = (
-        supabase.table("jobs")
-        .select("*")
-        .eq("date", date)
-        .eq("time", time)
-        .neq("status", "Archived")
-        .execute()
-    )
-    jobs = [models.Job(**row) for row in (jobs_res.data or []) if row.get("job_number") != exclude_job_number]
-    jobs = _attach_engineer_team(jobs)
-
-    conflicts = []
-    wanted = set(engineer_names)
-    for job in jobs:
-        assigned = set(job.engineer_team or ([job.engineer_contact_name] if job.engineer_contact_name else []))
-        overlapping = sorted(wanted.intersection(assigned))
-        if overlapping:
-            conflicts.append({
-                "job_number": job.job_number,
-                "client_name": job.client_name,
-                "engineers": overlapping
+    starts_at, ends_at = job_window(date, time, duration_minutes)
+    busy = await busy_between(engineer_names, starts_at, ends_at, exclude_job_number=exclude_job_number)
+
+    conflicts = {}
+    for name in engineer_names:
+        for booking in busy.get(name, []):
+            key = (booking.kind, booking.job_number or name)
+            conflict = conflicts.setdefault(key, {
+                "job_number": booking.job_number,
+                "client_name": booking.client_name,
+                "engineers": [],
+                "leave_reason": booking.reason if booking.kind == "leave" else None,
             })
-    return conflicts
+            if name not in conflict["engineers"]:
+                conflict["engineers"].append(name)
+    return list(conflicts.values())
 
 
 def _format_slot_conflict(conflicts):
     items = "".join([
+        f"<li>{html.escape(', '.join(conflict['engineers']))} is on approved leave ({html.escape(conflict['leave_reason'] or 'Leave')})</li>"
+        if conflict["job_number"] is None else
         f"<li>{html.escape(', '.join(conflict['engineers']))} already has {html.escape(conflict['job_number'])} ({html.escape(conflict['client_name'] or 'Unknown client')})</li>"
         for conflict in conflicts
     ])
@@ -217,31 +305,17 @@ def _format_slot_conflict(conflicts):
     )
 
 
-def _get_next_job_number() -> str:
-    """Generate the first available PNJ number (fills gaps, starts at pnj0001)."""
-    res = supabase.table("jobs").select("job_number").execute()
-    used_nums = set()
-    pattern = re.compile(r"^pnj(\d+)$", re.IGNORECASE)
-
-    for row in (res.data or []):
-        job_no = (row.get("job_number") or "").strip()
-        match = pattern.match(job_no)
-        if match:
-            used_nums.add(int(match.group(1)))
-
-    next_num = 1
-    while next_num in used_nums:
-        next_num += 1
-
-    return f"pnj{next_num:04d}"
-
-
-def _insert_job(job_data: dict):
-    """Insert a job, retrying without job_type if the live schema cache is stale."""
+async def _insert_job(job_data: dict):
+    """Insert a job, retrying without job_type or duration_minutes if the live schema cache is stale."""
     try:
-        return supabase.table("jobs").insert(job_data).execute()
+        res = await db.table("jobs").insert(job_data).execute()
+        dashboard_snapshot.invalidate("jobs")
+        return res
     except APIError as exc:
         error_text = str(exc)
+        if "Could not find the 'duration_minutes' column of 'jobs'" in error_text and "duration_minutes" in job_data:
+            print("Warning: jobs.duration_minutes missing from schema cache; retrying insert without it")
+            return await _insert_job({key: value for key, value in job_data.items() if key != "duration_minutes"})
         if "Could not find the 'job_type' column of 'jobs' in the schema cache" not in error_text:
             raise
         fallback_job_data = dict(job_data)
@@ -250,14 +324,22 @@ def _insert_job(job_data: dict):
             existing_notes = (fallback_job_data.get("notes") or "").strip()
             fallback_job_data["notes"] = f"[CALL OUT] {existing_notes}".strip()
         print("Warning: jobs.job_type missing from schema cache; retrying insert without job_type")
-        return supabase.table("jobs").insert(fallback_job_data).execute()
+        res = await db.table("jobs").insert(fallback_job_data).execute()
+        dashboard_snapshot.invalidate("jobs")
+        return res
+
+async def _today_queue(engineer: models.Engineer, today_str: str, request: Request) -> List[models.Job]:
+    today_jobs = await _get_jobs_for_engineer(engineer.contact_name, date=today_str)
+    for job in today_jobs:
+        job.wa_link = generate_whatsapp_link(job, engineer, request.url.netloc)
+    return today_jobs
 
 @router.get("/portal/{token}", response_class=HTMLResponse)
-def engineer_portal(token: str, request: Request):
+async def engineer_portal(token: str, request: Request):
     try:
         import uuid
         uuid.UUID(token)
-        res = supabase.table("engineers").select("*").eq("access_token", token).execute()
+        res = await db.table("engineers").select("*").eq("access_token", token).execute()
         if not res.data:
             raise HTTPException(status_code=403, detail="Invalid Access Token")
         engineer = models.Engineer(**res.data[0])
@@ -265,34 +347,40 @@ def engineer_portal(token: str, request: Request):
          raise HTTPException(status_code=403, detail="Invalid Token Format")
 
     today_str = datetime.now().strftime('%Y-%m-%d')
-    today_jobs = _get_jobs_for_engineer(engineer.contact_name, date=today_str)
-    
-    for job in today_jobs:
-        job.wa_link = generate_whatsapp_link(job, engineer, request.url.netloc)
-
     return templates.TemplateResponse("engineer_dashboard.html", {
         "request": request,
         "engineer": engineer,
         "token": token,
-        "today_jobs": today_jobs
+        "today": today_str,
+        "today_jobs": await _today_queue(engineer, today_str, request),
+        "sync_interval_ms": int(PORTAL_SYNC_POLL_SECONDS * 1000)
+    })
+
+@router.get("/portal/{token}/today", response_class=HTMLResponse)
+async def engineer_today_queue(token: str, request: Request):
+    """Today's queue alone, re-fetched by the dashboard when a sync reports a change."""
+    engineer = await engineer_auth.engineer(token)
+    if not engineer:
+        raise HTTPException(status_code=403, detail="Invalid Token")
+    return templates.TemplateResponse("partials/engineer_today_queue.html", {
+        "request": request,
+        "engineer": engineer,
+        "token": token,
+        "today_jobs": await _today_queue(engineer, datetime.now().strftime('%Y-%m-%d'), request)
     })
 
 @router.get("/api/engineer/{token}/events")
-def get_engineer_events(token: str):
-    res = supabase.table("engineers").select("*").eq("access_token", token).execute()
+async def get_engineer_events(token: str, request: Request, start: Optional[str] = None, end: Optional[str] = None):
+    res = await db.table("engineers").select("*").eq("access_token", token).execute()
     if not res.data:
         raise HTTPException(status_code=403, detail="Invalid Token")
     engineer = models.Engineer(**res.data[0])
+    start_date, end_date = _parse_calendar_window(start, end)
     
     events = []
-    for job in _get_jobs_for_engineer(engineer.contact_name):
+    for job in await _get_jobs_for_engineer(engineer.contact_name, start_date=start_date, end_date=end_date, columns=CALENDAR_JOB_COLUMNS):
         start_dt = f"{job.date}T{job.time}"
-        if job.engineer_contact_name == engineer.contact_name:
-            role = "Lead"
-        elif job.supervisor_name == engineer.contact_name:
-            role = "Supervisor"
-        else:
-            role = "Contributing"
+        role = job.assignment_role or "Contributing"
         events.append({
             "title": f"{job.client_name} ({role})",
             "start": start_dt,
@@ -304,7 +392,13 @@ def get_engineer_events(token: str):
             }
         })
         
-    l_res = supabase.table("leave_requests").select("*").eq("engineer_name", engineer.contact_name).execute()
+    leave_query = db.table("leave_requests").select("reason,status,start_date,end_date").eq("engineer_name", engineer.contact_name)
+    # Any leave overlapping the window, not just leave starting inside it.
+    if start_date:
+        leave_query = leave_query.gte("end_date", start_date)
+    if end_date:
+        leave_query = leave_query.lt("start_date", end_date)
+    l_res = await leave_query.execute()
     for l in l_res.data:
         color = "#ef4444"
         if l['status'] == 'Approved':
@@ -319,11 +413,26 @@ def get_engineer_events(token: str):
             "color": color,
             "allDay": True
         })
-    return JSONResponse(content=events)
+    return json_response_with_etag(request, events)
+
+
+@router.get("/api/engineer/{token}/sync")
+@query_budget(4)
+async def sync_engineer_queue(token: str, request: Request, cursor: Optional[str] = None):
+    """
+    Jobs, leave and contributions that changed since ``cursor`` (everything
+    without one). Send the returned cursor next time, or as If-None-Match to
+    get a 304 while nothing has changed.
+    """
+    engineer = await engineer_auth.engineer(token)
+    if not engineer:
+        raise HTTPException(status_code=403, detail="Invalid Token")
+    payload = await portal_sync.changes(engineer.contact_name, cursor)
+    return json_response_with_etag(request, payload, version=payload["cursor"])
 
 @router.post("/api/engineer/{token}/leave")
 async def submit_leave_request(token: str, request: Request):
-    res = supabase.table("engineers").select("*").eq("access_token", token).execute()
+    res = await db.table("engineers").select("*").eq("access_token", token).execute()
     if not res.data:
         return HTMLResponse("<div class='alert alert-error'>Invalid Token</div>")
     engineer = models.Engineer(**res.data[0])
@@ -338,7 +447,7 @@ async def submit_leave_request(token: str, request: Request):
     }
     
     try:
-        supabase.table("leave_requests").insert(leave_data).execute()
+        await db.table("leave_requests").insert(leave_data).execute()
         return HTMLResponse("""
             <div class='alert alert-success'><span>Request submitted successfully!</span></div>
             <script>
@@ -350,10 +459,11 @@ async def submit_leave_request(token: str, request: Request):
         return HTMLResponse(f"<div class='alert alert-error'>Error: {str(e)}</div>")
 
 @router.get("/api/admin/events")
-def get_admin_events(user: models.User = Depends(login_required)):
+async def get_admin_events(request: Request, start: Optional[str] = None, end: Optional[str] = None, user: models.User = Depends(login_required)):
     events = []
-    j_res = supabase.table("jobs").select("*").execute()
-    jobs = _attach_engineer_team([models.Job(**j) for j in (j_res.data or [])])
+    start_date, end_date = _parse_calendar_window(start, end)
+    j_res = await _filter_job_window(db.table("jobs").select(CALENDAR_JOB_COLUMNS), start_date=start_date, end_date=end_date).execute()
+    jobs = await _attach_engineer_team([models.Job(**j) for j in (j_res.data or [])])
     for job in jobs:
         start_dt = f"{job.date}T{job.time}"
         # Color coding: orange for breakdown jobs, blue for regular not completed, green for completed
@@ -371,19 +481,48 @@ def get_admin_events(user: models.User = Depends(login_required)):
             "backgroundColor": bg_color,
             "extendedProps": { "location": job.address, "engineer": ", ".join(team) if team else job.engineer_contact_name }
         })
-    return JSONResponse(content=events)
+    return json_response_with_etag(request, events)
+
+@router.post("/api/admin/schedule/check")
+async def check_draft_schedule(draft: models.ScheduleCheckRequest, user: models.User = Depends(role_required(["Admin", "Manager"]))):
+    """Check a whole draft schedule (e.g. a week) for engineer clashes in one pass."""
+    conflicts = await check_schedule(draft.jobs)
+    return {
+        "checked": len(draft.jobs),
+        "conflicts": [conflict.model_dump(mode="json") for conflict in conflicts],
+    }
+
+@router.post("/api/admin/schedule/recurring")
+async def generate_recurring_schedule(
+    schedule: models.RecurringScheduleRequest,
+    user: models.User = Depends(role_required(["Admin", "Manager"]))
+):
+    """Plan (dry_run, the default) or create the next months of cleans from site frequencies."""
+    if not 1 <= schedule.months <= SCHEDULE_MAX_MONTHS:
+        raise HTTPException(status_code=400, detail=f"months must be between 1 and {SCHEDULE_MAX_MONTHS}")
+    if not schedule.dry_run and job_number_allocator.reuse_gaps:
+        raise HTTPException(
+            status_code=409,
+            detail="Bulk scheduling takes its job numbers from the counter; unset JOB_NUMBER_REUSE_GAPS to create jobs"
+        )
+    plan = await plan_recurring_jobs(schedule)
+    if not schedule.dry_run:
+        if plan.conflicts:
+            raise HTTPException(status_code=409, detail="The engineer has clashing bookings; run a dry run to review them")
+        plan = await create_recurring_jobs(plan, priority=schedule.priority)
+    return plan.model_dump(mode="json")
 
 @router.get("/admin/leaves/pending")
-def get_pending_leaves(request: Request, user: models.User = Depends(login_required)):
-    res = supabase.table("leave_requests").select("*").eq("status", "Pending").execute()
+async def get_pending_leaves(request: Request, user: models.User = Depends(login_required)):
+    res = await db.table("leave_requests").select("*").eq("status", "Pending").execute()
     leaves = [models.LeaveRequest(**l) for l in res.data]
     return templates.TemplateResponse("partials/pending_leaves.html", {"request": request, "leaves": leaves})
 
 @router.post("/admin/leaves/{id}/{action}")
-def update_leave_status(id: int, action: str, user: models.User = Depends(login_required)):
+async def update_leave_status(id: int, action: str, user: models.User = Depends(login_required)):
     status_map = {"approve": "Approved", "reject": "Rejected"}
     new_status = status_map.get(action, "Pending")
-    supabase.table("leave_requests").update({"status": new_status}).eq("id", id).execute()
+    await db.table("leave_requests").update({"status": new_status}).eq("id", id).execute()
     return HTMLResponse(f"<span>{new_status}</span>")
 
 @router.post("/admin/book-leave")
@@ -396,52 +535,71 @@ async def book_leave_for_staff(request: Request, user: models.User = Depends(log
         "reason": form_data.get("reason"),
         "status": "Approved"
     }
-    supabase.table("leave_requests").insert(leave_data).execute()
+    await db.table("leave_requests").insert(leave_data).execute()
     return RedirectResponse(url="/management", status_code=303)
 
 @router.get("/management", response_class=HTMLResponse)
-def management_dashboard(request: Request, user: models.User = Depends(role_required(["Admin", "Manager"]))):
-    engineers_res = supabase.table("engineers").select("*").execute()
+async def management_dashboard(request: Request, user: models.User = Depends(role_required(["Admin", "Manager"]))):
+    start_date, end_date = _job_list_window(None, None)
+    engineers_res, (jobs, next_cursor), active_count = await asyncio.gather(
+        db.table("engineers").select("*").execute(),
+        _get_job_page(start_date, end_date),
+        _count_unfinished_jobs()
+    )
     engineers = [models.Engineer(**e) for e in engineers_res.data]
-    jobs_res = supabase.table("jobs").select("*").order("date").order("time").execute()
-    jobs = _attach_engineer_team([models.Job(**j) for j in (jobs_res.data or [])])
-    return templates.TemplateResponse("manager_diary.html", {"request": request, "engineers": engineers, "jobs": jobs, "user": user})
+    return templates.TemplateResponse("manager_diary.html", {
+        "request": request,
+        "engineers": engineers,
+        "jobs": jobs,
+        "user": user,
+        "active_count": active_count,
+        "window_start": start_date,
+        "window_end": (dt_date.fromisoformat(end_date) - timedelta(days=1)).isoformat(),
+        "statuses": JOB_LIST_STATUSES,
+        "job_types": JOB_LIST_TYPES,
+        "next_url": _next_job_page_url({}, next_cursor)
+    })
+
+
+def _next_job_page_url(filters: dict, next_cursor: Optional[str]) -> Optional[str]:
+    if not next_cursor:
+        return None
+    params = {key: value for key, value in filters.items() if value}
+    params["cursor"] = next_cursor
+    return f"/admin/jobs/filter?{urlencode(params)}"
 
 
 @router.get("/admin/jobs/filter", response_class=HTMLResponse)
-def filter_admin_jobs(request: Request, engineer_name: str = "", user: models.User = Depends(login_required)):
-    engineers_res = supabase.table("engineers").select("*").order("contact_name").execute()
+async def filter_admin_jobs(
+    request: Request,
+    engineer_name: str = "",
+    status: str = "",
+    job_type: str = "",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    cursor: Optional[str] = None,
+    user: models.User = Depends(login_required)
+):
+    start_date, end_date = _job_list_window(start, end)
+    engineers_res, (jobs, next_cursor) = await asyncio.gather(
+        db.table("engineers").select("*").order("contact_name").execute(),
+        _get_job_page(start_date, end_date, status, engineer_name, job_type, cursor)
+    )
     engineers = [models.Engineer(**e) for e in (engineers_res.data or [])]
-    if engineer_name:
-        jobs = _get_jobs_for_engineer(engineer_name)
-    else:
-        jobs_res = supabase.table("jobs").select("*").order("date").order("time").execute()
-        jobs = _attach_engineer_team([models.Job(**j) for j in (jobs_res.data or [])])
-    return templates.TemplateResponse("partials/job_rows.html", {"request": request, "jobs": jobs, "engineers": engineers})
+    filters = {"engineer_name": engineer_name, "status": status, "job_type": job_type, "start": start, "end": end}
+    return templates.TemplateResponse("partials/job_rows.html", {
+        "request": request,
+        "jobs": jobs,
+        "engineers": engineers,
+        "user": user,
+        "next_url": _next_job_page_url(filters, next_cursor)
+    })
 
 @router.get("/engineer-diary", response_class=HTMLResponse)
-def engineer_diary(request: Request, user: models.User = Depends(login_required)):
-    # Fetch jobs where the user is the assigned engineer (check both username and email for robustness)
-    # Using multiple queries because Supabase OR syntax is a bit specific via postgrest
-    # But clean way with .or_ or multiple .eq
-    query = supabase.table("jobs").select("*")
-    
-    # Check for engineer_contact_name matching username OR engineer_email matching user email
-    jobs_by_number = {}
-    res = query.or_(f"engineer_contact_name.eq.{user.username},engineer_email.eq.{user.email}").order("date").order("time").execute()
-    for row in res.data or []:
-        jobs_by_number[row.get("job_number")] = row
-    try:
-        assignment_res = supabase.table("job_engineers").select("job_number").eq("engineer_contact_name", user.username).execute()
-        assigned_numbers = [row["job_number"] for row in (assignment_res.data or []) if row.get("job_number")]
-        if assigned_numbers:
-            assigned_res = supabase.table("jobs").select("*").in_("job_number", assigned_numbers).execute()
-            for row in assigned_res.data or []:
-                jobs_by_number[row.get("job_number")] = row
-    except Exception as exc:
-        print(f"Warning: job_engineers lookup unavailable for user diary: {exc}")
-    jobs = _attach_engineer_team([models.Job(**j) for j in jobs_by_number.values() if j])
-    
+async def engineer_diary(request: Request, user: models.User = Depends(login_required)):
+    # Jobs the user leads (matched by username or email) or is on through job_engineers.
+    jobs = await fetch_assignments(user.username, engineer_email=user.email)
+
     return templates.TemplateResponse("engineer_diary.html", {
         "request": request, 
         "user": user,
@@ -449,45 +607,27 @@ def engineer_diary(request: Request, user: models.User = Depends(login_required)
     })
 
 @router.get("/engineer/diary")
-def engineer_diary_redirect():
+async def engineer_diary_redirect():
     return RedirectResponse(url="/engineer-diary")
 
 @router.get("/job-allocation", response_class=HTMLResponse)
-def job_allocation_page(request: Request, user: models.User = Depends(login_required)):
-    context = _get_job_allocation_context(request, user)
+async def job_allocation_page(request: Request, user: models.User = Depends(login_required)):
+    context = await _get_job_allocation_context(request, user)
     return templates.TemplateResponse("job_allocation.html", context)
 
 
-def _get_job_allocation_context(request: Request, user: models.User, editing_job: Optional[models.Job] = None):
-    brands_res = supabase.table("brands").select("*").execute()
-    brands = brands_res.data if brands_res.data else []
-    
-    clients_res = supabase.table("clients").select("*").eq("archived", False).order("client_name").execute()
-    clients = clients_res.data if clients_res.data else []
-    
-    engineers_res = supabase.table("engineers").select("*").order("contact_name").execute()
-    engineers = engineers_res.data if engineers_res.data else []
-    
-    contacts_res = supabase.table("site_contacts").select("*").order("contact_name").execute()
-    site_contacts = contacts_res.data if contacts_res.data else []
-
-    try:
-        sub_contractors_res = supabase.table("sub_contractors").select("*").eq("archived", False).order("client_name").order("sub_contractor_name").execute()
-        sub_contractors = sub_contractors_res.data if sub_contractors_res.data else []
-    except Exception:
-        sub_contractors = []
-    
+async def _get_job_allocation_context(request: Request, user: models.User, editing_job: Optional[models.Job] = None):
+    snapshot, next_job_number = await asyncio.gather(reference_data.snapshot(), job_number_allocator.peek())
     today_str = datetime.now().strftime('%Y-%m-%d')
-    next_job_number = _get_next_job_number()
     
     return {
         "request": request, 
         "user": user,
-        "brands": brands,
-        "clients": clients,
-        "engineers": engineers,
-        "site_contacts": site_contacts,
-        "sub_contractors": sub_contractors,
+        "brands": snapshot.brands,
+        "clients": snapshot.active_clients(),
+        "engineers": snapshot.engineers,
+        "site_contacts": snapshot.site_contacts,
+        "sub_contractors": snapshot.active_sub_contractors(),
         "today": today_str,
         "next_job_number": next_job_number,
         "editing_job": editing_job
@@ -495,14 +635,14 @@ def _get_job_allocation_context(request: Request, user: models.User, editing_job
 
 
 @router.get("/job-allocation/{job_number}/edit", response_class=HTMLResponse)
-def edit_job_allocation_page(job_number: str, request: Request, user: models.User = Depends(role_required(["Admin", "Manager"]))):
-    job_res = supabase.table("jobs").select("*").eq("job_number", job_number).execute()
+async def edit_job_allocation_page(job_number: str, request: Request, user: models.User = Depends(role_required(["Admin", "Manager"]))):
+    job_res = await db.table("jobs").select("*").eq("job_number", job_number).execute()
     if not job_res.data:
         raise HTTPException(status_code=404, detail="Job not found")
-    job = _attach_engineer_team([models.Job(**job_res.data[0])])[0]
+    job = (await _attach_engineer_team([models.Job(**job_res.data[0])]))[0]
     if job.status in {"Submitted", "Completed", "Archived"}:
         return RedirectResponse(url=f"/admin/reports/job/{job_number}", status_code=303)
-    context = _get_job_allocation_context(request, user, editing_job=job)
+    context = await _get_job_allocation_context(request, user, editing_job=job)
     return templates.TemplateResponse("job_allocation.html", context)
 
 @router.post("/job-allocation")
@@ -523,6 +663,7 @@ async def allocate_job(
     supervisor_name: Optional[str] = Form(None),
     site_contact_name: Optional[str] = Form(None),
     notes: Optional[str] = Form(None),
+    duration_minutes: Optional[int] = Form(None, gt=0),
     user: models.User = Depends(login_required)
 ):
     engineer_name, contributing_engineer_names, supervisor_name, allocation_names = _normalise_assignment_names(
@@ -538,7 +679,7 @@ async def allocate_job(
             print("ERROR: Job in the past")
             return HTMLResponse(content=f"<div class='alert alert-error font-bold'>Error: Cannot allocate a job in the past ({requested_dt.strftime('%d/%m/%Y %H:%M')})</div>")
 
-        conflicts = _get_slot_conflicts(date, time, allocation_names)
+        conflicts = await _get_slot_conflicts(date, time, allocation_names, duration_minutes=duration_minutes)
         if conflicts:
             return HTMLResponse(content=_format_slot_conflict(conflicts))
 
@@ -550,14 +691,14 @@ async def allocate_job(
         
         brand_name_val = (brand_name or "").strip() or None
         if site_id:
-            s_res = supabase.table("client_sites").select("*").eq("id", site_id).execute()
+            s_res = await db.table("client_sites").select("*").eq("id", site_id).execute()
             if s_res.data:
                 site = s_res.data[0]
                 site_name_val = site["site_name"]
                 address_val = site.get("address")
                 brand_name_val = site.get("brand_name")
 
-        c_res = supabase.table("clients").select("*").eq("client_name", client_name).execute()
+        c_res = await db.table("clients").select("*").eq("client_name", client_name).execute()
         if c_res.data:
             client = c_res.data[0]
             company_val = client.get("company") or client["client_name"]
@@ -566,7 +707,7 @@ async def allocate_job(
 
         if sub_contractor_id:
             try:
-                sub_res = supabase.table("sub_contractors").select("*").eq("id", sub_contractor_id).eq("archived", False).execute()
+                sub_res = await db.table("sub_contractors").select("*").eq("id", sub_contractor_id).eq("archived", False).execute()
                 if sub_res.data:
                     subcontractor = sub_res.data[0]
                     proxy_sub_contractor_id_val = subcontractor.get("id")
@@ -601,11 +742,14 @@ async def allocate_job(
                 "proxy_sub_contractor_name": proxy_sub_contractor_name_val,
                 "status": "Scheduled"
             }
+            if duration_minutes:
+                job_data["duration_minutes"] = duration_minutes
             try:
                 # Refresh schema cache
-                supabase.table("jobs").select("*").limit(1).execute()
-                result = _insert_job(job_data)
+                await db.table("jobs").select("*").limit(1).execute()
+                result = await _insert_job(job_data)
                 created_job_number = requested_job_number
+                await job_number_allocator.observe(requested_job_number)
             except Exception as e:
                 if "duplicate" in str(e).lower():
                     return HTMLResponse(
@@ -614,7 +758,7 @@ async def allocate_job(
                 raise
         else:
             for _ in range(3):
-                next_job_number = _get_next_job_number()
+                next_job_number = await job_number_allocator.allocate()
                 job_data = {
                     "job_number": next_job_number,
                     "date": date,
@@ -633,10 +777,12 @@ async def allocate_job(
                     "proxy_sub_contractor_name": proxy_sub_contractor_name_val,
                     "status": "Scheduled"
                 }
+                if duration_minutes:
+                    job_data["duration_minutes"] = duration_minutes
                 try:
                     # Refresh schema cache
-                    supabase.table("jobs").select("*").limit(1).execute()
-                    result = _insert_job(job_data)
+                    await db.table("jobs").select("*").limit(1).execute()
+                    result = await _insert_job(job_data)
                     created_job_number = next_job_number
                     break
                 except Exception as e:
@@ -647,10 +793,10 @@ async def allocate_job(
         if not created_job_number:
             raise Exception("Could not allocate a unique PNJ job number after multiple attempts.")
 
-        res_job = supabase.table("jobs").select("*").eq("job_number", created_job_number).execute()
+        res_job = await db.table("jobs").select("*").eq("job_number", created_job_number).execute()
         job_obj = models.Job(**res_job.data[0])
         job_obj.job_type = job_type
-        if not _sync_job_engineers(created_job_number, engineer_name, contributing_engineer_names, supervisor_name):
+        if not await _sync_job_engineers(created_job_number, engineer_name, contributing_engineer_names, supervisor_name):
             return HTMLResponse(
                 "<div class='alert alert-error font-bold'>"
                 "The job was created, but the engineer team could not be saved. "
@@ -659,7 +805,7 @@ async def allocate_job(
             )
         assigned_engineer_names = [engineer_name] + contributing_engineer_names
         dispatch_recipient_names = assigned_engineer_names + ([supervisor_name] if supervisor_name else [])
-        assigned_engineers = _get_engineers_by_name(dispatch_recipient_names)
+        assigned_engineers = await _get_engineers_by_name(dispatch_recipient_names)
         job_obj.engineer_team = dispatch_recipient_names
         job_obj.contributing_engineer_names = contributing_engineer_names
         job_obj.supervisor_name = supervisor_name or None
@@ -730,7 +876,7 @@ async def allocate_job(
                 f"{missing_html}"
             )
 
-        next_job_number = _get_next_job_number()
+        next_job_number = await job_number_allocator.peek()
         print(f"SUCCESS: Job {created_job_number} allocated successfully")
         team_label = ", ".join(assigned_engineer_names)
         supervisor_label = f" Supervisor: {supervisor_name}." if supervisor_name else ""
@@ -758,9 +904,14 @@ async def allocate_job(
 
 
 @router.post("/admin/jobs/{job_number}/edit", response_class=HTMLResponse)
-async def edit_job(job_number: str, request: Request, user: models.User = Depends(role_required(["Admin", "Manager"]))):
+async def edit_job(
+    job_number: str,
+    request: Request,
+    duration_minutes: Optional[int] = Form(None, gt=0),
+    user: models.User = Depends(role_required(["Admin", "Manager"]))
+):
     form_data = await request.form()
-    job_res = supabase.table("jobs").select("*").eq("job_number", job_number).execute()
+    job_res = await db.table("jobs").select("*").eq("job_number", job_number).execute()
     if not job_res.data:
         return HTMLResponse("<div class='alert alert-error text-sm'>Job not found.</div>")
 
@@ -782,18 +933,35 @@ async def edit_job(job_number: str, request: Request, user: models.User = Depend
         supervisor_name
     )
 
-    conflicts = _get_slot_conflicts(date, time, allocation_names, exclude_job_number=job_number)
+    conflicts = await _get_slot_conflicts(
+        date,
+        time,
+        allocation_names,
+        exclude_job_number=job_number,
+        duration_minutes=duration_minutes or existing_job.duration_minutes
+    )
     if conflicts:
         return HTMLResponse(content=_format_slot_conflict(conflicts))
 
-    supabase.table("jobs").update({
+    job_update = {
         "date": date,
         "time": time,
         "priority": priority,
         "engineer_contact_name": engineer_name,
         "notes": notes
-    }).eq("job_number", job_number).execute()
-    if not _sync_job_engineers(job_number, engineer_name, contributing_engineer_names, supervisor_name):
+    }
+    if duration_minutes:
+        job_update["duration_minutes"] = duration_minutes
+    try:
+        await db.table("jobs").update(job_update).eq("job_number", job_number).execute()
+    except APIError as exc:
+        if "duration_minutes" not in job_update or "'duration_minutes' column" not in str(exc):
+            raise
+        print("Warning: jobs.duration_minutes missing from schema cache; saving the job without it")
+        job_update.pop("duration_minutes")
+        await db.table("jobs").update(job_update).eq("job_number", job_number).execute()
+    dashboard_snapshot.invalidate("jobs")
+    if not await _sync_job_engineers(job_number, engineer_name, contributing_engineer_names, supervisor_name):
         return HTMLResponse(
             "<div class='alert alert-error text-sm'>"
             "The job details were updated, but the engineer team could not be saved. "
@@ -806,7 +974,7 @@ async def edit_job(job_number: str, request: Request, user: models.User = Depend
         "<script>"
         "setTimeout(() => {"
         "  if (document.getElementById('job-rows')) {"
-        "    htmx.ajax('GET', '/admin/jobs/filter', { target: '#job-rows' });"
+        "    htmx.ajax('GET', '/admin/jobs/filter', { target: '#job-rows', source: '#job-filters' });"
         "    const dialog = document.currentScript?.closest('dialog');"
         "    if (dialog) dialog.close();"
         "  }"
@@ -816,14 +984,15 @@ async def edit_job(job_number: str, request: Request, user: models.User = Depend
 
 
 @router.post("/admin/jobs/{job_number}/archive")
-def archive_job(job_number: str, user: models.User = Depends(role_required(["Admin", "Manager"]))):
-    supabase.table("jobs").update({"status": "Archived"}).eq("job_number", job_number).execute()
+async def archive_job(job_number: str, user: models.User = Depends(role_required(["Admin", "Manager"]))):
+    await db.table("jobs").update({"status": "Archived"}).eq("job_number", job_number).execute()
+    dashboard_snapshot.invalidate("jobs")
     return HTMLResponse(content="")
 
 
 @router.delete("/admin/jobs/{job_number}", response_class=HTMLResponse)
-def delete_job(job_number: str, user: models.User = Depends(role_required(["Admin"]))):
-    job_res = supabase.table("jobs").select("*").eq("job_number", job_number).execute()
+async def delete_job(job_number: str, user: models.User = Depends(role_required(["Admin"]))):
+    job_res = await db.table("jobs").select("*").eq("job_number", job_number).execute()
     if not job_res.data:
         return HTMLResponse("<div class='alert alert-error text-sm'>Job not found.</div>")
 
@@ -831,36 +1000,32 @@ def delete_job(job_number: str, user: models.User = Depends(role_required(["Admi
     if job.status in {"Submitted", "Completed", "Archived"}:
         return HTMLResponse("<div class='alert alert-error text-sm'>Submitted, completed, or archived jobs cannot be deleted. Archive them instead.</div>")
 
-    reports_res = supabase.table("extraction_reports").select("id").eq("job_number", job_number).limit(1).execute()
+    reports_res = await db.table("extraction_reports").select("id").eq("job_number", job_number).limit(1).execute()
     if reports_res.data:
         return HTMLResponse("<div class='alert alert-error text-sm'>This job already has report evidence and cannot be deleted. Archive it instead.</div>")
 
     try:
-        supabase.table("job_engineers").delete().eq("job_number", job_number).execute()
+        await db.table("job_engineers").delete().eq("job_number", job_number).execute()
     except Exception as exc:
         print(f"Warning: job_engineers cleanup failed during job delete: {exc}")
     try:
-        supabase.table("job_contributions").delete().eq("job_number", job_number).execute()
+        await db.table("job_contributions").delete().eq("job_number", job_number).execute()
     except Exception as exc:
         print(f"Warning: job_contributions cleanup failed during job delete: {exc}")
 
-    supabase.table("jobs").delete().eq("job_number", job_number).execute()
+    await db.table("jobs").delete().eq("job_number", job_number).execute()
+    dashboard_snapshot.invalidate("jobs")
+    engineer_auth.invalidate(job_number=job_number)
     return HTMLResponse(content="")
 
 @router.get("/admin/jobs/archive/search", response_class=HTMLResponse)
-def search_archive(q: str = "", user: models.User = Depends(login_required)):
-    query = supabase.table("jobs").select("*").eq("status", "Archived")
-    if q:
-        filter_str = f"job_number.ilike.%{q}%,client_name.ilike.%{q}%,site_name.ilike.%{q}%"
-        query = query.or_(filter_str)
-    res = query.order("date", desc=True).execute()
-    jobs = [models.Job(**j) for j in res.data]
-    
-    html_rows = "".join([f"""<tr class="opacity-75 hover:opacity-100 transition-opacity">
-        <td class="p-4 font-medium text-slate-500">{j.date.strftime('%d %b %Y')}</td>
-        <td><span class="badge badge-ghost font-mono text-[10px]">{j.job_number}</span></td>
-        <td><div class="font-bold text-slate-600">{j.client_name}</div><div class="text-[9px] uppercase tracking-tighter text-slate-400">{j.site_name or 'N/A'}</div></td>
-        <td><span class="badge badge-outline badge-xs font-bold">{j.status}</span></td>
-        <td class="text-right"><a href="/admin/reports" class="btn btn-ghost btn-xs text-indigo-500 font-bold underline">View Audit</a></td>
-    </tr>""" for j in jobs])
-    return HTMLResponse(content=html_rows or "<tr><td colspan='5' class='text-center py-20 text-slate-400 italic'>No matches found in archive.</td></tr>")
+async def search_archive(request: Request, q: str = "", offset: int = 0, user: models.User = Depends(login_required)):
+    jobs, has_more = await search_archived_jobs(q, offset=offset)
+    next_offset = offset + len(jobs)
+    return templates.TemplateResponse("partials/archive_rows.html", {
+        "request": request,
+        "jobs": jobs,
+        "q": q,
+        "first_batch": offset == 0,
+        "more_url": f"/admin/jobs/archive/search?{urlencode({'q': q, 'offset': next_offset})}" if has_more else None
+    })
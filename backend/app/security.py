@@ -3,6 +3,7 @@ from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import os
+from .offload import run_cpu
 
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -18,6 +19,13 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+# bcrypt takes a few hundred ms by design; async handlers use these so it runs off the event loop.
+async def verify_password_async(plain_password, hashed_password):
+    return await run_cpu(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await run_cpu(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -0,0 +1,355 @@
+"""
+Streaming import of store / frequency spreadsheets into client_sites.
+
+Rows are read one at a time (CSV with the csv module, XLSX with openpyxl's
+read-only reader) and mapped onto ClientSite fields by header name, so the
+"All Stores" sheet (Company, Brand, Site Name, Frequency, ...) and the
+frequency batches (Site No., Date Cleaned., Current cleans PA, ...) both
+load without editing. Each row is validated with models.ClientSite; rows
+repeating an earlier store_id_code (or client + site name when there is no
+code) are skipped.
+
+Rows are applied in chunks of SITE_IMPORT_CHUNK_SIZE: one lookup of the
+chunk's existing sites, clients and brands, then one multi-row insert for new
+sites and one upsert for sites whose values changed. Unchanged rows are not
+written and blank cells never clear stored values, so importing the same file
+again writes nothing. A progress callback receives the running totals after
+every chunk.
+
+    python -m app.site_import "All Stores Spreadsheet.xlsx" --dry-run
+"""
+import argparse
+import asyncio
+import csv
+import io
+import os
+import re
+import secrets
+from datetime import date as dt_date, datetime
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from . import models
+from .dashboard_snapshot import dashboard_snapshot
+from .db import db
+from .reference_data import reference_data
+
+try:
+    import openpyxl
+except ImportError:  # CSV imports still work without it
+    openpyxl = None
+
+SITE_IMPORT_CHUNK_SIZE = max(int(os.getenv("SITE_IMPORT_CHUNK_SIZE", "200")), 1)
+MAX_REPORTED_ERRORS = 50
+
+IMPORT_FIELDS = [
+    "client_name", "site_name", "address", "postcode", "brand_name",
+    "store_id_code", "ac_number", "frequency_number", "last_clean",
+]
+
+# Normalised spreadsheet header -> client_sites column.
+HEADER_ALIASES = {
+    "client": "client_name",
+    "client name": "client_name",
+    "company": "client_name",
+    "site": "site_name",
+    "site name": "site_name",
+    "store name": "site_name",
+    "address": "address",
+    "location": "address",
+    "postcode": "postcode",
+    "post code": "postcode",
+    "brand": "brand_name",
+    "brand name": "brand_name",
+    "store id": "store_id_code",
+    "store id code": "store_id_code",
+    "store number": "store_id_code",
+    "site no": "store_id_code",
+    "site number": "store_id_code",
+    "ac number": "ac_number",
+    "frequency": "frequency_number",
+    "frequency number": "frequency_number",
+    "current cleans pa": "frequency_number",
+    "cleans pa": "frequency_number",
+    "last clean": "last_clean",
+    "date cleaned": "last_clean",
+}
+
+_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d/%m/%y", "%d-%m-%Y", "%d.%m.%Y")
+
+
+def normalise_header(value) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", str(value or "").lower()).strip()
+
+
+def _text(value) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # Excel stores site numbers as floats
+    text = str(value).strip()
+    return text or None
+
+
+def _code(value) -> Optional[str]:
+    text = _text(value)
+    # Sheets that went through pandas carry site numbers as "306.0".
+    return re.sub(r"^(\d+)\.0+$", r"\1", text) if text else None
+
+
+def _frequency(value) -> Optional[int]:
+    text = _text(value)
+    try:
+        return int(float(text)) if text else None
+    except ValueError:
+        return None  # e.g. "NO CLEANS YET"
+
+
+def _clean_date(value) -> Optional[str]:
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, dt_date):
+        return value.isoformat()
+    text = _text(value)
+    if not text:
+        return None
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text.split(" ")[0], date_format).date().isoformat()
+        except ValueError:
+            continue
+    return text  # left for validation to reject
+
+
+_CONVERTERS = {"store_id_code": _code, "frequency_number": _frequency, "last_clean": _clean_date}
+
+
+def _records(rows: Iterator[tuple]) -> Iterator[Tuple[int, dict]]:
+    """Map raw rows onto ClientSite fields using the first non-empty row as the header."""
+    columns = None
+    for number, row in enumerate(rows, start=1):
+        if not any(_text(cell) for cell in row):
+            continue
+        if columns is None:
+            columns = [HEADER_ALIASES.get(normalise_header(cell)) for cell in row]
+            continue
+        record = {}
+        for field, cell in zip(columns, row):
+            if field and field not in record:
+                record[field] = _CONVERTERS.get(field, _text)(cell)
+        yield number, record
+
+
+def _csv_rows(source) -> Iterator[tuple]:
+    text = io.TextIOWrapper(source, encoding="utf-8-sig", newline="") if not isinstance(source, io.TextIOBase) else source
+    for row in csv.reader(text):
+        yield tuple(row)
+
+
+def _xlsx_rows(source) -> Iterator[tuple]:
+    if openpyxl is None:
+        raise RuntimeError("XLSX imports need openpyxl (pip install openpyxl); save the sheet as CSV instead")
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_rows(source, filename: str) -> Iterator[Tuple[int, dict]]:
+    """Stream (row number, fields) from a CSV or XLSX file object."""
+    if filename.lower().endswith((".xlsx", ".xlsm")):
+        return _records(_xlsx_rows(source))
+    return _records(_csv_rows(source))
+
+
+def _site_key(fields: dict) -> tuple:
+    if fields.get("store_id_code"):
+        return ("code", fields["store_id_code"])
+    return ("name", fields.get("client_name"), fields.get("site_name"))
+
+
+def _same(stored, new) -> bool:
+    return stored is not None and str(stored) == str(new)
+
+
+class SiteImporter:
+    def __init__(
+        self,
+        default_client: Optional[str] = None,
+        chunk_size: int = SITE_IMPORT_CHUNK_SIZE,
+        dry_run: bool = False,
+        progress: Optional[Callable[[models.SiteImportStats], None]] = None
+    ):
+        self.default_client = (default_client or "").strip() or None
+        self.chunk_size = max(int(chunk_size), 1)
+        self.dry_run = dry_run
+        self.progress = progress
+        self.stats = models.SiteImportStats(dry_run=dry_run)
+        self._seen = set()
+        # Clients and brands already counted as created; a dry run never inserts them.
+        self._created_clients = set()
+        self._created_brands = set()
+
+    def _error(self, row_number: int, message: str):
+        self.stats.invalid += 1
+        if len(self.stats.errors) < MAX_REPORTED_ERRORS:
+            self.stats.errors.append(f"Row {row_number}: {message}")
+
+    def _validate(self, row_number: int, record: dict) -> Optional[dict]:
+        record = dict(record)
+        record["client_name"] = record.get("client_name") or self.default_client
+        if not record["client_name"]:
+            self._error(row_number, "no client name (add a Client/Company column or pass a default client)")
+            return None
+        try:
+            site = models.ClientSite(**{key: value for key, value in record.items() if value is not None})
+        except ValidationError as exc:
+            self._error(row_number, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in exc.errors()))
+            return None
+        fields = site.model_dump(mode="json", include=set(IMPORT_FIELDS))
+        # Keep "not in the sheet" apart from real values so blanks never clear stored data.
+        return {field: fields[field] for field in IMPORT_FIELDS if record.get(field) is not None}
+
+    async def _lookup(self, rows: List[dict]):
+        codes = sorted({row["store_id_code"] for row in rows if row.get("store_id_code")})
+        names = sorted({row["site_name"] for row in rows})
+        clients = sorted({row["client_name"] for row in rows})
+        brands = sorted({row["brand_name"] for row in rows if row.get("brand_name")})
+
+        async def fetch(table, columns, column, values):
+            if not values:
+                return []
+            return (await db.table(table).select(columns).in_(column, values).execute()).data or []
+
+        coded, named, client_rows, brand_rows = await asyncio.gather(
+            fetch("client_sites", "*", "store_id_code", codes),
+            fetch("client_sites", "*", "site_name", names),
+            fetch("clients", "client_name", "client_name", clients),
+            fetch("brands", "brand_name", "brand_name", brands),
+        )
+        known_clients = {row["client_name"] for row in client_rows}
+        known_brands = {row["brand_name"] for row in brand_rows}
+        return (
+            {site["store_id_code"]: site for site in coded},
+            {(site["client_name"], site["site_name"]): site for site in named},
+            [name for name in clients if name not in known_clients],
+            [name for name in brands if name not in known_brands],
+        )
+
+    @staticmethod
+    def _match(row: dict, by_code: Dict[str, dict], by_name: Dict[tuple, dict]) -> Optional[dict]:
+        code = row.get("store_id_code")
+        if code and code in by_code:
+            return by_code[code]
+        # Sites imported before they had a store code are matched by name.
+        stored = by_name.get((row["client_name"], row["site_name"]))
+        if stored and (not code or not stored.get("store_id_code")):
+            return stored
+        return None
+
+    async def _apply(self, rows: List[dict]):
+        by_code, by_name, new_clients, new_brands = await self._lookup(rows)
+        new_clients = [name for name in new_clients if name not in self._created_clients]
+        new_brands = [name for name in new_brands if name not in self._created_brands]
+        self._created_clients.update(new_clients)
+        self._created_brands.update(new_brands)
+        inserts, updates = [], []
+        for row in rows:
+            stored = self._match(row, by_code, by_name)
+            if stored is None:
+                inserts.append({field: row.get(field) for field in IMPORT_FIELDS})
+            elif all(_same(stored.get(field), value) for field, value in row.items()):
+                self.stats.unchanged += 1
+            else:
+                updates.append({"id": stored["id"], **{field: row.get(field, stored.get(field)) for field in IMPORT_FIELDS}})
+
+        self.stats.inserted += len(inserts)
+        self.stats.updated += len(updates)
+        self.stats.clients_created += len(new_clients)
+        self.stats.brands_created += len(new_brands)
+        if self.dry_run:
+            return
+        if new_clients or new_brands:
+            await asyncio.gather(*[
+                db.table(table).insert(payload).execute()
+                for table, payload in (
+                    ("clients", [{"client_name": name, "company": name, "portal_token": secrets.token_urlsafe(32)} for name in new_clients]),
+                    ("brands", [{"brand_name": name} for name in new_brands]),
+                )
+                if payload
+            ])
+        if inserts:
+            await db.table("client_sites").insert(inserts).execute()
+        if updates:
+            await db.table("client_sites").upsert(updates, on_conflict="id").execute()
+
+    async def _flush(self, chunk: List[dict]):
+        if chunk:
+            await self._apply(chunk)
+            chunk.clear()
+        if self.progress:
+            self.progress(self.stats)
+
+    async def run(self, rows: Iterator[Tuple[int, dict]]) -> models.SiteImportStats:
+        chunk = []
+        iterator = iter(rows)
+        while True:
+            # Parsing (openpyxl in particular) happens off the event loop, a batch at a time.
+            batch = await asyncio.to_thread(lambda: list(islice(iterator, self.chunk_size)))
+            if not batch:
+                break
+            for row_number, record in batch:
+                self.stats.rows += 1
+                fields = self._validate(row_number, record)
+                if fields is None:
+                    continue
+                key = _site_key(fields)
+                if key in self._seen:
+                    self.stats.duplicates += 1
+                    continue
+                self._seen.add(key)
+                chunk.append(fields)
+                if len(chunk) >= self.chunk_size:
+                    await self._flush(chunk)
+        await self._flush(chunk)
+
+        if not self.dry_run and (self.stats.inserted or self.stats.updated or self.stats.clients_created or self.stats.brands_created):
+            reference_data.invalidate("client_sites", "clients", "brands")
+            dashboard_snapshot.invalidate("client_sites", "clients")
+        return self.stats
+
+
+async def import_sites(source, filename: str, **options) -> models.SiteImportStats:
+    return await SiteImporter(**options).run(read_rows(source, filename))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Import a store / frequency spreadsheet into client_sites.")
+    parser.add_argument("path", help="CSV or XLSX file")
+    parser.add_argument("--client", help="client name for rows without a Client/Company column")
+    parser.add_argument("--chunk-size", type=int, default=SITE_IMPORT_CHUNK_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = parser.parse_args(argv)
+
+    def report(stats: models.SiteImportStats):
+        print(
+            f"{stats.rows} rows: {stats.inserted} new, {stats.updated} changed, {stats.unchanged} unchanged, "
+            f"{stats.duplicates} duplicate, {stats.invalid} invalid",
+            flush=True,
+        )
+
+    with open(args.path, "rb") as source:
+        stats = asyncio.run(import_sites(
+            source, args.path, default_client=args.client, chunk_size=args.chunk_size, dry_run=args.dry_run, progress=report
+        ))
+    for error in stats.errors:
+        print(f"Warning: {error}")
+    if stats.dry_run:
+        print("Dry run: nothing was written.")
+
+
+if __name__ == "__main__":
+    main()
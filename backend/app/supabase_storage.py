@@ -5,30 +5,33 @@ Handles file uploads to Supabase Storage bucket
 import os
 from typing import BinaryIO
 from .supabase_client import supabase
+from .offload import run_io
 
 BUCKET_NAME = "pnj-uploads"
 
-def upload_file(file_content: bytes, file_path: str) -> str:
+def upload_file(file_content: bytes, file_path: str, content_type: str = "image/jpeg", bucket: str = BUCKET_NAME) -> str:
     """
     Upload a file to Supabase Storage
     
     Args:
         file_content: Binary content of the file
         file_path: Path within the bucket (e.g., "reports/2024/image.jpg")
+        content_type: MIME type stored with the file
+        bucket: Bucket to upload to (defaults to the public uploads bucket)
     
     Returns:
         Public URL of the uploaded file
     """
     try:
         # Upload to Supabase Storage
-        result = supabase.storage.from_(BUCKET_NAME).upload(
+        result = supabase.storage.from_(bucket).upload(
             file_path,
             file_content,
-            file_options={"content-type": "image/jpeg"}  # Adjust based on file type
+            file_options={"content-type": content_type}
         )
         
         # Get public URL
-        public_url = supabase.storage.from_(BUCKET_NAME).get_public_url(file_path)
+        public_url = supabase.storage.from_(bucket).get_public_url(file_path)
         
         return public_url
     except Exception as e:
@@ -36,6 +39,11 @@ def upload_file(file_content: bytes, file_path: str) -> str:
         raise
 
 
+async def upload_file_async(file_content: bytes, file_path: str) -> str:
+    """upload_file() on the offload I/O pool, for use from async handlers."""
+    return await run_io(upload_file, file_content, file_path)
+
+
 def delete_file(file_path: str) -> bool:
     """
     Delete a file from Supabase Storage
@@ -54,6 +62,20 @@ def delete_file(file_path: str) -> bool:
         return False
 
 
+def download_file(file_path: str, bucket: str = BUCKET_NAME) -> bytes:
+    """
+    Download a file with the service key (works for private buckets)
+    
+    Args:
+        file_path: Path within the bucket
+        bucket: Bucket to read from
+    
+    Returns:
+        Binary content of the file
+    """
+    return supabase.storage.from_(bucket).download(file_path)
+
+
 def get_file_url(file_path: str) -> str:
     """
     Get the public URL for a file
@@ -0,0 +1,82 @@
+"""
+In-process cache for current-user resolution.
+
+Every HTMX partial resolves the logged-in user from the access_token cookie,
+which used to mean one ``users`` lookup per request. Users are cached here by
+lower-cased email for USER_CACHE_TTL seconds, with at most
+USER_CACHE_MAX_ENTRIES kept (least recently used are dropped first). Admin
+edits and deletes call invalidate() so role changes and removals take effect
+on the next request; anything else is at most one TTL stale.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "256"))
+
+
+def _key(email: Optional[str]) -> str:
+    return (email or "").strip().lower()
+
+
+class UserCache:
+    def __init__(self, ttl: float = USER_CACHE_TTL, max_entries: int = USER_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max(max_entries, 1)
+        # email -> (expires_at, user)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, email: str):
+        key = _key(email)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+
+    def put(self, email: str, user):
+        if user is None or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[_key(email)] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(_key(email))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def get_or_load(self, email: str, loader: Callable[[str], Awaitable]):
+        user = self.get(email)
+        if user is None:
+            # Unknown emails are not cached, so a newly added user can log in straight away.
+            user = await loader(email)
+            self.put(email, user)
+        return user
+
+    def invalidate(self, email: Optional[str] = None, user_id: Optional[int] = None):
+        """Drop a user by email and/or id (an edit may have changed the email)."""
+        with self._lock:
+            if email:
+                self._entries.pop(_key(email), None)
+            if user_id is not None:
+                for key in [k for k, (_, user) in self._entries.items() if user.id == user_id]:
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+user_cache = UserCache()
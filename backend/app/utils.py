@@ -1,5 +1,9 @@
+import hashlib
+import json
 import urllib.parse
 import os
+from fastapi import Request
+from fastapi.responses import Response
 from . import models
 
 
@@ -107,3 +111,26 @@ def generate_whatsapp_app_link(job: models.Job, engineer: models.Engineer, host:
         return None
     text = web.split("text=", 1)[1] if "text=" in web else ""
     return f"whatsapp://send?phone={phone}&text={text}"
+
+
+def _json_body(content) -> str:
+    return json.dumps(content, separators=(",", ":"), default=str)
+
+
+def json_response_with_etag(request: Request, content, version: str = None) -> Response:
+    """
+    Return JSON with an ETag, or an empty 304 if the client already has it.
+    The ETag is a hash of the body unless ``version`` names the content instead,
+    in which case a 304 is answered without serialising the content at all.
+    """
+    body = None
+    if version is None:
+        body = _json_body(content)
+        version = hashlib.sha1(body.encode("utf-8")).hexdigest()
+    etag = f'W/"{version}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in [tag.strip() for tag in (request.headers.get("if-none-match") or "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    if body is None:
+        body = _json_body(content)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,52 @@
+-- Safe to run multiple times.
+-- Indexed, ranked search over archived jobs (job number, client, site) for
+-- the manager diary's archive tab. search_archived_jobs() is called through
+-- the REST API by app/archive_search.py.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE OR REPLACE FUNCTION job_search_text(job_number TEXT, client_name TEXT, site_name TEXT)
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT lower(concat_ws(' ', job_number, client_name, site_name));
+$$;
+
+-- Substring matches (the old ilike '%q%' behaviour) served by a trigram index.
+CREATE INDEX IF NOT EXISTS idx_jobs_archive_search_trgm
+    ON jobs USING gin (job_search_text(job_number, client_name, site_name) gin_trgm_ops)
+    WHERE status = 'Archived';
+
+-- Whole-word matches, used for ranking.
+CREATE INDEX IF NOT EXISTS idx_jobs_archive_search_tsv
+    ON jobs USING gin (to_tsvector('simple', job_search_text(job_number, client_name, site_name)))
+    WHERE status = 'Archived';
+
+CREATE OR REPLACE FUNCTION search_archived_jobs(query TEXT, result_limit INTEGER DEFAULT 25, result_offset INTEGER DEFAULT 0)
+RETURNS SETOF jobs
+LANGUAGE sql
+STABLE
+AS $$
+    WITH q AS (
+        SELECT
+            '%' || replace(replace(replace(lower(query), '\', '\\'), '%', '\%'), '_', '\_') || '%' AS pattern,
+            plainto_tsquery('simple', query) AS words
+    )
+    SELECT j.*
+    FROM jobs j, q
+    WHERE j.status = 'Archived'
+      AND (
+          job_search_text(j.job_number, j.client_name, j.site_name) LIKE q.pattern
+          OR to_tsvector('simple', job_search_text(j.job_number, j.client_name, j.site_name)) @@ q.words
+      )
+    ORDER BY
+        ts_rank(to_tsvector('simple', job_search_text(j.job_number, j.client_name, j.site_name)), q.words) DESC,
+        similarity(job_search_text(j.job_number, j.client_name, j.site_name), lower(query)) DESC,
+        j.date DESC,
+        j.id DESC
+    LIMIT GREATEST(result_limit, 1)
+    OFFSET GREATEST(result_offset, 0);
+$$;
+
+NOTIFY pgrst, 'reload schema';
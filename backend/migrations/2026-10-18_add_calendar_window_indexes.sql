@@ -0,0 +1,13 @@
+-- Safe to run multiple times.
+-- The calendar feeds filter jobs and leave by the visible date window.
+
+CREATE INDEX IF NOT EXISTS idx_jobs_date
+    ON jobs (date);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_engineer_contact_name_date
+    ON jobs (engineer_contact_name, date);
+
+CREATE INDEX IF NOT EXISTS idx_leave_requests_engineer_name_dates
+    ON leave_requests (engineer_name, start_date, end_date);
+
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,71 @@
+-- Safe to run multiple times.
+-- One query for "which jobs is this engineer on, in what role, and who else is
+-- on them", used by app/assignments.py for the engineer portal, the staff
+-- diary and the portal's per-job access checks.
+
+CREATE INDEX IF NOT EXISTS idx_job_engineers_engineer
+    ON job_engineers (engineer_contact_name, job_number);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_engineer_contact_date
+    ON jobs (engineer_contact_name, date);
+
+-- Jobs led by for_engineer (or, when given, by for_email) or shared with them
+-- through job_engineers, optionally narrowed to one job number and to
+-- [date_from, date_to). Each row carries the job (limited to job_columns when
+-- given), the engineer's role on it and the job's job_engineers team.
+CREATE OR REPLACE FUNCTION engineer_assignments(
+    for_engineer TEXT,
+    for_email TEXT DEFAULT NULL,
+    for_job_number TEXT DEFAULT NULL,
+    date_from DATE DEFAULT NULL,
+    date_to DATE DEFAULT NULL,
+    job_columns TEXT[] DEFAULT NULL
+)
+RETURNS TABLE (
+    job JSONB,
+    assignment_role TEXT,
+    team JSONB
+)
+LANGUAGE sql
+STABLE
+AS $$
+    WITH assigned AS (
+        SELECT j.job_number, 'Lead'::TEXT AS role, 0 AS source
+        FROM jobs j
+        WHERE j.engineer_contact_name = for_engineer
+           OR (for_email IS NOT NULL AND j.engineer_email = for_email)
+        UNION ALL
+        SELECT je.job_number, COALESCE(je.engineer_role, 'Contributing'), 1
+        FROM job_engineers je
+        WHERE je.engineer_contact_name = for_engineer
+    ),
+    mine AS (
+        SELECT a.job_number, (array_agg(a.role ORDER BY a.source))[1] AS role
+        FROM assigned a
+        WHERE for_job_number IS NULL OR a.job_number = for_job_number
+        GROUP BY a.job_number
+    )
+    SELECT
+        CASE WHEN job_columns IS NULL THEN to_jsonb(j)
+             ELSE (SELECT jsonb_object_agg(f.key, f.value) FROM jsonb_each(to_jsonb(j)) f WHERE f.key = ANY(job_columns))
+        END,
+        m.role,
+        COALESCE(
+            (
+                SELECT jsonb_agg(
+                    jsonb_build_object('engineer_contact_name', je.engineer_contact_name, 'engineer_role', je.engineer_role)
+                    ORDER BY je.id
+                )
+                FROM job_engineers je
+                WHERE je.job_number = j.job_number
+            ),
+            '[]'::JSONB
+        )
+    FROM mine m
+    JOIN jobs j ON j.job_number = m.job_number
+    WHERE (date_from IS NULL OR j.date >= date_from)
+      AND (date_to IS NULL OR j.date < date_to)
+    ORDER BY j.date, j.time;
+$$;
+
+NOTIFY pgrst, 'reload schema';
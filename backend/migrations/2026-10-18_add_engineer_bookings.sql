@@ -0,0 +1,74 @@
+-- Safe to run multiple times.
+-- Job durations and a single-query view of when engineers are busy, used by
+-- app/conflicts.py to check allocations (and whole draft weeks) for clashes.
+-- Jobs without a duration are assumed to take default_minutes.
+
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS duration_minutes INTEGER;
+
+CREATE INDEX IF NOT EXISTS idx_job_engineers_job_number
+    ON job_engineers (job_number);
+
+CREATE INDEX IF NOT EXISTS idx_leave_requests_approved_dates
+    ON leave_requests (start_date, end_date)
+    WHERE status = 'Approved';
+
+-- Every job (lead or job_engineers member) and approved leave day range that
+-- overlaps [window_start, window_end), one row per engineer. Leave runs from
+-- the start of start_date to the end of end_date. Jobs are assumed to finish
+-- within a day, so only jobs dated from the day before the window are read.
+CREATE OR REPLACE FUNCTION engineer_bookings(
+    window_start TIMESTAMP,
+    window_end TIMESTAMP,
+    engineer_names TEXT[] DEFAULT NULL,
+    exclude_job_number TEXT DEFAULT NULL,
+    default_minutes INTEGER DEFAULT 120
+)
+RETURNS TABLE (
+    engineer_name TEXT,
+    kind TEXT,
+    job_number TEXT,
+    client_name TEXT,
+    reason TEXT,
+    starts_at TIMESTAMP,
+    ends_at TIMESTAMP
+)
+LANGUAGE sql
+STABLE
+AS $$
+    WITH window_jobs AS (
+        SELECT
+            j.job_number,
+            j.client_name,
+            j.engineer_contact_name,
+            j.date + j.time AS starts_at,
+            j.date + j.time + make_interval(mins => COALESCE(j.duration_minutes, default_minutes)) AS ends_at
+        FROM jobs j
+        WHERE j.status <> 'Archived'
+          AND j.date BETWEEN window_start::date - 1 AND window_end::date
+          AND j.job_number IS DISTINCT FROM exclude_job_number
+    ),
+    team AS (
+        SELECT wj.engineer_contact_name AS engineer_name, wj.job_number, wj.client_name, wj.starts_at, wj.ends_at
+        FROM window_jobs wj
+        WHERE wj.engineer_contact_name IS NOT NULL
+        UNION
+        SELECT je.engineer_contact_name, wj.job_number, wj.client_name, wj.starts_at, wj.ends_at
+        FROM window_jobs wj
+        JOIN job_engineers je ON je.job_number = wj.job_number
+    )
+    SELECT t.engineer_name, 'job', t.job_number, t.client_name, NULL, t.starts_at, t.ends_at
+    FROM team t
+    WHERE t.starts_at < window_end
+      AND t.ends_at > window_start
+      AND (engineer_names IS NULL OR t.engineer_name = ANY(engineer_names))
+    UNION ALL
+    SELECT l.engineer_name, 'leave', NULL, NULL, l.reason, l.start_date::timestamp, (l.end_date + 1)::timestamp
+    FROM leave_requests l
+    WHERE l.status = 'Approved'
+      AND l.start_date::timestamp < window_end
+      AND (l.end_date + 1)::timestamp > window_start
+      AND (engineer_names IS NULL OR l.engineer_name = ANY(engineer_names))
+    ORDER BY 1, 6;
+$$;
+
+NOTIFY pgrst, 'reload schema';
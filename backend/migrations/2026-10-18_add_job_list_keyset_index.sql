@@ -0,0 +1,7 @@
+-- Safe to run multiple times.
+-- The manager diary and job list page through jobs in (date, time, id) order.
+
+CREATE INDEX IF NOT EXISTS idx_jobs_date_time_id
+    ON jobs (date, time, id);
+
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,57 @@
+-- Safe to run multiple times.
+-- Job numbers (pnjNNNN) are handed out from a counter row instead of scanning
+-- every job. reserve_job_numbers() is called through the REST API by
+-- app/job_numbers.py; first_free_job_number() backs the optional gap-reuse mode.
+
+CREATE TABLE IF NOT EXISTS job_number_counters (
+    name TEXT PRIMARY KEY,
+    next_value BIGINT NOT NULL
+);
+
+INSERT INTO job_number_counters (name, next_value)
+SELECT 'pnj', COALESCE(MAX(substring(job_number FROM '^[pP][nN][jJ](\d+)$')::BIGINT), 0) + 1
+FROM jobs
+ON CONFLICT (name) DO NOTHING;
+
+ALTER TABLE IF EXISTS job_number_counters
+    DISABLE ROW LEVEL SECURITY;
+
+-- Atomically reserve block_size consecutive numbers; returns the first one.
+CREATE OR REPLACE FUNCTION reserve_job_numbers(block_size INTEGER DEFAULT 1)
+RETURNS BIGINT
+LANGUAGE sql
+AS $$
+    UPDATE job_number_counters
+    SET next_value = next_value + GREATEST(block_size, 1)
+    WHERE name = 'pnj'
+    RETURNING next_value - GREATEST(block_size, 1);
+$$;
+
+-- Move the counter past a number that was entered by hand.
+CREATE OR REPLACE FUNCTION bump_job_number_counter(used_value BIGINT)
+RETURNS BIGINT
+LANGUAGE sql
+AS $$
+    UPDATE job_number_counters
+    SET next_value = GREATEST(next_value, used_value + 1)
+    WHERE name = 'pnj'
+    RETURNING next_value;
+$$;
+
+-- Lowest pnj number not used by any job (gap-reuse mode).
+CREATE OR REPLACE FUNCTION first_free_job_number()
+RETURNS BIGINT
+LANGUAGE sql
+STABLE
+AS $$
+    WITH used AS (
+        SELECT DISTINCT substring(job_number FROM '^[pP][nN][jJ](\d+)$')::BIGINT AS n
+        FROM jobs
+        WHERE job_number ~* '^pnj\d+$'
+    )
+    SELECT MIN(candidate)
+    FROM (SELECT 1::BIGINT AS candidate UNION ALL SELECT n + 1 FROM used) candidates
+    WHERE candidate NOT IN (SELECT n FROM used);
+$$;
+
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,23 @@
+-- Safe to run multiple times.
+-- Notifications that could not be delivered after every retry (or that were
+-- dropped because the send queue was full) are kept here by
+-- app/notifications.py so they can be inspected and re-sent by hand.
+
+CREATE TABLE IF NOT EXISTS notification_dead_letters (
+    id BIGSERIAL PRIMARY KEY,
+    channel TEXT NOT NULL,
+    recipient TEXT,
+    subject TEXT,
+    body TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS notification_dead_letters_created_at_idx
+    ON notification_dead_letters (created_at DESC);
+
+ALTER TABLE IF EXISTS notification_dead_letters
+    DISABLE ROW LEVEL SECURITY;
+
+NOTIFY pgrst, 'reload schema';
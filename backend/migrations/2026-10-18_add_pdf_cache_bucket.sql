@@ -0,0 +1,7 @@
+-- Safe to run multiple times.
+-- Private bucket for the rendered report PDF mirror (PDF_CACHE_MIRROR).
+-- Objects are read back with the service key, never through a public URL.
+
+INSERT INTO storage.buckets (id, name, public)
+VALUES ('pnj-pdf-cache', 'pnj-pdf-cache', false)
+ON CONFLICT (id) DO UPDATE SET public = false;
@@ -0,0 +1,15 @@
+-- Safe to run multiple times.
+-- Report media is uploaded to storage in the background after submission.
+-- upload_status: pending, uploaded, failed. Existing rows are already uploaded.
+
+ALTER TABLE IF EXISTS extraction_photos
+    ADD COLUMN IF NOT EXISTS upload_status TEXT NOT NULL DEFAULT 'uploaded';
+
+ALTER TABLE IF EXISTS extraction_photos
+    ADD COLUMN IF NOT EXISTS storage_path TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_extraction_photos_pending
+    ON extraction_photos (upload_status)
+    WHERE upload_status = 'pending';
+
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,128 @@
+import os
+import sys
+
+import pytest
+
+# The app reads these at import time; tests never talk to the real services.
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+os.environ.setdefault("WORKOS_API_KEY", "test-key")
+os.environ.setdefault("WORKOS_CLIENT_ID", "test-client")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db import db  # noqa: E402
+from app import security  # noqa: E402
+from app.job_numbers import job_number_allocator  # noqa: E402
+from app.user_cache import user_cache  # noqa: E402
+from app.dashboard_snapshot import dashboard_snapshot  # noqa: E402
+from app.reference_data import reference_data  # noqa: E402
+from app.engineer_auth import engineer_auth  # noqa: E402
+from app import query_stats  # noqa: E402
+
+
+@pytest.fixture
+def local_db():
+    """Point the app at a fresh in-memory SQLite stand-in for one test."""
+    previous = db.use(None)
+    backend = db.use_local()
+    job_number_allocator.reset()
+    user_cache.clear()
+    dashboard_snapshot.invalidate()
+    reference_data.invalidate()
+    engineer_auth.clear()
+    yield backend
+    db.use(previous)
+    job_number_allocator.reset()
+    user_cache.clear()
+    dashboard_snapshot.invalidate()
+    reference_data.invalidate()
+    engineer_auth.clear()
+
+
+class Factory:
+    """Inserts rows into the local backend with test defaults; keyword arguments set any other column."""
+
+    JOB_DEFAULTS = {"date": "2026-03-02", "time": "09:00:00", "client_name": "Acme", "priority": "Medium", "status": "Scheduled"}
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def insert(self, table: str, **row) -> dict:
+        self.backend.execute_sql(
+            f"INSERT INTO {table} ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})",
+            tuple(row.values()),
+        )
+        return row
+
+    def job(self, job_number: str, **columns) -> dict:
+        return self.insert("jobs", **{"job_number": job_number, **self.JOB_DEFAULTS, **columns})
+
+    def engineer(self, contact_name: str, **columns) -> dict:
+        return self.insert("engineers", contact_name=contact_name, **columns)
+
+    def assign(self, job_number: str, engineer: str, role: str = "Contributing") -> dict:
+        return self.insert("job_engineers", job_number=job_number, engineer_contact_name=engineer, engineer_role=role)
+
+    def leave(self, engineer: str, start_date: str, end_date: str, reason: str = "Holiday", status: str = "Approved") -> dict:
+        return self.insert("leave_requests", engineer_name=engineer, start_date=start_date, end_date=end_date,
+                           reason=reason, status=status)
+
+
+@pytest.fixture
+def factory(local_db):
+    """Row factory for the test's local backend: factory.job(...), factory.engineer(...)."""
+    return Factory(local_db)
+
+
+@pytest.fixture
+def client(local_db):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def admin_client(client, local_db):
+    local_db.execute_sql(
+        "INSERT INTO users (username, email, password, role) VALUES (?, ?, ?, ?)",
+        ("admin", "admin@example.com", "x", "Admin"),
+    )
+    client.cookies.set("access_token", security.create_access_token({"sub": "admin@example.com"}))
+    return client
+
+
+class QueryBudgetRecorder:
+    """Requests seen during a test, with their query counts and budgets."""
+
+    def __init__(self):
+        self.requests = []
+        self.budgets = {}
+
+    def limit(self, route: str, budget: int):
+        """Set a budget for one test, e.g. limit("GET /api/engineer/{token}/sync", 3)."""
+        self.budgets[route] = budget
+
+    def __call__(self, route, queries, budget):
+        self.requests.append((route, queries, self.budgets.get(route, budget)))
+
+    def over_budget(self):
+        return [
+            f"{route} ran {queries.count} queries (budget {budget}): {queries.summary()}"
+            for route, queries, budget in self.requests
+            if budget is not None and queries.count > budget
+        ]
+
+
+@pytest.fixture
+def query_budget():
+    """Fail the test if any request runs more queries than its route's @query_budget."""
+    recorder = QueryBudgetRecorder()
+    query_stats.listeners.append(recorder)
+    yield recorder
+    query_stats.listeners.remove(recorder)
+    over = recorder.over_budget()
+    if over:
+        pytest.fail("Query budget exceeded:\n" + "\n".join(over))
@@ -0,0 +1,57 @@
+import asyncio
+
+from app.archive_search import normalise_query, search_archived_jobs
+
+
+def _seed(factory):
+    rows = [
+        ("pnj0001", "Acme Foods", "Leeds Central", "Archived", "2026-01-01"),
+        ("pnj0002", "Acme Foods", "London Bridge", "Archived", "2026-02-01"),
+        ("pnj0003", "Burger Co", "Acme Park", "Archived", "2026-03-01"),
+        ("pnj0004", "Acme Foods", "Leeds Central", "Scheduled", "2026-04-01"),
+    ]
+    for job_number, client, site, status, date in rows:
+        factory.job(job_number, client_name=client, site_name=site, status=status, date=date, priority="Low")
+
+
+def _numbers(jobs):
+    return [job.job_number for job in jobs]
+
+
+def test_search_is_indexed_ranked_and_archived_only(local_db, factory):
+    _seed(factory)
+    local_db.reset_query_log()
+
+    jobs, has_more = asyncio.run(search_archived_jobs("acme leeds"))
+    assert _numbers(jobs) == ["pnj0001"] and not has_more
+    assert local_db.query_log == [("rpc/search_archived_jobs", "rpc")]
+
+    jobs, _ = asyncio.run(search_archived_jobs("acme"))
+    assert sorted(_numbers(jobs)) == ["pnj0001", "pnj0002", "pnj0003"]
+    assert _numbers(asyncio.run(search_archived_jobs("0002"))[0]) == ["pnj0002"]
+
+    local_db.execute_sql("UPDATE jobs SET site_name = 'York Road' WHERE job_number = 'pnj0001'")
+    assert _numbers(asyncio.run(search_archived_jobs("acme leeds"))[0]) == []
+
+
+def test_results_are_paged_with_load_more(local_db, factory):
+    _seed(factory)
+    first, has_more = asyncio.run(search_archived_jobs("acme", limit=2))
+    rest, more_after = asyncio.run(search_archived_jobs("acme", limit=2, offset=2))
+    assert has_more and not more_after
+    assert sorted(_numbers(first + rest)) == ["pnj0001", "pnj0002", "pnj0003"]
+
+    recent, _ = asyncio.run(search_archived_jobs("", limit=2))
+    assert _numbers(recent) == ["pnj0003", "pnj0002"]
+
+
+def test_falls_back_to_ilike_without_the_rpc(local_db, factory):
+    _seed(factory)
+    local_db.rpcs.pop("search_archived_jobs")
+    jobs, _ = asyncio.run(search_archived_jobs("london"))
+    assert _numbers(jobs) == ["pnj0002"]
+
+
+def test_query_normalisation():
+    assert normalise_query("  acme,  (leeds)* ") == "acme leeds"
+    assert len(normalise_query("x" * 500)) == 100
@@ -0,0 +1,71 @@
+import asyncio
+import uuid
+
+from app.assignments import fetch_assignments, role_for_job
+
+
+def _seed(factory):
+    factory.job("pnj0001", engineer_contact_name="Alice")
+    factory.assign("pnj0001", "Alice", "Lead")
+    factory.job("pnj0002", time="08:00:00", engineer_contact_name="Bob")
+    for name, role in (("Bob", "Lead"), ("Alice", "Contributing"), ("Carol", "Supervisor")):
+        factory.assign("pnj0002", name, role)
+    factory.job("pnj0003", time="10:00:00", engineer_contact_name="Bob")
+    factory.job("pnj0004", date="2026-03-09", engineer_contact_name="Dan", engineer_email="alice@example.com")
+
+
+def _summary(jobs):
+    return [(job.job_number, job.assignment_role, job.engineer_team, job.supervisor_name) for job in jobs]
+
+
+def test_jobs_roles_and_teams_come_back_in_one_query(local_db, factory):
+    _seed(factory)
+
+    local_db.reset_query_log()
+    jobs = asyncio.run(fetch_assignments("Alice", start_date="2026-03-01", end_date="2026-03-08"))
+
+    assert local_db.query_log == [("rpc/engineer_assignments", "rpc")]
+    assert _summary(jobs) == [
+        ("pnj0002", "Contributing", ["Bob", "Alice", "Carol"], "Carol"),
+        ("pnj0001", "Lead", ["Alice"], None),
+    ]
+    assert jobs[0].contributing_engineer_names == ["Alice"]
+    assert [job.job_number for job in asyncio.run(fetch_assignments("Alice", date="2026-03-09"))] == []
+    by_email = asyncio.run(fetch_assignments("Alice", engineer_email="alice@example.com"))
+    assert [(job.job_number, job.assignment_role) for job in by_email][-1] == ("pnj0004", "Lead")
+
+
+def test_table_fallback_matches_the_rpc(local_db, factory):
+    _seed(factory)
+    expected = _summary(asyncio.run(fetch_assignments("Alice", start_date="2026-03-01", end_date="2026-03-08")))
+
+    local_db.rpcs.pop("engineer_assignments")
+    local_db.reset_query_log()
+    jobs = asyncio.run(fetch_assignments("Alice", start_date="2026-03-01", end_date="2026-03-08"))
+
+    assert _summary(jobs) == expected
+    assert len(local_db.query_log) == 5
+
+
+def test_role_checks_take_one_query_each(local_db, factory):
+    _seed(factory)
+
+    local_db.reset_query_log()
+    assert asyncio.run(role_for_job("Carol", "pnj0002")) == "Supervisor"
+    assert asyncio.run(role_for_job("Carol", "pnj0003")) is None
+    assert asyncio.run(role_for_job("Alice", "pnj0002")) == "Contributing"
+    assert asyncio.run(role_for_job("Carol", "pnj9999")) is None
+    assert len(local_db.query_log) == 4
+
+
+def test_engineer_calendar_uses_the_projection(client, local_db, factory):
+    _seed(factory)
+    token = str(uuid.uuid4())
+    factory.engineer("Alice", access_token=token)
+
+    local_db.reset_query_log()
+    response = client.get(f"/api/engineer/{token}/events", params={"start": "2026-03-01", "end": "2026-03-08"})
+
+    assert response.status_code == 200
+    assert [event["title"] for event in response.json()] == ["Acme (Contributing)", "Acme (Lead)"]
+    assert [table for table, _ in local_db.query_log] == ["engineers", "rpc/engineer_assignments", "leave_requests"]
@@ -0,0 +1,44 @@
+def _seed(factory):
+    factory.insert("clients", client_name="Acme")
+    factory.engineer("Gary", access_token="11111111-1111-1111-1111-111111111111")
+    for job_number, date, engineer in (
+        ("pnj0001", "2026-01-05", "Gary"),
+        ("pnj0002", "2026-02-10", "Gary"),
+        ("pnj0003", "2026-02-11", None),
+    ):
+        factory.job(job_number, date=date, priority="High", engineer_contact_name=engineer)
+    factory.leave("Gary", "2026-01-28", "2026-02-03")
+    factory.leave("Gary", "2025-06-01", "2025-06-02", reason="Old")
+
+
+def test_admin_events_are_windowed_and_conditional(admin_client, local_db, factory):
+    _seed(factory)
+    params = {"start": "2026-02-01T00:00:00Z", "end": "2026-03-01T00:00:00Z"}
+
+    response = admin_client.get("/api/admin/events", params=params)
+    assert response.status_code == 200
+    assert [event["start"] for event in response.json()] == ["2026-02-10T09:00:00", "2026-02-11T09:00:00"]
+
+    cached = admin_client.get("/api/admin/events", params=params, headers={"If-None-Match": response.headers["ETag"]})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    local_db.execute_sql("UPDATE jobs SET status = 'Completed' WHERE job_number = 'pnj0002'")
+    changed = admin_client.get("/api/admin/events", params=params, headers={"If-None-Match": response.headers["ETag"]})
+    assert changed.status_code == 200
+
+
+def test_engineer_events_include_only_overlapping_leave(client, local_db, factory):
+    _seed(factory)
+    response = client.get(
+        "/api/engineer/11111111-1111-1111-1111-111111111111/events",
+        params={"start": "2026-02-01", "end": "2026-03-01"},
+    )
+    assert response.status_code == 200
+    titles = [event["title"] for event in response.json()]
+    assert titles == ["Acme (Lead)", "Leave: Holiday"]
+    assert "ETag" in response.headers
+
+
+def test_invalid_window_is_rejected(admin_client, local_db):
+    assert admin_client.get("/api/admin/events", params={"start": "soon"}).status_code == 400
@@ -0,0 +1,37 @@
+import asyncio
+
+from app.db import db
+from app.routers.crm import _clients_with_site_counts
+
+
+def _seed(factory):
+    for client in ("Acme", "Beta", "Empty"):
+        factory.insert("clients", client_name=client)
+    for client, site_name, code, archived in (("Acme", "Leeds", "A1", 0), ("Acme", "Hull", "A2", 1), ("Beta", "York", None, 0)):
+        factory.insert("client_sites", client_name=client, site_name=site_name, store_id_code=code, archived=archived)
+
+
+def test_site_counts_come_from_one_query(local_db, factory):
+    _seed(factory)
+    local_db.reset_query_log()
+
+    clients = asyncio.run(_clients_with_site_counts(lambda columns: db.table("clients").select(columns)))
+
+    assert [(c.client_name, c.site_count) for c in clients] == [("Acme", 2), ("Beta", 1), ("Empty", 0)]
+    assert local_db.query_log == [("clients", "select")]
+
+
+def test_site_counts_fall_back_without_the_relationship(local_db, monkeypatch, factory):
+    _seed(factory)
+    monkeypatch.setattr(local_db, "relationship", lambda parent, child: None)
+
+    clients = asyncio.run(_clients_with_site_counts(lambda columns: db.table("clients").select(columns).eq("client_name", "Acme")))
+
+    assert [(c.client_name, c.site_count) for c in clients] == [("Acme", 2)]
+
+
+def test_client_sites_expand_lazily(admin_client, local_db, factory):
+    _seed(factory)
+    body = admin_client.get("/admin/manage/clients/Acme/sites").text
+    assert "Leeds" in body and "A1" in body and "line-through" in body
+    assert "No stores linked" in admin_client.get("/admin/manage/clients/Empty/sites").text
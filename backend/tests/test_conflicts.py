@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime
+
+from app.conflicts import busy_between
+from app.routers.scheduler import _format_slot_conflict, _get_slot_conflicts
+
+
+def _seed(factory):
+    factory.job("pnj0001", engineer_contact_name="Gary")  # default 120 minutes
+    factory.job("pnj0002", time="14:00:00", engineer_contact_name="Dave", duration_minutes=30)
+    factory.job("pnj0003", time="10:00:00", engineer_contact_name="Dave", status="Archived")
+    factory.assign("pnj0001", "Sam")
+    factory.leave("Lee", "2026-03-02", "2026-03-03")
+    factory.leave("Dave", "2026-03-02", "2026-03-02", reason="Dentist", status="Pending")
+
+
+def _busy(start, end):
+    busy = asyncio.run(busy_between(["Gary", "Dave", "Sam", "Lee"], datetime.fromisoformat(start), datetime.fromisoformat(end)))
+    return {name: sorted(booking.job_number or booking.kind for booking in bookings) for name, bookings in busy.items()}
+
+
+def test_whole_team_is_checked_against_durations_and_leave_in_one_query(local_db, factory):
+    _seed(factory)
+
+    local_db.reset_query_log()
+    assert _busy("2026-03-02T10:30", "2026-03-02T11:30") == {"Gary": ["pnj0001"], "Sam": ["pnj0001"], "Lee": ["leave"]}
+    assert local_db.query_log == [("rpc/engineer_bookings", "rpc")]
+
+    assert _busy("2026-03-02T11:00", "2026-03-02T14:00") == {"Lee": ["leave"]}
+    assert _busy("2026-03-02T14:15", "2026-03-02T15:00") == {"Dave": ["pnj0002"], "Lee": ["leave"]}
+    assert _busy("2026-03-04T00:00", "2026-03-04T09:00") == {}
+
+
+def test_table_fallback_matches_the_rpc(local_db, factory):
+    _seed(factory)
+    expected = _busy("2026-03-02T08:00", "2026-03-02T15:00")
+
+    del local_db.rpcs["engineer_bookings"]
+    assert _busy("2026-03-02T08:00", "2026-03-02T15:00") == expected
+
+
+def test_slot_conflicts_report_overlaps_and_leave(local_db, factory):
+    _seed(factory)
+
+    conflicts = asyncio.run(_get_slot_conflicts("2026-03-02", "10:00", ["Sam", "Lee", "Dave"]))
+    assert conflicts == [
+        {"job_number": "pnj0001", "client_name": "Acme", "engineers": ["Sam"], "leave_reason": None},
+        {"job_number": None, "client_name": None, "engineers": ["Lee"], "leave_reason": "Holiday"},
+    ]
+    message = _format_slot_conflict(conflicts)
+    assert "Sam already has pnj0001" in message and "Lee is on approved leave (Holiday)" in message
+
+    # Editing a job never clashes with its own booking.
+    assert asyncio.run(_get_slot_conflicts("2026-03-02", "09:30", ["Gary"], exclude_job_number="pnj0001")) == []
+
+
+def test_bulk_check_validates_a_draft_week(admin_client, local_db, factory):
+    _seed(factory)
+    local_db.reset_query_log()
+
+    response = admin_client.post("/api/admin/schedule/check", json={"jobs": [
+        {"ref": "a", "date": "2026-03-02", "time": "10:00", "engineers": ["Gary"]},
+        # Moving pnj0002 to the morning frees its afternoon slot.
+        {"ref": "b", "job_number": "pnj0002", "date": "2026-03-05", "time": "08:00", "engineers": ["Dave"]},
+        {"ref": "c", "date": "2026-03-02", "time": "14:00", "engineers": ["Dave"]},
+        {"ref": "d", "date": "2026-03-05", "time": "09:00", "duration_minutes": 60, "engineers": ["Dave", "Lee"]},
+    ]})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["checked"] == 4
+    assert [(c["ref"], c["engineer"], c["kind"], c["job_number"]) for c in body["conflicts"]] == [
+        ("a", "Gary", "job", "pnj0001"),
+        ("d", "Dave", "draft", "pnj0002"),
+    ]
+    assert [table for table, _ in local_db.query_log].count("rpc/engineer_bookings") == 1
+
+
+def test_non_positive_durations_are_rejected(admin_client, local_db, factory):
+    _seed(factory)
+
+    response = admin_client.post("/api/admin/schedule/check", json={"jobs": [
+        {"ref": "a", "date": "2026-03-02", "time": "10:00", "duration_minutes": -60, "engineers": ["Gary"]},
+    ]})
+    assert response.status_code == 422
+
+    response = admin_client.post("/admin/jobs/pnj0002/edit", data={
+        "date": "2026-03-02", "time": "13:00", "engineer_name": "Dave", "duration_minutes": "-30",
+    })
+    assert response.status_code == 422
+    assert local_db.execute_sql("SELECT time FROM jobs WHERE job_number = 'pnj0002'")[0][0] == "14:00:00"
@@ -0,0 +1,47 @@
+import asyncio
+
+from app.dashboard_snapshot import SnapshotService, dashboard_snapshot
+
+
+def _seed_jobs(factory, count):
+    for index in range(count):
+        factory.job(f"pnj{index + 1:04d}", date=f"2026-10-{index % 28 + 1:02d}")
+
+
+def test_snapshot_dedupes_the_recent_jobs_query(local_db, factory):
+    _seed_jobs(factory, 25)
+    local_db.execute_sql("INSERT INTO clients (client_name, archived) VALUES ('Old Co', 1)")
+    local_db.reset_query_log()
+
+    snapshot = asyncio.run(SnapshotService().get())
+
+    assert [table for table, _ in local_db.query_log].count("jobs") == 2  # count + recent list
+    assert len(local_db.query_log) == 7
+    assert snapshot.total_jobs == 25 and len(snapshot.recent_jobs) == 20
+    assert snapshot.all_jobs == snapshot.recent_jobs[:10]
+    assert [c.client_name for c in snapshot.archived_clients] == ["Old Co"]
+
+
+def test_concurrent_misses_share_one_build_and_invalidation_is_by_table(local_db):
+    service = SnapshotService(ttl=60)
+
+    async def scenario():
+        await asyncio.gather(*(service.get() for _ in range(5)))
+        built = local_db.query_count
+        await service.get()
+        assert local_db.query_count == built
+        service.invalidate("brands")
+        await service.get()
+        assert local_db.query_count == built
+        service.invalidate("jobs")
+        await service.get()
+        assert local_db.query_count == 2 * built
+
+    asyncio.run(scenario())
+    assert service.misses == 6 and service.hits == 2
+
+
+def test_crm_write_invalidates_the_snapshot(admin_client, local_db):
+    asyncio.run(dashboard_snapshot.get())
+    assert admin_client.post("/admin/manage/clients/add", data={"client_name": "New Co"}, follow_redirects=False).status_code == 303
+    assert asyncio.run(dashboard_snapshot.get()).total_clients == 1
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+from postgrest.exceptions import APIError
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_local_backend_round_trips_postgrest_queries(local_db):
+    run(local_db.table("clients").insert({"client_name": "Acme", "company": "Acme Ltd"}).execute())
+    run(local_db.table("clients").insert({"client_name": "Bravo", "archived": True}).execute())
+
+    res = run(local_db.table("clients").select("*").eq("archived", False).order("client_name").execute())
+    assert [row["client_name"] for row in res.data] == ["Acme"]
+    assert res.data[0]["portal_enabled"] is True
+
+    count = run(local_db.table("clients").select("client_name", count="exact").execute())
+    assert count.count == 2
+
+    either = run(local_db.table("clients").select("client_name").or_("client_name.eq.Bravo,company.ilike.%acme%").execute())
+    assert {row["client_name"] for row in either.data} == {"Acme", "Bravo"}
+
+
+def test_local_backend_reports_duplicates_like_postgres(local_db):
+    run(local_db.table("brands").insert({"brand_name": "KFC"}).execute())
+    with pytest.raises(APIError) as exc:
+        run(local_db.table("brands").insert({"brand_name": "KFC"}).execute())
+    assert exc.value.code == "23505"
+
+
+def test_local_backend_update_upsert_and_delete(local_db):
+    run(local_db.table("system_settings").upsert({"key": "a", "value": "1"}, on_conflict="key").execute())
+    run(local_db.table("system_settings").upsert({"key": "a", "value": "2"}, on_conflict="key").execute())
+    res = run(local_db.table("system_settings").select("value").eq("key", "a").execute())
+    assert res.data == [{"value": "2"}]
+
+    run(local_db.table("system_settings").update({"value": "3"}).eq("key", "a").execute())
+    run(local_db.table("system_settings").delete().eq("key", "report_notification_recipients").execute())
+    res = run(local_db.table("system_settings").select("key, value").execute())
+    assert res.data == [{"key": "a", "value": "3"}]
+
+
+def test_routes_run_against_local_backend(admin_client, local_db, factory):
+    local_db.execute_sql("INSERT INTO clients (client_name) VALUES ('Acme')")
+    factory.job("JOB-1", date="2026-01-05", priority="High")
+
+    response = admin_client.get("/api/admin/events")
+    assert response.status_code == 200
+    assert [event["title"] for event in response.json()] == ["[Unassigned] Acme"]
+
+
+def test_missing_supabase_settings_do_not_fall_back_to_sqlite(monkeypatch):
+    from app.db import Database
+    from app.local_db import LocalBackend
+
+    monkeypatch.delenv("SUPABASE_KEY", raising=False)
+    monkeypatch.delenv("PNJ_DB_BACKEND", raising=False)
+    with pytest.raises(RuntimeError, match="SUPABASE_URL and SUPABASE_KEY"):
+        Database().backend
+
+    monkeypatch.setenv("PNJ_DB_BACKEND", "local")
+    assert isinstance(Database().backend, LocalBackend)
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from app.delta_sync import DeltaSync, source_tables
+from app.local_db import LocalBackend
+
+TABLES = ["clients", "client_sites", "jobs"]
+
+
+@pytest.fixture
+def source(tmp_path):
+    backend = LocalBackend(str(tmp_path / "source.db"))
+    backend.execute_sql("INSERT INTO clients (client_name, archived) VALUES ('Acme', 0), ('Beta', 1)")
+    backend.execute_sql("INSERT INTO client_sites (client_name, site_name, frequency_number) VALUES ('Acme', 'Goat', 4)")
+    for number in range(1, 6):
+        backend.execute_sql(
+            "INSERT INTO jobs (job_number, date, time, client_name, priority, job_type) "
+            "VALUES (?, '2026-03-02', '09:00:00', 'Acme', 'Medium', 'Extraction')",
+            (f"pnj{number:04d}",),
+        )
+    return backend
+
+
+def _sync(source, target, tmp_path, **options):
+    return {
+        stats.source_table: stats
+        for stats in asyncio.run(DeltaSync(source.path, target, str(tmp_path / "state.db"), **options).run(TABLES))
+    }
+
+
+def test_first_sync_copies_rows_parents_first(source, local_db, tmp_path):
+    results = _sync(source, local_db, tmp_path, batch_size=2)
+
+    assert {name: stats.pushed for name, stats in results.items()} == {"clients": 2, "client_sites": 1, "jobs": 5}
+    assert results["jobs"].batches == 3
+    upserted = [table for table, method in local_db.query_log if method == "upsert"]
+    assert upserted.index("clients") < upserted.index("client_sites")
+    assert [tuple(row) for row in local_db.execute_sql("SELECT client_name, archived FROM clients ORDER BY client_name")] == [
+        ("Acme", 0), ("Beta", 1)
+    ]
+    assert local_db.execute_sql("SELECT COUNT(*) AS n FROM jobs")[0]["n"] == 5
+    assert "jobs_search" not in source_tables(source.path)
+
+
+def test_rerun_pushes_only_new_and_changed_rows(source, local_db, tmp_path):
+    _sync(source, local_db, tmp_path)
+
+    local_db.reset_query_log()
+    assert sum(stats.pushed for stats in _sync(source, local_db, tmp_path).values()) == 0
+    assert local_db.query_log == []
+
+    source.execute_sql("UPDATE client_sites SET frequency_number = 12 WHERE site_name = 'Goat'")
+    source.execute_sql(
+        "INSERT INTO jobs (job_number, date, time, client_name, priority, job_type) "
+        "VALUES ('pnj0006', '2026-03-03', '09:00:00', 'Acme', 'Medium', 'Extraction')"
+    )
+    results = _sync(source, local_db, tmp_path)
+
+    assert (results["client_sites"].changed, results["jobs"].new) == (1, 1)
+    assert sum(stats.pushed for stats in results.values()) == 2
+    assert local_db.execute_sql("SELECT frequency_number FROM client_sites")[0]["frequency_number"] == 12
+
+
+class FlakyTarget:
+    """Fails every upsert after the first ``allowed`` ones."""
+
+    def __init__(self, backend, allowed):
+        self.backend = backend
+        self.allowed = allowed
+
+    def table(self, name):
+        if name == "jobs":
+            self.allowed -= 1
+            if self.allowed < 0:
+                raise ConnectionError("connection dropped")
+        return self.backend.table(name)
+
+
+def test_interrupted_sync_resumes_after_last_batch(source, local_db, tmp_path):
+    with pytest.raises(ConnectionError):
+        _sync(source, FlakyTarget(local_db, allowed=1), tmp_path, batch_size=2)
+    assert local_db.execute_sql("SELECT COUNT(*) AS n FROM jobs")[0]["n"] == 2
+
+    results = _sync(source, local_db, tmp_path, batch_size=2)
+    assert results["jobs"].pushed == 3 and results["clients"].pushed == 0
+    assert local_db.execute_sql("SELECT COUNT(*) AS n FROM jobs")[0]["n"] == 5
@@ -0,0 +1,82 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+from app.engineer_auth import EngineerAuthCache
+from app.routers.scheduler import _sync_job_engineers
+
+TOKEN = str(uuid.uuid4())
+
+
+def _seed(factory):
+    factory.engineer("Carol", access_token=TOKEN)
+    factory.job("pnj0001", engineer_contact_name="Carol")
+    factory.job("pnj0002", engineer_contact_name="Bob")
+
+
+def test_resolved_context_is_cached_until_the_team_changes(local_db, factory):
+    _seed(factory)
+    cache = EngineerAuthCache(ttl=60)
+
+    async def scenario():
+        local_db.reset_query_log()
+        engineer, role = await cache.resolve(TOKEN, "pnj0001")
+        assert (engineer.contact_name, role) == ("Carol", "Lead")
+        assert len(local_db.query_log) == 2
+        assert (await cache.resolve(TOKEN, "pnj0001"))[1] == "Lead"
+        assert (await cache.resolve(TOKEN, "pnj0002"))[1] is None
+        assert len(local_db.query_log) == 3
+
+        await cache.resolve(TOKEN, "pnj0002")
+        assert len(local_db.query_log) == 3
+        cache.invalidate(job_number="pnj0002")
+        factory.assign("pnj0002", "Carol", "Supervisor")
+        assert (await cache.resolve(TOKEN, "pnj0002"))[1] == "Supervisor"
+
+        assert await cache.resolve("not-a-token", "pnj0001") == (None, None)
+        local_db.reset_query_log()
+        await cache.resolve("not-a-token", "pnj0001")
+        assert len(local_db.query_log) == 1
+
+        cache.invalidate(engineer_name="Carol")
+        local_db.reset_query_log()
+        await cache.resolve(TOKEN, "pnj0001")
+        assert len(local_db.query_log) == 2
+
+    asyncio.run(scenario())
+
+
+def test_request_memo_works_without_the_shared_cache(local_db, factory):
+    _seed(factory)
+    cache = EngineerAuthCache(ttl=0)
+    request = SimpleNamespace(state=SimpleNamespace())
+
+    async def scenario():
+        local_db.reset_query_log()
+        first = await cache.resolve(TOKEN, "pnj0001", request)
+        assert await cache.resolve(TOKEN, "pnj0001", request) is first
+        assert len(local_db.query_log) == 2
+        await cache.resolve(TOKEN, "pnj0001")
+        assert len(local_db.query_log) == 4
+
+    asyncio.run(scenario())
+
+
+def test_portal_requests_skip_auth_queries_on_a_hit(client, local_db, factory):
+    _seed(factory)
+
+    def start(job_number):
+        return client.post(
+            "/extraction-report/start",
+            data={"job_number": job_number, "portal_token": TOKEN},
+            follow_redirects=False,
+        )
+
+    assert start("pnj0001").status_code == 303
+    local_db.reset_query_log()
+    assert start("pnj0001").status_code == 303
+    assert local_db.query_log == []
+
+    assert start("pnj0002").status_code == 403
+    asyncio.run(_sync_job_engineers("pnj0002", "Bob", ["Carol"]))
+    assert start("pnj0002").status_code == 303
@@ -0,0 +1,70 @@
+import asyncio
+
+from app.job_numbers import JobNumberAllocator
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_allocations_never_repeat(local_db):
+    # Three allocators stand in for separate worker processes sharing one counter.
+    workers = [JobNumberAllocator(block_size=size) for size in (1, 5, 10)]
+
+    async def allocate_many():
+        return await asyncio.gather(*(workers[i % 3].allocate() for i in range(90)))
+
+    numbers = run(allocate_many())
+    assert len(set(numbers)) == 90
+    assert all(number.startswith("pnj") for number in numbers)
+
+
+def test_allocation_does_not_scan_jobs(local_db, factory):
+    for value in range(1, 50):
+        factory.job(f"pnj{value:04d}")
+    local_db.execute_sql("UPDATE job_number_counters SET next_value = 50")
+    local_db.reset_query_log()
+
+    allocator = JobNumberAllocator()
+    assert run(allocator.allocate()) == "pnj0050"
+    assert local_db.query_log == [("rpc/reserve_job_numbers", "rpc")]
+
+
+def test_block_reservations_are_served_from_cache(local_db):
+    allocator = JobNumberAllocator(block_size=4)
+    local_db.reset_query_log()
+
+    async def allocate_four():
+        return [await allocator.allocate() for _ in range(4)]
+
+    assert run(allocate_four()) == ["pnj0001", "pnj0002", "pnj0003", "pnj0004"]
+    assert local_db.query_count == 1
+    assert run(allocator.peek()) == "pnj0005"
+
+
+def test_manual_numbers_move_the_counter(local_db, factory):
+    allocator = JobNumberAllocator()
+    factory.job("PNJ0007")
+    run(allocator.observe("PNJ0007"))
+    run(allocator.observe("CUSTOM-1"))
+    assert run(allocator.allocate()) == "pnj0008"
+
+
+def test_gap_reuse_mode_fills_lowest_free_number(local_db, factory):
+    for job_number in ("pnj0001", "pnj0002", "pnj0004"):
+        factory.job(job_number)
+    allocator = JobNumberAllocator(reuse_gaps=True)
+    assert run(allocator.peek()) == "pnj0003"
+    assert run(allocator.allocate()) == "pnj0003"
+
+
+def test_allocate_job_route_takes_a_new_number_each_time(admin_client, local_db, factory):
+    factory.engineer("Alice")
+    form = {"date": "2099-01-05", "time": "09:00", "priority": "Medium", "client_name": "Acme", "engineer_name": "Alice"}
+
+    first = admin_client.post("/job-allocation", data=form)
+    second = admin_client.post("/job-allocation", data=dict(form, time="13:00"))
+
+    assert first.status_code == 200 and second.status_code == 200
+    rows = local_db.execute_sql("SELECT job_number FROM jobs ORDER BY id")
+    assert [row["job_number"] for row in rows] == ["pnj0001", "pnj0002"]
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.routers.scheduler import _get_job_page, _job_list_window
+
+
+def test_pages_walk_every_unfinished_job_once_in_order(local_db, factory):
+    for index in range(12):
+        # Many ties on (date, time) so the id tiebreaker matters.
+        factory.job(f"pnj{index + 1:04d}", date=f"2026-03-0{index % 3 + 1}", time="08:00:00" if index % 2 else "09:00:00")
+    factory.job("pnj0099", date="2026-03-01", status="Archived")
+    factory.job("pnj0100", date="2026-05-01")
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        local_db.reset_query_log()
+        jobs, cursor = asyncio.run(_get_job_page("2026-03-01", "2026-04-01", cursor=cursor, limit=5))
+        assert [table for table, _ in local_db.query_log] == ["jobs", "job_engineers"]
+        seen.extend(jobs)
+        pages += 1
+        if not cursor:
+            break
+
+    assert pages == 3
+    assert len({job.job_number for job in seen}) == len(seen) == 12
+    keys = [(job.date, job.time, job.id) for job in seen]
+    assert keys == sorted(keys)
+
+
+def test_engineer_status_and_job_type_filters(factory):
+    factory.job("pnj0001", date="2026-03-01", engineer_contact_name="Gary")
+    factory.job("pnj0002", date="2026-03-02", engineer_contact_name="Dave")
+    factory.job("pnj0003", date="2026-03-03", engineer_contact_name="Dave", status="In Progress", notes="[CALL OUT] Fan noise")
+    factory.job("pnj0004", date="2026-03-04", engineer_contact_name="Dave", job_type="Breakdown/Callout")
+    factory.assign("pnj0002", "Gary")
+
+    def numbers(**filters):
+        jobs, _ = asyncio.run(_get_job_page("2026-03-01", "2026-04-01", **filters))
+        return [job.job_number for job in jobs]
+
+    assert numbers(engineer_name="Gary") == ["pnj0001", "pnj0002"]
+    assert numbers(status="In Progress") == ["pnj0003"]
+    assert numbers(job_type="Breakdown/Callout") == ["pnj0003", "pnj0004"]
+    assert numbers(job_type="Extraction") == ["pnj0001", "pnj0002"]
+
+
+def test_window_defaults_and_bad_cursor(local_db):
+    start, end = _job_list_window("2026-03-01", "2026-03-31")
+    assert (start, end) == ("2026-03-01", "2026-04-01")
+    with pytest.raises(HTTPException):
+        asyncio.run(_get_job_page(start, end, cursor="not-a-cursor"))
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import smtplib
+
+import httpx
+
+from app.notifications import Notification, NotificationDispatcher, ReportRecipients, SMTPPool
+
+
+class FakeSMTP:
+    def __init__(self, refuse=()):
+        self.refuse = set(refuse)
+        self.sent = []
+        self.closed = False
+
+    def noop(self):
+        return (250, b"OK")
+
+    def send_message(self, message):
+        if message["To"] in self.refuse:
+            raise smtplib.SMTPRecipientsRefused({message["To"]: (550, b"no such user")})
+        self.sent.append(message["To"])
+
+    def quit(self):
+        self.closed = True
+
+
+def test_queued_emails_share_one_pooled_session(local_db, monkeypatch):
+    monkeypatch.setenv("SMTP_FROM", "reports@example.com")
+    sessions = []
+
+    def connect():
+        sessions.append(FakeSMTP())
+        return sessions[-1]
+
+    dispatcher = NotificationDispatcher(workers=1, retry_delay=0, smtp_pool=SMTPPool(connect=connect))
+
+    async def scenario():
+        for address in ("a@example.com", "b@example.com", "c@example.com"):
+            dispatcher.submit(Notification("email", address, "Report", "Body"))
+        await dispatcher.join()
+        dispatcher.submit(Notification("email", "d@example.com", "Report", "Body"))
+        await dispatcher.join()
+        await dispatcher.stop()
+
+    asyncio.run(scenario())
+
+    assert len(sessions) == 1
+    assert sessions[0].sent == ["a@example.com", "b@example.com", "c@example.com", "d@example.com"]
+    assert sessions[0].closed
+    assert dispatcher.sent == 4
+
+
+def test_failures_back_off_then_dead_letter(local_db, monkeypatch):
+    monkeypatch.setenv("SMTP_FROM", "reports@example.com")
+    monkeypatch.setenv("WHATSAPP_NOTIFY_WEBHOOK_URL", "https://hooks.example.com/wa")
+    smtp = FakeSMTP(refuse={"gone@example.com"})
+    calls = []
+
+    def webhook(request):
+        calls.append(json.loads(request.content))
+        return httpx.Response(503 if len(calls) == 1 else 200)
+
+    dispatcher = NotificationDispatcher(
+        workers=1, max_attempts=2, retry_delay=0,
+        smtp_pool=SMTPPool(connect=lambda: smtp),
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(webhook)),
+    )
+
+    async def scenario():
+        dispatcher.submit(Notification("email", "gone@example.com", "Report", "Body"))
+        dispatcher.submit(Notification("email", "ok@example.com", "Report", "Body"))
+        dispatcher.submit(Notification("whatsapp", "+447700900123", "Report", "Body"))
+        await dispatcher.join()
+        await dispatcher.stop()
+
+    asyncio.run(scenario())
+
+    assert smtp.sent == ["ok@example.com"]
+    assert calls == [{"to": "+447700900123", "message": "Body"}] * 2
+    rows = local_db.execute_sql("SELECT channel, recipient, attempts, error FROM notification_dead_letters")
+    # A 550 refusal is permanent, so it is dead-lettered without a retry.
+    assert [(row["channel"], row["recipient"], row["attempts"]) for row in rows] == [("email", "gone@example.com", 1)]
+    assert "no such user" in rows[0]["error"]
+
+
+def test_a_failing_delivery_step_still_settles_every_item(local_db, monkeypatch):
+    monkeypatch.setenv("SMTP_FROM", "reports@example.com")
+    smtp = FakeSMTP()
+
+    def flaky_send(messages):
+        raise RuntimeError("worker bug")
+
+    dispatcher = NotificationDispatcher(workers=1, max_attempts=2, retry_delay=0, smtp_pool=SMTPPool(connect=lambda: smtp))
+    dispatcher.smtp.send = flaky_send
+
+    async def scenario():
+        dispatcher.submit(Notification("email", "bad\naddress@example.com", "Report", "Body"))
+        dispatcher.submit(Notification("email", "ok@example.com", "Report", "Body"))
+        await asyncio.wait_for(dispatcher.join(), timeout=5)
+        await dispatcher.stop()
+
+    asyncio.run(scenario())
+
+    rows = local_db.execute_sql("SELECT recipient, attempts FROM notification_dead_letters ORDER BY id")
+    assert [tuple(row) for row in rows] == [("bad\naddress@example.com", 1), ("ok@example.com", 2)]
+
+
+def test_full_queue_dead_letters_instead_of_blocking(local_db):
+    dispatcher = NotificationDispatcher(queue_size=1, workers=1, smtp_pool=SMTPPool(connect=FakeSMTP))
+
+    async def scenario():
+        assert dispatcher.submit(Notification("whatsapp", "+447700900123", "", "one"))
+        assert not dispatcher.submit(Notification("whatsapp", "+447700900124", "", "two"))
+        await dispatcher.stop()
+
+    asyncio.run(scenario())
+    rows = local_db.execute_sql("SELECT recipient, error FROM notification_dead_letters")
+    assert [tuple(row) for row in rows] == [("+447700900124", "queue full")]
+
+
+def test_report_recipients_are_cached_until_invalidated(local_db):
+    local_db.execute_sql(
+        "INSERT INTO users (id, username, email, password, role) VALUES (1, 'admin', 'admin@example.com', 'x', 'Admin')"
+    )
+    local_db.execute_sql(
+        "UPDATE system_settings SET value = ? WHERE key = 'report_notification_recipients'",
+        (json.dumps([{"user_id": 1, "email": True, "whatsapp": True, "whatsapp_number": "07700 900123"}]),),
+    )
+    recipients = ReportRecipients(ttl=60)
+
+    async def scenario():
+        first = await recipients.get()
+        local_db.reset_query_log()
+        assert await recipients.get() == first
+        assert local_db.query_log == []
+        local_db.execute_sql("UPDATE system_settings SET value = '[]' WHERE key = 'report_notification_recipients'")
+        recipients.invalidate()
+        return first, await recipients.get()
+
+    first, after = asyncio.run(scenario())
+    assert first == [
+        {"channel": "email", "recipient": "admin@example.com"},
+        {"channel": "whatsapp", "recipient": "447700900123"},
+    ]
+    assert after == []
@@ -0,0 +1,45 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+from app import security
+from app.loop_monitor import LoopLagMonitor
+from app.offload import run_io
+
+
+def test_password_hashing_runs_off_the_event_loop():
+    async def scenario():
+        loop_thread = threading.get_ident()
+        hashed = await security.get_password_hash_async("s3cret")
+        worker = await run_io(threading.get_ident)
+        return (
+            await security.verify_password_async("s3cret", hashed),
+            await security.verify_password_async("wrong", hashed),
+            worker != loop_thread,
+        )
+
+    assert asyncio.run(scenario()) == (True, False, True)
+
+
+def test_loop_monitor_reports_blocking_route_and_stack():
+    stalls = []
+    monitor = LoopLagMonitor(threshold_ms=60, interval_ms=10, report=stalls.append)
+
+    def blocking_login_handler(request):
+        time.sleep(0.3)
+
+    async def scenario():
+        await monitor.start()
+        await asyncio.sleep(0.05)
+        blocking_login_handler(SimpleNamespace(scope={"type": "http", "method": "POST", "path": "/login"}))
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    asyncio.run(scenario())
+
+    assert len(stalls) == 1
+    assert stalls[0]["route"] == "POST /login"
+    assert stalls[0]["lag_ms"] >= 60
+    assert any("blocking_login_handler" in line for line in stalls[0]["stack"])
+    assert monitor.stats()["max_lag_ms"] >= 250
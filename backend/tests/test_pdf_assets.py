@@ -0,0 +1,75 @@
+import base64
+import io
+import threading
+
+from PIL import Image
+
+from app import models, report_generator
+from app.pdf_assets import PDFAssets
+
+
+def _jpeg(size=(4000, 3000)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (200, 120, 40)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def _fake_fetch(calls, content):
+    lock = threading.Lock()
+
+    def fetch(url):
+        with lock:
+            calls.append(url)
+        return None if url.endswith("missing.jpg") else content
+    return fetch
+
+
+def test_photos_are_downsized_once_and_reused(tmp_path):
+    calls = []
+    assets = PDFAssets(asset_dir=str(tmp_path), dpi=200, fetch=_fake_fetch(calls, _jpeg()))
+    urls = ["https://cdn/a.jpg", "https://cdn/b.jpg", "https://cdn/a.jpg", "https://cdn/missing.jpg"]
+
+    thumbnails = assets.prefetch(urls, 85, 55)
+
+    assert sorted(calls) == ["https://cdn/a.jpg", "https://cdn/b.jpg", "https://cdn/missing.jpg"]
+    assert thumbnails["https://cdn/missing.jpg"] is None
+    with Image.open(thumbnails["https://cdn/a.jpg"]) as thumb:
+        assert thumb.size == (669, 433)
+
+    calls.clear()
+    assert assets.prefetch(urls[:2], 85, 55) == {url: thumbnails[url] for url in urls[:2]}
+    assert calls == []
+
+
+def test_signatures_decode_to_one_file(tmp_path):
+    buffer = io.BytesIO()
+    Image.new("RGB", (40, 20), (0, 0, 0)).save(buffer, "PNG")
+    signature = "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+    assets = PDFAssets(asset_dir=str(tmp_path))
+
+    first = assets.signature_path(signature)
+    assert first.endswith(".png") and assets.signature_path(signature) == first
+    assert len(list(tmp_path.iterdir())) == 1
+    assert assets.signature_path("Jane Smith") is None
+
+
+def test_reports_reuse_parsed_images_across_builds(tmp_path, monkeypatch):
+    calls = []
+    assets = PDFAssets(asset_dir=str(tmp_path / "assets"), fetch=_fake_fetch(calls, _jpeg()))
+    monkeypatch.setattr(report_generator, "pdf_assets", assets)
+    report = models.ExtractionReport(id=1, job_number="pnj0001", company="Acme", job_type="Extraction")
+    photos = [
+        models.ExtractionPhoto(report_id=1, photo_type="Before Clean", photo_path=f"https://cdn/{index}.jpg")
+        for index in range(6)
+    ]
+
+    first = report_generator.generate_client_pdf(report, [], [], [], photos, str(tmp_path / "out" / "1.pdf"))
+    parsed = assets.misses
+    second = report_generator.generate_client_pdf(report, [], [], [], photos, str(tmp_path / "out" / "2.pdf"))
+
+    assert len(calls) == 6
+    assert assets.misses == parsed
+    assert assets.hits >= parsed
+    # Six 4000x3000 photos fit in well under a megabyte once downsized.
+    assert (tmp_path / "out" / "2.pdf").stat().st_size < 1024 * 1024
+    assert open(first, "rb").read(5) == open(second, "rb").read(5) == b"%PDF-"
@@ -0,0 +1,103 @@
+import asyncio
+import os
+
+from app import models
+from app.pdf_cache import PDFCache, pdf_cache
+
+
+def _fake_renderer(calls):
+    def render(report, micron_readings, inspection_items, filter_items, photos, output_path):
+        calls.append(report.id)
+        with open(output_path, "wb") as f:
+            f.write(b"%PDF-" + str(len(photos)).encode() + b" " * 1000)
+    return render
+
+
+def _report(report_id=1, **fields):
+    return models.ExtractionReport(id=report_id, job_number="pnj0001", company="Acme", **fields)
+
+
+def test_unchanged_content_is_rendered_once(tmp_path):
+    calls = []
+    cache = PDFCache(cache_dir=str(tmp_path), renderer=_fake_renderer(calls))
+    report = _report()
+
+    first = asyncio.run(cache.get_or_render(report, [], [], [], []))
+    assert asyncio.run(cache.get_or_render(report, [], [], [], [])) == first
+    assert calls == [1]
+
+    # A photo added behind the app's back (delta sync, a direct edit) still changes the key.
+    photo = models.ExtractionPhoto(report_id=1, photo_type="Before Clean", photo_path="https://cdn/a.jpg")
+    assert asyncio.run(cache.get_or_render(report, [], [], [], [photo])) != first
+    assert calls == [1, 1]
+
+
+def test_edited_report_row_renders_again(tmp_path):
+    calls = []
+    cache = PDFCache(cache_dir=str(tmp_path), renderer=_fake_renderer(calls))
+    asyncio.run(cache.get_or_render(_report(), [], [], [], []))
+    asyncio.run(cache.get_or_render(_report(status="Approved"), [], [], [], []))
+    assert calls == [1, 1]
+
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    cache = PDFCache(cache_dir=str(tmp_path), max_bytes=2500, renderer=_fake_renderer([]))
+    paths = []
+    for report_id in (1, 2, 3):
+        paths.append(asyncio.run(cache.get_or_render(_report(report_id), [], [], [], [])))
+        os.utime(paths[-1], (report_id, report_id))
+    asyncio.run(cache.get_or_render(_report(4), [], [], [], []))
+    assert not os.path.exists(paths[0]) and not os.path.exists(paths[1])
+    assert os.path.exists(paths[2])
+
+
+def test_repeat_download_renders_once(admin_client, local_db, tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(pdf_cache, "cache_dir", str(tmp_path))
+    monkeypatch.setattr(pdf_cache, "renderer", _fake_renderer(calls))
+    local_db.execute_sql("INSERT INTO extraction_reports (job_number, company) VALUES ('pnj0001', 'Acme')")
+
+    assert admin_client.get("/admin/reports/1/download").status_code == 200
+    assert admin_client.get("/admin/reports/1/download").status_code == 200
+    assert calls == [1]
+
+    assert admin_client.post("/admin/reports/1/approve").status_code == 200
+    assert admin_client.get("/admin/reports/1/download").status_code == 200
+    assert calls == [1, 1]
+
+
+def test_mirror_upload_runs_in_the_io_pool_and_is_tracked(tmp_path, monkeypatch):
+    uploads = []
+    monkeypatch.setattr(
+        "app.pdf_cache.supabase_storage.upload_file",
+        lambda content, name, content_type, bucket: uploads.append((name, content_type, bucket)),
+    )
+    cache = PDFCache(cache_dir=str(tmp_path), mirror=True, renderer=_fake_renderer([]))
+    monkeypatch.setattr(cache, "_fetch_mirror", lambda digest, path: asyncio.sleep(0, result=False))
+
+    async def render():
+        await cache.get_or_render(_report(), [], [], [], [])
+        assert len(cache._uploads) == 1
+        await asyncio.gather(*cache._uploads)
+
+    asyncio.run(render())
+    [(name, content_type, bucket)] = uploads
+    assert name.endswith(".pdf") and content_type == "application/pdf" and bucket == "pnj-pdf-cache"
+    assert cache._uploads == set()
+
+
+def test_fresh_container_downloads_the_mirrored_pdf(tmp_path, monkeypatch):
+    calls, downloads = [], []
+
+    def download(name, bucket):
+        downloads.append(bucket)
+        return b"%PDF-mirrored"
+
+    monkeypatch.setattr("app.pdf_cache.supabase_storage.download_file", download)
+    cache = PDFCache(cache_dir=str(tmp_path), mirror=True, renderer=_fake_renderer(calls))
+
+    path = asyncio.run(cache.get_or_render(_report(), [], [], [], []))
+
+    assert calls == [] and downloads == ["pnj-pdf-cache"]
+    with open(path, "rb") as f:
+        assert f.read() == b"%PDF-mirrored"
@@ -0,0 +1,67 @@
+import asyncio
+import io
+import zipfile
+
+import httpx
+
+from app.modules.extraction.photo_archive import stream_photo_zip
+
+
+def test_photo_zip_streams_entries_with_bounded_concurrency():
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if request.url.path.endswith("missing.jpg"):
+            return httpx.Response(404)
+        return httpx.Response(200, content=b"data:" + request.url.path.encode())
+
+    photos = [{"photo_path": f"https://cdn/p{i}.jpg", "photo_type": "Before Clean"} for i in range(10)]
+    photos.append({"photo_path": "https://cdn/scan.tif", "photo_type": "Site Evidence"})
+    photos.append({"photo_path": "https://cdn/missing.jpg", "photo_type": "After Clean"})
+
+    async def build():
+        chunks = []
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            async for chunk in stream_photo_zip(photos, "pnj0001", client=client, limit=3):
+                chunks.append(chunk)
+        return chunks
+
+    chunks = asyncio.run(build())
+    assert peak <= 3
+    assert len(chunks) > 10  # one flush per entry plus the central directory
+
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    infos = {info.filename: info for info in archive.infolist()}
+    assert len(infos) == 11
+    assert infos["pnj0001_photo_1_Before_Clean.jpg"].compress_type == zipfile.ZIP_STORED
+    assert infos["pnj0001_photo_11_Site_Evidence.tif"].compress_type == zipfile.ZIP_DEFLATED
+    assert archive.read("pnj0001_photo_3_Before_Clean.jpg") == b"data:/p2.jpg"
+
+
+def test_only_deflated_entries_are_compressed_off_the_loop(monkeypatch):
+    offloaded = []
+
+    async def run_cpu(func, *args):
+        offloaded.append(args[0].filename)
+        return func(*args)
+
+    monkeypatch.setattr("app.modules.extraction.photo_archive.run_cpu", run_cpu)
+
+    async def handler(request):
+        return httpx.Response(200, content=b"x" * 5000)
+
+    photos = [{"photo_path": "https://cdn/a.jpg"}, {"photo_path": "https://cdn/b.tif"}]
+
+    async def build():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return b"".join([chunk async for chunk in stream_photo_zip(photos, "pnj0001", client=client)])
+
+    archive = zipfile.ZipFile(io.BytesIO(asyncio.run(build())))
+    assert offloaded == ["pnj0001_photo_2_Photo.tif"]
+    assert archive.read("pnj0001_photo_2_Photo.tif") == b"x" * 5000
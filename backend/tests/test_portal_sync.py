@@ -0,0 +1,75 @@
+import uuid
+from datetime import date, timedelta
+
+from app import models
+
+TOKEN = str(uuid.uuid4())
+
+
+def _seed(factory):
+    today = date.today().isoformat()
+    factory.engineer("Alice", access_token=TOKEN)
+    for job_number, lead, day in (
+        ("pnj0001", "Bob", today),
+        ("pnj0002", "Alice", today),
+        ("pnj0003", "Alice", (date.today() - timedelta(days=90)).isoformat()),
+    ):
+        factory.job(job_number, date=day, engineer_contact_name=lead)
+    factory.assign("pnj0001", "Bob", "Lead")
+    factory.assign("pnj0001", "Alice")
+    factory.leave("Alice", today, today, status="Pending")
+    factory.insert("job_contributions", job_number="pnj0001", engineer_contact_name="Alice", note="Filters bagged")
+
+
+def test_sync_returns_only_changes_since_the_cursor(client, local_db, factory):
+    _seed(factory)
+    url = f"/api/engineer/{TOKEN}/sync"
+
+    first = client.get(url)
+    assert first.status_code == 200
+    body = first.json()
+    assert body["full"] is True and body["v"] == 1
+    assert [(job["job_number"], job["role"]) for job in body["jobs"]] == [("pnj0001", "Contributing"), ("pnj0002", "Lead")]
+    assert body["jobs"][0]["team"] == ["Bob", "Alice"]
+    assert len(body["leave"]) == 1 and body["contributions"][0]["note"] == "Filters bagged"
+    assert "removed" not in body
+
+    assert client.get(url, headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+    unchanged = client.get(url, params={"cursor": body["cursor"]}).json()
+    assert unchanged == {"v": 1, "cursor": body["cursor"], "full": False}
+
+    local_db.execute_sql("UPDATE jobs SET status = 'In Progress' WHERE job_number = 'pnj0002'")
+    local_db.execute_sql("DELETE FROM job_engineers WHERE engineer_contact_name = 'Alice'")
+    delta = client.get(url, params={"cursor": body["cursor"]}, headers={"If-None-Match": first.headers["ETag"]})
+
+    assert delta.status_code == 200
+    assert len(delta.content) < 300
+    changes = delta.json()
+    assert [job["status"] for job in changes["jobs"]] == ["In Progress"]
+    assert changes["removed"] == {"contributions": ["1"], "jobs": ["pnj0001"]}
+    assert "leave" not in changes
+
+
+def test_unknown_cursor_gets_a_full_snapshot(client, local_db, factory):
+    _seed(factory)
+
+    body = client.get(f"/api/engineer/{TOKEN}/sync", params={"cursor": "1.expired"}).json()
+
+    assert body["full"] is True and len(body["jobs"]) == 2
+    assert client.get(f"/api/engineer/{uuid.uuid4()}/sync").status_code == 403
+
+
+def test_dashboard_polls_sync_and_refreshes_only_todays_queue(client, local_db, factory):
+    from app.dependencies import templates
+
+    _seed(factory)
+    dashboard = templates.env.loader.get_source(templates.env, "engineer_dashboard.html")[0]
+    assert "/api/engineer/{{ token }}/sync" in dashboard and "/portal/{{ token }}/today" in dashboard
+    assert '{% include "partials/engineer_today_queue.html" %}' in dashboard
+
+    job = models.Job(job_number="pnj0002", date=date.today(), time="09:00", client_name="Acme", priority="Medium", status="Scheduled")
+    queue = templates.get_template("partials/engineer_today_queue.html").render(
+        today_jobs=[job], engineer=models.Engineer(contact_name="Alice"), token=TOKEN
+    )
+    assert "pnj0002" in queue and "Start Job" in queue and "<html" not in queue
+    assert client.get("/portal/not-a-token/today").status_code == 403
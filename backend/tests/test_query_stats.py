@@ -0,0 +1,42 @@
+import asyncio
+
+from app.db import db
+from app.query_stats import QUERY_N_PLUS_ONE_MIN, track_queries
+from conftest import QueryBudgetRecorder
+
+
+def test_per_row_queries_are_flagged_as_n_plus_one(factory):
+    for index in range(QUERY_N_PLUS_ONE_MIN):
+        factory.job(f"pnj{index:04d}")
+
+    async def scenario():
+        with track_queries() as queries:
+            for index in range(QUERY_N_PLUS_ONE_MIN):
+                await db.table("jobs").update({"status": "Done"}).eq("job_number", f"pnj{index:04d}").execute()
+            await asyncio.gather(*(db.table("clients").select("*").eq("client_name", "Acme").execute() for _ in range(2)))
+        await db.table("clients").select("*").execute()  # outside the block: not counted
+        return queries
+
+    queries = asyncio.run(scenario())
+
+    assert queries.count == QUERY_N_PLUS_ONE_MIN + 2
+    assert dict(queries.tables) == {"jobs": QUERY_N_PLUS_ONE_MIN, "clients": 2}
+    assert queries.n_plus_one() == {"jobs.update.eq(job_number)": QUERY_N_PLUS_ONE_MIN}
+    assert queries.repeated() == {"clients.select('*').eq('client_name', 'Acme')": 2}
+    assert queries.headers(budget=3)["X-DB-N-Plus-One"] == "jobs.update.eq(job_number)"
+
+
+def test_responses_carry_query_headers_and_budget(client, local_db, query_budget):
+    response = client.get("/api/engineer/not-a-token/sync")
+
+    assert response.status_code == 403
+    assert response.headers["X-DB-Queries"] == "1"
+    assert response.headers["X-DB-Query-Budget"] == "4"
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+    assert query_budget.requests[0][0] == "GET /api/engineer/{token}/sync"
+
+    recorder = QueryBudgetRecorder()
+    recorder.limit("GET /api/engineer/{token}/sync", 0)
+    recorder(*query_budget.requests[0][:2], 4)
+    [over] = recorder.over_budget()
+    assert over.startswith("GET /api/engineer/{token}/sync ran 1 queries (budget 0)")
@@ -0,0 +1,146 @@
+import asyncio
+from datetime import date
+
+from app import recurring_schedule
+from app.job_numbers import job_number_allocator
+from app.recurring_schedule import due_dates, working_day
+from app.reference_data import reference_data
+
+
+def _seed(factory):
+    factory.insert("clients", client_name="Acme", company="Acme Ltd", address="1 High St")
+    for site_name, address, frequency, last_clean, archived in (
+        ("Quarterly Inn", "2 Low St", 4, "2026-01-15", 0),
+        ("Monthly Arms", None, 12, "2026-03-20", 0),
+        ("Never Cleaned", None, 2, None, 0),
+        ("No Frequency", None, None, "2026-01-01", 0),
+        ("Closed Site", None, 12, "2026-03-01", 1),
+    ):
+        factory.insert("client_sites", client_name="Acme", site_name=site_name, address=address,
+                       frequency_number=frequency, last_clean=last_clean, archived=archived)
+
+
+def test_due_dates_step_by_frequency():
+    assert due_dates(date(2026, 1, 15), 4, date(2026, 3, 1), date(2026, 9, 1)) == [
+        (date(2026, 4, 15), False), (date(2026, 7, 15), False)
+    ]
+    # Overdue sites are booked on the first day, then continue from there.
+    assert due_dates(date(2025, 1, 31), 12, date(2026, 3, 1), date(2026, 5, 1)) == [
+        (date(2026, 3, 1), True), (date(2026, 4, 1), False)
+    ]
+    # Frequencies that do not divide the year step in days.
+    assert due_dates(date(2026, 1, 1), 5, date(2026, 1, 1), date(2026, 6, 1)) == [
+        (date(2026, 3, 15), False), (date(2026, 5, 27), False)
+    ]
+    assert working_day(date(2026, 3, 7)) == date(2026, 3, 9)
+    assert working_day(date(2026, 3, 10)) == date(2026, 3, 10)
+
+
+def test_dry_run_previews_without_writing(admin_client, local_db, factory):
+    _seed(factory)
+    asyncio.run(reference_data.snapshot())
+    local_db.reset_query_log()
+
+    response = admin_client.post("/api/admin/schedule/recurring", json={"start": "2026-04-01", "months": 3})
+
+    assert response.status_code == 200
+    plan = response.json()
+    assert [(job["site_name"], job["date"], job["overdue"]) for job in plan["jobs"]] == [
+        ("Never Cleaned", "2026-04-01", False),
+        ("Quarterly Inn", "2026-04-15", False),
+        ("Monthly Arms", "2026-04-20", False),
+        ("Monthly Arms", "2026-05-20", False),
+        ("Monthly Arms", "2026-06-22", False),  # 20 June is a Saturday
+    ]
+    assert plan["sites_considered"] == 4 and plan["sites_without_frequency"] == 1
+    assert plan["created"] == 0
+    assert [table for table, _ in local_db.query_log if table != "users"] == ["jobs"]
+    assert local_db.execute_sql("SELECT COUNT(*) AS n FROM jobs")[0]["n"] == 0
+
+
+def test_create_reserves_one_block_and_is_idempotent(admin_client, local_db, factory):
+    _seed(factory)
+    local_db.reset_query_log()
+
+    response = admin_client.post("/api/admin/schedule/recurring", json={"start": "2026-04-01", "months": 3, "dry_run": False})
+
+    assert response.status_code == 200
+    plan = response.json()
+    assert plan["created"] == 5
+    assert [job["job_number"] for job in plan["jobs"]] == ["pnj0001", "pnj0002", "pnj0003", "pnj0004", "pnj0005"]
+    assert local_db.query_log.count(("rpc/reserve_job_numbers", "rpc")) == 1
+    assert local_db.query_log.count(("jobs", "insert")) == 1
+    row = local_db.execute_sql("SELECT company, address, status FROM jobs WHERE site_name = 'Quarterly Inn'")[0]
+    assert dict(row) == {"company": "Acme Ltd", "address": "2 Low St", "status": "Scheduled"}
+
+    again = admin_client.post("/api/admin/schedule/recurring", json={"start": "2026-04-01", "months": 3, "dry_run": False})
+    assert again.json()["jobs"] == [] and again.json()["created"] == 0
+    assert local_db.execute_sql("SELECT COUNT(*) AS n FROM jobs")[0]["n"] == 5
+
+
+def test_engineer_clashes_block_creation(admin_client, local_db, factory):
+    _seed(factory)
+
+    response = admin_client.post("/api/admin/schedule/recurring", json={
+        "start": "2026-04-01", "months": 1, "engineer_name": "Gary", "site_ids": [1, 2]
+    })
+    assert response.status_code == 200
+    assert response.json()["conflicts"] == []
+
+    factory.leave("Gary", "2026-04-15", "2026-04-15", reason=None)
+    blocked = admin_client.post("/api/admin/schedule/recurring", json={
+        "start": "2026-04-01", "months": 1, "engineer_name": "Gary", "site_ids": [1, 2], "dry_run": False
+    })
+    assert blocked.status_code == 409
+    assert local_db.execute_sql("SELECT COUNT(*) AS n FROM jobs")[0]["n"] == 0
+
+
+def test_latest_jobs_reads_every_page(local_db, factory, monkeypatch):
+    monkeypatch.setattr(recurring_schedule, "SCHEDULE_JOBS_PAGE", 2)
+    for n, (site_name, day) in enumerate((
+        ("Quarterly Inn", "2026-02-01"), ("Monthly Arms", "2026-03-01"), ("Quarterly Inn", "2026-03-10"),
+        ("Monthly Arms", "2026-01-05"), ("Never Cleaned", "2026-02-20"),
+    ), start=1):
+        factory.job(f"pnj{n:04d}", date=day, site_name=site_name)
+    local_db.reset_query_log()
+
+    latest = asyncio.run(recurring_schedule._latest_jobs(date(2026, 4, 1), date(2026, 7, 1)))
+
+    assert latest == {
+        ("Acme", "Quarterly Inn"): date(2026, 3, 10),
+        ("Acme", "Monthly Arms"): date(2026, 3, 1),
+        ("Acme", "Never Cleaned"): date(2026, 2, 20),
+    }
+    assert local_db.query_log.count(("jobs", "select")) == 3
+
+
+def test_create_needs_the_job_number_counter(admin_client, local_db, factory, monkeypatch):
+    _seed(factory)
+    monkeypatch.setattr(job_number_allocator, "reuse_gaps", True)
+
+    response = admin_client.post("/api/admin/schedule/recurring", json={"start": "2026-04-01", "months": 3, "dry_run": False})
+
+    assert response.status_code == 409
+    assert "JOB_NUMBER_REUSE_GAPS" in response.json()["detail"]
+    assert local_db.execute_sql("SELECT COUNT(*) AS n FROM jobs")[0]["n"] == 0
+    assert admin_client.post("/api/admin/schedule/recurring", json={"start": "2026-04-01", "months": 3}).status_code == 200
+
+
+def test_same_day_jobs_for_one_engineer_get_consecutive_slots(admin_client, local_db, factory):
+    factory.insert("clients", client_name="Acme", company="Acme Ltd")
+    for site_name in ("Overdue One", "Overdue Two"):
+        factory.insert("client_sites", client_name="Acme", site_name=site_name, frequency_number=12, last_clean="2026-01-01")
+
+    response = admin_client.post("/api/admin/schedule/recurring", json={
+        "start": "2026-04-01", "months": 1, "engineer_name": "Gary", "dry_run": False
+    })
+
+    assert response.status_code == 200
+    plan = response.json()
+    assert plan["conflicts"] == [] and plan["created"] == 2
+    assert [(job["site_name"], job["date"], job["time"]) for job in plan["jobs"]] == [
+        ("Overdue One", "2026-04-01", "09:00:00"),
+        ("Overdue Two", "2026-04-01", "11:00:00"),
+    ]
+    rows = local_db.execute_sql("SELECT site_name, time FROM jobs WHERE engineer_contact_name = 'Gary' ORDER BY time")
+    assert [(row["site_name"], row["time"]) for row in rows] == [("Overdue One", "09:00:00"), ("Overdue Two", "11:00:00")]
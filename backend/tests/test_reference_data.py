@@ -0,0 +1,78 @@
+import asyncio
+
+from app import reference_data
+from app.reference_data import ReferenceDataCache
+
+
+def _seed(factory):
+    for brand in ("Burgers", "Pizza"):
+        factory.insert("brands", brand_name=brand)
+    factory.insert("clients", client_name="Beta")
+    factory.insert("clients", client_name="Acme")
+    factory.insert("clients", client_name="Gone", archived=1)
+    for site_name, client, brand, code, archived in (
+        ("Leeds", "Acme", "Burgers", "B2", 0),
+        ("Bradford", "Acme", "Burgers", "B1", 0),
+        ("Closed", "Acme", "Pizza", "P9", 1),
+        ("York", "Beta", "Pizza", None, 0),
+    ):
+        factory.insert("client_sites", client_name=client, site_name=site_name, brand_name=brand, store_id_code=code, archived=archived)
+
+
+def test_snapshot_indexes_and_filters(local_db, factory):
+    _seed(factory)
+    snapshot = asyncio.run(ReferenceDataCache().snapshot())
+
+    assert [s["site_name"] for s in snapshot.active_sites("Acme")] == ["Bradford", "Leeds"]
+    assert [s["store_id_code"] for s in snapshot.active_sites("Acme", order_by_store_id=True)] == ["B1", "B2"]
+    assert snapshot.brands_for_client("Acme") == ["Burgers"]
+    assert [c["client_name"] for c in snapshot.clients_for_brand("Pizza")] == ["Acme", "Beta"]
+    assert [c["client_name"] for c in snapshot.active_clients()] == ["Acme", "Beta"]
+    assert snapshot.sites_by_store_id_code["P9"][0]["site_name"] == "Closed"
+
+
+def test_lookups_answer_from_memory_until_a_crm_write(admin_client, local_db, factory):
+    _seed(factory)
+    assert admin_client.get("/admin/sites-lookup", params={"client_name": "Acme"}).status_code == 200
+    local_db.reset_query_log()
+
+    brand = admin_client.get("/admin/client-brand-lookup", params={"client_name": "Acme"}).json()
+    options = admin_client.get("/admin/sites-lookup-by-id", params={"client_name": "Acme"}).text
+    assert brand["brand"] == "Burgers"
+    assert options.index(">B1<") < options.index(">B2<")
+    assert local_db.query_log == []
+
+    admin_client.post("/admin/manage/sites/add", data={"client_name": "Acme", "site_name": "Hull", "address": "1 Dock St"}, follow_redirects=False)
+    assert ("client_sites", "select") not in local_db.query_log
+    local_db.reset_query_log()
+    assert "Hull" in admin_client.get("/admin/sites-lookup", params={"client_name": "Acme"}).text
+    assert local_db.query_log == [("client_sites", "select")]
+
+
+def test_write_during_load_is_not_cached(local_db, factory):
+    _seed(factory)
+    cache = ReferenceDataCache()
+
+    async def scenario():
+        loading = asyncio.ensure_future(cache.snapshot())
+        await asyncio.sleep(0)
+        cache.invalidate("clients")
+        await loading
+        assert "clients" not in cache._tables
+        return (await cache.snapshot()).version
+
+    assert asyncio.run(scenario()) == 2
+
+
+def test_tables_larger_than_a_page_are_read_in_full(local_db, factory, monkeypatch):
+    monkeypatch.setattr(reference_data, "REFERENCE_DATA_PAGE", 2)
+    _seed(factory)
+    local_db.reset_query_log()
+
+    snapshot = asyncio.run(ReferenceDataCache().snapshot())
+
+    assert sorted(s["site_name"] for s in snapshot.sites) == ["Bradford", "Closed", "Leeds", "York"]
+    assert [c["client_name"] for c in snapshot.clients] == ["Acme", "Beta", "Gone"]
+    # Four sites fill two pages and need an empty third to stop; three clients end on a short page.
+    assert local_db.query_log.count(("client_sites", "select")) == 3
+    assert local_db.query_log.count(("clients", "select")) == 2
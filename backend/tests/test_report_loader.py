@@ -0,0 +1,69 @@
+import asyncio
+
+from app.report_loader import load_report_aggregate
+
+
+def _seed(factory):
+    factory.insert("clients", client_name="Acme", portal_token="tok")
+    factory.job("pnj0001", date="2026-10-01", status="Archived")
+    factory.insert("extraction_reports", job_number="pnj0001", company="Acme")
+    factory.insert("extraction_micron_readings", report_id=1, location="Canopy", pre_clean=180, post_clean=40)
+    factory.insert("extraction_photos", report_id=1, photo_type="After Clean", photo_path="https://cdn/b.jpg")
+    factory.insert("extraction_photos", report_id=1, photo_type="Before Clean", photo_path="https://cdn/a.jpg")
+
+
+def test_report_by_id_is_one_query_plus_the_job(local_db, factory):
+    _seed(factory)
+    local_db.reset_query_log()
+
+    aggregate = asyncio.run(load_report_aggregate(report_id=1))
+
+    assert [table for table, _ in local_db.query_log] == ["extraction_reports", "jobs"]
+    assert aggregate.report.job_number == "pnj0001"
+    assert aggregate.job.client_name == "Acme"
+    assert [m.location for m in aggregate.micron_readings] == ["Canopy"]
+    assert [p.photo_type for p in aggregate.photos] == ["After Clean", "Before Clean"]
+    assert aggregate.inspection_items == [] and aggregate.filter_items == []
+
+
+def test_missing_report_returns_none(local_db):
+    assert asyncio.run(load_report_aggregate(job_number="pnj9999")) is None
+
+
+def test_child_queries_run_separately_when_embedding_fails(local_db, monkeypatch, factory):
+    _seed(factory)
+    monkeypatch.setattr(local_db, "relationship", lambda parent, child: None)
+    local_db.reset_query_log()
+
+    aggregate = asyncio.run(load_report_aggregate(job_number="pnj0001", include_job=False))
+
+    assert len(aggregate.photos) == 2 and len(aggregate.micron_readings) == 1
+    assert sorted(table for table, _ in local_db.query_log[2:]) == sorted([
+        "extraction_micron_readings", "extraction_inspection_items", "extraction_filter_items", "extraction_photos",
+    ])
+
+
+def test_portal_pdf_rejects_other_clients(client, local_db, tmp_path, monkeypatch, factory):
+    from app.pdf_cache import pdf_cache
+
+    _seed(factory)
+    local_db.execute_sql("INSERT INTO clients (client_name, portal_token) VALUES ('Other', 'other')")
+    monkeypatch.setattr(pdf_cache, "cache_dir", str(tmp_path))
+    monkeypatch.setattr(pdf_cache, "renderer", lambda *args: open(args[-1], "wb").write(b"%PDF-1"))
+
+    factory.job("pnj0002", client_name="Other")
+    local_db.reset_query_log()
+    assert client.get("/client-portal/nope/pdf/pnj0001").status_code == 404
+    assert [table for table, _ in local_db.query_log] == ["clients"]
+
+    # Another client's job is refused the same way whether or not it has a report.
+    for token, job_number in (("other", "pnj0001"), ("tok", "pnj0002"), ("tok", "pnj9999")):
+        local_db.reset_query_log()
+        assert client.get(f"/client-portal/{token}/pdf/{job_number}").status_code == 403
+        assert "extraction_reports" not in [table for table, _ in local_db.query_log]
+    assert client.get("/client-portal/other/pdf/pnj0002").status_code == 404
+
+    local_db.reset_query_log()
+    response = client.get("/client-portal/tok/pdf/pnj0001")
+    assert response.status_code == 200 and response.content.startswith(b"%PDF")
+    assert [table for table, _ in local_db.query_log] == ["clients", "jobs", "extraction_reports"]
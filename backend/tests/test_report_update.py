@@ -0,0 +1,35 @@
+def test_save_sends_one_upsert_per_table_with_only_changed_rows(admin_client, local_db, query_budget):
+    local_db.execute_sql("INSERT INTO extraction_reports (job_number, company) VALUES ('pnj0001', 'Acme')")
+    for index in range(30):
+        local_db.execute_sql(
+            "INSERT INTO extraction_micron_readings (report_id, location, pre_clean, post_clean, description) "
+            "VALUES (1, ?, 100, 20, 'ok')",
+            (f"Duct {index}",),
+        )
+    local_db.execute_sql("INSERT INTO extraction_inspection_items (report_id, item_name, advice) VALUES (1, 'Fan', '')")
+    local_db.execute_sql("INSERT INTO extraction_inspection_items (report_id, item_name, advice) VALUES (1, 'Canopy', '')")
+
+    form = {"company": "Acme"}
+    for rid in range(1, 31):
+        form.update({f"read_pre_{rid}": "100", f"read_post_{rid}": "20", f"read_desc_{rid}": "ok"})
+    form.update({"read_post_7": "15", "read_post_21": "12", "insp_status_2": "Fail", "insp_advice_2": "Replace belt"})
+
+    local_db.reset_query_log()
+    response = admin_client.post("/admin/reports/1/update", data=form)
+
+    assert response.status_code == 200
+    assert "X-DB-N-Plus-One" not in response.headers
+    writes = [(table, method) for table, method in local_db.query_log if method not in {"select"}]
+    assert sorted(writes) == [
+        ("extraction_inspection_items", "upsert"),
+        ("extraction_micron_readings", "upsert"),
+        ("extraction_reports", "update"),
+    ]
+    post_clean = local_db.execute_sql("SELECT id, post_clean FROM extraction_micron_readings WHERE post_clean != 20")
+    assert [(row["id"], row["post_clean"]) for row in post_clean] == [(7, 15), (21, 12)]
+    item = local_db.execute_sql("SELECT * FROM extraction_inspection_items WHERE id = 2")[0]
+    assert item["fail_status"] and not item["pass_status"] and item["advice"] == "Replace belt"
+
+    local_db.reset_query_log()
+    admin_client.post("/admin/reports/1/update", data=form)
+    assert not any(method == "upsert" for _, method in local_db.query_log)
@@ -0,0 +1,127 @@
+import asyncio
+import io
+import json
+
+from app.site_import import SiteImporter, read_rows
+
+SHEET = (
+    "Company,Brand,Site Name,Site No.,Address,Current cleans PA,Date Cleaned.\n"
+    "Acme,Goat Inns,Goat,306,St Albans,1,15/01/2026\n"
+    "Acme,Goat Inns,Jolly Sailor,256.0,St Albans,NO CLEANS YET,\n"
+    ",,,,,,\n"
+    "Acme,,Duplicate Goat,306,,4,\n"
+    "Acme,,,999,Nowhere,2,\n"
+    "Beta,,Gate,260,Watford,4,2026-02-01\n"
+)
+
+
+def _import(text, **options):
+    importer = SiteImporter(**options)
+    return asyncio.run(importer.run(read_rows(io.BytesIO(text.encode()), "sites.csv")))
+
+
+def _sites(local_db):
+    rows = local_db.execute_sql(
+        "SELECT client_name, site_name, store_id_code, brand_name, frequency_number, last_clean FROM client_sites ORDER BY id"
+    )
+    return [tuple(row) for row in rows]
+
+
+def test_import_validates_dedupes_and_creates_clients(local_db):
+    local_db.execute_sql("INSERT INTO clients (client_name) VALUES ('Acme')")
+    progress = []
+
+    stats = _import(SHEET, chunk_size=2, progress=lambda s: progress.append(s.rows))
+
+    assert (stats.rows, stats.inserted, stats.duplicates, stats.invalid) == (5, 3, 1, 1)
+    assert stats.errors == ["Row 6: site_name: Field required"]
+    assert (stats.clients_created, stats.brands_created) == (1, 1)
+    assert progress == [2, 5]
+    assert _sites(local_db) == [
+        ("Acme", "Goat", "306", "Goat Inns", 1, "2026-01-15"),
+        ("Acme", "Jolly Sailor", "256", "Goat Inns", None, None),
+        ("Beta", "Gate", "260", None, 4, "2026-02-01"),
+    ]
+    assert local_db.execute_sql("SELECT portal_token FROM clients WHERE client_name = 'Beta'")[0]["portal_token"]
+
+
+def test_reimport_only_writes_changed_rows(local_db):
+    _import(SHEET)
+
+    local_db.reset_query_log()
+    again = _import(SHEET)
+    assert (again.inserted, again.updated, again.unchanged) == (0, 0, 3)
+    assert [method for _, method in local_db.query_log] == ["select"] * 4
+
+    changed = SHEET.replace("Goat Inns,Jolly Sailor,256.0,St Albans,NO CLEANS YET,", "Goat Inns,Jolly Sailor,256,,12,")
+    local_db.reset_query_log()
+    stats = _import(changed)
+    assert (stats.inserted, stats.updated, stats.unchanged) == (0, 1, 2)
+    assert ("client_sites", "upsert") in local_db.query_log
+    jolly = local_db.execute_sql("SELECT address, frequency_number FROM client_sites WHERE site_name = 'Jolly Sailor'")[0]
+    # The blank address cell left the stored address alone.
+    assert tuple(jolly) == ("St Albans", 12)
+
+
+def test_dry_run_and_default_client(local_db):
+    sheet = "Site Name,Site No.,Current cleans PA\nGoat,306,1\n"
+
+    stats = _import(sheet, dry_run=True, default_client="Acme")
+    assert (stats.inserted, stats.clients_created) == (1, 1)
+    assert _sites(local_db) == []
+
+    assert _import(sheet).invalid == 1
+
+
+def test_dry_run_counts_each_new_client_and_brand_once(local_db):
+    stats = _import(SHEET, chunk_size=1, dry_run=True)
+
+    assert (stats.clients_created, stats.brands_created) == (2, 1)
+    assert local_db.execute_sql("SELECT COUNT(*) AS n FROM clients")[0]["n"] == 0
+
+
+def test_admin_endpoint_streams_progress(admin_client, local_db):
+    response = admin_client.post(
+        "/api/admin/import/sites",
+        files={"file": ("sites.csv", SHEET.encode(), "text/csv")},
+        data={"chunk_size": "2"},
+    )
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["rows"] for line in lines] == [2, 5, 5]
+    assert lines[-1]["done"] and lines[-1]["inserted"] == 3
+    assert len(_sites(local_db)) == 3
+
+    rejected = admin_client.post("/api/admin/import/sites", files={"file": ("sites.txt", b"x", "text/plain")})
+    assert rejected.status_code == 400
+
+
+def test_disconnect_stops_the_import_before_removing_the_spool(tmp_path):
+    from app.routers.crm import _site_import_progress
+    from app.models import SiteImportStats
+
+    path = tmp_path / "sites.csv"
+    path.write_text(SHEET)
+    seen = {}
+
+    class SlowImporter:
+        progress = None
+
+        async def run(self, rows):
+            self.progress(SiteImportStats(rows=1))
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                seen["spool_present_when_cancelled"] = path.exists()
+                raise
+
+    async def scenario():
+        stream = _site_import_progress(str(path), SlowImporter())
+        first = await stream.__anext__()
+        await stream.aclose()  # what Starlette does when the client disconnects
+        return json.loads(first)
+
+    assert asyncio.run(scenario())["rows"] == 1
+    assert seen == {"spool_present_when_cancelled": True}
+    assert not path.exists()
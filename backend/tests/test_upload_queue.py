@@ -0,0 +1,68 @@
+import asyncio
+import io
+import os
+
+from app.modules.extraction.upload_queue import PhotoUploadQueue
+
+
+class FakeUpload:
+    def __init__(self, content: bytes):
+        self.file = io.BytesIO(content)
+
+
+def _pending_row(local_db, storage_path):
+    local_db.execute_sql("INSERT INTO extraction_reports (job_number) VALUES ('pnj0001')")
+    rows = local_db.execute_sql(
+        "INSERT INTO extraction_photos (report_id, photo_type, photo_path, storage_path, upload_status) "
+        "VALUES (1, 'Before Clean', 'https://cdn/' || ?, ?, 'pending') RETURNING id",
+        (storage_path, storage_path),
+    )
+    return rows[0]["id"]
+
+
+def test_spooled_photos_upload_in_background_with_retries(local_db, tmp_path):
+    attempts = []
+
+    def flaky_upload(content, storage_path):
+        attempts.append(storage_path)
+        if len(attempts) == 1:
+            raise ConnectionError("4G dropped")
+        return f"https://cdn/{storage_path}"
+
+    queue = PhotoUploadQueue(spool_dir=str(tmp_path), workers=2, retry_delay=0, uploader=flaky_upload)
+    storage_path = "reports/pnj0001/before.jpg"
+    photo_id = _pending_row(local_db, storage_path)
+
+    async def scenario():
+        spool_path = await queue.spool(FakeUpload(b"jpeg-bytes"), storage_path)
+        assert open(spool_path, "rb").read() == b"jpeg-bytes"
+        queue.enqueue(photo_id, storage_path)
+        await queue.join()
+        await queue.stop()
+        return spool_path
+
+    spool_path = asyncio.run(scenario())
+    row = local_db.execute_sql("SELECT upload_status, photo_path FROM extraction_photos WHERE id = ?", (photo_id,))[0]
+    assert row["upload_status"] == "uploaded"
+    assert row["photo_path"] == "https://cdn/reports/pnj0001/before.jpg"
+    assert len(attempts) == 2
+    assert not os.path.exists(spool_path)
+
+
+def test_upload_marked_failed_after_last_attempt(local_db, tmp_path):
+    def broken_upload(content, storage_path):
+        raise ConnectionError("storage unavailable")
+
+    queue = PhotoUploadQueue(spool_dir=str(tmp_path), max_attempts=2, retry_delay=0, uploader=broken_upload)
+    storage_path = "reports/pnj0001/after.jpg"
+    photo_id = _pending_row(local_db, storage_path)
+
+    async def scenario():
+        await queue.spool(FakeUpload(b"x"), storage_path)
+        await queue.resume_pending()
+        await queue.join()
+        await queue.stop()
+
+    asyncio.run(scenario())
+    row = local_db.execute_sql("SELECT upload_status FROM extraction_photos WHERE id = ?", (photo_id,))[0]
+    assert row["upload_status"] == "failed"
@@ -0,0 +1,45 @@
+import asyncio
+
+from app.user_cache import UserCache, user_cache
+
+
+def test_entries_expire_and_are_bounded(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("app.user_cache.time.monotonic", lambda: clock[0])
+    cache = UserCache(ttl=30, max_entries=2)
+    loads = []
+
+    async def loader(email):
+        loads.append(email)
+        return type("U", (), {"id": len(loads)})()
+
+    asyncio.run(cache.get_or_load("A@example.com", loader))
+    asyncio.run(cache.get_or_load("a@example.com ", loader))
+    assert loads == ["A@example.com"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    clock[0] += 31
+    asyncio.run(cache.get_or_load("a@example.com", loader))
+    asyncio.run(cache.get_or_load("b@example.com", loader))
+    asyncio.run(cache.get_or_load("c@example.com", loader))
+    assert cache.stats()["entries"] == 2
+    assert cache.get("a@example.com") is None
+
+
+def test_requests_reuse_the_cached_user_until_an_admin_edit(admin_client, local_db):
+    local_db.execute_sql("INSERT INTO users (username, email, password, role) VALUES ('eve', 'eve@example.com', 'x', 'Manager')")
+    admin_client.get("/api/admin/cache-stats")
+    local_db.reset_query_log()
+
+    for _ in range(3):
+        assert admin_client.get("/api/admin/cache-stats").status_code == 200
+    assert ("users", "select") not in local_db.query_log
+
+    response = admin_client.post(
+        "/admin/manage/users/edit/1",
+        data={"username": "admin", "email": "admin@example.com", "role": "Manager"},
+        follow_redirects=False,
+    )
+    assert response.status_code == 303
+    assert user_cache.get("admin@example.com") is None
+    assert admin_client.get("/api/admin/cache-stats").status_code == 403